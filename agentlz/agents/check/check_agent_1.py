@@ -7,16 +7,20 @@ from agentlz.schemas.check import CheckInput, CheckOutput
 from mcp.server.fastmcp import FastMCP
 
 # Agent: Check Agent
-def get_check_agent() -> Runnable[CheckInput, CheckOutput]:
+def get_check_agent(llm=None) -> Runnable[CheckInput, CheckOutput]:
     """
     构建并返回一个 Check Agent。
 
     该 Agent 接收一个 CheckInput 对象，返回一个 CheckOutput 对象。
     它使用 LLM 来判断 factMsg 是否成功实现了 objectMsg 的目标。
+
+    参数:
+        llm: 可选，注入的聊天模型（基准测试/离线测试使用）；默认由 get_model 构建
     """
     # 1. 获取模型，并绑定输出结构
-    settings = get_settings()
-    llm = get_model(settings)
+    if llm is None:
+        settings = get_settings()
+        llm = get_model(settings, agent_name="check")
     structured_llm = llm.with_structured_output(CheckOutput)
 
     # 2. 创建提示词模板
@@ -0,0 +1,206 @@
+"""
+依赖图（DAG）步骤调度
+
+WorkflowPlan.steps 中每个步骤通过 inputs 引用前序步骤的输出；依赖全部完成的步骤即可执行，
+互不依赖的步骤在 asyncio 上并发（并发数受 concurrency 限制），总耗时趋近关键路径长度。
+某步骤失败时，直接或间接依赖它的步骤标记为 skipped，其余分支继续执行。
+步骤输出同时以步骤 id 与输出绑定名（WorkflowStep.output）登记，供后续步骤的 task/args 模板引用。
+每个步骤在 min(步骤超时预算, 请求截止时间) 内执行，超时的步骤被取消并标记为 timeout，其下游同样 skipped。
+"""
+
+import asyncio
+import dataclasses
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from agentlz.core.deadline import deadline_scope, run_with_timeout
+from agentlz.core.tracing import span
+from agentlz.schemas.workflow import StepResult, WorkflowStep
+
+StepRunner = Callable[[WorkflowStep, Dict[str, str]], Awaitable[str]]
+EventCallback = Callable[[str, Dict[str, Any]], None]
+
+_REF = re.compile(r"\{([A-Za-z0-9_\-]+)\}")
+
+
+def validate_steps(steps: List[WorkflowStep]) -> List[str]:
+    """
+    校验依赖图并返回拓扑序的步骤 id。
+
+    异常:
+        ValueError：步骤 id 重复、引用了不存在的步骤或存在环。
+    """
+    ids = [s.id for s in steps]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"步骤 id 重复：{ids}")
+    known = set(ids)
+    for s in steps:
+        missing = [i for i in s.inputs if i not in known]
+        if missing:
+            raise ValueError(f"步骤 {s.id} 引用了不存在的步骤：{missing}")
+    bindings = [s.output for s in steps if s.output and s.output != s.id]
+    clashes = sorted({b for b in bindings if b in known or bindings.count(b) > 1})
+    if clashes:
+        raise ValueError(f"输出绑定名重复或与步骤 id 冲突：{clashes}")
+    pending = {s.id: set(s.inputs) for s in steps}
+    order: List[str] = []
+    while pending:
+        ready = [i for i in ids if i in pending and not pending[i]]
+        if not ready:
+            raise ValueError(f"步骤依赖存在环：{sorted(pending)}")
+        for i in ready:
+            order.append(i)
+            del pending[i]
+        for deps in pending.values():
+            deps.difference_update(ready)
+    return order
+
+
+def render_task(template: str, outputs: Dict[str, str]) -> str:
+    """把任务描述中的 {步骤id} 替换为对应步骤的输出；未知引用保持原样。"""
+    return _REF.sub(lambda m: outputs.get(m.group(1), m.group(0)), template or "")
+
+
+def render_args(value: Any, outputs: Dict[str, str]) -> Any:
+    """递归渲染参数模板：字符串中的 {步骤id/绑定名} 替换为对应输出，其它类型原样返回。"""
+    if isinstance(value, str):
+        return render_task(value, outputs)
+    if isinstance(value, dict):
+        return {k: render_args(v, outputs) for k, v in value.items()}
+    if isinstance(value, list):
+        return [render_args(v, outputs) for v in value]
+    return value
+
+
+def _refs(value: Any) -> List[str]:
+    if isinstance(value, str):
+        return _REF.findall(value)
+    if isinstance(value, dict):
+        return [r for v in value.values() for r in _refs(v)]
+    if isinstance(value, list):
+        return [r for v in value for r in _refs(v)]
+    return []
+
+
+def infer_inputs(steps: List[WorkflowStep]) -> List[WorkflowStep]:
+    """
+    补全步骤依赖：task/args 中引用了其它步骤（id 或输出绑定名）但未列入 inputs 时自动加入。
+
+    返回:
+        新的步骤列表（原步骤对象不修改）。
+    """
+    names = {s.id: s.id for s in steps}
+    names.update({s.output: s.id for s in steps if s.output})
+    result: List[WorkflowStep] = []
+    for s in steps:
+        inputs = list(s.inputs)
+        for ref in _refs(s.task) + _refs(s.args):
+            target = names.get(ref)
+            if target and target != s.id and target not in inputs:
+                inputs.append(target)
+        result.append(dataclasses.replace(s, inputs=inputs) if inputs != s.inputs else s)
+    return result
+
+
+def sink_steps(steps: List[WorkflowStep]) -> List[str]:
+    """返回没有被其它步骤引用的步骤 id（最终输出）。"""
+    used = {i for s in steps for i in s.inputs}
+    return [s.id for s in steps if s.id not in used]
+
+
+async def run_dag(
+    steps: List[WorkflowStep],
+    run_step: StepRunner,
+    concurrency: int = 4,
+    on_event: Optional[EventCallback] = None,
+    step_timeout: Optional[float] = None,
+) -> Dict[str, StepResult]:
+    """
+    按依赖关系并发执行步骤。
+
+    参数:
+        steps: 计划中的步骤。
+        run_step: 执行单个步骤的协程 run_step(step, outputs)，outputs 为已完成步骤的输出
+            （键为步骤 id 与输出绑定名）；返回步骤输出文本。
+        concurrency: 同时执行的步骤数上限。
+        on_event: 可选的事件回调 on_event(name, data)，name 为 step_start / step_end。
+        step_timeout: 步骤默认超时（秒），步骤自身的 timeout 优先；<=0 或 None 表示只受上下文截止时间约束。
+    返回:
+        按 steps 顺序排列的 {步骤 id: StepResult}。
+    异常:
+        ValueError：依赖图非法（见 validate_steps）。
+    """
+    validate_steps(steps)
+    by_id = {s.id: s for s in steps}
+    waiting = {s.id: set(s.inputs) for s in steps}
+    dependents: Dict[str, List[str]] = {s.id: [] for s in steps}
+    for s in steps:
+        for i in s.inputs:
+            dependents[i].append(s.id)
+    outputs: Dict[str, str] = {}
+    results: Dict[str, StepResult] = {}
+    sem = asyncio.Semaphore(max(1, int(concurrency)))
+
+    def emit(name: str, data: Dict[str, Any]) -> None:
+        if on_event is not None:
+            on_event(name, data)
+
+    async def execute(step: WorkflowStep) -> StepResult:
+        async with sem:
+            emit("step_start", {"id": step.id, "server": step.server})
+            start = time.perf_counter()
+            with span("executor.step", {"step.id": step.id, "step.server": step.server, "step.tool": step.tool}) as sp:
+                try:
+                    # 步骤预算写入上下文截止时间，步骤内的工具调用与 LLM 调用都受其约束
+                    with deadline_scope(step.timeout or step_timeout):
+                        output = await run_with_timeout(run_step(step, dict(outputs)), what=f"步骤 {step.id}")
+                    result = StepResult(id=step.id, status="ok", output=str(output))
+                except TimeoutError as e:
+                    result = StepResult(id=step.id, status="timeout", error=str(e) or repr(e))
+                except Exception as e:
+                    result = StepResult(id=step.id, status="error", error=repr(e))
+                sp.set_attribute("step.status", result.status)
+                if result.status != "ok":
+                    sp.set_status("error", result.error)
+            result.elapsed_ms = round((time.perf_counter() - start) * 1000.0, 1)
+            emit("step_end", {"id": step.id, "status": result.status, "output": result.output,
+                              "error": result.error, "elapsed_ms": result.elapsed_ms})
+            return result
+
+    def skip(step_id: str) -> None:
+        for child in dependents[step_id]:
+            if child not in results:
+                results[child] = StepResult(id=child, status="skipped", error=f"前序步骤 {step_id} 未成功")
+                waiting.pop(child, None)
+                skip(child)
+
+    running: Dict[asyncio.Task, str] = {}
+
+    def launch_ready() -> None:
+        for step_id in [i for i, deps in waiting.items() if not deps]:
+            del waiting[step_id]
+            running[asyncio.ensure_future(execute(by_id[step_id]))] = step_id
+
+    launch_ready()
+    try:
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                step_id = running.pop(task)
+                result = task.result()
+                results[step_id] = result
+                if result.status == "ok":
+                    outputs[step_id] = result.output
+                    if by_id[step_id].output:
+                        outputs[by_id[step_id].output] = result.output
+                    for child in dependents[step_id]:
+                        if child in waiting:
+                            waiting[child].discard(step_id)
+                else:
+                    skip(step_id)
+            launch_ready()
+    finally:
+        for task in running:
+            task.cancel()
+    return {s.id: results[s.id] for s in steps}
@@ -1,21 +1,41 @@
 import os
 import sys
+import json
 import asyncio
+from typing import Any, AsyncIterator, Dict
 from langchain_core.runnables.config import P
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain.agents import create_agent
+from langchain_core.messages import HumanMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate
 from agentlz.core.model_factory import get_model
+from agentlz.core.deadline import deadline_scope, run_with_timeout
+from agentlz.core.llm_scheduler import is_rate_limit_error
 from agentlz.core.logger import setup_logging
+from agentlz.core.tracing import current_traceparent, span, tracing_config
 from agentlz.config.settings import get_settings
-from agentlz.schemas.workflow import WorkflowPlan, MCPConfigItem
+from agentlz.agents.executor.dag import infer_inputs, render_args, render_task, run_dag, sink_steps
+from agentlz.schemas.workflow import WorkflowPlan, MCPConfigItem, WorkflowStep
+from agentlz.services.mcp_session_pool import get_mcp_session_pool
 from agentlz.prompts import EXECUTOR_PROMPT
 
 
 class MCPChainExecutor:
-    def __init__(self, plan: WorkflowPlan):
+    def __init__(self, plan: WorkflowPlan, llm=None):
+        """
+        参数:
+            plan: Planner 生成的工作流计划
+            llm: 可选，注入的聊天模型（基准测试/离线测试使用）；默认由 get_model 构建
+        """
         self.plan = plan
+        self.llm = llm
         self.client = None
+        # 依赖图模式下各步骤的执行结果 {步骤 id: StepResult}
+        self.step_results = {}
+        # 最近一次执行的状态：ok / error / timeout
+        self.status = ""
+        # 超时时已完成的部分结果：依赖图模式为 {步骤 id: 输出}，agent 模式为 {"工具名#序号": 输出}
+        self.partial_results = {}
 
     def assemble_mcp(self):
         # 将 WorkflowPlan.mcp_config 列表转换为 MultiServerMCPClient 需要的字典结构
@@ -27,6 +47,12 @@ class MCPChainExecutor:
             }
             for item in self.plan.mcp_config
         }
+        traceparent = current_traceparent()
+        if traceparent:
+            # 按次拉起的 stdio 服务器通过环境变量获得 trace 上下文
+            for name, item in zip(mcp_dict, self.plan.mcp_config):
+                if item.transport == "stdio":
+                    mcp_dict[name]["env"] = {"TRACEPARENT": traceparent}
         try:
             self.client = MultiServerMCPClient(mcp_dict)
         except Exception as e:
@@ -35,28 +61,65 @@ class MCPChainExecutor:
             logger.exception("创建 MCP 客户端失败：%r", e)
             self.client = None
 
-    async def execute_chain(self, input_data):
+    async def _load_tools(self, settings, logger, by_server: bool = False):
+        """
+        按计划的 mcp_config 加载 MCP 工具（会话池开启时复用常驻会话）。
+
+        返回:
+            工具列表；by_server=True 时返回 {服务器名: 工具列表}。加载失败的服务器没有工具。
+        """
+        names = [item.name for item in self.plan.mcp_config]
+        pool = get_mcp_session_pool(settings)
+        if pool is not None:
+            # 会话池：复用常驻 MCP 服务器会话，工具调用经由池内会话执行
+            def fetch(item):
+                return pool.get_tools([item])
+        else:
+            self.assemble_mcp()
+            if self.client is None:
+                logger.warning("MCP 客户端不可用，将在无工具模式下执行。")
+                return {} if by_server else []
+
+            def fetch(item):
+                return self.client.get_tools(server_name=item.name)
+
+        async def load(item):
+            with span("mcp.get_tools", {"mcp.server": item.name, "mcp.pooled": pool is not None}) as sp:
+                try:
+                    tools = await run_with_timeout(fetch(item), what=f"加载 MCP 工具 {item.name}")
+                except Exception as e:
+                    sp.record_exception(e)
+                    logger.exception("加载 MCP 工具失败：%s %r", item.name, e)
+                    return []
+                sp.set_attribute("mcp.tools", len(tools))
+                return tools
+
+        loaded = await asyncio.gather(*(load(item) for item in self.plan.mcp_config))
+        if by_server:
+            return dict(zip(names, loaded))
+        return [tool for tools in loaded for tool in tools]
+
+    def _model(self, settings, logger, streaming: bool = False):
+        llm = self.llm if self.llm is not None else get_model(settings, streaming=streaming, agent_name="executor")
+        if llm is None:
+            logger.error("模型未配置：请在 .env 设置 OPENAI_API_KEY 或 CHATOPENAI_API_KEY/CHATOPENAI_BASE_URL")
+        return llm
+
+    async def _prepare_agent(self, input_data, streaming: bool = False):
         """
-        使用 MCP 工具集合创建 LangChain 代理并执行用户任务。
+        装配 MCP 工具、模型与 LangChain 代理。
+
+        返回:
+            (agent, user_msg)；失败时返回面向用户的错误字符串。
         """
-        self.assemble_mcp()
         settings = get_settings()
         logger = setup_logging(settings.log_level)
-        tools = []
-        if self.client is not None:
-            try:
-                tools = await self.client.get_tools()
-            except Exception as e:
-                logger.exception("加载 MCP 工具失败：%r", e)
-                tools = []
-        else:
-            logger.warning("MCP 客户端不可用，将在无工具模式下执行。")
+        tools = await self._load_tools(settings, logger)
         # 将计划中的链路作为偏好提示传递给代理
         preferred_chain = ", ".join(self.plan.execution_chain) if self.plan.execution_chain else ""
         system_prompt = EXECUTOR_PROMPT + (f"优先按以下顺序使用工具/服务：{preferred_chain}。" if preferred_chain else "")
-        llm = get_model(settings)
+        llm = self._model(settings, logger, streaming=streaming)
         if llm is None:
-            logger.error("模型未配置：请在 .env 设置 OPENAI_API_KEY 或 CHATOPENAI_API_KEY/CHATOPENAI_BASE_URL")
             return "执行器错误：模型未配置，无法执行链路。"
         # 通过 ChatPromptTemplate 组织提示词与输入；如果 planner 给出 instructions，则一并注入
         template_msgs = [("system", system_prompt)]
@@ -72,17 +135,283 @@ class MCPChainExecutor:
             logger.exception("创建 Executor 代理失败：%r", e)
             return "执行器错误：代理创建失败。"
         user_content = input_data if isinstance(input_data, str) else str(input_data)
+        formatted_msgs = prompt.format_messages(input=user_content, instructions=getattr(self.plan, "instructions", ""))
+        # 系统提示词由 system_prompt 注入，这里仅传递用户消息
+        return agent, formatted_msgs[-1]
+
+    # ---- 依赖图执行 ----
+    def _use_dag(self, settings) -> bool:
+        mode = (settings.executor_mode or "agent").lower()
+        return mode in ("dag", "direct") and bool(getattr(self.plan, "steps", None))
+
+    async def _execute_dag(self, input_data, settings, logger, on_event=None) -> str:
+        """
+        按 plan.steps 的依赖关系执行：每个步骤由只绑定该步骤 MCP 服务器工具的代理完成，
+        无依赖关系的步骤并发执行（上限 EXECUTOR_MAX_PARALLEL_STEPS）。各步骤结果保存在 self.step_results。
+
+        EXECUTOR_MODE=direct 时，给出 tool 且未标记 reasoning 的步骤不经过模型：按参数模板渲染后直接调用
+        该 MCP 工具，工具输出即步骤输出；其余步骤（reasoning 或未指定工具）仍交给代理完成。
+        """
+        direct = (settings.executor_mode or "agent").lower() == "direct"
+        steps = infer_inputs(self.plan.steps)
+        needs_llm = not direct or any(s.reasoning or not s.tool for s in steps)
+        llm = self._model(settings, logger) if needs_llm else None
+        if needs_llm and llm is None:
+            return "执行器错误：模型未配置，无法执行链路。"
+        tools_by_server = await self._load_tools(settings, logger, by_server=True)
+        user_content = input_data if isinstance(input_data, str) else str(input_data)
+        agents: Dict[str, Any] = {}
+
+        def emit(name: str, data: Dict[str, Any]) -> None:
+            if on_event is not None:
+                on_event(name, data)
+
+        async def call_tool(step: WorkflowStep, tool, outputs: Dict[str, str]) -> str:
+            args = render_args(step.args, outputs)
+            emit("tool_start", {"name": tool.name, "step": step.id, "input": args})
+            result = await tool.ainvoke(args)
+            text = _tool_text(result)
+            emit("tool_end", {"name": tool.name, "step": step.id, "output": text})
+            return text
+
+        async def run_step(step: WorkflowStep, outputs: Dict[str, str]) -> str:
+            if direct and step.tool and not step.reasoning:
+                tool = _find_tool(tools_by_server, step)
+                if tool is not None:
+                    return await call_tool(step, tool, outputs)
+                logger.warning("步骤 %s 的工具 %s 不在服务器 %s 的工具列表中，改由代理执行。",
+                               step.id, step.tool, step.server or "*")
+                if llm is None:
+                    raise RuntimeError(f"工具不存在且模型未配置：{step.tool}")
+            agent = agents.get(step.server)
+            if agent is None:
+                system_prompt = EXECUTOR_PROMPT + "当前只需完成给定的单个步骤，直接输出该步骤的结果。"
+                agent = create_agent(model=llm, tools=tools_by_server.get(step.server, []), system_prompt=system_prompt)
+                agents[step.server] = agent
+            content = f"用户需求：{user_content}\n当前步骤（{step.id}）：{render_task(step.task, outputs)}"
+            if step.tool:
+                args = json.dumps(render_args(step.args, outputs), ensure_ascii=False)
+                content += f"\n建议调用工具 {step.tool}，参数：{args}"
+            response = await agent.ainvoke({"messages": [HumanMessage(content=content)]}, config=tracing_config())
+            return _message_text(response["messages"][-1])
+
         try:
-            formatted_msgs = prompt.format_messages(input=user_content, instructions=getattr(self.plan, "instructions", ""))
-            # 系统提示词由 system_prompt 注入，这里仅传递用户消息
-            response = await agent.ainvoke({"messages": [formatted_msgs[-1]]})
+            results = await run_dag(steps, run_step, settings.executor_max_parallel_steps, on_event,
+                                    step_timeout=settings.executor_step_timeout_seconds)
+        except ValueError as e:
+            logger.error("计划步骤依赖图非法：%s", e)
+            return "执行器错误：计划步骤依赖图非法。"
+        self.step_results = results
+        failed = [r for r in results.values() if r.status != "ok"]
+        if failed:
+            logger.warning("依赖图步骤未全部成功：%s", [(r.id, r.status, r.error) for r in failed])
+        timed_out = [r for r in failed if r.status == "timeout"]
+        if timed_out:
+            partial = {r.id: r.output for r in results.values() if r.status == "ok"}
+            return self._timed_out("，".join(f"步骤 {r.id}：{r.error}" for r in timed_out), partial)
+        finals = [results[i] for i in sink_steps(steps) if results[i].status == "ok"]
+        if not finals:
+            return "执行器错误：步骤执行失败（" + "，".join(f"{r.id}: {r.status}" for r in failed) + "）。"
+        if len(finals) == 1:
+            return finals[0].output
+        return "\n".join(f"{r.id}：{r.output}" for r in finals)
+
+    def _timed_out(self, reason: str, partial: Dict[str, str]) -> str:
+        """记录超时状态与部分结果，返回面向用户的超时说明。"""
+        self.status = "timeout"
+        self.partial_results = partial
+        message = f"执行器超时：{reason}。"
+        if not partial:
+            return message + "没有已完成的结果。"
+        return message + "已完成的部分结果：\n" + "\n".join(f"- {k}：{v}" for k, v in partial.items())
+
+    @staticmethod
+    def _deadline_seconds(settings, timeout):
+        """本次执行的截止秒数：调用方传入优先，否则 EXECUTOR_TIMEOUT_SECONDS；<=0 表示不限。"""
+        value = settings.executor_timeout_seconds if timeout is None else timeout
+        return value if value and value > 0 else None
+
+    async def _run(self, input_data, settings, logger, on_event=None) -> str:
+        self.status, self.partial_results = "", {}
+        dag = self._use_dag(settings)
+        attributes = {
+            "executor.mode": (settings.executor_mode or "agent").lower() if dag else "agent",
+            "executor.servers": [item.name for item in self.plan.mcp_config],
+        }
+        with span("executor.run", attributes) as sp:
+            if dag:
+                output = await self._execute_dag(input_data, settings, logger, on_event)
+            else:
+                output = await self._execute_agent(input_data, settings, logger, on_event)
+            if not self.status:
+                self.status = "error" if str(output).startswith("执行器错误") else "ok"
+            sp.set_attribute("executor.status", self.status)
+            if self.status != "ok":
+                sp.set_status("error", str(output)[:200])
+        return output
+
+    async def execute_chain(self, input_data, timeout=None):
+        """
+        使用 MCP 工具集合创建 LangChain 代理并执行用户任务；
+        EXECUTOR_MODE=dag/direct 且计划包含 steps 时按依赖图并发执行步骤（direct 下工具步骤不经过模型）。
+
+        参数:
+            input_data: 用户任务
+            timeout: 可选，本次执行的截止秒数（默认 EXECUTOR_TIMEOUT_SECONDS）；截止时间传递到每次工具调用与模型调用，
+                超时后取消进行中的调用，返回“执行器超时”说明与已完成的部分结果（self.status 为 timeout）
+        """
+        settings = get_settings()
+        logger = setup_logging(settings.log_level)
+        with deadline_scope(self._deadline_seconds(settings, timeout)):
+            return await self._run(input_data, settings, logger)
+
+    async def _execute_agent(self, input_data, settings, logger, on_event=None) -> str:
+        """单个代理执行整条链路；on_event 不为空时以流式事件推送工具调用与 token。"""
+        prepared = await self._prepare_agent(input_data, streaming=on_event is not None)
+        if isinstance(prepared, str):
+            return prepared
+        agent, user_msg = prepared
+        completed: Dict[str, str] = {}
+        try:
+            if on_event is None:
+                return await run_with_timeout(self._invoke_agent(agent, user_msg, completed), what="执行器")
+            return await self._stream_agent(agent, user_msg, completed, on_event)
+        except TimeoutError as e:
+            logger.warning("执行超时：%s", e)
+            return self._timed_out(str(e), completed)
         except Exception as e:
+            if is_rate_limit_error(e):
+                logger.error("代理执行失败：模型服务限流，重试后仍未成功：%r", e)
+                return "执行器错误：模型服务限流（HTTP 429），重试后仍失败，请稍后再试。"
             logger.exception("代理执行失败：%r", e)
             return "执行器错误：代理执行失败。"
+
+    @staticmethod
+    def _record_tool(completed: Dict[str, str], name: Any, output: Any) -> None:
+        name = str(name or "tool")
+        index = sum(1 for k in completed if k.rsplit("#", 1)[0] == name) + 1
+        completed[f"{name}#{index}"] = str(output)
+
+    async def _invoke_agent(self, agent, user_msg, completed: Dict[str, str]) -> str:
+        messages = []
+        async for state in agent.astream({"messages": [user_msg]}, config=tracing_config(), stream_mode="values"):
+            messages = state.get("messages") or []
+            completed.clear()
+            for m in messages:
+                if isinstance(m, ToolMessage):
+                    self._record_tool(completed, m.name, _message_text(m) or m.content)
+        return messages[-1].content if messages else ""
+
+    async def _stream_agent(self, agent, user_msg, completed: Dict[str, str], on_event) -> str:
+        final_output = ""
+        events = agent.astream_events({"messages": [user_msg]}, config=tracing_config(), version="v2").__aiter__()
+        try:
+            while True:
+                try:
+                    ev = await run_with_timeout(events.__anext__(), what="执行器")
+                except StopAsyncIteration:
+                    break
+                kind = ev.get("event")
+                data = ev.get("data") or {}
+                if kind == "on_chat_model_stream":
+                    text = _message_text(data.get("chunk"))
+                    if text:
+                        on_event("token", {"text": text})
+                elif kind == "on_chat_model_end":
+                    output = data.get("output")
+                    if output is not None and not getattr(output, "tool_calls", None):
+                        final_output = _message_text(output)
+                elif kind == "on_tool_start":
+                    on_event("tool_start", {"name": ev.get("name"), "run_id": ev.get("run_id"), "input": data.get("input")})
+                elif kind == "on_tool_end":
+                    output = str(getattr(data.get("output"), "content", data.get("output")))
+                    self._record_tool(completed, ev.get("name"), output)
+                    on_event("tool_end", {"name": ev.get("name"), "run_id": ev.get("run_id"), "output": output})
+        finally:
+            try:
+                await events.aclose()
+            except Exception:
+                pass
+        return final_output
+
+    async def astream_chain(self, input_data, timeout=None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式执行用户任务，逐步产出事件字典 {"event": 名称, "data": 负载}：
+
+        - tool_start / tool_end：工具调用开始与结束（含工具名、run_id、输入/输出）
+        - token：执行器 LLM 生成的文本增量
+        - result：最终回答
+        - error：执行失败（负载含 message）
+        - timeout：超过截止时间（负载含 message 与已完成的部分结果 partial），见 execute_chain 的 timeout 参数
+        - step_start / step_end：依赖图模式下步骤开始与结束（含步骤 id、状态、输出与耗时）
+          （direct 模式直接调用的工具以 tool_start / tool_end 推送，负载含步骤 id）
+        """
+        settings = get_settings()
+        logger = setup_logging(settings.log_level)
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def run() -> str:
+            # 在独立任务中执行：截止时间（contextvars）只作用于该任务，不泄漏到迭代方
+            try:
+                with deadline_scope(self._deadline_seconds(settings, timeout)):
+                    return await self._run(
+                        input_data, settings, logger,
+                        on_event=lambda name, data: queue.put_nowait({"event": name, "data": data}),
+                    )
+            finally:
+                queue.put_nowait(None)
+
+        task = asyncio.ensure_future(run())
         try:
-            return response["messages"][-1].content if isinstance(response, dict) else response
-        except Exception:
-            return str(response)
+            while True:
+                ev = await queue.get()
+                if ev is None:
+                    break
+                yield ev
+            output = await task
+        finally:
+            task.cancel()
+        if self.status == "timeout":
+            yield {"event": "timeout", "data": {"message": output, "partial": self.partial_results}}
+        elif self.status == "error":
+            yield {"event": "error", "data": {"message": output}}
+        else:
+            yield {"event": "result", "data": {"output": output}}
+
+
+def _find_tool(tools_by_server: Dict[str, list], step: WorkflowStep):
+    """在步骤服务器（未指定时为全部服务器）的工具中按名称查找 step.tool；找不到返回 None。"""
+    if step.server:
+        candidates = tools_by_server.get(step.server, [])
+    else:
+        candidates = [t for tools in tools_by_server.values() for t in tools]
+    return next((t for t in candidates if t.name == step.tool), None)
+
+
+def _tool_text(result: Any) -> str:
+    """把 MCP 工具返回值（文本或文本块列表）转换为字符串。"""
+    if isinstance(result, str):
+        return result
+    if isinstance(result, (list, tuple)):
+        return "\n".join(
+            item if isinstance(item, str) else str(item.get("text", "")) if isinstance(item, dict) else str(item)
+            for item in result
+        )
+    return _message_text(result) or str(result)
+
+
+def _message_text(message: Any) -> str:
+    """提取消息（或流式块）中的文本内容，兼容 content 为内容块列表的情况。"""
+    content = getattr(message, "content", None)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block if isinstance(block, str) else str(block.get("text", ""))
+            for block in content
+            if isinstance(block, str) or (isinstance(block, dict) and block.get("type") == "text")
+        )
+    return ""
 
 
 
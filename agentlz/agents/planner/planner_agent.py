@@ -1,48 +1,454 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Sequence
 
 from langchain.agents import create_agent
+from langchain_core.messages import SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
 from agentlz.core.model_factory import get_model
+from agentlz.core.llm_scheduler import is_rate_limit_error
 from agentlz.core.logger import setup_logging
+from agentlz.core.tracing import span, tracing_config
 from agentlz.config.settings import get_settings
-from agentlz.agents.planner.tools.mcp_config_tool import get_mcp_config_by_keyword
-from agentlz.schemas.workflow import WorkflowPlan
-from agentlz.prompts import PLANNER_PROMPT
-    
-def plan_workflow_chain(user_input: str):
-        settings = get_settings()
-        logger = setup_logging(settings.log_level)
-        llm = get_model(settings)
-        if llm is None:
-            logger.error("模型未配置：请在 .env 设置 OPENAI_API_KEY 或 CHATOPENAI_API_KEY/CHATOPENAI_BASE_URL")
-            return WorkflowPlan(execution_chain=[], mcp_config=[], instructions="计划生成失败：模型未配置。")
-        # 提示词构建
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", PLANNER_PROMPT),
-            ("human", "{user_input}"),
-        ])
-        tools = [get_mcp_config_by_keyword]
-        try:
-            agent = create_agent(
-                model=llm,
-                tools=tools,
-                system_prompt=PLANNER_PROMPT,
-                response_format=WorkflowPlan,
-            )
-        except Exception as e:
-            logger.exception("创建 Planner 代理失败：%r", e)
-            return WorkflowPlan(execution_chain=[], mcp_config=[], instructions="计划生成失败：代理创建错误。")
+from agentlz.agents.planner.tools.mcp_config_tool import get_mcp_config_by_keyword, get_mcp_configs_by_keywords
+from agentlz.agents.planner.tools.mcp_search_tool import search_mcp_tools
+from agentlz.schemas.workflow import MCPConfigItem, WorkflowPlan, WorkflowStep, workflow_plan_schema
+from agentlz.services.mcp_catalog import get_mcp_catalog
+from agentlz.services.mcp_vector_index import get_mcp_vector_index
+from agentlz.services.plan_cache import get_plan_cache
+from agentlz.prompts import PLANNER_BATCH_PROMPT, PLANNER_INLINE_PROMPT, PLANNER_PROMPT
+
+# 内联模式下语义检索候选的最低余弦相似度
+_INLINE_MIN_SIMILARITY = 0.5
+_INLINE_FIELDS = ("name", "transport", "command", "args", "category", "trust_score", "description")
+
+
+def _failed_plan(reason: str) -> WorkflowPlan:
+    """构造失败计划：execution_chain/mcp_config 为空，instructions 说明原因。"""
+    return WorkflowPlan(execution_chain=[], mcp_config=[], instructions=f"计划生成失败：{reason}")
+
+
+def _batch_mode(settings) -> bool:
+    return (settings.planner_lookup_mode or "single").lower() == "batch"
+
+
+def default_planner_tools(settings) -> list:
+    """默认工具：关键词查询（PLANNER_LOOKUP_MODE=batch 时以批量查询为主）；
+    启用 MCP_VECTOR_SEARCH_ENABLED 时追加语义检索工具。"""
+    tools = [get_mcp_config_by_keyword]
+    if _batch_mode(settings):
+        tools.insert(0, get_mcp_configs_by_keywords)
+    if settings.mcp_vector_search_enabled:
+        tools.append(search_mcp_tools)
+    return tools
+
+
+def _resolve_llm(settings, logger, llm=None):
+    """返回注入的模型或按配置构建的模型；未配置时记录错误并返回 None。"""
+    if llm is None:
+        llm = get_model(settings, agent_name="planner")
+    if llm is None:
+        logger.error("模型未配置：请在 .env 设置 OPENAI_API_KEY 或 CHATOPENAI_API_KEY/CHATOPENAI_BASE_URL")
+    return llm
+
+
+def _build_planner(settings, logger, llm, tools=None):
+    """
+    构建 Planner 代理。
+
+    返回:
+        代理对象；创建失败时返回失败计划（WorkflowPlan）。
+    """
+    if tools is None:
+        tools = default_planner_tools(settings)
+    try:
+        agent = create_agent(
+            model=llm,
+            tools=tools,
+            system_prompt=PLANNER_BATCH_PROMPT if _batch_mode(settings) else PLANNER_PROMPT,
+            response_format=WorkflowPlan,
+        )
+    except Exception as e:
+        logger.exception("创建 Planner 代理失败：%r", e)
+        return _failed_plan("代理创建错误。")
+    return agent
+
+
+def _user_message(user_input: str):
+    # 提示词构建：系统提示词由 create_agent(system_prompt=...) 注入，这里仅取用户消息
+    # 系统提示词以消息对象传入，不作为模板解析（其中的 {s1} 等步骤占位符是给模型看的原文）
+    prompt = ChatPromptTemplate.from_messages([
+        SystemMessage(content=PLANNER_PROMPT),
+        ("human", "{user_input}"),
+    ])
+    return prompt.format_messages(user_input=user_input)[-1]
+
 
+def _invoke_error_plan(e: Exception, logger) -> WorkflowPlan:
+    if is_rate_limit_error(e):
+        logger.error("Planner 代理调用失败：模型服务限流，重试后仍未成功：%r", e)
+        return _failed_plan("模型服务限流（HTTP 429），请稍后再试。")
+    logger.exception("Planner 代理调用失败：%r", e)
+    return _failed_plan("代理调用错误。")
+
+
+def _extract_plan(response, logger) -> Optional[WorkflowPlan]:
+    if isinstance(response, dict) and response.get("structured_response") is not None:
+        return response["structured_response"]
+    logger.error("Planner 未返回结构化计划，原始响应：%r", response)
+    return None
+
+
+# ---- 内联规划：本地预选候选工具，单次结构化输出 ----
+def _inline_candidates(user_input: str, settings, logger, catalog=None) -> Optional[List[Dict[str, Any]]]:
+    """
+    在内存 MCP 目录上预选候选工具（n-gram 关键词命中；启用语义检索时合并向量检索结果）。
+
+    返回:
+        候选记录列表；目录不可用，或最佳候选的命中数低于 PLANNER_INLINE_MIN_HITS
+        且没有足够相似的语义候选（预选不确定）时返回 None。
+    """
+    if catalog is None:
+        catalog = get_mcp_catalog(settings)
+    if catalog is None or not catalog.ready:
+        return None
+    limit = settings.planner_inline_max_candidates
+    candidates = catalog.prefilter(user_input, limit=limit, min_hits=1)
+    if candidates and candidates[0]["hits"] < settings.planner_inline_min_hits:
+        candidates = []
+    index = get_mcp_vector_index(settings)
+    if index is not None:
         try:
-            formatted_msgs = prompt.format_messages(user_input=user_input)
-            user_msg = formatted_msgs[-1]
-            response = agent.invoke({
-                "messages": [user_msg]
-            })
+            names = {c["name"] for c in candidates}
+            for hit in index.search(user_input, k=limit):
+                if hit["similarity"] >= _INLINE_MIN_SIMILARITY and hit["name"] not in names:
+                    candidates.append(hit)
+                    names.add(hit["name"])
         except Exception as e:
-            logger.exception("Planner 代理调用失败：%r", e)
-            return WorkflowPlan(execution_chain=[], mcp_config=[], instructions="计划生成失败：代理调用错误。")
+            logger.warning("内联规划的语义预选失败，仅使用关键词预选：%r", e)
+    return candidates[:limit] or None
+
+
+def _inline_messages(user_input: str, candidates: List[Dict[str, Any]]):
+    compact = [{f: c.get(f) for f in _INLINE_FIELDS} for c in candidates]
+    prompt = ChatPromptTemplate.from_messages([
+        SystemMessage(content=PLANNER_INLINE_PROMPT),
+        ("human", "用户需求：\n{user_input}\n\n候选 MCP 工具（JSON）：\n```json\n{candidates}\n```"),
+    ])
+    return prompt.format_messages(user_input=user_input, candidates=json.dumps(compact, ensure_ascii=False))
+
+
+def _finalize_inline(raw: Any, candidates: List[Dict[str, Any]], logger) -> Optional[WorkflowPlan]:
+    """
+    把结构化输出（dict 或 WorkflowPlan）整理为计划：mcp_config 以候选记录原值覆盖（防止模型改写命令与参数），
+    丢弃候选之外的工具。
+
+    返回:
+        WorkflowPlan；计划为空（模型判定候选不足以完成任务）时返回 None，由调用方回退到代理模式。
+    """
+    if isinstance(raw, WorkflowPlan):
+        chain, items, instructions, steps = raw.execution_chain, raw.mcp_config, raw.instructions, raw.steps
+    elif isinstance(raw, dict):
+        chain, items, instructions = raw.get("execution_chain") or [], raw.get("mcp_config") or [], raw.get("instructions") or ""
+        steps = raw.get("steps") or []
+    else:
+        return None
+    by_name = {c["name"]: c for c in candidates}
+    names = [i.get("name") if isinstance(i, dict) else getattr(i, "name", None) for i in items]
+    configs = [
+        MCPConfigItem(
+            name=name,
+            transport=by_name[name].get("transport", "stdio"),
+            command=by_name[name].get("command", "python"),
+            args=list(by_name[name].get("args") or []),
+        )
+        for name in dict.fromkeys(names) if name in by_name
+    ]
+    kept = [name for name in chain if name in by_name]
+    dropped = sorted(set(chain) - set(kept))
+    if dropped:
+        logger.warning("内联计划引用了候选之外的工具，已忽略：%s", dropped)
+    if not kept or not configs:
+        return None
+    return WorkflowPlan(execution_chain=kept, mcp_config=configs, instructions=instructions,
+                        steps=_coerce_steps(steps, {c.name for c in configs}, logger))
+
+
+def _coerce_steps(steps: Sequence[Any], servers: set, logger) -> List[WorkflowStep]:
+    """把结构化输出中的 steps 整理为 WorkflowStep；引用计划之外工具的依赖图整体丢弃（回退为顺序执行）。"""
+    try:
+        result = [s if isinstance(s, WorkflowStep) else WorkflowStep(**s) for s in steps or []]
+    except TypeError as e:
+        logger.warning("计划 steps 格式不正确，已忽略：%r", e)
+        return []
+    unknown = sorted({s.server for s in result if s.server and s.server not in servers})
+    if unknown:
+        logger.warning("计划 steps 引用了计划之外的工具，已忽略依赖图：%s", unknown)
+        return []
+    return result
+
+
+def _planner_mode(settings, mode: Optional[str]) -> str:
+    return (mode or settings.planner_mode or "agent").lower()
+
+
+def _store_plan(plan_cache, user_input: str, plan: WorkflowPlan, started: float, logger) -> None:
+    if plan_cache is None:
+        return
+    try:
+        plan_cache.store(user_input, plan, time.perf_counter() - started)
+    except Exception as e:
+        logger.warning("写入计划缓存失败：%r", e)
+
+
+def _annotate_plan(sp, plan: WorkflowPlan) -> None:
+    """把计划概要写入 planner.plan span；失败计划标记为 ERROR。"""
+    sp.set_attributes({"planner.chain": list(plan.execution_chain), "planner.steps": len(plan.steps)})
+    if not plan.execution_chain and not plan.mcp_config and plan.instructions.startswith("计划生成失败"):
+        sp.set_status("error", plan.instructions)
+
+
+def _run_config(callbacks=None) -> Optional[Dict[str, Any]]:
+    """模型/代理调用的 config：链路追踪回调与调用方传入的回调（如 MCP 预热）合并。"""
+    config = tracing_config() or {}
+    if callbacks:
+        config["callbacks"] = list(config.get("callbacks") or []) + list(callbacks)
+    return config or None
+
+
+def plan_workflow_chain(
+    user_input: str,
+    llm=None,
+    tools=None,
+    use_cache: bool = True,
+    mode: Optional[str] = None,
+    catalog=None,
+    callbacks=None,
+):
+    """
+    生成 MCP 工作流计划。
+
+    启用 PLAN_CACHE_ENABLED 时，先在语义计划缓存中查找相近请求的历史计划
+    （MCP 条目仍有效才命中），未命中时运行 Planner 并写回缓存。
+
+    规划模式（PLANNER_MODE）：
+    - agent：Planner 代理通过查询工具检索 MCP，多轮调用后输出计划；
+    - inline：在内存目录上预选候选工具并内联到提示词，单次结构化输出、无工具往返；
+      预选没有候选，或模型判定候选不足时，回退到 agent 模式。
+
+    参数:
+        user_input: 用户任务描述
+        llm: 可选，注入的聊天模型（基准测试/离线测试使用）；默认由 get_model 构建
+        tools: 可选，注入的工具列表；默认见 default_planner_tools
+        use_cache: 是否使用语义计划缓存（注入 tools/catalog 时自动跳过，避免与 MCP 目录不一致）
+        mode: 可选，覆盖 PLANNER_MODE（"agent" / "inline"）
+        catalog: 可选，注入的 MCPCatalog（内联预选使用）；默认为进程共享目录
+        callbacks: 可选，附加到模型与代理调用的 LangChain 回调（如 MCPWarmupCallback 观察查询工具结果预热服务器）
+
+    返回:
+        WorkflowPlan；失败时返回 execution_chain/mcp_config 为空、instructions 说明原因的计划
+    """
+    settings = get_settings()
+    with span("planner.plan", {"planner.mode": _planner_mode(settings, mode), "planner.async": False}) as sp:
+        plan = _plan_workflow_chain(user_input, settings, llm, tools, use_cache, mode, catalog, callbacks)
+        _annotate_plan(sp, plan)
+        return plan
+
+
+def _plan_workflow_chain(
+    user_input: str,
+    settings,
+    llm,
+    tools,
+    use_cache: bool,
+    mode: Optional[str],
+    catalog,
+    callbacks,
+) -> WorkflowPlan:
+    logger = setup_logging(settings.log_level)
+    plan_cache = None
+    if use_cache and tools is None and catalog is None:
+        with span("planner.cache_lookup") as sp:
+            try:
+                plan_cache = get_plan_cache(settings)
+                cached = plan_cache.lookup(user_input) if plan_cache is not None else None
+            except Exception as e:
+                logger.warning("计划缓存不可用，改为实时规划：%r", e)
+                plan_cache, cached = None, None
+            sp.set_attribute("plan_cache.hit", cached is not None)
+        if cached is not None:
+            logger.info("计划缓存命中：%s", cached.execution_chain)
+            return cached
+    started = time.perf_counter()
+
+    llm = _resolve_llm(settings, logger, llm)
+    if llm is None:
+        return _failed_plan("模型未配置。")
+
+    if _planner_mode(settings, mode) == "inline":
+        candidates = _inline_candidates(user_input, settings, logger, catalog)
+        if candidates is None:
+            logger.info("内联规划预选无候选，回退到代理模式")
+        else:
+            try:
+                raw = llm.with_structured_output(workflow_plan_schema()).invoke(
+                    _inline_messages(user_input, candidates), config=_run_config(callbacks))
+            except Exception as e:
+                return _invoke_error_plan(e, logger)
+            plan = _finalize_inline(raw, candidates, logger)
+            if plan is not None:
+                _store_plan(plan_cache, user_input, plan, started, logger)
+                return plan
+            logger.info("内联规划未选出可用工具，回退到代理模式")
+
+    agent = _build_planner(settings, logger, llm, tools=tools)
+    if isinstance(agent, WorkflowPlan):
+        return agent
+    try:
+        response = agent.invoke({"messages": [_user_message(user_input)]}, config=_run_config(callbacks))
+    except Exception as e:
+        return _invoke_error_plan(e, logger)
+
+    plan = _extract_plan(response, logger)
+    if plan is None:
+        return _failed_plan("未返回结构化计划。")
+    _store_plan(plan_cache, user_input, plan, started, logger)
+    return plan
+
+
+async def aplan_workflow_chain(
+    user_input: str,
+    llm=None,
+    tools=None,
+    use_cache: bool = True,
+    timeout: Optional[float] = None,
+    mode: Optional[str] = None,
+    catalog=None,
+    callbacks=None,
+) -> WorkflowPlan:
+    """
+    异步生成 MCP 工作流计划（ainvoke，不占用请求线程）。
+
+    关键词查询工具提供原生协程版本，数据库访问与计划缓存的编码在线程中执行，不阻塞事件循环；
+    超时（默认 PLANNER_TIMEOUT_SECONDS，覆盖内联尝试与代理回退的总耗时）会取消正在进行的模型调用与工具调用。
+
+    参数:
+        user_input: 用户任务描述
+        llm / tools / use_cache / mode / catalog / callbacks: 同 plan_workflow_chain
+        timeout: 超时秒数；None 使用配置值，<=0 表示不限
+
+    返回:
+        WorkflowPlan；失败或超时时返回 instructions 说明原因的失败计划
+    """
+    settings = get_settings()
+    with span("planner.plan", {"planner.mode": _planner_mode(settings, mode), "planner.async": True}) as sp:
+        plan = await _aplan_workflow_chain(
+            user_input, settings, llm, tools, use_cache, timeout, mode, catalog, callbacks)
+        _annotate_plan(sp, plan)
+        return plan
+
+
+async def _aplan_workflow_chain(
+    user_input: str,
+    settings,
+    llm,
+    tools,
+    use_cache: bool,
+    timeout: Optional[float],
+    mode: Optional[str],
+    catalog,
+    callbacks,
+) -> WorkflowPlan:
+    logger = setup_logging(settings.log_level)
+    plan_cache = None
+    if use_cache and tools is None and catalog is None:
+        with span("planner.cache_lookup") as sp:
+            try:
+                plan_cache = get_plan_cache(settings)
+                cached = await asyncio.to_thread(plan_cache.lookup, user_input) if plan_cache is not None else None
+            except Exception as e:
+                logger.warning("计划缓存不可用，改为实时规划：%r", e)
+                plan_cache, cached = None, None
+            sp.set_attribute("plan_cache.hit", cached is not None)
+        if cached is not None:
+            logger.info("计划缓存命中：%s", cached.execution_chain)
+            return cached
+    started = time.perf_counter()
+
+    llm = _resolve_llm(settings, logger, llm)
+    if llm is None:
+        return _failed_plan("模型未配置。")
+
+    async def _plan() -> Optional[WorkflowPlan]:
+        if _planner_mode(settings, mode) == "inline":
+            candidates = await asyncio.to_thread(_inline_candidates, user_input, settings, logger, catalog)
+            if candidates is None:
+                logger.info("内联规划预选无候选，回退到代理模式")
+            else:
+                raw = await llm.with_structured_output(workflow_plan_schema()).ainvoke(
+                    _inline_messages(user_input, candidates), config=_run_config(callbacks))
+                plan = _finalize_inline(raw, candidates, logger)
+                if plan is not None:
+                    return plan
+                logger.info("内联规划未选出可用工具，回退到代理模式")
+        agent = _build_planner(settings, logger, llm, tools=tools)
+        if isinstance(agent, WorkflowPlan):
+            return agent
+        response = await agent.ainvoke({"messages": [_user_message(user_input)]}, config=_run_config(callbacks))
+        return _extract_plan(response, logger)
+
+    limit = settings.planner_timeout_seconds if timeout is None else timeout
+    try:
+        plan = await asyncio.wait_for(_plan(), timeout=limit if limit and limit > 0 else None)
+    except asyncio.TimeoutError:
+        logger.error("Planner 规划超时（%.1fs）：%s", limit, user_input)
+        return _failed_plan(f"规划超时（{limit:g} 秒）。")
+    except Exception as e:
+        return _invoke_error_plan(e, logger)
+
+    if plan is None:
+        return _failed_plan("未返回结构化计划。")
+    if plan_cache is not None and (plan.execution_chain or plan.mcp_config):
+        await asyncio.to_thread(_store_plan, plan_cache, user_input, plan, started, logger)
+    return plan
+
+
+async def aplan_workflow_chain_batch(
+    user_inputs: Sequence[str],
+    concurrency: Optional[int] = None,
+    llm=None,
+    tools=None,
+    use_cache: bool = True,
+    timeout: Optional[float] = None,
+) -> List[WorkflowPlan]:
+    """
+    并发规划多条输入，结果顺序与输入一致。
+
+    参数:
+        user_inputs: 用户任务描述列表
+        concurrency: 同时进行的规划数上限；None 使用 PLANNER_BATCH_CONCURRENCY
+        llm / tools / use_cache / timeout: 同 aplan_workflow_chain（timeout 针对单条规划）
+
+    返回:
+        List[WorkflowPlan]；单条失败不影响其他条目（对应位置为失败计划）
+    """
+    settings = get_settings()
+    logger = setup_logging(settings.log_level)
+    sem = asyncio.Semaphore(max(1, concurrency or settings.planner_batch_concurrency))
+
+    async def _one(text: str) -> WorkflowPlan:
+        async with sem:
+            return await aplan_workflow_chain(text, llm=llm, tools=tools, use_cache=use_cache, timeout=timeout)
 
-        if isinstance(response, dict) and response.get("structured_response") is not None:
-            return response["structured_response"]
-        logger.error("Planner 未返回结构化计划，原始响应：%r", response)
-        return WorkflowPlan(execution_chain=[], mcp_config=[], instructions="计划生成失败：未返回结构化计划。")
\ No newline at end of file
+    results = await asyncio.gather(*(_one(t) for t in user_inputs), return_exceptions=True)
+    plans: List[WorkflowPlan] = []
+    for text, result in zip(user_inputs, results):
+        if isinstance(result, BaseException):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            logger.error("批量规划失败：%s -> %r", text, result)
+            plans.append(_failed_plan("规划异常。"))
+        else:
+            plans.append(result)
+    return plans
@@ -1,11 +1,15 @@
-from langchain.tools import tool
+from typing import Dict, List
+
+from langchain_core.tools import StructuredTool
+import asyncio
 import json
+import logging
 from agentlz.core.logger import setup_logging
 from agentlz.config.settings import get_settings
-from agentlz.repositories.mcp_repository import search_mcp_by_keyword, to_tool_config
+from agentlz.repositories.mcp_repository import search_mcp_by_keyword, search_mcp_by_keywords, to_tool_config
+from agentlz.services.mcp_catalog import get_mcp_catalog
 
-@tool
-def get_mcp_config_by_keyword(keyword: str) -> str:
+def _get_mcp_config_by_keyword(keyword: str) -> str:
     """
     按关键词查询 MCP（name/description LIKE 匹配），按 trust_score 降序返回。
     SQL: SELECT id, name, transport, command, args, category, trust_score, description
@@ -22,11 +26,85 @@ def get_mcp_config_by_keyword(keyword: str) -> str:
         if not kw:
             logger.warning("关键词为空，返回空列表")
             return json.dumps([], ensure_ascii=False)
-        rows = search_mcp_by_keyword(kw, limit=3)
-        logger.info("🔍 按关键词查询 MCP 结果: %s", rows)
-        result = [to_tool_config(r) for r in rows]
+        catalog = get_mcp_catalog(settings)
+        if catalog is not None and catalog.ready:
+            # 内存目录：倒排索引查询，不访问数据库
+            rows = result = catalog.search_configs(kw, limit=3)
+        else:
+            rows = search_mcp_by_keyword(kw, limit=3)
+            result = [to_tool_config(r) for r in rows]
+        logger.info("🔍 按关键词查询 MCP: %s -> %d 条", kw, len(rows))
+        if logger.isEnabledFor(logging.DEBUG):
+            # 完整结果体量较大，仅在 DEBUG 开启时格式化
+            logger.debug("🔍 按关键词查询 MCP 结果: %s", rows)
         # 工具输出必须是字符串，避免下游 OpenAI Chat Completions 对 messages.content 的类型错误
         return json.dumps(result, ensure_ascii=False)
     except Exception as e:
         logger.exception("查询 MCP 失败：%r", e)
         return json.dumps([], ensure_ascii=False)
+
+
+async def _aget_mcp_config_by_keyword(keyword: str) -> str:
+    """异步版本（ainvoke 路径使用）：内存目录就绪时直接查询；
+    否则回退的 pymysql 查询为阻塞调用，放到线程池执行，避免阻塞事件循环。"""
+    catalog = get_mcp_catalog(get_settings(), create=False)
+    if catalog is not None and catalog.ready:
+        return _get_mcp_config_by_keyword(keyword)
+    return await asyncio.to_thread(_get_mcp_config_by_keyword, keyword)
+
+
+# 同名工具同时提供同步与异步实现：invoke 走 func，ainvoke 走 coroutine
+get_mcp_config_by_keyword = StructuredTool.from_function(
+    func=_get_mcp_config_by_keyword,
+    coroutine=_aget_mcp_config_by_keyword,
+    name="get_mcp_config_by_keyword",
+)
+
+
+def _get_mcp_configs_by_keywords(keywords: List[str], limit_per_keyword: int = 3) -> str:
+    """
+    多关键词批量查询 MCP（每个关键词按 name/description 匹配，按 trust_score 降序）。
+    一次调用即可覆盖全部子任务，代替多次调用 get_mcp_config_by_keyword。
+    返回 JSON：{"groups": {关键词: [工具名, ...]}, "configs": [去重后的工具配置]}。
+    """
+    settings = get_settings()
+    logger = setup_logging(settings.log_level)
+    try:
+        kws = [k for k in dict.fromkeys((k or "").strip() for k in (keywords or [])) if k]
+        limit = max(1, min(int(limit_per_keyword or 3), 10))
+        if not kws:
+            logger.warning("关键词列表为空，返回空结果")
+            return json.dumps({"groups": {}, "configs": []}, ensure_ascii=False)
+        catalog = get_mcp_catalog(settings)
+        if catalog is not None and catalog.ready:
+            found: Dict[str, List[Dict]] = {kw: catalog.search_configs(kw, limit=limit) for kw in kws}
+        else:
+            found = {kw: [to_tool_config(r) for r in rows]
+                     for kw, rows in search_mcp_by_keywords(kws, limit=limit).items()}
+        groups: Dict[str, List[str]] = {}
+        configs: Dict[str, Dict] = {}
+        for kw in kws:
+            items = found.get(kw, [])
+            groups[kw] = [c["name"] for c in items]
+            for c in items:
+                configs.setdefault(c["name"], c)
+        logger.info("🔍 批量查询 MCP: %s", {kw: len(v) for kw, v in groups.items()})
+        return json.dumps({"groups": groups, "configs": list(configs.values())}, ensure_ascii=False)
+    except Exception as e:
+        logger.exception("批量查询 MCP 失败：%r", e)
+        return json.dumps({"groups": {}, "configs": []}, ensure_ascii=False)
+
+
+async def _aget_mcp_configs_by_keywords(keywords: List[str], limit_per_keyword: int = 3) -> str:
+    """异步版本：内存目录就绪时直接查询，否则在线程池中执行 SQL 回退。"""
+    catalog = get_mcp_catalog(get_settings(), create=False)
+    if catalog is not None and catalog.ready:
+        return _get_mcp_configs_by_keywords(keywords, limit_per_keyword)
+    return await asyncio.to_thread(_get_mcp_configs_by_keywords, keywords, limit_per_keyword)
+
+
+get_mcp_configs_by_keywords = StructuredTool.from_function(
+    func=_get_mcp_configs_by_keywords,
+    coroutine=_aget_mcp_configs_by_keywords,
+    name="get_mcp_configs_by_keywords",
+)
@@ -0,0 +1,42 @@
+from langchain_core.tools import StructuredTool
+import asyncio
+import json
+from agentlz.core.logger import setup_logging
+from agentlz.config.settings import get_settings
+from agentlz.services.mcp_vector_index import get_mcp_vector_index
+
+_FIELDS = ("name", "transport", "command", "args", "category", "trust_score", "description", "score")
+
+
+def _search_mcp_tools(need: str, k: int = 5) -> str:
+    """
+    按自然语言需求语义检索 MCP 工具（向量相似度与 trust_score 加权排序），返回 top-k 配置列表。
+    一次调用即可覆盖同义表达，无需为同一子任务尝试多个关键词。
+    参数 need：子任务的自然语言描述，如“把数字翻译成英文描述”；k：返回条数（默认 5）。
+    """
+    settings = get_settings()
+    logger = setup_logging(settings.log_level)
+    try:
+        index = get_mcp_vector_index(settings)
+        if index is None:
+            logger.warning("MCP 向量检索未启用或索引尚在构建，返回空列表")
+            return json.dumps([], ensure_ascii=False)
+        hits = index.search(need, k=max(1, min(int(k or 5), 20)))
+        logger.info("🔍 语义检索 MCP: %s -> %s", need, [h.get("name") for h in hits])
+        result = [{f: h.get(f) for f in _FIELDS} for h in hits]
+        return json.dumps(result, ensure_ascii=False)
+    except Exception as e:
+        logger.exception("语义检索 MCP 失败：%r", e)
+        return json.dumps([], ensure_ascii=False)
+
+
+async def _asearch_mcp_tools(need: str, k: int = 5) -> str:
+    """异步版本：查询编码为 CPU 密集操作，放到线程池执行。"""
+    return await asyncio.to_thread(_search_mcp_tools, need, k)
+
+
+search_mcp_tools = StructuredTool.from_function(
+    func=_search_mcp_tools,
+    coroutine=_asearch_mcp_tools,
+    name="search_mcp_tools",
+)
@@ -14,7 +14,7 @@ def get_mail_agent():
     该 Agent 接收邮件内容和目标邮箱地址，返回发送结果。
     """
     settings = get_settings()
-    model = get_model(settings)
+    model = get_model(settings, agent_name="mail")
 
     # 将系统提示词内置到 Agent 的调用中，避免每次显式传入
     class _MailAgentWithSystem:
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+"""
+共享 Embeddings 服务入口（FastAPI）
+
+单进程持有一份句向量模型，供多个 uvicorn worker / 入库进程通过本地 HTTP 或 Unix Socket 调用：
+- 路由：POST /v1/embeddings  请求体 {"texts": [...], "model": 可选, "normalize": 可选}，返回 {"embeddings": [[...], ...]}
+  服务端只提供 HF_EMBEDDING_MODEL 的归一化向量，请求的 model/normalize 与之不符时返回 400
+- 路由：GET  /v1/embeddings/stats  返回 p50/p99 延迟、批次填充率等统计
+- 并发请求由 MicroBatcher 合并为微批次，最长等待 EMBEDDING_BATCH_MAX_WAIT_MS
+
+启动：
+    python -m agentlz.app.embedding_server
+客户端：设置 EMBEDDING_SERVER_URL 后 get_hf_embeddings 自动返回 RemoteEmbeddings。
+"""
+
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+
+from agentlz.config.settings import get_settings
+from agentlz.core.embedding_model_factory import get_hf_embeddings
+from agentlz.core.logger import setup_logging
+from agentlz.services.embedding_batcher import MicroBatcher
+
+
+class EmbedRequest(BaseModel):
+    """编码请求体"""
+
+    texts: List[str] = Field(default_factory=list)
+    # 客户端期望的模型与归一化设置；与服务端不一致时拒绝，避免向量空间不一致
+    model: Optional[str] = None
+    normalize: bool = True
+
+
+class EmbedResponse(BaseModel):
+    """编码响应体"""
+
+    embeddings: List[List[float]]
+
+
+_BATCHER: MicroBatcher | None = None
+# 服务端加载的模型名（启动时确定）
+_MODEL: str | None = None
+
+
+@asynccontextmanager
+async def _lifespan(_: FastAPI):
+    """启动时加载模型并启动攒批协程，退出时停止。"""
+    global _BATCHER, _MODEL
+    settings = get_settings()
+    logger = setup_logging(settings.log_level)
+    _MODEL = settings.hf_embedding_model
+    embeddings = get_hf_embeddings(model_name=_MODEL, use_server=False)
+    _BATCHER = MicroBatcher(
+        embeddings,
+        max_batch_size=settings.embedding_batch_size,
+        max_wait_ms=settings.embedding_batch_max_wait_ms,
+    )
+    await _BATCHER.start()
+    logger.info(
+        "Embeddings 服务已就绪: batch_size=%s max_wait_ms=%s",
+        settings.embedding_batch_size,
+        settings.embedding_batch_max_wait_ms,
+    )
+    try:
+        yield
+    finally:
+        await _BATCHER.stop()
+
+
+app = FastAPI(lifespan=_lifespan)
+
+
+@app.post("/v1/embeddings", response_model=EmbedResponse)
+async def embed(payload: EmbedRequest) -> Dict[str, Any]:
+    """编码一组文本（与其他并发请求合批执行）。"""
+    served = _MODEL or get_settings().hf_embedding_model
+    if (payload.model and payload.model != served) or not payload.normalize:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Embeddings 服务只提供 {served} 的归一化向量，请求为 {payload.model or served}"
+                   f"（normalize={payload.normalize}）",
+        )
+    vectors = await _BATCHER.embed(payload.texts)
+    return {"embeddings": vectors}
+
+
+@app.get("/v1/embeddings/stats")
+def stats() -> Dict[str, Any]:
+    """返回微批处理统计：p50/p99 延迟（毫秒）与批次填充率。"""
+    return _BATCHER.stats() if _BATCHER is not None else {}
+
+
+@app.get("/v1/health")
+def health() -> Dict[str, str]:
+    """健康检查：返回 OK"""
+    return {"status": "ok"}
+
+
+def main() -> None:
+    """按配置以 HTTP 或 Unix Socket 方式启动服务（单 worker，保证只加载一份模型）。"""
+    import uvicorn
+
+    settings = get_settings()
+    if settings.embedding_server_uds:
+        uvicorn.run(app, uds=settings.embedding_server_uds, workers=1)
+    else:
+        uvicorn.run(
+            app,
+            host=settings.embedding_server_host,
+            port=settings.embedding_server_port,
+            workers=1,
+        )
+
+
+if __name__ == "__main__":
+    main()
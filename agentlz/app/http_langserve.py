@@ -9,21 +9,93 @@ HTTP 接口入口（FastAPI）
 - 支持排序：_sort（字段白名单）, _order（ASC/DESC）
 - 支持搜索：q（匹配 username/email/full_name）
 - 支持多租户：从请求头读取 TENANT_ID_HEADER（默认 X-Tenant-ID），按 tenant_id 过滤
+- 工作流：POST /v1/workflow/stream 以 SSE 推送规划结果、工具调用事件与执行器 token
+- LLM 响应缓存：请求头 LLM_CACHE_BYPASS_HEADER（默认 X-LLM-Cache-Bypass）为真时跳过缓存读取；
+  GET /v1/llm-cache/stats 返回命中/未命中统计
+- 语义计划缓存：GET /v1/plan-cache/stats 返回命中率与节省的规划耗时
+- 内存 MCP 目录：应用启动时在后台线程开始整表加载（启用语义检索时同时构建向量索引）；GET /v1/mcp-catalog/stats 返回条目数、同步次数与 updated_at 水位
+- MCP 会话池：GET /v1/mcp-pool/stats 返回常驻会话数、租用/新建次数与淘汰计数
+- 工作流运行器：GET /v1/workflow-runner/stats 返回运行/排队数、各租户队列深度、拒绝次数与排队等待时间分位数
 
 读取配置来自 agentlz.config.settings.Settings（.env 环境变量）
 """
 
-from typing import Dict
+from contextlib import asynccontextmanager
+from typing import Any, Dict
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 
 from agentlz.app.routers.users import router as users_router
+from agentlz.app.routers.workflow import router as workflow_router
+from agentlz.config.settings import get_settings
+from agentlz.core.llm_cache import get_llm_cache_stats, reset_llm_cache_bypass, set_llm_cache_bypass
+from agentlz.services.mcp_catalog import get_mcp_catalog, get_mcp_catalog_stats
+from agentlz.services.mcp_session_pool import get_mcp_session_pool_stats
+from agentlz.services.mcp_vector_index import get_mcp_vector_index, get_mcp_vector_index_stats
+from agentlz.services.plan_cache import get_plan_cache_stats
+from agentlz.services.workflow_runner import get_workflow_runner_stats
 
 
-app = FastAPI()
+@asynccontextmanager
+async def _lifespan(_: FastAPI):
+    """启动时创建内存 MCP 目录与向量索引（后台线程加载，不阻塞启动与首个请求）。"""
+    settings = get_settings()
+    get_mcp_catalog(settings)
+    get_mcp_vector_index(settings)
+    yield
+
+
+app = FastAPI(lifespan=_lifespan)
 
 # 挂载用户路由（CRUD + 列表）
 app.include_router(users_router)
+# 挂载工作流路由（规划 + 执行，SSE 流式输出）
+app.include_router(workflow_router)
+
+
+@app.middleware("http")
+async def llm_cache_bypass_middleware(request: Request, call_next):
+    """按请求头设置 LLM 缓存旁路标记（调试用），作用域为当前请求。"""
+    header = get_settings().llm_cache_bypass_header
+    value = (request.headers.get(header) or "").strip().lower()
+    token = set_llm_cache_bypass(value in ("1", "true", "yes", "on"))
+    try:
+        return await call_next(request)
+    finally:
+        reset_llm_cache_bypass(token)
+
+
+@app.get("/v1/llm-cache/stats")
+def llm_cache_stats() -> Dict[str, Any]:
+    """LLM 响应缓存统计：按数据库路径返回条目数、命中率与淘汰计数"""
+    return get_llm_cache_stats()
+
+
+@app.get("/v1/plan-cache/stats")
+def plan_cache_stats() -> Dict[str, Any]:
+    """语义计划缓存统计：命中率、失效次数与节省的规划耗时"""
+    return get_plan_cache_stats()
+
+
+@app.get("/v1/mcp-catalog/stats")
+def mcp_catalog_stats() -> Dict[str, Any]:
+    """内存 MCP 目录统计：条目数、索引词数、同步次数与水位（含语义检索向量索引统计）"""
+    data = get_mcp_catalog_stats()
+    if data:
+        data["vector_index"] = get_mcp_vector_index_stats()
+    return data
+
+
+@app.get("/v1/mcp-pool/stats")
+def mcp_pool_stats() -> Dict[str, Any]:
+    """MCP 会话池统计：常驻会话数、进行中请求数、复用/新建次数与空闲/异常淘汰计数"""
+    return get_mcp_session_pool_stats()
+
+
+@app.get("/v1/workflow-runner/stats")
+def workflow_runner_stats() -> Dict[str, Any]:
+    """工作流运行器统计：运行/排队数、各租户排队深度、接纳/拒绝次数与排队等待时间 p50/p95"""
+    return get_workflow_runner_stats()
 
 
 @app.get("/v1/health")
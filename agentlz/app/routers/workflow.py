@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+"""工作流路由（规划 + 执行，SSE 流式输出）
+
+每次运行先向工作流运行器（agentlz.services.workflow_runner）申请名额：全局并发受限，按租户
+（请求头 TENANT_ID_HEADER，缺省归入 default 租户）加权公平排队，队列已满时返回 429。
+
+POST /v1/workflow/run 运行到结束后返回 JSON（计划、状态、输出与排队耗时）。
+
+开启链路追踪（TRACING_ENABLED）时，每次运行记录为一个 trace（请求头 traceparent 存在时延续调用方的 trace），
+响应与 done 事件含 trace_id。
+
+开启 MCP 预热（MCP_PREWARM_ENABLED，需开启会话池）时，Planner 查询到的候选 MCP 服务器在规划期间即在后台拉起，
+执行器直接采用已就绪的会话。
+
+POST /v1/workflow/stream 以 Server-Sent Events 推送：
+- plan：Planner 生成的 WorkflowPlan（规划完成即推送，首字节时间约等于规划耗时）
+- tool_start / tool_end：执行器的工具调用开始与结束
+- token：执行器 LLM 生成的文本增量
+- result：最终回答
+- error：规划或执行失败
+- timeout：执行超过截止时间（请求体 timeout 或 EXECUTOR_TIMEOUT_SECONDS），含已完成的部分结果
+- done：流结束（含总耗时、排队耗时 queued_ms 与 trace_id）
+"""
+
+import asyncio
+import dataclasses
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from sse_starlette.sse import EventSourceResponse
+
+from agentlz.agents.executor.executor_agnet import MCPChainExecutor
+from agentlz.agents.planner.planner_agent import plan_workflow_chain
+from agentlz.config.settings import get_settings
+from agentlz.core.logger import setup_logging
+from agentlz.core.tracing import span
+from agentlz.schemas.workflow import WorkflowRunRequest
+from agentlz.services.mcp_warmup import create_mcp_warmup
+from agentlz.services.workflow_runner import DEFAULT_TENANT, RunTicket, WorkflowQueueFull, get_workflow_runner
+
+
+router = APIRouter(prefix="/v1", tags=["workflow"])
+
+_PLAN_FAILED_PREFIX = "计划生成失败"
+
+
+def _event(name: str, data: Dict[str, Any]) -> Dict[str, str]:
+    """构造 sse-starlette 事件（data 统一序列化为 JSON）。"""
+    return {"event": name, "data": json.dumps(data, ensure_ascii=False, default=str)}
+
+
+def _admit(request: Request) -> RunTicket:
+    """按租户申请运行名额；排队已满时返回 429。"""
+    settings = get_settings()
+    tenant_id = (request.headers.get(settings.tenant_id_header) or "").strip() or DEFAULT_TENANT
+    try:
+        return get_workflow_runner(settings).submit(tenant_id)
+    except WorkflowQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+
+async def _plan(user_input: str, logger):
+    """生成计划；失败时返回 (None, 错误说明)。"""
+    try:
+        # Planner 为同步实现，放入线程执行以免阻塞事件循环；预热回调在规划期间拉起候选服务器
+        warmup = create_mcp_warmup(get_settings())
+        options = {"callbacks": [warmup]} if warmup is not None else {}
+        plan = await asyncio.to_thread(plan_workflow_chain, user_input, **options)
+    except Exception as e:
+        logger.exception("工作流规划失败：%r", e)
+        return None, "计划生成失败：规划异常。"
+    if not plan.mcp_config and not plan.execution_chain and plan.instructions.startswith(_PLAN_FAILED_PREFIX):
+        return plan, plan.instructions
+    return plan, ""
+
+
+async def _wait_turn(ticket: RunTicket, sp) -> None:
+    """等待运行名额（排队耗时记录为 workflow.queue span）。"""
+    with span("workflow.queue", {"tenant.id": ticket.tenant_id}):
+        await ticket.wait()
+    sp.set_attribute("workflow.queued_ms", ticket.wait_ms)
+
+
+async def _workflow_events(
+    user_input: str,
+    timeout: Optional[float] = None,
+    ticket: Optional[RunTicket] = None,
+    traceparent: Optional[str] = None,
+) -> AsyncIterator[Dict[str, str]]:
+    """依次执行规划与执行，并把各阶段事件转换为 SSE（持有 ticket 时先排队等待名额，结束后归还）。"""
+    try:
+        attributes = {"tenant.id": ticket.tenant_id if ticket is not None else None}
+        with span("workflow.stream", attributes, kind="server", parent=traceparent) as sp:
+            if ticket is not None:
+                await _wait_turn(ticket, sp)
+            queued_ms = ticket.wait_ms if ticket is not None else 0.0
+            logger = setup_logging(get_settings().log_level)
+            started = time.perf_counter()
+            plan, error = await _plan(user_input, logger)
+            plan_ms = (time.perf_counter() - started) * 1000.0
+            if plan is not None:
+                yield _event("plan", {"plan": dataclasses.asdict(plan), "elapsed_ms": round(plan_ms, 1)})
+            if error:
+                sp.set_status("error", error)
+                yield _event("error", {"stage": "plan", "message": error})
+                return
+
+            executor = MCPChainExecutor(plan)
+            async for ev in executor.astream_chain(user_input, timeout=timeout):
+                data = dict(ev["data"])
+                if ev["event"] in ("error", "timeout"):
+                    data["stage"] = "execute"
+                    sp.set_status("error", str(data.get("message", ""))[:200])
+                yield _event(ev["event"], data)
+                if ev["event"] in ("error", "timeout"):
+                    return
+            yield _event("done", {"elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1),
+                                  "queued_ms": queued_ms, "trace_id": sp.trace_id})
+    finally:
+        if ticket is not None:
+            ticket.release()
+
+
+@router.post("/workflow/run")
+async def run_workflow(payload: WorkflowRunRequest, request: Request) -> Dict[str, Any]:
+    """运行工作流（规划 + 执行）直到结束，返回计划、状态（ok/error/timeout）、输出与排队耗时。"""
+    ticket = _admit(request)
+    try:
+        parent = request.headers.get("traceparent")
+        with span("workflow.run", {"tenant.id": ticket.tenant_id}, kind="server", parent=parent) as sp:
+            await _wait_turn(ticket, sp)
+            logger = setup_logging(get_settings().log_level)
+            started = time.perf_counter()
+            plan, error = await _plan(payload.input, logger)
+            result: Dict[str, Any] = {"plan": dataclasses.asdict(plan) if plan is not None else None, "queued_ms": ticket.wait_ms}
+            if error:
+                result.update({"status": "error", "stage": "plan", "output": error})
+            else:
+                executor = MCPChainExecutor(plan)
+                output = await executor.execute_chain(payload.input, timeout=payload.timeout)
+                result.update({"status": executor.status, "output": output, "partial": executor.partial_results})
+            if result["status"] != "ok":
+                sp.set_status("error", str(result["output"])[:200])
+            result["elapsed_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+            result["trace_id"] = sp.trace_id
+            return result
+    finally:
+        ticket.release()
+
+
+@router.post("/workflow/stream")
+async def stream_workflow(payload: WorkflowRunRequest, request: Request):
+    """运行工作流并以 SSE 推送规划结果、工具调用与执行器 token（排队已满时返回 429）。"""
+    ticket = _admit(request)
+    return EventSourceResponse(_workflow_events(payload.input, payload.timeout, ticket, request.headers.get("traceparent")))
@@ -1,4 +1,8 @@
 # Settings 类与 get_settings 函数
+import os
+import threading
+from typing import Any, Optional, Tuple
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
@@ -22,6 +26,91 @@ class Settings(BaseSettings):
     model_temperature: float = Field(default=0.0, env="MODEL_TEMPERATURE")
     system_prompt: str = Field(default="You are a helpful assistant.", env="SYSTEM_PROMPT")
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
+    # 日志输出格式（text/json）与按模块级别覆盖，例如 "agentlz.agents.planner=DEBUG,httpx=WARNING"
+    log_format: str = Field(default="text", env="LOG_FORMAT")
+    log_module_levels: str | None = Field(default=None, env="LOG_MODULE_LEVELS")
+    # LLM HTTP 连接池（同一端点共享，keep-alive；安装 h2 后启用 HTTP/2）
+    llm_pool_max_connections: int = Field(default=100, env="LLM_POOL_MAX_CONNECTIONS")
+    llm_pool_max_keepalive: int = Field(default=20, env="LLM_POOL_MAX_KEEPALIVE")
+    llm_pool_keepalive_expiry: float = Field(default=60.0, env="LLM_POOL_KEEPALIVE_EXPIRY")
+    llm_http2: bool = Field(default=True, env="LLM_HTTP2")
+    llm_request_timeout: float = Field(default=120.0, env="LLM_REQUEST_TIMEOUT")
+    # LLM 调用调度：端点共享的 RPM/TPM 令牌桶（<=0 不限）、AIMD 并发上限与退避重试
+    llm_scheduler_enabled: bool = Field(default=True, env="LLM_SCHEDULER_ENABLED")
+    llm_rpm_limit: float = Field(default=0, env="LLM_RPM_LIMIT")
+    llm_tpm_limit: float = Field(default=0, env="LLM_TPM_LIMIT")
+    llm_concurrency_initial: int = Field(default=8, env="LLM_CONCURRENCY_INITIAL")
+    llm_concurrency_min: int = Field(default=1, env="LLM_CONCURRENCY_MIN")
+    llm_concurrency_max: int = Field(default=64, env="LLM_CONCURRENCY_MAX")
+    llm_max_retries: int = Field(default=4, env="LLM_MAX_RETRIES")
+    llm_retry_base_delay: float = Field(default=0.5, env="LLM_RETRY_BASE_DELAY")
+    llm_retry_max_delay: float = Field(default=30.0, env="LLM_RETRY_MAX_DELAY")
+    # LLM 响应缓存（SQLite，仅 temperature=0 时生效）：按 Agent 名称启用，"*" 表示全部
+    llm_cache_enabled: bool = Field(default=False, env="LLM_CACHE_ENABLED")
+    llm_cache_agents: str = Field(default="planner,check", env="LLM_CACHE_AGENTS")
+    llm_cache_path: str = Field(default=".storage/llm_cache.sqlite3", env="LLM_CACHE_PATH")
+    llm_cache_ttl_seconds: float = Field(default=86400.0, env="LLM_CACHE_TTL_SECONDS")
+    llm_cache_max_entries: int = Field(default=10000, env="LLM_CACHE_MAX_ENTRIES")
+    llm_cache_bypass_header: str = Field(default="X-LLM-Cache-Bypass", env="LLM_CACHE_BYPASS_HEADER")
+    # Planner：单次规划超时（秒，<=0 不限）与批量规划并发上限
+    planner_timeout_seconds: float = Field(default=120.0, env="PLANNER_TIMEOUT_SECONDS")
+    planner_batch_concurrency: int = Field(default=16, env="PLANNER_BATCH_CONCURRENCY")
+    # Planner 查询模式：single（逐关键词调用）或 batch（批量查询工具 + 对应提示词变体，一次调用解析全部关键词）
+    planner_lookup_mode: str = Field(default="single", env="PLANNER_LOOKUP_MODE")
+    # Planner 规划模式：agent（代理 + 查询工具多轮调用）或 inline（本地预选候选工具内联到提示词，单次结构化输出；
+    # 最佳候选命中的 n-gram 数低于阈值时视为预选不确定，回退到 agent）
+    planner_mode: str = Field(default="agent", env="PLANNER_MODE")
+    planner_inline_max_candidates: int = Field(default=8, env="PLANNER_INLINE_MAX_CANDIDATES")
+    planner_inline_min_hits: int = Field(default=2, env="PLANNER_INLINE_MIN_HITS")
+    # 内存 MCP 目录：关键词查询走 n-gram 倒排索引，后台按 updated_at 水位增量同步（秒）
+    mcp_catalog_enabled: bool = Field(default=True, env="MCP_CATALOG_ENABLED")
+    mcp_catalog_refresh_interval: float = Field(default=30.0, env="MCP_CATALOG_REFRESH_INTERVAL")
+    mcp_catalog_ngram: int = Field(default=2, env="MCP_CATALOG_NGRAM")
+    # MCP 语义检索：对目录描述建立向量索引（planner 增加 search_mcp_tools 工具），trust_score 加权
+    mcp_vector_search_enabled: bool = Field(default=False, env="MCP_VECTOR_SEARCH_ENABLED")
+    mcp_vector_index_dir: str = Field(default=".storage/mcp_index", env="MCP_VECTOR_INDEX_DIR")
+    mcp_vector_trust_weight: float = Field(default=0.3, env="MCP_VECTOR_TRUST_WEIGHT")
+    # MCP 会话池：执行器复用常驻的 MCP 服务器会话（按 name/transport/command/args 区分），不再每次工作流拉起子进程
+    mcp_session_pool_enabled: bool = Field(default=True, env="MCP_SESSION_POOL_ENABLED")
+    mcp_pool_max_sessions_per_server: int = Field(default=2, env="MCP_POOL_MAX_SESSIONS_PER_SERVER")
+    mcp_pool_max_inflight_per_session: int = Field(default=4, env="MCP_POOL_MAX_INFLIGHT_PER_SESSION")
+    mcp_pool_idle_ttl: float = Field(default=300.0, env="MCP_POOL_IDLE_TTL")
+    mcp_pool_health_interval: float = Field(default=30.0, env="MCP_POOL_HEALTH_INTERVAL")
+    mcp_pool_connect_timeout: float = Field(default=30.0, env="MCP_POOL_CONNECT_TIMEOUT")
+    # MCP 工具定义缓存：按服务器配置与程序文件指纹缓存 list_tools 结果（持久化），命中时服务器在首次调用工具时才拉起
+    mcp_tool_cache_enabled: bool = Field(default=True, env="MCP_TOOL_CACHE_ENABLED")
+    mcp_tool_cache_path: str = Field(default=".storage/mcp_tool_cache.json", env="MCP_TOOL_CACHE_PATH")
+    # 执行模式：agent（单个代理按链路逐个调用工具）、dag（按 plan.steps 依赖图并发执行步骤，计划无 steps 时回退 agent）
+    # 或 direct（同 dag，但给出 tool/args 的步骤直接调用 MCP 工具，仅 reasoning 步骤使用模型）
+    executor_mode: str = Field(default="agent", env="EXECUTOR_MODE")
+    executor_max_parallel_steps: int = Field(default=4, env="EXECUTOR_MAX_PARALLEL_STEPS")
+    # 执行截止时间：整个执行（工具加载、工具调用、模型调用）的上限与单个步骤的默认预算（秒，<=0 表示不限）
+    executor_timeout_seconds: float = Field(default=300.0, env="EXECUTOR_TIMEOUT_SECONDS")
+    executor_step_timeout_seconds: float = Field(default=120.0, env="EXECUTOR_STEP_TIMEOUT_SECONDS")
+    # 工作流运行器：HTTP 工作流的全局并发上限，超出后按租户（TENANT_ID_HEADER）加权公平排队，队列满返回 429
+    workflow_max_concurrency: int = Field(default=8, env="WORKFLOW_MAX_CONCURRENCY")
+    workflow_queue_per_tenant: int = Field(default=50, env="WORKFLOW_QUEUE_PER_TENANT")
+    workflow_queue_total: int = Field(default=500, env="WORKFLOW_QUEUE_TOTAL")
+    # 租户权重，形如 "tenant_a:3,tenant_b:1"；未列出的租户权重为 1
+    workflow_tenant_weights: str = Field(default="", env="WORKFLOW_TENANT_WEIGHTS")
+    # 同时跟踪的租户数上限（租户 id 来自请求头）；达到上限时移除空闲租户，仍满则拒绝新租户
+    workflow_max_tenants: int = Field(default=10000, env="WORKFLOW_MAX_TENANTS")
+    # 链路追踪：规划、数据库查询、MCP 拉起/工具加载/工具调用与模型调用记录为嵌套 span，
+    # 按 OpenTelemetry span 结构逐行写入 JSONL（python -m agentlz.core.tracing 汇总最慢的 span）
+    tracing_enabled: bool = Field(default=False, env="TRACING_ENABLED")
+    trace_export_path: str = Field(default=".storage/traces/spans.jsonl", env="TRACE_EXPORT_PATH")
+    trace_service_name: str = Field(default="agentlz", env="TRACE_SERVICE_NAME")
+    # MCP 服务器预热（需开启会话池）：Planner 的查询工具返回候选 MCP 时即在后台拉起并初始化（每次规划最多 N 个），
+    # 执行器直接采用已就绪的会话；宽限期内未被采用的预热会话关闭（秒）
+    mcp_prewarm_enabled: bool = Field(default=True, env="MCP_PREWARM_ENABLED")
+    mcp_prewarm_max_servers: int = Field(default=4, env="MCP_PREWARM_MAX_SERVERS")
+    mcp_prewarm_grace_seconds: float = Field(default=30.0, env="MCP_PREWARM_GRACE_SECONDS")
+    # 语义计划缓存：相似请求复用历史 WorkflowPlan（MCP 目录变化时失效）
+    plan_cache_enabled: bool = Field(default=False, env="PLAN_CACHE_ENABLED")
+    plan_cache_threshold: float = Field(default=0.92, env="PLAN_CACHE_THRESHOLD")
+    plan_cache_max_entries: int = Field(default=512, env="PLAN_CACHE_MAX_ENTRIES")
+    plan_cache_ttl_seconds: float = Field(default=3600.0, env="PLAN_CACHE_TTL_SECONDS")
+    plan_cache_catalog_check_interval: float = Field(default=10.0, env="PLAN_CACHE_CATALOG_CHECK_INTERVAL")
     # search
     bing_api_key: str | None = Field(default=None, env="BING_API_KEY")
 
@@ -35,10 +124,91 @@ class Settings(BaseSettings):
     user_table_name: str = Field(default="users", env="USER_TABLE_NAME")
     tenant_id_header: str = Field(default="X-Tenant-ID", env="TENANT_ID_HEADER")
     
-    model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
+    # frozen：get_settings 返回进程共享的不可变快照，禁止调用方就地修改
+    model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", frozen=True)
     # 配置HuggingFace 中文句向量嵌入模型
     hf_embedding_model: str = Field(default="BAAI/bge-small-zh-v1.5", env="HF_EMBEDDING_MODEL")
+    # Embeddings 推理后端：torch（sentence-transformers）或 onnx（ONNX Runtime CPU）
+    hf_embedding_backend: str = Field(default="torch", env="HF_EMBEDDING_BACKEND")
+    onnx_model_dir: str = Field(default=".storage/onnx", env="ONNX_MODEL_DIR")
+    onnx_quantize: bool = Field(default=True, env="ONNX_QUANTIZE")
+    # 共享 Embeddings 服务：配置 URL 后 get_hf_embeddings 返回远程客户端（http://host:port 或 unix:///path）
+    embedding_server_url: str | None = Field(default=None, env="EMBEDDING_SERVER_URL")
+    embedding_server_host: str = Field(default="127.0.0.1", env="EMBEDDING_SERVER_HOST")
+    embedding_server_port: int = Field(default=8765, env="EMBEDDING_SERVER_PORT")
+    embedding_server_uds: str | None = Field(default=None, env="EMBEDDING_SERVER_UDS")
+    embedding_batch_size: int = Field(default=32, env="EMBEDDING_BATCH_SIZE")
+    embedding_batch_max_wait_ms: float = Field(default=5.0, env="EMBEDDING_BATCH_MAX_WAIT_MS")
+    # 异步 Embeddings 包装：专用编码线程数与排队上限
+    embedding_async_workers: int = Field(default=2, env="EMBEDDING_ASYNC_WORKERS")
+    embedding_async_queue: int = Field(default=64, env="EMBEDDING_ASYNC_QUEUE")
+
+
+class SettingsProvider:
+    """缓存的配置提供者
+
+    只解析一次 .env 与环境变量；之后每次 get() 仅比较 .env 文件的 (mtime, size)
+    与相关环境变量的取值，发生变化时才重新构建 Settings。返回的 Settings 为不可变快照。
+
+    参数:
+        env_file: .env 文件路径（与 Settings.model_config 一致，相对当前工作目录）。
+    """
+
+    def __init__(self, env_file: str = ".env") -> None:
+        self.env_file = env_file
+        self._env_keys = tuple(name.upper() for name in Settings.model_fields)
+        # os.environ.get 每次都会编码键名；直接读取底层映射可将指纹计算开销降低一个数量级
+        self._environ_data = getattr(os.environ, "_data", None)
+        encodekey = getattr(os.environ, "encodekey", None)
+        self._raw_env_keys = (
+            tuple(encodekey(k) for k in self._env_keys)
+            if self._environ_data is not None and encodekey is not None
+            else None
+        )
+        self._lock = threading.Lock()
+        self._settings: Optional[Settings] = None
+        self._fingerprint: Optional[Tuple[Any, ...]] = None
+
+    def _current_fingerprint(self) -> Tuple[Any, ...]:
+        """计算 .env 文件状态与环境变量取值的指纹。"""
+        try:
+            st = os.stat(self.env_file)
+            file_state: Tuple[Any, ...] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            file_state = (None, None)
+        if self._raw_env_keys is not None:
+            return file_state + tuple(map(self._environ_data.get, self._raw_env_keys))
+        return file_state + tuple(map(os.environ.get, self._env_keys))
+
+    def get(self) -> Settings:
+        """返回当前配置快照；.env 或环境变量变化时自动热加载。"""
+        fingerprint = self._current_fingerprint()
+        settings = self._settings
+        if settings is not None and fingerprint == self._fingerprint:
+            return settings
+        with self._lock:
+            if self._settings is None or fingerprint != self._fingerprint:
+                self._settings = Settings()
+                self._fingerprint = fingerprint
+            return self._settings
+
+    def reload(self) -> Settings:
+        """强制重新解析 .env 与环境变量，返回新的配置快照。"""
+        with self._lock:
+            self._settings = Settings()
+            self._fingerprint = self._current_fingerprint()
+            return self._settings
+
+
+_PROVIDER = SettingsProvider()
+
 
 def get_settings() -> Settings:
-    return Settings()
+    """返回缓存的配置快照（不可变）；.env 或环境变量变化时自动重新加载。"""
+    return _PROVIDER.get()
+
+
+def reload_settings() -> Settings:
+    """显式重新加载配置并返回新快照。"""
+    return _PROVIDER.reload()
 
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+"""
+异步 Embeddings 包装
+
+同步编码（sentence-transformers / ONNX Runtime）会长时间占用调用线程，
+在 async 路由或 MCP 工具中直接调用会阻塞事件循环。本模块提供：
+- 专用、有界的线程池执行编码，aembed_documents/aembed_query 不阻塞事件循环；
+- 有界排队：同时在途（排队 + 执行中）的请求数不超过 max_workers + max_queue，超出时协程等待；
+- 取消传播：调用方被取消时，尚未开始的编码任务直接从线程池撤销；
+- 队列深度指标：等待准入、排队、执行中与累计计数。
+"""
+
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, TypeVar
+
+try:
+    from langchain_core.embeddings import Embeddings
+except Exception:  # 兼容旧版本
+    from langchain.embeddings.base import Embeddings  # type: ignore
+
+
+T = TypeVar("T")
+
+
+class AsyncEmbeddings(Embeddings):
+    """为同步 Embeddings 提供不阻塞事件循环的异步接口
+
+    若底层实现自带原生异步（如 RemoteEmbeddings），异步调用直接透传，不占用线程池。
+
+    参数:
+        embeddings: 底层 LangChain Embeddings 实例。
+        max_workers: 编码线程数。
+        max_queue: 线程全部忙碌时允许排队的最大请求数。
+    """
+
+    def __init__(self, embeddings: Embeddings, max_workers: int = 2, max_queue: int = 64) -> None:
+        self.embeddings = embeddings
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="agentlz-embed"
+        )
+        self._native_async = (
+            getattr(type(embeddings), "aembed_documents", Embeddings.aembed_documents)
+            is not Embeddings.aembed_documents
+        )
+        # asyncio.Semaphore 绑定事件循环，按循环分别创建
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+
+    # ---- 同步接口：直接透传 ----
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """批量编码文档（同步）。"""
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """编码单条查询（同步）。"""
+        return self.embeddings.embed_query(text)
+
+    # ---- 异步接口 ----
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """批量编码文档（异步，编码在专用线程池中执行）。"""
+        if self._native_async:
+            return await self.embeddings.aembed_documents(texts)
+        return await self._offload(self.embeddings.embed_documents, list(texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """编码单条查询（异步，编码在专用线程池中执行）。"""
+        if self._native_async:
+            return await self.embeddings.aembed_query(text)
+        return await self._offload(self.embeddings.embed_query, text)
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        """返回当前事件循环的准入信号量。"""
+        loop = asyncio.get_running_loop()
+        sem = self._semaphores.get(loop)
+        if sem is None:
+            sem = asyncio.Semaphore(self.max_workers + self.max_queue)
+            self._semaphores[loop] = sem
+        return sem
+
+    def _add(self, name: str, delta: int) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+    async def _offload(self, fn: Callable[[Any], T], arg: Any) -> T:
+        """在有界线程池中执行 fn(arg)，并维护队列指标与取消语义。"""
+        sem = self._semaphore()
+        self._add("_waiting", 1)
+        try:
+            await sem.acquire()
+        finally:
+            self._add("_waiting", -1)
+
+        def _job() -> T:
+            self._add("_queued", -1)
+            self._add("_running", 1)
+            try:
+                return fn(arg)
+            finally:
+                self._add("_running", -1)
+
+        self._add("_queued", 1)
+        try:
+            future = self._executor.submit(_job)
+        except Exception:
+            self._add("_queued", -1)
+            sem.release()
+            raise
+
+        try:
+            result = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            self._add("_cancelled", 1)
+            if future.cancel():
+                # 未开始的任务直接从线程池撤销
+                self._add("_queued", -1)
+                sem.release()
+            else:
+                # 已在执行的任务无法中断：结果丢弃，线程空出后再释放名额，保证有界
+                loop = asyncio.get_running_loop()
+
+                def _release_later(_f) -> None:
+                    try:
+                        loop.call_soon_threadsafe(sem.release)
+                    except RuntimeError:
+                        pass  # 事件循环已关闭，名额随循环一并失效
+
+                future.add_done_callback(_release_later)
+            raise
+        except Exception:
+            self._add("_failed", 1)
+            sem.release()
+            raise
+        sem.release()
+        self._add("_completed", 1)
+        return result
+
+    def metrics(self) -> Dict[str, int]:
+        """返回队列指标快照。
+
+        返回:
+            waiting: 等待准入（超出有界队列）的协程数
+            queued: 已提交线程池、尚未开始执行的任务数
+            running: 正在执行的编码任务数
+            completed/failed/cancelled: 累计计数
+        """
+        with self._lock:
+            return {
+                "waiting": self._waiting,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+                "cancelled": self._cancelled,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+            }
+
+    def shutdown(self) -> None:
+        """关闭线程池（撤销未开始的任务）。"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
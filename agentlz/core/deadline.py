@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+"""
+请求级截止时间（deadline）
+
+截止时间（time.monotonic 绝对值）保存在 contextvars 中，随 asyncio 任务、LangChain 工具与模型调用传递：
+- deadline_scope(seconds) 在当前上下文设置截止时间，嵌套时取更早者（步骤预算不会超出请求截止时间）；
+- remaining() 返回剩余秒数，MCP 工具调用与 LLM 调用（调度器重试、httpx 超时）据此限制自身耗时；
+- run_with_timeout(coro) 以 min(timeout, remaining()) 为上限执行协程，超时取消协程并抛出 DeadlineExceeded。
+"""
+
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Iterator, Optional
+
+
+_DEADLINE: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("agentlz_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """超出截止时间或步骤超时预算。"""
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[float]]:
+    """
+    在当前上下文设置截止时间。
+
+    参数:
+        seconds: 距现在的秒数；None 或 <=0 表示不新增限制（沿用外层截止时间）。
+    返回:
+        生效的绝对截止时间（time.monotonic），未设置时为 None。
+    """
+    current = _DEADLINE.get()
+    if seconds is None or seconds <= 0:
+        yield current
+        return
+    candidate = time.monotonic() + float(seconds)
+    value = candidate if current is None else min(current, candidate)
+    token = _DEADLINE.set(value)
+    try:
+        yield value
+    finally:
+        _DEADLINE.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """返回距截止时间的剩余秒数（可能 <=0）；未设置截止时间时返回 None。"""
+    value = _DEADLINE.get()
+    return None if value is None else value - time.monotonic()
+
+
+def effective_timeout(timeout: Optional[float] = None) -> Optional[float]:
+    """合并调用方超时与上下文截止时间，返回更严格者；两者都未设置时返回 None。"""
+    left = remaining()
+    if timeout is None or timeout <= 0:
+        return left
+    return timeout if left is None else min(timeout, left)
+
+
+async def run_with_timeout(aw: Awaitable[Any], timeout: Optional[float] = None, what: str = "调用") -> Any:
+    """
+    在超时与截止时间约束下等待 aw。
+
+    异常:
+        DeadlineExceeded：超时（aw 已被取消）或截止时间在调用前已过。
+    """
+    limit = effective_timeout(timeout)
+    if limit is None:
+        return await aw
+    if limit <= 0:
+        if asyncio.iscoroutine(aw):
+            aw.close()
+        raise DeadlineExceeded(f"已超过截止时间，未执行：{what}")
+    try:
+        return await asyncio.wait_for(aw, limit)
+    except DeadlineExceeded:
+        raise
+    except asyncio.TimeoutError as e:
+        raise DeadlineExceeded(f"超时（{limit:.1f}s）：{what}") from e
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+"""
+共享 Embeddings 服务客户端
+
+与 `agentlz.app.embedding_server` 通信的 LangChain Embeddings 实现，
+多个 uvicorn worker / 入库进程共用同一份模型，由服务端跨请求微批处理。
+
+服务地址支持：
+- HTTP：`http://127.0.0.1:8765`
+- Unix Socket：`unix:///tmp/agentlz-embedding.sock`
+
+实例在进程内共享（见 embedding_model_factory），异步客户端按事件循环分别创建（连接不能跨循环复用），
+事件循环被回收时随之释放。
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+try:
+    from langchain_core.embeddings import Embeddings
+except Exception:  # 兼容旧版本
+    from langchain.embeddings.base import Embeddings  # type: ignore
+
+
+_UNIX_PREFIX = "unix://"
+
+
+def _parse_server_url(url: str) -> Tuple[str, Optional[str]]:
+    """解析服务地址，返回 (base_url, uds_path)。"""
+    if url.startswith(_UNIX_PREFIX):
+        return "http://localhost", url[len(_UNIX_PREFIX):]
+    return url.rstrip("/"), None
+
+
+class RemoteEmbeddings(Embeddings):
+    """调用本地共享 Embeddings 服务的客户端
+
+    参数:
+        server_url: 服务地址（http://host:port 或 unix:///path/to.sock）。
+        timeout: 单次请求超时时间（秒）。
+        model: 期望的模型名；随请求发送，服务端加载的模型不同时拒绝（HTTP 400），None 表示不校验。
+    """
+
+    def __init__(self, server_url: str, timeout: float = 30.0, model: Optional[str] = None) -> None:
+        self.server_url = server_url
+        self.timeout = timeout
+        self.model = model
+        base_url, uds = _parse_server_url(server_url)
+        self._base_url = base_url
+        self._uds = uds
+        self._client = httpx.Client(
+            base_url=base_url,
+            timeout=timeout,
+            transport=httpx.HTTPTransport(uds=uds) if uds else None,
+        )
+        # 事件循环 -> 该循环专属的异步客户端
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._async_lock = threading.Lock()
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """返回当前事件循环专属的异步客户端（首次在该循环中使用时创建）。"""
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(
+                    base_url=self._base_url,
+                    timeout=self.timeout,
+                    transport=httpx.AsyncHTTPTransport(uds=self._uds) if self._uds else None,
+                )
+                self._async_clients[loop] = client
+        return client
+
+    def _payload(self, texts: List[str]) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"texts": list(texts), "normalize": True}
+        if self.model:
+            payload["model"] = self.model
+        return payload
+
+    @staticmethod
+    def _parse(resp: httpx.Response) -> List[List[float]]:
+        """校验响应并提取向量列表。"""
+        resp.raise_for_status()
+        data: Dict[str, Any] = resp.json()
+        return data["embeddings"]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """批量编码文档（同步）。"""
+        if not texts:
+            return []
+        return self._parse(self._client.post("/v1/embeddings", json=self._payload(texts)))
+
+    def embed_query(self, text: str) -> List[float]:
+        """编码单条查询（同步）。"""
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """批量编码文档（异步，不阻塞事件循环）。"""
+        if not texts:
+            return []
+        resp = await self._get_async_client().post("/v1/embeddings", json=self._payload(texts))
+        return self._parse(resp)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """编码单条查询（异步）。"""
+        return (await self.aembed_documents([text]))[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """读取服务端统计：p50/p99 延迟与批次填充率等。"""
+        resp = self._client.get("/v1/embeddings/stats")
+        resp.raise_for_status()
+        return resp.json()
@@ -1,7 +1,12 @@
 
-from typing import Optional
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 
 from agentlz.config.settings import get_settings
+from agentlz.core.async_embeddings import AsyncEmbeddings
+from agentlz.core.embedding_client import RemoteEmbeddings
 from agentlz.core.logger import setup_logging
 
 try:
@@ -13,28 +18,142 @@ except Exception:  # 兼容旧版本，必要时可回退
     except Exception:
         HuggingFaceEmbeddings = None  # 延迟到运行时检查
 
+try:
+    from langchain_core.embeddings import Embeddings
+except Exception:  # 兼容旧版本
+    from langchain.embeddings.base import Embeddings  # type: ignore
+
+
+# 进程级模型缓存：key 为 (model_name, device, normalize_embeddings)
+_EMBEDDINGS_CACHE: Dict[Tuple[str, Optional[str], bool], Any] = {}
+_EMBEDDINGS_LOCK = threading.Lock()
+# 预热文本：首次加载后执行一次编码，提前完成分词器与线程池初始化
+_WARMUP_TEXT = "预热 warmup"
 
 
 def get_hf_embeddings(
     model_name: Optional[str] = "BAAI/bge-small-zh-v1.5",
     device: Optional[str] = "cpu",
     normalize_embeddings: bool = True,
+    warmup: bool = True,
+    use_server: bool = True,
 ):
     """
-    创建并返回一个 HuggingFace 中文句向量嵌入模型（LangChain 兼容）。
+    返回一个 HuggingFace 中文句向量嵌入模型（LangChain 兼容），进程内按配置复用。
+
+    同一 (model_name, device, normalize_embeddings) 只会加载一次权重；
+    多线程并发首次访问时仅有一个线程执行加载，其余线程等待并复用结果。
+    若配置了 EMBEDDING_SERVER_URL，且请求的模型与归一化设置与服务端一致（HF_EMBEDDING_MODEL、归一化），
+    则返回共享 Embeddings 服务的客户端，进程内不加载模型；否则在进程内加载，避免得到与索引不一致的向量。
 
     参数:
         model_name: 模型名称或本地路径，默认使用 "BAAI/bge-small-zh-v1.5"
         device: 设备标识（如 "cpu"/"cuda"），不传则默认 cpu
         normalize_embeddings: 是否归一化向量，默认 True
+        warmup: 首次加载后是否执行一次预热编码，默认 True
+        use_server: 是否允许使用共享 Embeddings 服务（服务端自身加载模型时传 False）
 
     返回:
-        HuggingFaceEmbeddings 实例
+        HuggingFaceEmbeddings / ONNXEmbeddings / RemoteEmbeddings 实例（缓存共享，调用方不应修改其属性）
 
     异常:
         RuntimeError: 当环境缺失 HuggingFaceEmbeddings 依赖时抛出
     """
-    
+
+    settings = get_settings()
+
+    # 允许通过环境变量覆盖
+    name = model_name or settings.hf_embedding_model or "BAAI/bge-small-zh-v1.5"
+
+    if use_server and settings.embedding_server_url:
+        served = settings.hf_embedding_model or "BAAI/bge-small-zh-v1.5"
+        if name == served and normalize_embeddings:
+            return _get_remote_embeddings(settings.embedding_server_url, served)
+        setup_logging(settings.log_level).info(
+            "Embeddings 服务只提供 %s（归一化），请求 %s（normalize=%s）改为进程内加载",
+            served, name, normalize_embeddings,
+        )
+
+    # CPU 场景可切换到 ONNX Runtime 后端（HF_EMBEDDING_BACKEND=onnx）
+    if (settings.hf_embedding_backend or "torch").lower() == "onnx" and device in (None, "cpu"):
+        return get_onnx_embeddings(
+            model_name=name, normalize_embeddings=normalize_embeddings, warmup=warmup
+        )
+
+    key = (name, device, bool(normalize_embeddings))
+
+    cached = _EMBEDDINGS_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    with _EMBEDDINGS_LOCK:
+        # 双重检查：等待锁期间可能已被其他线程加载
+        cached = _EMBEDDINGS_CACHE.get(key)
+        if cached is not None:
+            return cached
+        embeddings = _load_hf_embeddings(name, device, normalize_embeddings, warmup)
+        _EMBEDDINGS_CACHE[key] = embeddings
+        return embeddings
+
+
+def get_async_hf_embeddings(
+    model_name: Optional[str] = "BAAI/bge-small-zh-v1.5",
+    device: Optional[str] = "cpu",
+    normalize_embeddings: bool = True,
+) -> AsyncEmbeddings:
+    """
+    返回带不阻塞事件循环的 aembed_documents/aembed_query 的 Embeddings（进程内按配置复用）。
+
+    底层模型与 get_hf_embeddings 共享同一缓存实例；编码在有界专用线程池中执行，
+    线程数与排队上限分别由 EMBEDDING_ASYNC_WORKERS、EMBEDDING_ASYNC_QUEUE 配置。
+
+    参数:
+        model_name: 模型名称或本地路径
+        device: 设备标识（如 "cpu"/"cuda"）
+        normalize_embeddings: 是否归一化向量
+
+    返回:
+        AsyncEmbeddings 实例（可通过 metrics() 读取队列深度）
+    """
+    settings = get_settings()
+    base = get_hf_embeddings(model_name=model_name, device=device, normalize_embeddings=normalize_embeddings)
+    key = (f"async:{id(base)}", device, bool(normalize_embeddings))
+    cached = _EMBEDDINGS_CACHE.get(key)
+    if cached is not None:
+        return cached
+    with _EMBEDDINGS_LOCK:
+        cached = _EMBEDDINGS_CACHE.get(key)
+        if cached is None:
+            cached = AsyncEmbeddings(
+                base,
+                max_workers=settings.embedding_async_workers,
+                max_queue=settings.embedding_async_queue,
+            )
+            _EMBEDDINGS_CACHE[key] = cached
+        return cached
+
+
+def _get_remote_embeddings(server_url: str, model_name: str):
+    """按服务地址与模型缓存共享 Embeddings 服务客户端（复用其 HTTP 连接池）。"""
+    key = (server_url, f"remote:{model_name}", True)
+    cached = _EMBEDDINGS_CACHE.get(key)
+    if cached is not None:
+        return cached
+    with _EMBEDDINGS_LOCK:
+        cached = _EMBEDDINGS_CACHE.get(key)
+        if cached is None:
+            cached = RemoteEmbeddings(server_url, model=model_name)
+            _EMBEDDINGS_CACHE[key] = cached
+        return cached
+
+
+def _load_hf_embeddings(
+    name: str,
+    device: Optional[str],
+    normalize_embeddings: bool,
+    warmup: bool,
+):
+    """实际加载模型权重并可选预热（调用方需持有 _EMBEDDINGS_LOCK）。"""
     settings = get_settings()
     logger = setup_logging(settings.log_level)
 
@@ -43,18 +162,303 @@ def get_hf_embeddings(
             "未找到 HuggingFaceEmbeddings，请安装 langchain-community 和 sentence-transformers。"
         )
 
-    # 允许通过环境变量覆盖
-    name = model_name or settings.hf_embedding_model or "BAAI/bge-small-zh-v1.5"
-
     model_kwargs = {}
     if device:
         model_kwargs["device"] = device
 
     encode_kwargs = {"normalize_embeddings": normalize_embeddings}
 
-    logger.info(f"加载 Embeddings 模型: {name} (device={device or 'auto'})")
-    return HuggingFaceEmbeddings(
+    logger.info("加载 Embeddings 模型: %s (device=%s)", name, device or "auto")
+    embeddings = HuggingFaceEmbeddings(
         model_name=name,
         model_kwargs=model_kwargs if model_kwargs else {},
         encode_kwargs=encode_kwargs,
     )
+    if warmup:
+        try:
+            embeddings.embed_query(_WARMUP_TEXT)
+        except Exception as e:
+            # 预热失败不影响模型可用性，真实调用时再暴露错误
+            logger.warning("Embeddings 预热失败：%r", e)
+    return embeddings
+
+
+def clear_hf_embeddings_cache() -> None:
+    """清空进程内的 Embeddings 模型缓存（主要用于测试或切换模型后释放内存）。"""
+    with _EMBEDDINGS_LOCK:
+        _EMBEDDINGS_CACHE.clear()
+
+
+# ---------------------------------------------------------------------------
+# ONNX Runtime CPU 后端
+# ---------------------------------------------------------------------------
+
+_ONNX_FP32_FILE = "model.onnx"
+_ONNX_INT8_FILE = "model.int8.onnx"
+_ONNX_META_FILE = "agentlz_onnx.json"
+
+
+def _onnx_export_dir(model_name: str, output_dir: Optional[str] = None) -> str:
+    """返回模型对应的 ONNX 导出目录（按模型名隔离）。"""
+    base = output_dir or get_settings().onnx_model_dir or ".storage/onnx"
+    return os.path.join(base, model_name.replace("/", "__"))
+
+
+def _detect_pooling(st_model) -> str:
+    """从 sentence-transformers 的 Pooling 模块推断池化方式（仅支持 cls / mean）。"""
+    try:
+        pooling_module = st_model[1]
+    except Exception:
+        return "cls"
+    mode = getattr(pooling_module, "pooling_mode", None)
+    if not isinstance(mode, str) and hasattr(pooling_module, "get_pooling_mode_str"):
+        mode = pooling_module.get_pooling_mode_str()
+    if not isinstance(mode, str):
+        mode = "cls" if getattr(pooling_module, "pooling_mode_cls_token", False) else "mean"
+    return "cls" if "cls" in mode else "mean"
+
+
+def export_onnx_model(
+    model_name: str,
+    output_dir: Optional[str] = None,
+    quantize: bool = True,
+    opset: int = 17,
+) -> str:
+    """
+    将 sentence-transformers 模型导出为 ONNX，并可选执行动态 int8 量化。
+
+    导出目录中包含 model.onnx、（可选）model.int8.onnx、分词器文件以及
+    记录池化方式与最大长度的 agentlz_onnx.json；已存在的产物不会重复导出。
+
+    参数:
+        model_name: 模型名称或本地路径
+        output_dir: 导出根目录，默认使用 settings.onnx_model_dir
+        quantize: 是否生成动态 int8 量化模型
+        opset: ONNX opset 版本
+
+    返回:
+        导出目录路径
+
+    异常:
+        RuntimeError: 缺少 torch / sentence-transformers / onnxruntime 依赖时抛出
+    """
+    settings = get_settings()
+    logger = setup_logging(settings.log_level)
+    export_dir = _onnx_export_dir(model_name, output_dir)
+    fp32_path = os.path.join(export_dir, _ONNX_FP32_FILE)
+    int8_path = os.path.join(export_dir, _ONNX_INT8_FILE)
+
+    if not os.path.exists(fp32_path):
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except Exception as e:
+            raise RuntimeError(
+                "导出 ONNX 需要 torch 与 sentence-transformers，请先安装。"
+            ) from e
+
+        os.makedirs(export_dir, exist_ok=True)
+        st_model = SentenceTransformer(model_name, device="cpu")
+        transformer = st_model[0].auto_model
+        tokenizer = st_model.tokenizer
+        pooling = _detect_pooling(st_model)
+
+        class _LastHiddenState(torch.nn.Module):
+            """仅输出 last_hidden_state，池化在推理侧完成。"""
+
+            def __init__(self, model):
+                super().__init__()
+                self.model = model
+
+            def forward(self, input_ids, attention_mask, token_type_ids):
+                return self.model(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    token_type_ids=token_type_ids,
+                ).last_hidden_state
+
+        sample = tokenizer(["导出样例 export sample"], return_tensors="pt")
+        token_type_ids = sample.get("token_type_ids")
+        if token_type_ids is None:
+            token_type_ids = torch.zeros_like(sample["input_ids"])
+        dynamic = {0: "batch", 1: "sequence"}
+        logger.info("导出 ONNX 模型: %s -> %s", model_name, fp32_path)
+        with torch.no_grad():
+            torch.onnx.export(
+                _LastHiddenState(transformer).eval(),
+                (sample["input_ids"], sample["attention_mask"], token_type_ids),
+                fp32_path,
+                input_names=["input_ids", "attention_mask", "token_type_ids"],
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    "input_ids": dynamic,
+                    "attention_mask": dynamic,
+                    "token_type_ids": dynamic,
+                    "last_hidden_state": dynamic,
+                },
+                opset_version=opset,
+                dynamo=False,
+            )
+        tokenizer.save_pretrained(export_dir)
+        with open(os.path.join(export_dir, _ONNX_META_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "model_name": model_name,
+                    "pooling": pooling,
+                    "max_seq_length": int(st_model.get_max_seq_length() or 512),
+                },
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+    if quantize and not os.path.exists(int8_path):
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+        except Exception as e:
+            raise RuntimeError("int8 量化需要 onnxruntime，请先安装。") from e
+        logger.info("动态 int8 量化: %s -> %s", fp32_path, int8_path)
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    return export_dir
+
+
+class ONNXEmbeddings(Embeddings):
+    """基于 ONNX Runtime（CPUExecutionProvider）的句向量模型，兼容 LangChain Embeddings 接口。
+
+    参数:
+        model_dir: export_onnx_model 导出的目录
+        quantized: 是否加载 int8 量化模型
+        normalize_embeddings: 是否对输出向量做 L2 归一化
+        batch_size: 单次推理的最大文本数
+        intra_op_num_threads: ONNX Runtime 线程数（None 表示由运行时决定）
+    """
+
+    def __init__(
+        self,
+        model_dir: str,
+        quantized: bool = True,
+        normalize_embeddings: bool = True,
+        batch_size: int = 32,
+        intra_op_num_threads: Optional[int] = None,
+    ) -> None:
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except Exception as e:
+            raise RuntimeError("ONNX 后端需要 onnxruntime 与 transformers，请先安装。") from e
+
+        meta_path = os.path.join(model_dir, _ONNX_META_FILE)
+        meta: Dict[str, Any] = {}
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+
+        self.model_dir = model_dir
+        self.quantized = quantized
+        self.normalize_embeddings = normalize_embeddings
+        self.batch_size = max(1, int(batch_size))
+        self.pooling = meta.get("pooling", "cls")
+        self.max_length = int(meta.get("max_seq_length", 512))
+
+        sess_options = ort.SessionOptions()
+        sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_num_threads:
+            sess_options.intra_op_num_threads = intra_op_num_threads
+        model_file = _ONNX_INT8_FILE if quantized else _ONNX_FP32_FILE
+        self._session = ort.InferenceSession(
+            os.path.join(model_dir, model_file),
+            sess_options=sess_options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        self._tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        """分批分词、推理并池化，返回向量列表。"""
+        import numpy as np
+
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = [t.replace("\n", " ") for t in texts[start:start + self.batch_size]]
+            enc = self._tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            feeds = {
+                "input_ids": enc["input_ids"].astype(np.int64),
+                "attention_mask": enc["attention_mask"].astype(np.int64),
+            }
+            if "token_type_ids" in self._input_names:
+                tt = enc.get("token_type_ids")
+                feeds["token_type_ids"] = (
+                    tt.astype(np.int64) if tt is not None else np.zeros_like(feeds["input_ids"])
+                )
+            hidden = self._session.run(None, feeds)[0]
+            if self.pooling == "mean":
+                mask = feeds["attention_mask"][..., None].astype(hidden.dtype)
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            else:
+                pooled = hidden[:, 0]
+            if self.normalize_embeddings:
+                norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+                pooled = pooled / np.clip(norms, 1e-12, None)
+            vectors.extend(pooled.astype(np.float32).tolist())
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """批量编码文档。"""
+        return self._encode(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        """编码单条查询。"""
+        return self._encode([text])[0]
+
+
+def get_onnx_embeddings(
+    model_name: Optional[str] = None,
+    normalize_embeddings: bool = True,
+    quantize: Optional[bool] = None,
+    warmup: bool = True,
+) -> ONNXEmbeddings:
+    """
+    返回 ONNX Runtime CPU 后端的句向量模型，首次调用时按需导出/量化并缓存实例。
+
+    参数:
+        model_name: 模型名称，默认使用 settings.hf_embedding_model
+        normalize_embeddings: 是否归一化向量
+        quantize: 是否使用 int8 量化模型，默认取 settings.onnx_quantize
+        warmup: 首次加载后是否执行一次预热编码
+
+    返回:
+        ONNXEmbeddings 实例
+
+    异常:
+        RuntimeError: 缺少导出或推理所需依赖时抛出
+    """
+    settings = get_settings()
+    name = model_name or settings.hf_embedding_model or "BAAI/bge-small-zh-v1.5"
+    use_int8 = settings.onnx_quantize if quantize is None else bool(quantize)
+    key = (name, "onnx-int8" if use_int8 else "onnx", bool(normalize_embeddings))
+
+    cached = _EMBEDDINGS_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    with _EMBEDDINGS_LOCK:
+        cached = _EMBEDDINGS_CACHE.get(key)
+        if cached is not None:
+            return cached
+        logger = setup_logging(settings.log_level)
+        export_dir = export_onnx_model(name, quantize=use_int8)
+        logger.info("加载 ONNX Embeddings 模型: %s (int8=%s)", export_dir, use_int8)
+        embeddings = ONNXEmbeddings(
+            export_dir, quantized=use_int8, normalize_embeddings=normalize_embeddings
+        )
+        if warmup:
+            embeddings.embed_query(_WARMUP_TEXT)
+        _EMBEDDINGS_CACHE[key] = embeddings
+        return embeddings
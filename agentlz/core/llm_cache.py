@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+"""
+LLM 响应持久化缓存（SQLite）
+
+Planner / Check / Mail 等 Agent 默认以 temperature=0 调用模型，相同输入的结果可复用。
+本模块实现 LangChain BaseCache 接口，作为 ChatOpenAI 的 cache 参数按 Agent 启用：
+- 键：sha256(消息序列 + 模型配置字符串)；后者由 LangChain 生成，包含模型名、温度、
+  绑定的 tools、tool_choice 与 response_format（结构化输出 schema）。
+- 消息中每次调用都会变化的字段（消息 id、response_metadata、usage_metadata）不参与键计算，
+  使多轮工具调用的后续轮次同样可以命中。
+- TTL 过期与按条数的 LRU 淘汰。
+- 命中/未命中/写入/淘汰计数。
+- 旁路：在 llm_cache_bypass() 上下文（或 HTTP 请求头 X-LLM-Cache-Bypass）中跳过读缓存，
+  强制请求模型并用新结果刷新缓存，便于调试。
+"""
+
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+from agentlz.config.settings import Settings
+
+
+_BYPASS: contextvars.ContextVar[bool] = contextvars.ContextVar("agentlz_llm_cache_bypass", default=False)
+
+# 消息序列化结果中不稳定、不应影响缓存键的字段
+_VOLATILE_MESSAGE_KEYS = ("id", "response_metadata", "usage_metadata")
+
+_CACHES: Dict[str, "SQLiteLLMCache"] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+@contextmanager
+def llm_cache_bypass(enabled: bool = True) -> Iterator[None]:
+    """在上下文内跳过 LLM 缓存读取（仍写入新结果）。"""
+    token = _BYPASS.set(enabled)
+    try:
+        yield
+    finally:
+        _BYPASS.reset(token)
+
+
+def set_llm_cache_bypass(enabled: bool) -> contextvars.Token:
+    """设置当前上下文的旁路标记，返回可用于 reset 的 token（供中间件使用）。"""
+    return _BYPASS.set(enabled)
+
+
+def reset_llm_cache_bypass(token: contextvars.Token) -> None:
+    """恢复 set_llm_cache_bypass 之前的旁路标记。"""
+    _BYPASS.reset(token)
+
+
+def _normalize_prompt(prompt: str) -> str:
+    """去掉消息中的易变字段并规范化 JSON，得到稳定的键材料。"""
+    try:
+        data = json.loads(prompt)
+    except (TypeError, ValueError):
+        return prompt
+    if isinstance(data, list):
+        for item in data:
+            kwargs = item.get("kwargs") if isinstance(item, dict) else None
+            if isinstance(kwargs, dict):
+                for key in _VOLATILE_MESSAGE_KEYS:
+                    kwargs.pop(key, None)
+    return json.dumps(data, sort_keys=True, ensure_ascii=False)
+
+
+class SQLiteLLMCache(BaseCache):
+    """基于 SQLite 的 LLM 响应缓存
+
+    参数:
+        database_path: SQLite 文件路径（父目录不存在时自动创建）。
+        ttl_seconds: 条目有效期（秒），<=0 表示不过期。
+        max_entries: 最大条目数，超出时按最近访问时间淘汰，<=0 表示不限。
+    """
+
+    def __init__(self, database_path: str, ttl_seconds: float = 86400.0, max_entries: int = 10000) -> None:
+        self.database_path = database_path
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = int(max_entries)
+        parent = os.path.dirname(os.path.abspath(database_path))
+        os.makedirs(parent, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(database_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " llm_string TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+        self._hits = 0
+        self._misses = 0
+        self._bypassed = 0
+        self._expired = 0
+        self._writes = 0
+        self._evictions = 0
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        """由消息序列与模型配置字符串计算缓存键。"""
+        material = _normalize_prompt(prompt) + "\x00" + llm_string
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """查询缓存；旁路、未命中或已过期时返回 None。"""
+        if _BYPASS.get():
+            with self._lock:
+                self._bypassed += 1
+            return None
+        key = self.make_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            if self.ttl_seconds > 0 and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._expired += 1
+                self._misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        try:
+            generations = loads(row[0])
+        except Exception:
+            # 反序列化失败（如依赖版本变化）视为未命中
+            with self._lock:
+                self._misses += 1
+            return None
+        with self._lock:
+            self._hits += 1
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """写入（或刷新）缓存条目，并在超出容量时淘汰最久未访问的条目。"""
+        key = self.make_key(prompt, llm_string)
+        payload = dumps(list(return_val))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, llm_string, response, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, llm_string, payload, now, now),
+            )
+            self._writes += 1
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """清理过期条目并执行 LRU 淘汰（调用方需持有 _lock）。"""
+        if self.ttl_seconds > 0:
+            cur = self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._expired += max(0, cur.rowcount)
+        if self.max_entries > 0:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN"
+                    " (SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self._evictions += overflow
+
+    def clear(self, **kwargs: Any) -> None:
+        """清空缓存条目（统计计数保留）。"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中率等统计快照。"""
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+            lookups = self._hits + self._misses
+            return {
+                "path": self.database_path,
+                "entries": entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "bypassed": self._bypassed,
+                "expired": self._expired,
+                "writes": self._writes,
+                "evictions": self._evictions,
+                "ttl_seconds": self.ttl_seconds,
+                "max_entries": self.max_entries,
+            }
+
+    def close(self) -> None:
+        """关闭数据库连接。"""
+        with self._lock:
+            self._conn.close()
+
+
+def _enabled_agents(settings: Settings) -> Sequence[str]:
+    return [a.strip().lower() for a in (settings.llm_cache_agents or "").split(",") if a.strip()]
+
+
+def get_llm_cache(settings: Settings, agent_name: Optional[str] = None) -> Optional[SQLiteLLMCache]:
+    """返回指定 Agent 应使用的 LLM 缓存；未启用时返回 None。
+
+    仅在 LLM_CACHE_ENABLED 为真、agent_name 位于 LLM_CACHE_AGENTS 列表（"*" 表示全部）
+    且 model_temperature 为 0（确定性输出）时启用。同一数据库文件在进程内共享一个实例。
+
+    参数:
+        settings: 应用配置对象
+        agent_name: Agent 名称，如 "planner"、"check"、"mail"
+
+    返回:
+        SQLiteLLMCache 或 None
+    """
+    if not settings.llm_cache_enabled or not agent_name:
+        return None
+    agents = _enabled_agents(settings)
+    if "*" not in agents and agent_name.lower() not in agents:
+        return None
+    if settings.model_temperature != 0:
+        return None
+    path = os.path.abspath(settings.llm_cache_path)
+    cache = _CACHES.get(path)
+    if cache is None:
+        with _CACHES_LOCK:
+            cache = _CACHES.get(path)
+            if cache is None:
+                cache = SQLiteLLMCache(
+                    path,
+                    ttl_seconds=settings.llm_cache_ttl_seconds,
+                    max_entries=settings.llm_cache_max_entries,
+                )
+                _CACHES[path] = cache
+    return cache
+
+
+def get_llm_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """返回进程内所有 LLM 缓存实例的统计，按数据库路径分组。"""
+    with _CACHES_LOCK:
+        caches = list(_CACHES.items())
+    return {path: cache.stats() for path, cache in caches}
+
+
+def close_llm_caches() -> None:
+    """关闭并移除所有缓存实例（测试或配置变更时使用）。"""
+    with _CACHES_LOCK:
+        for cache in _CACHES.values():
+            try:
+                cache.close()
+            except Exception:
+                pass
+        _CACHES.clear()
@@ -0,0 +1,587 @@
+from __future__ import annotations
+
+"""
+LLM 调用调度器（客户端限流 + 自适应并发）
+
+get_model 为每个端点安装同一个调度器（httpx Transport 包装），进程内 Planner / Executor /
+Check / Mail 等所有 Agent 的模型调用都经过它：
+- 令牌桶：按每分钟请求数（RPM）与每分钟 token 数（TPM）限流；token 数按请求体估算，
+  非流式响应返回后按 usage.total_tokens 校正。
+- AIMD 并发上限：成功时加性增长，遇到 429 / 5xx 时乘性减半；流式补全的名额在响应体读完或关闭时才归还，
+  生成期间仍计入并发。
+- 重试：429 / 5xx / 连接错误时指数退避（full jitter），优先遵循 Retry-After / retry-after-ms。
+  重试耗尽后返回最后一次响应，由 openai SDK 抛出对应异常（ChatOpenAI 侧 max_retries=0，避免重复重试）。
+- 截止时间：上下文中设置了请求截止时间（agentlz.core.deadline）时，单次请求的 httpx 超时不超过剩余时间，
+  退避等待会越过截止时间时不再重试。
+"""
+
+import asyncio
+import email.utils
+import json
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from agentlz.config.settings import Settings
+from agentlz.core.deadline import DeadlineExceeded, remaining
+
+
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+_SCHEDULERS: Dict[str, "LLMScheduler"] = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+class TokenBucket:
+    """线程安全的令牌桶
+
+    参数:
+        rate_per_minute: 每分钟补充的令牌数；<=0 表示不限流。
+        capacity: 桶容量（允许的突发量），默认等于 rate_per_minute。
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None) -> None:
+        self.rate_per_minute = float(rate_per_minute)
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate_per_minute > 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_minute / 60.0)
+            self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """预留 amount 个令牌，返回调用方需要等待的秒数（令牌允许透支，等待期间补足）。"""
+        if not self.enabled:
+            return 0.0
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens * 60.0 / self.rate_per_minute
+
+    def adjust(self, delta: float) -> None:
+        """按实际消耗校正：delta>0 追加扣减，delta<0 退还。"""
+        if not self.enabled or not delta:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class AIMDLimiter:
+    """AIMD 自适应并发上限（同步线程与多个事件循环共享）
+
+    参数:
+        initial: 初始并发上限。
+        minimum / maximum: 上限的取值范围。
+        increase: 每次成功后增加的量（按当前上限摊分，约每轮增加 increase）。
+        decrease_factor: 过载（429/5xx）时的乘性缩减系数。
+    """
+
+    def __init__(
+        self,
+        initial: int = 8,
+        minimum: int = 1,
+        maximum: int = 64,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5,
+    ) -> None:
+        self.minimum = max(1, int(minimum))
+        self.maximum = max(self.minimum, int(maximum))
+        self.increase = float(increase)
+        self.decrease_factor = float(decrease_factor)
+        self._limit = float(min(self.maximum, max(self.minimum, int(initial))))
+        self._inflight = 0
+        self._cond = threading.Condition()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._last_decrease = 0.0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self._inflight < int(self._limit):
+                self._inflight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        """阻塞直到获得一个并发名额（同步调用方）。"""
+        with self._cond:
+            while self._inflight >= int(self._limit):
+                self._cond.wait()
+            self._inflight += 1
+
+    async def aacquire(self) -> None:
+        """等待直到获得一个并发名额（异步调用方，不阻塞事件循环）。"""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._inflight < int(self._limit):
+                    self._inflight += 1
+                    return
+                fut = loop.create_future()
+                self._async_waiters.append((loop, fut))
+            try:
+                await fut
+            finally:
+                with self._cond:
+                    try:
+                        self._async_waiters.remove((loop, fut))
+                    except ValueError:
+                        pass
+
+    def release(self, overloaded: Optional[bool] = None) -> None:
+        """归还名额；overloaded 为 True/False 时分别执行乘性减/加性增，None 表示不调整。"""
+        with self._cond:
+            self._inflight = max(0, self._inflight - 1)
+            if overloaded is True:
+                self._on_overload()
+            elif overloaded is False:
+                self._limit = min(float(self.maximum), self._limit + self.increase / max(1.0, self._limit))
+            self._cond.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, fut in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, fut)
+            except RuntimeError:
+                pass  # 事件循环已关闭
+
+    def _on_overload(self) -> None:
+        # 同一波过载（并发请求几乎同时收到 429）只减半一次
+        now = time.monotonic()
+        if now - self._last_decrease < 1.0:
+            return
+        self._last_decrease = now
+        self._limit = max(float(self.minimum), self._limit * self.decrease_factor)
+
+
+def _wake(fut: asyncio.Future) -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+def parse_retry_after(headers: httpx.Headers) -> Optional[float]:
+    """解析 retry-after-ms / Retry-After（秒或 HTTP 日期），返回秒数。"""
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return max(0.0, float(ms) / 1000.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        dt = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, dt.timestamp() - time.time())
+
+
+def estimate_tokens(request: httpx.Request) -> int:
+    """估算一次请求消耗的 token 数：请求体字符数 / 4 + 预期输出上限。"""
+    try:
+        body = request.content
+    except httpx.RequestNotRead:
+        return 1
+    if not body:
+        return 1
+    prompt_tokens = len(body) // 4
+    completion = 256
+    try:
+        payload = json.loads(body)
+        completion = int(payload.get("max_completion_tokens") or payload.get("max_tokens") or completion)
+    except Exception:
+        pass
+    return max(1, prompt_tokens + completion)
+
+
+def _is_streaming(request: httpx.Request) -> bool:
+    try:
+        return b'"stream": true' in request.content or b'"stream":true' in request.content
+    except httpx.RequestNotRead:
+        return True
+
+
+def _usage_tokens(response: httpx.Response) -> Optional[int]:
+    try:
+        usage = response.json().get("usage") or {}
+        total = usage.get("total_tokens")
+        return int(total) if total is not None else None
+    except Exception:
+        return None
+
+
+def _apply_deadline(request: httpx.Request) -> None:
+    """把 httpx 超时限制在截止时间之内；截止时间已过时不再发送。"""
+    left = remaining()
+    if left is None:
+        return
+    if left <= 0:
+        raise DeadlineExceeded("LLM 请求未发送：已超过截止时间")
+    timeout = dict(request.extensions.get("timeout") or {})
+    for name in ("connect", "read", "write", "pool"):
+        value = timeout.get(name)
+        timeout[name] = left if value is None else min(value, left)
+    request.extensions["timeout"] = timeout
+
+
+def _past_deadline(wait: float) -> bool:
+    left = remaining()
+    return left is not None and wait >= left
+
+
+class _SlotReleasingStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """流式响应的响应体包装：生成在读取响应体期间进行，读完或关闭时才归还并发名额。"""
+
+    def __init__(self, stream: Any, limiter: AIMDLimiter) -> None:
+        self._stream = stream
+        self._limiter = limiter
+        self._done = False
+        self._released = False
+        self._lock = threading.Lock()
+
+    def _release(self, overloaded: Optional[bool]) -> None:
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._limiter.release(overloaded)
+
+    def __iter__(self) -> Iterator[bytes]:
+        try:
+            for chunk in self._stream:
+                yield chunk
+        except BaseException:
+            self._release(None)
+            raise
+        self._done = True
+        self._release(False)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in self._stream:
+                yield chunk
+        except BaseException:
+            self._release(None)
+            raise
+        self._done = True
+        self._release(False)
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            # 未读完即关闭（调用方中止）不调整并发上限
+            self._release(False if self._done else None)
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release(False if self._done else None)
+
+
+class LLMScheduler:
+    """单个 LLM 端点的共享调度器
+
+    参数:
+        rpm / tpm: 每分钟请求数与 token 数上限，<=0 表示不限。
+        limiter: AIMD 并发上限。
+        max_retries: 可重试错误的最大重试次数。
+        base_delay / max_delay: 指数退避的基数与上限（秒）。
+    """
+
+    def __init__(
+        self,
+        rpm: float = 0,
+        tpm: float = 0,
+        limiter: Optional[AIMDLimiter] = None,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ) -> None:
+        self.requests_bucket = TokenBucket(rpm)
+        self.tokens_bucket = TokenBucket(tpm)
+        self.limiter = limiter or AIMDLimiter()
+        self.max_retries = max(0, int(max_retries))
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self._lock = threading.Lock()
+        self._counters = {
+            "requests": 0,
+            "attempts": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "server_errors": 0,
+            "connect_errors": 0,
+            "failed": 0,
+            "deadline_stops": 0,
+            "throttle_wait_s": 0.0,
+            "backoff_wait_s": 0.0,
+        }
+
+    def _count(self, name: str, delta: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += delta
+
+    def _admission_delay(self, request: httpx.Request) -> Tuple[float, int]:
+        """预留 RPM/TPM 令牌，返回 (等待秒数, 预估 token 数)。"""
+        estimate = estimate_tokens(request) if self.tokens_bucket.enabled else 0
+        delay = max(self.requests_bucket.reserve(1), self.tokens_bucket.reserve(estimate))
+        if delay > 0:
+            self._count("throttle_wait_s", delay)
+        return delay, estimate
+
+    def backoff_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """第 attempt 次重试前的等待时间：优先 Retry-After，否则指数退避 + full jitter。"""
+        if response is not None:
+            retry_after = parse_retry_after(response.headers)
+            if retry_after is not None:
+                return min(self.max_delay, retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _classify(self, response: httpx.Response) -> Optional[bool]:
+        """返回 True 表示过载（需退避重试），False 表示成功，None 表示普通错误（不重试）。"""
+        if response.status_code in RETRYABLE_STATUS:
+            self._count("rate_limited" if response.status_code == 429 else "server_errors")
+            return True
+        return False if response.status_code < 400 else None
+
+    def _settle_tokens(self, request: httpx.Request, response: httpx.Response, estimate: int) -> None:
+        if self.tokens_bucket.enabled and response.status_code == 200 and not _is_streaming(request):
+            actual = _usage_tokens(response)
+            if actual is not None:
+                self.tokens_bucket.adjust(actual - estimate)
+
+    def send(self, transport: httpx.BaseTransport, request: httpx.Request) -> httpx.Response:
+        """同步发送：限流、并发控制与重试。"""
+        self._count("requests")
+        attempt = 0
+        error: Optional[BaseException] = None
+        while True:
+            delay, estimate = self._admission_delay(request)
+            if delay > 0:
+                time.sleep(delay)
+            _apply_deadline(request)
+            self.limiter.acquire()
+            overloaded: Optional[bool] = None
+            deferred = False
+            try:
+                self._count("attempts")
+                try:
+                    response = transport.handle_request(request)
+                except (httpx.ConnectError, httpx.RemoteProtocolError, httpx.ReadError) as e:
+                    overloaded = True
+                    self._count("connect_errors")
+                    if attempt >= self.max_retries:
+                        self._count("failed")
+                        raise
+                    response = None
+                    error = e
+                else:
+                    overloaded = self._classify(response)
+                    if overloaded is not True or attempt >= self.max_retries:
+                        if overloaded is not True and self.tokens_bucket.enabled and not _is_streaming(request):
+                            response.read()
+                            self._settle_tokens(request, response, estimate)
+                        if overloaded is True:
+                            self._count("failed")
+                        elif overloaded is False and _is_streaming(request):
+                            # 流式补全的生成在读取响应体期间进行：名额在响应体读完或关闭时归还
+                            response.stream = _SlotReleasingStream(response.stream, self.limiter)
+                            deferred = True
+                        return response
+                    response.read()
+                    response.close()
+            finally:
+                if not deferred:
+                    self.limiter.release(overloaded)
+            wait = self.backoff_delay(attempt, response)
+            if _past_deadline(wait):
+                self._count("deadline_stops")
+                self._count("failed")
+                if response is None:
+                    raise error
+                return response
+            self._count("retries")
+            self._count("backoff_wait_s", wait)
+            time.sleep(wait)
+            attempt += 1
+
+    async def asend(self, transport: httpx.AsyncBaseTransport, request: httpx.Request) -> httpx.Response:
+        """异步发送：限流、并发控制与重试（等待不阻塞事件循环）。"""
+        self._count("requests")
+        attempt = 0
+        error: Optional[BaseException] = None
+        while True:
+            delay, estimate = self._admission_delay(request)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            _apply_deadline(request)
+            await self.limiter.aacquire()
+            overloaded: Optional[bool] = None
+            deferred = False
+            try:
+                self._count("attempts")
+                try:
+                    response = await transport.handle_async_request(request)
+                except (httpx.ConnectError, httpx.RemoteProtocolError, httpx.ReadError) as e:
+                    overloaded = True
+                    self._count("connect_errors")
+                    if attempt >= self.max_retries:
+                        self._count("failed")
+                        raise
+                    response = None
+                    error = e
+                else:
+                    overloaded = self._classify(response)
+                    if overloaded is not True or attempt >= self.max_retries:
+                        if overloaded is not True and self.tokens_bucket.enabled and not _is_streaming(request):
+                            await response.aread()
+                            self._settle_tokens(request, response, estimate)
+                        if overloaded is True:
+                            self._count("failed")
+                        elif overloaded is False and _is_streaming(request):
+                            # 流式补全的生成在读取响应体期间进行：名额在响应体读完或关闭时归还
+                            response.stream = _SlotReleasingStream(response.stream, self.limiter)
+                            deferred = True
+                        return response
+                    await response.aread()
+                    await response.aclose()
+            finally:
+                if not deferred:
+                    self.limiter.release(overloaded)
+            wait = self.backoff_delay(attempt, response)
+            if _past_deadline(wait):
+                self._count("deadline_stops")
+                self._count("failed")
+                if response is None:
+                    raise error
+                return response
+            self._count("retries")
+            self._count("backoff_wait_s", wait)
+            await asyncio.sleep(wait)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """返回调度统计快照。"""
+        with self._lock:
+            data: Dict[str, Any] = dict(self._counters)
+        data["throttle_wait_s"] = round(data["throttle_wait_s"], 3)
+        data["backoff_wait_s"] = round(data["backoff_wait_s"], 3)
+        data["concurrency_limit"] = self.limiter.limit
+        data["inflight"] = self.limiter.inflight
+        data["rpm_available"] = round(self.requests_bucket.available(), 2) if self.requests_bucket.enabled else None
+        data["tpm_available"] = round(self.tokens_bucket.available(), 2) if self.tokens_bucket.enabled else None
+        return data
+
+
+class ScheduledTransport(httpx.BaseTransport):
+    """经 LLMScheduler 调度的同步 httpx Transport。"""
+
+    def __init__(self, wrapped: httpx.BaseTransport, scheduler: LLMScheduler) -> None:
+        self.wrapped = wrapped
+        self.scheduler = scheduler
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self.scheduler.send(self.wrapped, request)
+
+    def close(self) -> None:
+        self.wrapped.close()
+
+
+class AsyncScheduledTransport(httpx.AsyncBaseTransport):
+    """经 LLMScheduler 调度的异步 httpx Transport。"""
+
+    def __init__(self, wrapped: httpx.AsyncBaseTransport, scheduler: LLMScheduler) -> None:
+        self.wrapped = wrapped
+        self.scheduler = scheduler
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.scheduler.asend(self.wrapped, request)
+
+    async def aclose(self) -> None:
+        await self.wrapped.aclose()
+
+
+def get_llm_scheduler(endpoint: str, settings: Settings) -> Optional[LLMScheduler]:
+    """返回端点共享的调度器；LLM_SCHEDULER_ENABLED 关闭时返回 None。"""
+    if not settings.llm_scheduler_enabled:
+        return None
+    scheduler = _SCHEDULERS.get(endpoint)
+    if scheduler is None:
+        with _SCHEDULERS_LOCK:
+            scheduler = _SCHEDULERS.get(endpoint)
+            if scheduler is None:
+                scheduler = LLMScheduler(
+                    rpm=settings.llm_rpm_limit,
+                    tpm=settings.llm_tpm_limit,
+                    limiter=AIMDLimiter(
+                        initial=settings.llm_concurrency_initial,
+                        minimum=settings.llm_concurrency_min,
+                        maximum=settings.llm_concurrency_max,
+                    ),
+                    max_retries=settings.llm_max_retries,
+                    base_delay=settings.llm_retry_base_delay,
+                    max_delay=settings.llm_retry_max_delay,
+                )
+                _SCHEDULERS[endpoint] = scheduler
+    return scheduler
+
+
+def get_llm_scheduler_stats() -> Dict[str, Dict[str, Any]]:
+    """返回所有端点调度器的统计，按端点分组。"""
+    with _SCHEDULERS_LOCK:
+        items = list(_SCHEDULERS.items())
+    return {endpoint: s.stats() for endpoint, s in items}
+
+
+def clear_llm_schedulers() -> None:
+    """移除所有调度器（配置变更或测试时使用）。"""
+    with _SCHEDULERS_LOCK:
+        _SCHEDULERS.clear()
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """判断异常（含异常链）是否由模型服务限流（HTTP 429）引起。"""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if getattr(exc, "status_code", None) == 429 or type(exc).__name__ == "RateLimitError":
+            return True
+        response = getattr(exc, "response", None)
+        if getattr(response, "status_code", None) == 429:
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
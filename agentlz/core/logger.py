@@ -1,11 +1,158 @@
+"""
+统一日志入口
+
+进程内只配置一次：所有日志记录经 QueueHandler 投递到内存队列，由后台 QueueListener
+线程负责格式化与输出，请求路径上不发生控制台/文件 I/O。
+
+配置项（见 agentlz.config.settings）：
+- LOG_LEVEL：根日志级别
+- LOG_FORMAT：text（默认）或 json（结构化输出，附带 request_id / tenant_id 等 extra 字段）
+- LOG_MODULE_LEVELS：按模块覆盖级别，例如 "agentlz.agents.planner=DEBUG,httpx=WARNING"
+
+大体量参数（如数据库查询结果）应使用 %s 占位符延迟格式化，或在
+logger.isEnabledFor(...) 为真时才构造，避免级别关闭时白白付出格式化开销。
+"""
+
+import atexit
+import copy
+import json
 import logging
-from typing import Optional
+import logging.handlers
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+_TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+# LogRecord 自带属性，JSON 输出时其余属性视为 extra 字段
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_LOCK = threading.Lock()
+_LISTENER: Optional[logging.handlers.QueueListener] = None
+_QUEUE_HANDLER: Optional["_QueueHandler"] = None
+_LEVEL: Optional[str] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """将日志记录格式化为单行 JSON。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """仅在调用线程合并消息参数，异常堆栈保留在 exc_text 中交由监听线程的格式化器输出。"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_EXC_FORMATTER = logging.Formatter()
+
+
+def _parse_module_levels(spec: Optional[str]) -> Dict[str, int]:
+    """解析 "a.b=DEBUG,c=WARNING" 形式的按模块级别配置。"""
+    levels: Dict[str, int] = {}
+    for item in (spec or "").split(","):
+        name, sep, level = item.partition("=")
+        if not sep or not name.strip():
+            continue
+        value = getattr(logging, level.strip().upper(), None)
+        if isinstance(value, int):
+            levels[name.strip()] = value
+    return levels
+
+
+def _to_level(level: Optional[str]) -> int:
+    return getattr(logging, (level or "INFO").upper(), logging.INFO)
+
+
+def _configure(level: Optional[str]) -> None:
+    """首次调用时安装 QueueHandler 与后台监听线程（调用方需持有 _LOCK）。"""
+    global _LISTENER, _QUEUE_HANDLER, _LEVEL
+    # 延迟导入，避免 settings 与 logger 之间的循环依赖
+    from agentlz.config.settings import get_settings
+
+    log_format = "text"
+    module_levels: Dict[str, int] = {}
+    try:
+        settings = get_settings()
+        log_format = (settings.log_format or "text").lower()
+        module_levels = _parse_module_levels(settings.log_module_levels)
+    except Exception:
+        # 配置不完整时仍需可用的日志
+        pass
+
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(_TEXT_FORMAT))
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _QUEUE_HANDLER = _QueueHandler(log_queue)
+    _LISTENER = logging.handlers.QueueListener(log_queue, console, respect_handler_level=True)
+    _LISTENER.start()
+    atexit.register(shutdown_logging)
+
+    root = logging.getLogger()
+    root.addHandler(_QUEUE_HANDLER)
+    root.setLevel(_to_level(level))
+    for name, value in module_levels.items():
+        logging.getLogger(name).setLevel(value)
+    _LEVEL = level
 
 
 def setup_logging(level: Optional[str] = "INFO") -> logging.Logger:
-    """Configure basic logging and return a package logger."""
-    logging.basicConfig(
-        level=getattr(logging, (level or "INFO").upper(), logging.INFO),
-        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
-    )
-    return logging.getLogger("agentlz")
\ No newline at end of file
+    """Configure logging once (queue-based, non-blocking) and return the package logger.
+
+    重复调用开销极低：已配置时仅在级别变化时调整根日志级别。
+    """
+    global _LEVEL
+    if _LISTENER is None:
+        with _LOCK:
+            if _LISTENER is None:
+                _configure(level)
+    elif level != _LEVEL:
+        with _LOCK:
+            logging.getLogger().setLevel(_to_level(level))
+            _LEVEL = level
+    return logging.getLogger("agentlz")
+
+
+def shutdown_logging() -> None:
+    """停止后台监听线程并刷新队列中剩余的日志（进程退出时自动调用）。"""
+    global _LISTENER, _QUEUE_HANDLER, _LEVEL
+    with _LOCK:
+        if _LISTENER is not None:
+            try:
+                _LISTENER.stop()
+            except Exception:
+                pass
+        if _QUEUE_HANDLER is not None:
+            logging.getLogger().removeHandler(_QUEUE_HANDLER)
+        _LISTENER = None
+        _QUEUE_HANDLER = None
+        _LEVEL = None
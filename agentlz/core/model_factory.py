@@ -1,41 +1,288 @@
+import asyncio
+import hashlib
+import importlib.util
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
 from langchain_openai import ChatOpenAI
 
 from agentlz.config.settings import Settings
+from .llm_cache import get_llm_cache
+from .llm_scheduler import AsyncScheduledTransport, ScheduledTransport, clear_llm_schedulers, get_llm_scheduler, get_llm_scheduler_stats
 from .logger import setup_logging
 
 
-def get_model(settings: Settings, streaming: bool = False) -> ChatOpenAI:
+# 模型实例缓存：key 为 (model, base_url, api_key 摘要, temperature, streaming, 响应缓存路径)
+_MODEL_CACHE: Dict[Tuple[Any, ...], ChatOpenAI] = {}
+# 每个端点共享一个同步连接池与一个异步客户端；异步客户端的连接池按事件循环隔离（连接不能跨循环复用），
+# 在某个事件循环中首次发送请求时才创建
+_SYNC_CLIENTS: Dict[str, httpx.Client] = {}
+_ASYNC_CLIENTS: Dict[str, httpx.AsyncClient] = {}
+_ASYNC_TRANSPORTS: Dict[Tuple[str, int], httpx.AsyncBaseTransport] = {}
+_POOL_STATS: Dict[str, Dict[str, int]] = {}
+_WATCHED_LOOPS: Dict[int, Any] = {}
+_LOCK = threading.RLock()
+
+_OPENAI_ENDPOINT = "https://api.openai.com/v1"
+
+
+def _http2_available() -> bool:
+    """HTTP/2 依赖 h2 包，未安装时自动回退 HTTP/1.1 keep-alive。"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def _running_loop_id() -> int:
+    """返回当前运行中事件循环的 id（须在事件循环中调用）。"""
+    loop = asyncio.get_running_loop()
+    loop_id = id(loop)
+    with _LOCK:
+        if loop_id not in _WATCHED_LOOPS:
+            # 事件循环被回收时清理其专属的异步连接池，避免 id 复用导致误命中
+            _WATCHED_LOOPS[loop_id] = weakref.finalize(loop, _drop_loop, loop_id)
+    return loop_id
+
+
+def _drop_loop(loop_id: int) -> None:
+    """移除与已回收事件循环绑定的异步连接池。"""
+    with _LOCK:
+        _WATCHED_LOOPS.pop(loop_id, None)
+        for key in [k for k in _ASYNC_TRANSPORTS if k[1] == loop_id]:
+            _ASYNC_TRANSPORTS.pop(key, None)
+
+
+def _endpoint_stats(endpoint: str) -> Dict[str, int]:
+    return _POOL_STATS.setdefault(
+        endpoint,
+        {"model_hits": 0, "model_misses": 0, "requests": 0, "responses": 0},
+    )
+
+
+def _limits(settings: Settings) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.llm_pool_max_connections,
+        max_keepalive_connections=settings.llm_pool_max_keepalive,
+        keepalive_expiry=settings.llm_pool_keepalive_expiry,
+    )
+
+
+def _get_sync_client(endpoint: str, settings: Settings) -> httpx.Client:
+    """返回端点共享的同步 HTTP 客户端（调用方需持有 _LOCK）。"""
+    client = _SYNC_CLIENTS.get(endpoint)
+    if client is None:
+        stats = _endpoint_stats(endpoint)
+
+        def _on_request(_request: httpx.Request) -> None:
+            stats["requests"] += 1
+
+        def _on_response(_response: httpx.Response) -> None:
+            stats["responses"] += 1
+
+        transport: httpx.BaseTransport = httpx.HTTPTransport(
+            limits=_limits(settings),
+            http2=settings.llm_http2 and _http2_available(),
+        )
+        scheduler = get_llm_scheduler(endpoint, settings)
+        if scheduler is not None:
+            transport = ScheduledTransport(transport, scheduler)
+        client = httpx.Client(
+            transport=transport,
+            timeout=settings.llm_request_timeout,
+            event_hooks={"request": [_on_request], "response": [_on_response]},
+        )
+        _SYNC_CLIENTS[endpoint] = client
+    return client
+
+
+def _get_async_transport(endpoint: str, loop_id: int, settings: Settings) -> httpx.AsyncBaseTransport:
+    """返回端点在指定事件循环内的异步连接池（调用方需持有 _LOCK）。"""
+    key = (endpoint, loop_id)
+    transport = _ASYNC_TRANSPORTS.get(key)
+    if transport is None:
+        transport = httpx.AsyncHTTPTransport(
+            limits=_limits(settings),
+            http2=settings.llm_http2 and _http2_available(),
+        )
+        scheduler = get_llm_scheduler(endpoint, settings)
+        if scheduler is not None:
+            transport = AsyncScheduledTransport(transport, scheduler)
+        _ASYNC_TRANSPORTS[key] = transport
+    return transport
+
+
+class _LoopLocalTransport(httpx.AsyncBaseTransport):
+    """按当前事件循环分派请求的异步传输：每个事件循环首次发送请求时才创建其专属连接池。
+
+    模型实例可在同步代码中创建并在多个事件循环（如多次 asyncio.run）中使用，连接不会跨循环复用。
+    """
+
+    def __init__(self, endpoint: str, settings: Settings) -> None:
+        self.endpoint = endpoint
+        self.settings = settings
+
+    def _current(self) -> httpx.AsyncBaseTransport:
+        loop_id = _running_loop_id()
+        with _LOCK:
+            return _get_async_transport(self.endpoint, loop_id, self.settings)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._current().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        """关闭当前事件循环的连接池（其他事件循环的连接池在循环回收时清理）。"""
+        loop_id = _running_loop_id()
+        with _LOCK:
+            transport = _ASYNC_TRANSPORTS.pop((self.endpoint, loop_id), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+def _get_async_client(endpoint: str, settings: Settings) -> httpx.AsyncClient:
+    """返回端点共享的异步 HTTP 客户端（调用方需持有 _LOCK）；连接池按事件循环延迟创建。"""
+    client = _ASYNC_CLIENTS.get(endpoint)
+    if client is None:
+        stats = _endpoint_stats(endpoint)
+
+        async def _on_request(_request: httpx.Request) -> None:
+            stats["requests"] += 1
+
+        async def _on_response(_response: httpx.Response) -> None:
+            stats["responses"] += 1
+
+        client = httpx.AsyncClient(
+            transport=_LoopLocalTransport(endpoint, settings),
+            timeout=settings.llm_request_timeout,
+            event_hooks={"request": [_on_request], "response": [_on_response]},
+        )
+        _ASYNC_CLIENTS[endpoint] = client
+    return client
+
+
+def get_model(
+    settings: Settings,
+    streaming: bool = False,
+    agent_name: Optional[str] = None,
+) -> Optional[ChatOpenAI]:
     """Return a configured chat model instance.
 
+    相同配置（model、base_url、api_key、temperature、streaming）复用同一实例，
+    同一端点的所有实例共享一个 keep-alive（可用时 HTTP/2）连接池，避免每次调用重新握手；
+    连接池外层挂载端点共享的调度器（RPM/TPM 限流、AIMD 并发上限与退避重试，见 llm_scheduler）。
+    若 agent_name 在 LLM_CACHE_AGENTS 中启用了响应缓存，返回的实例带有 SQLite 响应缓存。
+
     参数:
         settings: 应用配置对象
         streaming: 是否启用流式输出，默认为False
-        
+        agent_name: 调用方 Agent 名称（如 "planner"），用于按 Agent 启用响应缓存
+
     返回值:
-        ChatOpenAI: 配置好的聊天模型实例
-        
+        ChatOpenAI: 配置好的聊天模型实例（缓存共享，调用方不应修改其属性）；未配置密钥时返回 None
+
     异常:
         无显式异常抛出，但会记录警告日志
     """
     logger = setup_logging(settings.log_level)
-    
-    common_kwargs = {
-        "model": settings.model_name,
-        "temperature": settings.model_temperature,
-        "streaming": streaming,
-    }
-    
+
     if settings.chatopenai_api_key and settings.chatopenai_base_url:
-        return ChatOpenAI(
-            **common_kwargs,
-            api_key=settings.chatopenai_api_key,
-            base_url=settings.chatopenai_base_url,
-        )
+        api_key = settings.chatopenai_api_key
+        base_url = settings.chatopenai_base_url
     elif settings.openai_api_key:
-        return ChatOpenAI(
-            **common_kwargs,
-            api_key=settings.openai_api_key,
-        )
+        api_key = settings.openai_api_key
+        base_url = None
     else:
         logger.warning("No valid API key found for model configuration. [没有找到有效的API密钥]")
         return None
+
+    endpoint = (base_url or _OPENAI_ENDPOINT).rstrip("/")
+    llm_cache = get_llm_cache(settings, agent_name)
+    key = (
+        settings.model_name,
+        endpoint,
+        hashlib.sha256(api_key.encode("utf-8")).hexdigest(),
+        settings.model_temperature,
+        streaming,
+        llm_cache.database_path if llm_cache is not None else None,
+    )
+
+    with _LOCK:
+        stats = _endpoint_stats(endpoint)
+        model = _MODEL_CACHE.get(key)
+        if model is not None:
+            stats["model_hits"] += 1
+            return model
+        stats["model_misses"] += 1
+
+        common_kwargs = {
+            "model": settings.model_name,
+            "temperature": settings.model_temperature,
+            "streaming": streaming,
+            "api_key": api_key,
+            "http_client": _get_sync_client(endpoint, settings),
+            "http_async_client": _get_async_client(endpoint, settings),
+        }
+        if base_url:
+            common_kwargs["base_url"] = base_url
+        if llm_cache is not None:
+            common_kwargs["cache"] = llm_cache
+        if settings.llm_scheduler_enabled:
+            # 重试由共享调度器统一负责（遵循 Retry-After），SDK 侧不再重复重试
+            common_kwargs["max_retries"] = 0
+        model = ChatOpenAI(**common_kwargs)
+        _MODEL_CACHE[key] = model
+        return model
+
+
+def _pool_connections(client: Any) -> Dict[str, int]:
+    """尽力读取 httpx 连接池中的连接数（依赖 httpcore 内部结构，失败时返回空）。"""
+    try:
+        transport = client._transport
+        transport = getattr(transport, "wrapped", transport)
+        conns = list(transport._pool.connections)
+    except Exception:
+        return {}
+    idle = 0
+    for c in conns:
+        try:
+            idle += 1 if c.is_idle() else 0
+        except Exception:
+            pass
+    return {"connections": len(conns), "idle": idle, "active": len(conns) - idle}
+
+
+def get_model_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """返回每个 LLM 端点的连接池与模型缓存统计。
+
+    返回:
+        {endpoint: {model_hits, model_misses, requests, responses, cached_models,
+                    http2, sync_pool: {...}, async_pools: int, scheduler: {...}}}
+    """
+    scheduler_stats = get_llm_scheduler_stats()
+    with _LOCK:
+        result: Dict[str, Dict[str, Any]] = {}
+        for endpoint, stats in _POOL_STATS.items():
+            entry: Dict[str, Any] = dict(stats)
+            entry["cached_models"] = sum(1 for k in _MODEL_CACHE if k[1] == endpoint)
+            entry["http2"] = _http2_available()
+            sync_client = _SYNC_CLIENTS.get(endpoint)
+            entry["sync_pool"] = _pool_connections(sync_client) if sync_client else {}
+            entry["async_pools"] = sum(1 for k in _ASYNC_TRANSPORTS if k[0] == endpoint)
+            entry["scheduler"] = scheduler_stats.get(endpoint, {})
+            result[endpoint] = entry
+        return result
+
+
+def clear_model_cache() -> None:
+    """清空模型实例、连接池与调度器缓存（配置变更或测试时使用）。"""
+    with _LOCK:
+        clear_llm_schedulers()
+        for client in _SYNC_CLIENTS.values():
+            try:
+                client.close()
+            except Exception:
+                pass
+        _SYNC_CLIENTS.clear()
+        _ASYNC_CLIENTS.clear()
+        _ASYNC_TRANSPORTS.clear()
+        _MODEL_CACHE.clear()
+        _POOL_STATS.clear()
@@ -0,0 +1,26 @@
+"""
+统计小工具
+
+各服务的 stats() 快照（调度等待、合批延迟、span 耗时）与基准脚本共用同一种分位数算法，
+保证不同来源的 p50/p95/p99 可以直接比较。
+"""
+
+import math
+from typing import Sequence
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """
+    最近秩法计算分位数。
+
+    参数:
+        values: 样本（无需排序）。
+        q: 分位点，取值 0~1（如 0.95）。
+
+    返回:
+        样本中排序后第 ceil(q * n) 个值；样本为空时返回 0.0。
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
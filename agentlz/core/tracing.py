@@ -0,0 +1,597 @@
+from __future__ import annotations
+
+"""
+链路追踪（嵌套 span，JSONL 导出）
+
+一次工作流的耗时拆分为嵌套的 span：规划、数据库查询、MCP 服务器拉起、工具加载、单次工具调用与模型调用。
+- span(name, attributes=None, kind="internal", parent=None) 在当前上下文（contextvars，随 asyncio 任务与
+  asyncio.to_thread 传递）开启子 span，parent 可显式指定父 span 或 traceparent，都没有时开启新的 trace；
+  异常记录为 exception 事件并把状态置为 ERROR；
+- 模型调用与 LangChain 工具调用由 TracingCallbackHandler 记录（见 tracing_config）；
+- trace 上下文以 W3C traceparent（00-<trace_id>-<span_id>-01）传给 MCP 服务器：会话池的工具调用放在请求
+  _meta.traceparent 中，按次拉起的 stdio 服务器通过 TRACEPARENT 环境变量；
+- 结束的 span 按 OpenTelemetry（OTLP/JSON）span 结构逐行写入 TRACE_EXPORT_PATH，写文件在后台线程完成；
+- 命令行汇总最慢的 span 与各名称的耗时分布：
+    python -m agentlz.core.tracing --path .storage/traces/spans.jsonl --top 20
+
+TRACING_ENABLED 关闭时 span() 返回空操作对象，开销仅为一次全局变量判断。
+"""
+
+import argparse
+import atexit
+import contextvars
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Dict, Iterator, List, Optional, Sequence, Union
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables.config import var_child_runnable_config
+
+from agentlz.core.stats import percentile
+
+
+_CURRENT: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("agentlz_span", default=None)
+
+_LOCK = threading.Lock()
+_CONFIGURED = False
+_EXPORTER: Optional["JsonlSpanExporter"] = None
+
+_KINDS = {
+    "internal": "SPAN_KIND_INTERNAL",
+    "server": "SPAN_KIND_SERVER",
+    "client": "SPAN_KIND_CLIENT",
+}
+_STATUS = {"unset": "STATUS_CODE_UNSET", "ok": "STATUS_CODE_OK", "error": "STATUS_CODE_ERROR"}
+
+
+@dataclass(eq=False)
+class Span:
+    """一个计时 span；trace_id/span_id 为十六进制字符串（32/16 位）。"""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str = ""
+    kind: str = "internal"
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "unset"
+    status_message: str = ""
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    # 远端父 span（来自 traceparent）只提供上下文，不导出
+    remote: bool = False
+
+    recording = True
+
+    @property
+    def traceparent(self) -> str:
+        """W3C traceparent 头。"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> None:
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": dict(attributes or {})})
+
+    def set_status(self, status: str, message: str = "") -> None:
+        """设置状态：unset / ok / error。"""
+        self.status = status
+        self.status_message = message
+
+    def record_exception(self, error: BaseException) -> None:
+        """记录异常事件并把状态置为 ERROR。"""
+        self.add_event("exception", {
+            "exception.type": type(error).__name__,
+            "exception.message": str(error),
+        })
+        self.set_status("error", str(error) or type(error).__name__)
+
+    def end(self) -> None:
+        """结束 span 并导出（重复调用无效）。"""
+        if self.end_ns:
+            return
+        self.end_ns = time.time_ns()
+        exporter = _EXPORTER
+        if exporter is not None and not self.remote:
+            exporter.export(self)
+
+    def to_otel(self, resource: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """转换为 OTLP/JSON span 结构（附带 resource 属性）。"""
+        data: Dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "kind": _KINDS.get(self.kind, _KINDS["internal"]),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otel_attributes(self.attributes),
+            "events": [
+                {"name": e["name"], "timeUnixNano": str(e["time_ns"]), "attributes": _otel_attributes(e["attributes"])}
+                for e in self.events
+            ],
+            "status": {"code": _STATUS.get(self.status, _STATUS["unset"]), "message": self.status_message},
+        }
+        if resource:
+            data["resource"] = {"attributes": _otel_attributes(resource)}
+        return data
+
+
+class _NoopSpan:
+    """追踪关闭时的空操作 span。"""
+
+    recording = False
+    name = trace_id = span_id = parent_id = traceparent = ""
+    attributes: Dict[str, Any] = {}
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> None:
+        pass
+
+    def set_status(self, status: str, message: str = "") -> None:
+        pass
+
+    def record_exception(self, error: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+AnySpan = Union[Span, _NoopSpan]
+
+
+def _otel_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otel_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otel_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _otel_value(v)} for k, v in attributes.items()]
+
+
+def _plain_value(value: Dict[str, Any]) -> Any:
+    if "intValue" in value:
+        return int(value["intValue"])
+    if "arrayValue" in value:
+        return [_plain_value(v) for v in value["arrayValue"].get("values", [])]
+    for key in ("stringValue", "doubleValue", "boolValue"):
+        if key in value:
+            return value[key]
+    return None
+
+
+# ---- 导出 ----
+class JsonlSpanExporter:
+    """把结束的 span 以 OTLP/JSON 结构逐行追加到文件；写文件在后台线程完成，不阻塞请求路径。
+
+    参数:
+        path: JSONL 文件路径（目录不存在时创建）。
+        service_name: 写入 resource 的 service.name。
+    """
+
+    def __init__(self, path: str, service_name: str = "agentlz") -> None:
+        self.path = path
+        self.resource = {"service.name": service_name}
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.exported = 0
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+
+    def export(self, span: Span) -> None:
+        self._ensure_thread()
+        self._queue.put(span.to_otel(self.resource))
+
+    def _run(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = [json.dumps(i, ensure_ascii=False, default=str) for i in batch if isinstance(i, dict)]
+            if lines:
+                try:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write("\n".join(lines) + "\n")
+                    self.exported += len(lines)
+                except OSError:
+                    pass
+            for i in batch:
+                if isinstance(i, threading.Event):
+                    i.set()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待已导出的 span 写入文件。"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+
+def get_span_exporter() -> Optional[JsonlSpanExporter]:
+    """返回当前导出器；首次调用时按配置（TRACING_ENABLED / TRACE_EXPORT_PATH）创建，关闭时返回 None。"""
+    global _CONFIGURED, _EXPORTER
+    if not _CONFIGURED:
+        with _LOCK:
+            if not _CONFIGURED:
+                # 延迟导入，避免 settings 与 core 模块之间的循环依赖
+                from agentlz.config.settings import get_settings
+
+                try:
+                    settings = get_settings()
+                    if settings.tracing_enabled:
+                        _EXPORTER = JsonlSpanExporter(settings.trace_export_path, settings.trace_service_name)
+                        atexit.register(_EXPORTER.flush)
+                except Exception:
+                    # 配置不完整时不追踪
+                    _EXPORTER = None
+                _CONFIGURED = True
+    return _EXPORTER
+
+
+def set_span_exporter(exporter: Optional[JsonlSpanExporter]) -> Optional[JsonlSpanExporter]:
+    """替换导出器（None 表示关闭追踪），返回原导出器；测试与基准使用。"""
+    global _CONFIGURED, _EXPORTER
+    with _LOCK:
+        previous = _EXPORTER
+        _EXPORTER = exporter
+        _CONFIGURED = True
+    return previous
+
+
+# ---- 上下文 ----
+def current_span() -> Optional[Span]:
+    """当前上下文中的 span；没有时返回 None。"""
+    return _CURRENT.get()
+
+
+def current_traceparent() -> str:
+    """当前 span 的 W3C traceparent；追踪关闭或不在 span 中时返回空字符串。"""
+    span = _CURRENT.get()
+    return span.traceparent if span is not None else ""
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Span]:
+    """解析 W3C traceparent 头为远端父 span；格式不正确时返回 None。"""
+    parts = (value or "").strip().lower().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return Span(name="remote", trace_id=parts[1], span_id=parts[2], remote=True)
+
+
+def start_span(
+    name: str,
+    parent: Union[Span, str, None] = None,
+    kind: str = "internal",
+    attributes: Optional[Dict[str, Any]] = None,
+) -> AnySpan:
+    """
+    开启 span（不改变当前上下文），需调用 end() 结束；回调等无法使用 with 的场景使用。
+
+    参数:
+        parent: 父 span 或 traceparent 字符串；None 时取当前上下文中的 span，仍没有时开启新的 trace。
+    """
+    if get_span_exporter() is None:
+        return NOOP_SPAN
+    if isinstance(parent, str):
+        parent = parse_traceparent(parent)
+    if parent is None:
+        parent = _CURRENT.get()
+        # 在 LangChain 工具内部（如 MCP 工具调用）时挂到回调记录的 tool.call span 下
+        running = _callback_parent()
+        if running is not None and (parent is None or running.start_ns >= parent.start_ns):
+            parent = running
+    span = Span(
+        name=name,
+        trace_id=parent.trace_id if parent is not None else secrets.token_hex(16),
+        span_id=secrets.token_hex(8),
+        parent_id=parent.span_id if parent is not None else "",
+        kind=kind,
+    )
+    if attributes:
+        span.set_attributes(attributes)
+    return span
+
+
+@contextmanager
+def use_span(span: AnySpan) -> Iterator[AnySpan]:
+    """在 with 块内把 span 设为当前 span（不结束 span）。"""
+    if not span.recording:
+        yield span
+        return
+    token = _CURRENT.set(span)
+    try:
+        yield span
+    finally:
+        try:
+            _CURRENT.reset(token)
+        except ValueError:
+            # 异步生成器在其他上下文中被关闭
+            pass
+
+
+@contextmanager
+def span(
+    name: str,
+    attributes: Optional[Dict[str, Any]] = None,
+    kind: str = "internal",
+    parent: Union[Span, str, None] = None,
+) -> Iterator[AnySpan]:
+    """
+    开启子 span 并设为当前 span，退出时结束并导出；异常记录到 span 后继续抛出。
+
+    参数:
+        name: span 名称（如 "executor.step"）。
+        attributes: 初始属性。
+        kind: internal / server / client。
+        parent: 可选，显式父 span 或 traceparent 字符串（如 HTTP 请求头）。
+    """
+    current = start_span(name, parent=parent, kind=kind, attributes=attributes)
+    if not current.recording:
+        yield current
+        return
+    with use_span(current):
+        try:
+            yield current
+        except BaseException as e:
+            current.record_exception(e)
+            raise
+        finally:
+            current.end()
+
+
+def bind_current_span(aw: Awaitable[Any]) -> Awaitable[Any]:
+    """让 aw 在当前 span 下执行；提交到其他线程的事件循环（看不到调用方的 contextvars）时使用。"""
+    parent = _CURRENT.get()
+    if parent is None:
+        return aw
+
+    async def run() -> Any:
+        token = _CURRENT.set(parent)
+        try:
+            return await aw
+        finally:
+            _CURRENT.reset(token)
+
+    return run()
+
+
+# ---- LangChain 回调 ----
+class TracingCallbackHandler(BaseCallbackHandler):
+    """把模型调用与工具调用记录为 span（父 span 为调用发起时的当前 span）。"""
+
+    run_inline = True
+
+    def __init__(self) -> None:
+        self._spans: Dict[UUID, AnySpan] = {}
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, kind: str,
+               attributes: Dict[str, Any]) -> None:
+        parent = self._spans.get(parent_run_id) if parent_run_id is not None else None
+        self._spans[run_id] = start_span(name, parent=parent if isinstance(parent, Span) else None,
+                                         kind=kind, attributes=attributes)
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None,
+             attributes: Optional[Dict[str, Any]] = None) -> None:
+        span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        if attributes:
+            span.set_attributes(attributes)
+        if error is not None:
+            span.record_exception(error)
+        span.end()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs) -> None:
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or params.get("_type") or (serialized or {}).get("name")
+        self._start(run_id, parent_run_id, "llm.chat", "client", {
+            "llm.model": model,
+            "llm.messages": len(messages[0]) if messages else 0,
+        })
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs) -> None:
+        params = kwargs.get("invocation_params") or {}
+        self._start(run_id, parent_run_id, "llm.completion", "client",
+                    {"llm.model": params.get("model") or params.get("model_name")})
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        attributes: Dict[str, Any] = {}
+        usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+        generations = getattr(response, "generations", None) or []
+        message = getattr(generations[0][0], "message", None) if generations and generations[0] else None
+        if not usage and message is not None:
+            usage = getattr(message, "usage_metadata", None) or {}
+        for key, name in (("prompt_tokens", "input_tokens"), ("completion_tokens", "output_tokens")):
+            value = usage.get(key, usage.get(name))
+            if value is not None:
+                attributes[f"llm.usage.{name}"] = value
+        if message is not None:
+            attributes["llm.tool_calls"] = len(getattr(message, "tool_calls", None) or [])
+        self._end(run_id, attributes=attributes)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs) -> None:
+        self._start(run_id, parent_run_id, "tool.call", "internal", {"tool.name": (serialized or {}).get("name")})
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error=error)
+
+
+def _callback_parent() -> Optional[Span]:
+    """当前 LangChain 运行（子运行配置中的 parent_run_id）由 TracingCallbackHandler 记录的 span。"""
+    manager = (var_child_runnable_config.get() or {}).get("callbacks")
+    run_id = getattr(manager, "parent_run_id", None)
+    if run_id is None:
+        return None
+    for handler in getattr(manager, "handlers", None) or []:
+        if isinstance(handler, TracingCallbackHandler):
+            found = handler._spans.get(run_id)
+            if isinstance(found, Span):
+                return found
+    return None
+
+
+def tracing_config() -> Optional[Dict[str, Any]]:
+    """返回附带 TracingCallbackHandler 的 RunnableConfig；追踪关闭时返回 None。"""
+    if get_span_exporter() is None:
+        return None
+    return {"callbacks": [TracingCallbackHandler()]}
+
+
+# ---- 汇总 ----
+def load_spans(path: str, trace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """读取 JSONL 中的 span，转换为 {name, trace_id, span_id, parent_id, start_ns, duration_ms, status, attributes}。"""
+    spans: List[Dict[str, Any]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                raw = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if trace_id and raw.get("traceId") != trace_id:
+                continue
+            start, end = int(raw.get("startTimeUnixNano") or 0), int(raw.get("endTimeUnixNano") or 0)
+            spans.append({
+                "name": raw.get("name", ""),
+                "trace_id": raw.get("traceId", ""),
+                "span_id": raw.get("spanId", ""),
+                "parent_id": raw.get("parentSpanId", ""),
+                "start_ns": start,
+                "duration_ms": max(0.0, (end - start) / 1e6),
+                "status": (raw.get("status") or {}).get("code", _STATUS["unset"]),
+                "attributes": {a["key"]: _plain_value(a.get("value") or {}) for a in raw.get("attributes") or []},
+            })
+    return spans
+
+
+def summarize_spans(spans: Sequence[Dict[str, Any]], top: int = 20) -> Dict[str, Any]:
+    """
+    汇总 span：最慢的 top 个 span，以及按名称聚合的次数、总耗时、自身耗时（扣除子 span）与分位数。
+
+    返回:
+        {"traces": trace 数, "slowest": [...], "by_name": [...]}（by_name 按自身耗时降序）。
+    """
+    children: Dict[str, float] = {}
+    for s in spans:
+        if s["parent_id"]:
+            children[s["parent_id"]] = children.get(s["parent_id"], 0.0) + s["duration_ms"]
+    groups: Dict[str, Dict[str, Any]] = {}
+    for s in spans:
+        g = groups.setdefault(s["name"], {"name": s["name"], "count": 0, "errors": 0, "durations": [], "self_ms": 0.0})
+        g["count"] += 1
+        g["errors"] += s["status"] == _STATUS["error"]
+        g["durations"].append(s["duration_ms"])
+        # 并发的子 span 耗时之和可能超过父 span，自身耗时不低于 0
+        g["self_ms"] += max(0.0, s["duration_ms"] - children.get(s["span_id"], 0.0))
+    by_name = []
+    for g in groups.values():
+        durations = g.pop("durations")
+        g.update({
+            "total_ms": round(sum(durations), 1),
+            "self_ms": round(g["self_ms"], 1),
+            "p50_ms": round(percentile(durations, 0.50), 1),
+            "p95_ms": round(percentile(durations, 0.95), 1),
+            "max_ms": round(max(durations), 1),
+        })
+        by_name.append(g)
+    by_name.sort(key=lambda g: g["self_ms"], reverse=True)
+    slowest = sorted(spans, key=lambda s: s["duration_ms"], reverse=True)[:max(0, top)]
+    return {
+        "traces": len({s["trace_id"] for s in spans}),
+        "slowest": [dict(s, duration_ms=round(s["duration_ms"], 1)) for s in slowest],
+        "by_name": by_name,
+    }
+
+
+def _format_attributes(attributes: Dict[str, Any], limit: int = 60) -> str:
+    text = " ".join(f"{k}={v}" for k, v in attributes.items())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="汇总 JSONL 追踪文件中最慢的 span")
+    parser.add_argument("--path", default=None, help="span JSONL 文件，默认 TRACE_EXPORT_PATH")
+    parser.add_argument("--top", type=int, default=20, help="列出最慢的 span 个数")
+    parser.add_argument("--trace", default=None, help="只汇总指定 trace id")
+    args = parser.parse_args(argv)
+
+    path = args.path
+    if path is None:
+        from agentlz.config.settings import get_settings
+
+        path = get_settings().trace_export_path
+    summary = summarize_spans(load_spans(path, trace_id=args.trace), top=args.top)
+    print(f"{summary['traces']} 个 trace，{sum(g['count'] for g in summary['by_name'])} 个 span（{path}）\n")
+    print(f"{'duration(ms)':>13}  {'name':<24}{'trace':<34}{'status':<8}attributes")
+    for s in summary["slowest"]:
+        status = "ERROR" if s["status"] == _STATUS["error"] else ""
+        print(f"{s['duration_ms']:>13}  {s['name']:<24}{s['trace_id']:<34}{status:<8}{_format_attributes(s['attributes'])}")
+    print(f"\n{'name':<24}{'count':>7}{'errors':>8}{'self(ms)':>11}{'total(ms)':>11}{'p50':>9}{'p95':>9}{'max':>9}")
+    for g in summary["by_name"]:
+        print(f"{g['name']:<24}{g['count']:>7}{g['errors']:>8}{g['self_ms']:>11}{g['total_ms']:>11}"
+              f"{g['p50_ms']:>9}{g['p95_ms']:>9}{g['max_ms']:>9}")
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -118,12 +118,15 @@ def persist_huggingface_datasets_to_faiss(
     ds = load_dataset(dataset_name, split=split, streaming=True)
 
     batch_size = 64
+    # 进度日志间隔（批次数），避免每批都产生一条日志
+    log_every_batches = 50
     texts: List[str] = []
     metadatas: List[Dict[str, Any]] = []
     ids: List[str] = []
     total = 0
     skipped = 0
     processed = 0
+    batches = 0
 
     for sample in ds:  # datasets 是可迭代对象
         text = _concat_dialog(sample)
@@ -164,6 +167,9 @@ def persist_huggingface_datasets_to_faiss(
             svc.save(vectorstore)
             total += len(texts)
             processed += len(texts)
+            batches += 1
+            if batches % log_every_batches == 0:
+                logger.debug("已写入 %d 批（累计 %d 条）", batches, total)
             texts.clear()
             metadatas.clear()
             ids.clear()
@@ -178,5 +184,6 @@ def persist_huggingface_datasets_to_faiss(
         total += len(texts)
 
     logger.info(
-        f"PsyDTCorpus({split}) 已写入向量: {total} 条，重复跳过: {skipped} 条，索引保存到: {persist_dir}/{index_name}.faiss"
+        "PsyDTCorpus(%s) 已写入向量: %d 条，重复跳过: %d 条，索引保存到: %s/%s.faiss",
+        split, total, skipped, persist_dir, index_name,
     )
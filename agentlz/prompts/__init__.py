@@ -2,4 +2,8 @@ from pathlib import Path
 
 # 基础系统提示词常量，供各 Agent 引用
 PLANNER_PROMPT = Path(__file__).parent.joinpath("planner/system.prompt").read_text(encoding="utf-8")
+# 批量查询变体：一次调用 get_mcp_configs_by_keywords 解析全部子任务关键词
+PLANNER_BATCH_PROMPT = Path(__file__).parent.joinpath("planner/system_batch.prompt").read_text(encoding="utf-8")
+# 内联规划变体：候选工具随用户消息给出，单次结构化输出，不调用工具
+PLANNER_INLINE_PROMPT = Path(__file__).parent.joinpath("planner/inline.prompt").read_text(encoding="utf-8")
 EXECUTOR_PROMPT = Path(__file__).parent.joinpath("executor/system.prompt").read_text(encoding="utf-8")
\ No newline at end of file
@@ -1,9 +1,11 @@
 import os
 import json
-from typing import Any, Dict, List
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
 import pymysql
 from agentlz.config.settings import get_settings
+from agentlz.core.tracing import span
 
 
 def _get_conn() -> pymysql.connections.Connection:
@@ -31,26 +33,71 @@ def _get_conn() -> pymysql.connections.Connection:
 
 def search_mcp_by_keyword(keyword: str, limit: int = 10) -> List[Dict[str, Any]]:
     """按关键词在 name/description 模糊匹配，并按 trust_score 降序返回。"""
-    conn = _get_conn()  # 失败时直接抛异常，不做兜底
-    try:
-        like = f"%{keyword}%"
-        sql = (
-            "SELECT id, name, transport, command, args, category, trust_score, description "
-            "FROM mcp_agents "
-            "WHERE name LIKE %s OR description LIKE %s "
-            "ORDER BY trust_score DESC "
-            "LIMIT %s"
-        )
-        with conn.cursor() as cur:
-            cur.execute(sql, (like, like, limit))
-            rows = cur.fetchall()
-    finally:
+    with span("db.search_mcp_by_keyword", {"db.system": "mysql", "mcp.keyword": keyword}, kind="client") as sp:
+        conn = _get_conn()  # 失败时直接抛异常，不做兜底
         try:
-            conn.close()
-        except Exception:
-            pass
+            like = f"%{keyword}%"
+            sql = (
+                "SELECT id, name, transport, command, args, category, trust_score, description "
+                "FROM mcp_agents "
+                "WHERE name LIKE %s OR description LIKE %s "
+                "ORDER BY trust_score DESC "
+                "LIMIT %s"
+            )
+            with conn.cursor() as cur:
+                cur.execute(sql, (like, like, limit))
+                rows = cur.fetchall()
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        sp.set_attribute("db.rows", len(rows))
+
+    return _normalize_args(rows)
 
-    # 规范化 args 字段为 List[str]
+
+def search_mcp_by_keywords(keywords: List[str], limit: int = 10) -> Dict[str, List[Dict[str, Any]]]:
+    """多关键词一次查询：单连接、单条 SQL（每个关键词一个带 LIMIT 的子查询，UNION ALL 合并），
+    每组按 trust_score 降序最多 limit 条。
+
+    子查询带关键词序号列 kw_idx，按序号分组，匹配语义完全由数据库的 LIKE 与列排序规则决定。"""
+    keywords = [k for k in dict.fromkeys(keywords) if k]
+    if not keywords:
+        return {}
+    with span("db.search_mcp_by_keywords", {"db.system": "mysql", "mcp.keywords": keywords}, kind="client") as sp:
+        conn = _get_conn()
+        try:
+            part = (
+                "(SELECT %s AS kw_idx, id, name, transport, command, args, category, trust_score, description "
+                "FROM mcp_agents "
+                "WHERE name LIKE %s OR description LIKE %s "
+                "ORDER BY trust_score DESC "
+                "LIMIT %s)"
+            )
+            sql = " UNION ALL ".join([part] * len(keywords)) + " ORDER BY kw_idx, trust_score DESC"
+            params: List[Any] = []
+            for idx, kw in enumerate(keywords):
+                like = f"%{kw}%"
+                params.extend([idx, like, like, limit])
+            with conn.cursor() as cur:
+                cur.execute(sql, tuple(params))
+                rows = _normalize_args(list(cur.fetchall()))
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        sp.set_attribute("db.rows", len(rows))
+
+    groups: Dict[str, List[Dict[str, Any]]] = {kw: [] for kw in keywords}
+    for row in rows:
+        groups[keywords[int(row.pop("kw_idx"))]].append(row)
+    return groups
+
+
+def _normalize_args(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """规范化 args 字段为 List[str]（数据库中以 JSON 文本存储）。"""
     for r in rows:
         args = r.get("args")
         if isinstance(args, str):
@@ -63,6 +110,86 @@ def search_mcp_by_keyword(keyword: str, limit: int = 10) -> List[Dict[str, Any]]
     return rows
 
 
+def get_mcp_by_names(names: List[str]) -> List[Dict[str, Any]]:
+    """按名称批量查询 MCP 记录（用于校验缓存计划引用的 MCP 是否仍存在且配置未变）。"""
+    if not names:
+        return []
+    conn = _get_conn()
+    try:
+        placeholders = ", ".join(["%s"] * len(names))
+        sql = (
+            "SELECT id, name, transport, command, args, category, trust_score, description "
+            f"FROM mcp_agents WHERE name IN ({placeholders})"
+        )
+        with conn.cursor() as cur:
+            cur.execute(sql, tuple(names))
+            rows = cur.fetchall()
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+    return _normalize_args(rows)
+
+
+def get_mcp_catalog_fingerprint() -> str:
+    """返回 MCP 目录的指纹（条数 + 最后更新时间 + 全表内容校验和），目录任何增删改都会改变指纹。"""
+    conn = _get_conn()
+    try:
+        sql = (
+            "SELECT COUNT(*) AS n, MAX(updated_at) AS ts, "
+            "BIT_XOR(CRC32(CONCAT_WS('|', id, name, transport, command, args, trust_score))) AS crc "
+            "FROM mcp_agents"
+        )
+        with conn.cursor() as cur:
+            cur.execute(sql)
+            row = cur.fetchone() or {}
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+    return f"{row.get('n')}:{row.get('ts')}:{row.get('crc')}"
+
+
+def list_mcp_agents(since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """列出 MCP 记录（含 updated_at）；传入 since 时仅返回 updated_at >= since 的记录（增量同步）。"""
+    conn = _get_conn()
+    try:
+        sql = (
+            "SELECT id, name, transport, command, args, category, trust_score, description, updated_at "
+            "FROM mcp_agents"
+        )
+        params: tuple = ()
+        if since is not None:
+            sql += " WHERE updated_at >= %s"
+            params = (since,)
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+    return _normalize_args(list(rows))
+
+
+def count_mcp_agents() -> int:
+    """返回 MCP 记录总数（增量同步据此发现删除）。"""
+    conn = _get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) AS n FROM mcp_agents")
+            row = cur.fetchone() or {}
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+    return int(row.get("n") or 0)
+
+
 def to_tool_config(row: Dict[str, Any]) -> Dict[str, Any]:
     """将数据库行转换为工具配置字典（与 WorkflowPlan.mcp_config 对齐）。"""
     return {
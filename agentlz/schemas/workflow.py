@@ -1,5 +1,8 @@
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field, TypeAdapter
 
 
 @dataclass
@@ -11,10 +14,67 @@ class MCPConfigItem:
     args: List[str]
 
 
+@dataclass
+class WorkflowStep:
+    """依赖图计划中的单个步骤。"""
+    # 步骤 id（如 s1），供后续步骤引用
+    id: str
+    # 使用的 MCP 服务器（mcp_config 中的 name）；为空表示仅由模型处理
+    server: str
+    # 步骤任务描述，以 {步骤id} 引用前序步骤的输出
+    task: str
+    # 本步骤依赖（引用其输出）的前序步骤 id
+    inputs: List[str] = field(default_factory=list)
+    # 直接执行（EXECUTOR_MODE=direct）：要调用的 MCP 工具名与参数模板（字符串值中的 {步骤id/绑定名} 会被替换）
+    tool: str = ""
+    args: Dict[str, Any] = field(default_factory=dict)
+    # 输出绑定名：除步骤 id 外，后续步骤也可以用 {绑定名} 引用本步骤输出
+    output: str = ""
+    # 需要模型推理的步骤（如改写、总结）：直接执行模式下仍交给模型完成
+    reasoning: bool = False
+    # 步骤超时预算（秒）；0 表示使用 EXECUTOR_STEP_TIMEOUT_SECONDS，且不超过整个请求的截止时间
+    timeout: float = 0.0
+
+
 @dataclass
 class WorkflowPlan:
     """MCP 工作流编排的结构化输出模型。"""
     execution_chain: List[str]
     mcp_config: List[MCPConfigItem]
     # 额外的执行指示（由 planner 给出，executor 可用于指导工具调用与步骤）
-    instructions: str = ""
\ No newline at end of file
+    instructions: str = ""
+    # 可选的依赖图形式（EXECUTOR_MODE=dag/direct 时无依赖关系的步骤并发执行）
+    steps: List[WorkflowStep] = field(default_factory=list)
+
+
+@dataclass
+class StepResult:
+    """依赖图执行中单个步骤的结果。"""
+    id: str
+    # ok / error / timeout（超出步骤预算或请求截止时间） / skipped（前序步骤未成功）
+    status: str
+    output: str = ""
+    error: str = ""
+    elapsed_ms: float = 0.0
+
+
+@lru_cache(maxsize=1)
+def workflow_plan_schema() -> Dict[str, Any]:
+    """
+    WorkflowPlan 的 JSON Schema，供 `with_structured_output` 使用（结构化输出以 dict 返回）。
+
+    直接传入数据类时 langchain 按构造函数签名生成 schema，default_factory 字段的默认值是不可序列化的哨兵对象，
+    每次调用都会触发 PydanticJsonSchemaWarning；这里按数据类字段生成，只保留可序列化的默认值。
+
+    返回:
+        JSON Schema 字典（进程内缓存，调用方不得修改）。
+    """
+    schema = TypeAdapter(WorkflowPlan).json_schema()
+    schema["description"] = WorkflowPlan.__doc__
+    return schema
+
+
+class WorkflowRunRequest(BaseModel):
+    """工作流运行请求体（规划 + 执行）。"""
+    input: str = Field(..., min_length=1, description="用户任务描述")
+    timeout: Optional[float] = Field(None, gt=0, description="执行截止时间（秒），默认 EXECUTOR_TIMEOUT_SECONDS")
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+"""
+Embeddings 跨请求微批处理
+
+将并发到达的编码请求合并为一个批次交给底层模型，兼顾 CPU 批处理效率与单请求延迟：
+- 攒批条件：累计文本数达到 max_batch_size，或首个请求等待超过 max_wait_ms。
+- 模型推理在线程池中执行，不阻塞事件循环。
+- 统计请求延迟 p50/p99 与批次填充率（实际文本数 / max_batch_size）。
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+from agentlz.core.stats import percentile
+
+
+@dataclass
+class _PendingRequest:
+    """等待合批的单个请求。"""
+    texts: List[str]
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class MicroBatcher:
+    """跨请求微批处理器
+
+    参数:
+        embeddings: LangChain Embeddings 实例（需实现 embed_documents）。
+        max_batch_size: 单批最大文本数。
+        max_wait_ms: 首个请求最长等待时间（毫秒），超时即发车。
+        stats_window: 延迟与填充率统计的滑动窗口大小。
+    """
+
+    def __init__(
+        self,
+        embeddings: Any,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        stats_window: int = 10000,
+    ) -> None:
+        self.embeddings = embeddings
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # 已从队列取出、尚未返回结果的请求（攒批中或推理中），stop 时一并结束
+        self._inflight: List[_PendingRequest] = []
+        self._latencies_ms: Deque[float] = deque(maxlen=stats_window)
+        self._fill_ratios: Deque[float] = deque(maxlen=stats_window)
+        self._requests = 0
+        self._batches = 0
+        self._texts = 0
+
+    async def start(self) -> None:
+        """在当前事件循环中启动攒批协程（幂等）。"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止攒批协程；未完成的请求（排队中、攒批中与推理中的）以取消结束。"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        pending = list(self._inflight)
+        self._inflight = []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for req in pending:
+            if not req.future.done():
+                req.future.cancel()
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """提交一组文本并等待其向量结果（与其他并发请求合批执行）。"""
+        if not texts:
+            return []
+        await self.start()
+        loop = asyncio.get_running_loop()
+        req = _PendingRequest(texts=list(texts), future=loop.create_future())
+        await self._queue.put(req)
+        return await req.future
+
+    async def _run(self) -> None:
+        """攒批主循环：取首个请求后在截止时间内尽量填满批次。"""
+        while True:
+            first = await self._queue.get()
+            batch = [first]
+            self._inflight = batch
+            size = len(first.texts)
+            deadline = first.enqueued_at + self.max_wait_s
+            while size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining <= 0 or not self._queue.empty():
+                        # 已到期（或已有积压）时只取走队列中现成的请求，不再等待
+                        nxt = self._queue.get_nowait()
+                    else:
+                        nxt = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                batch.append(nxt)
+                size += len(nxt.texts)
+            await self._execute(batch)
+            self._inflight = []
+
+    async def _execute(self, batch: List[_PendingRequest]) -> None:
+        """执行一个批次并按请求切分结果。"""
+        live = [r for r in batch if not r.future.done()]
+        if not live:
+            return
+        texts = [t for r in live for t in r.texts]
+        try:
+            vectors = await asyncio.to_thread(self.embeddings.embed_documents, texts)
+        except Exception as e:
+            for r in live:
+                if not r.future.done():
+                    r.future.set_exception(e)
+            return
+
+        now = time.perf_counter()
+        offset = 0
+        for r in live:
+            n = len(r.texts)
+            if not r.future.done():
+                r.future.set_result(vectors[offset:offset + n])
+            offset += n
+            self._latencies_ms.append((now - r.enqueued_at) * 1000.0)
+        self._requests += len(live)
+        self._batches += 1
+        self._texts += len(texts)
+        self._fill_ratios.append(min(1.0, len(texts) / self.max_batch_size))
+
+    def stats(self) -> Dict[str, Any]:
+        """返回统计快照：请求/批次计数、延迟分位数与平均批次填充率。"""
+        lat = list(self._latencies_ms)
+        fills = list(self._fill_ratios)
+        return {
+            "requests": self._requests,
+            "batches": self._batches,
+            "texts": self._texts,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "latency_p50_ms": round(percentile(lat, 0.50), 3),
+            "latency_p99_ms": round(percentile(lat, 0.99), 3),
+            "batch_fill_ratio": round(sum(fills) / len(fills), 4) if fills else 0.0,
+            "avg_batch_size": round(self._texts / self._batches, 2) if self._batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_s * 1000.0,
+        }
@@ -5,10 +5,10 @@ FAISS 向量数据库服务封装
 
 提供针对 LangChain FAISS 的统一 CRUD 封装，包含：
 - 索引加载/创建
-- 批量写入文本（add_texts）
+- 批量写入文本（add_texts）或预先编码好的向量（add_embeddings）
 - 删除（delete）
 - 单条读取（get_by_id）
-- 相似度检索（similarity_search）
+- 相似度检索（similarity_search / similarity_search_with_score / similarity_search_with_score_by_vector）
 - 更新（update_text）
 
 所有函数均采用中文文档说明，符合项目开发规范。
@@ -93,6 +93,39 @@ class FAISSVectorService:
             vectorstore.add_texts(texts=texts, metadatas=metadatas, ids=ids)
         return vectorstore
 
+    def add_embeddings(
+        self,
+        vectorstore: Optional[FAISS],
+        texts: List[str],
+        vectors: List[List[float]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        embeddings=None,
+    ) -> FAISS:
+        """批量添加已编码的文本向量，支持懒创建（编码可在调用方持有的锁之外完成）。
+
+        参数:
+            vectorstore: 现有向量库对象；若为 None 则创建新索引。
+            texts: 文本列表。
+            vectors: 与 texts 一一对应的向量。
+            metadatas: 元数据列表（可选）。
+            ids: 文档 ID 列表（可选）。
+            embeddings: 当 vectorstore 为 None 时，新索引绑定的嵌入模型（用于之后的查询编码）。
+
+        返回:
+            更新后的 FAISS 向量库对象。
+        """
+        text_embeddings = list(zip(texts, vectors))
+        if vectorstore is None:
+            if embeddings is None:
+                raise ValueError("创建新索引时必须提供 embeddings")
+            vectorstore = FAISS.from_embeddings(
+                text_embeddings=text_embeddings, embedding=embeddings, metadatas=metadatas, ids=ids
+            )
+        else:
+            vectorstore.add_embeddings(text_embeddings=text_embeddings, metadatas=metadatas, ids=ids)
+        return vectorstore
+
     def delete(self, vectorstore: FAISS, ids: List[str]) -> None:
         """根据文档 ID 删除向量记录。"""
         try:
@@ -112,6 +145,14 @@ class FAISSVectorService:
         """执行相似度检索，返回最相关的 k 条 Document。"""
         return vectorstore.similarity_search(query, k=k)
 
+    def similarity_search_with_score(self, vectorstore: FAISS, query: str, k: int = 5):
+        """执行相似度检索，返回 [(Document, 距离)]（默认 L2 距离，越小越相近）。"""
+        return vectorstore.similarity_search_with_score(query, k=k)
+
+    def similarity_search_with_score_by_vector(self, vectorstore: FAISS, vector: List[float], k: int = 5):
+        """按已编码的查询向量检索，返回 [(Document, 距离)]。"""
+        return vectorstore.similarity_search_with_score_by_vector(vector, k=k)
+
     def update_text(
         self,
         vectorstore: FAISS,
@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+"""
+内存 MCP 目录
+
+把 mcp_agents 表整体加载到内存，关键词查询不再访问数据库：
+- 预先解析 args 并构建工具配置（to_tool_config），记录按 trust_score 降序排列；
+- 对 name/category/description 的小写文本建立字符 n-gram 倒排索引，查询沿最短倒排表按 trust_score 顺序
+  做子串校验，语义与 SQL `name LIKE '%kw%' OR description LIKE '%kw%'`（大小写不敏感）一致；
+- 首次整表加载与之后按 updated_at 水位的增量同步都在后台线程进行，加载完成前 ready 为 False，
+  调用方回退到数据库查询；记录总数与内存不一致（发生删除）时整表重载；
+- 快照不可变，刷新时整体替换，查询路径不加锁（只有统计计数持有一把短锁）。
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agentlz.config.settings import Settings
+from agentlz.core.logger import setup_logging
+
+
+Loader = Callable[[Optional[datetime]], List[Dict[str, Any]]]
+Counter = Callable[[], int]
+
+_CATALOG: Optional["MCPCatalog"] = None
+_CATALOG_LOCK = threading.Lock()
+
+
+def _to_tool_config(row: Dict[str, Any]) -> Dict[str, Any]:
+    from agentlz.repositories.mcp_repository import to_tool_config
+
+    return to_tool_config(row)
+
+
+@dataclass(frozen=True)
+class _Entry:
+    """目录条目：原始记录、预构建的工具配置与用于匹配的小写文本。"""
+    row: Dict[str, Any]
+    config: Dict[str, Any]
+    name: str
+    description: str
+    category: str
+    trust_score: float
+
+
+class _Snapshot:
+    """不可变目录快照：按 trust_score 降序的条目列表 + 倒排索引。
+
+    索引键为 1..ngram 字符的子串，值为升序的条目下标元组（即 trust_score 降序）。
+    关键词的任一子串的倒排表都覆盖全部匹配项，因此只需沿最短的倒排表顺序校验子串，
+    取满 limit 条即可停止。
+    """
+
+    def __init__(self, rows: Dict[Any, Dict[str, Any]], ngram: int) -> None:
+        self.ngram = ngram
+        entries = [
+            _Entry(
+                row=row,
+                config=_to_tool_config(row),
+                name=str(row.get("name") or "").lower(),
+                description=str(row.get("description") or "").lower(),
+                category=str(row.get("category") or "").lower(),
+                trust_score=float(row.get("trust_score") or 0.0),
+            )
+            for row in rows.values()
+        ]
+        entries.sort(key=lambda e: (-e.trust_score, str(e.row.get("id"))))
+        self.entries: Tuple[_Entry, ...] = tuple(entries)
+        index: Dict[str, List[int]] = {}
+        for pos, entry in enumerate(self.entries):
+            grams = set()
+            for text in (entry.name, entry.description, entry.category):
+                for size in range(1, ngram + 1):
+                    grams.update(text[i:i + size] for i in range(len(text) - size + 1))
+            for gram in grams:
+                index.setdefault(gram, []).append(pos)
+        self.index: Dict[str, Tuple[int, ...]] = {k: tuple(v) for k, v in index.items()}
+
+    def search(self, keyword: str, limit: int) -> List[_Entry]:
+        kw = keyword.lower()
+        size = min(self.ngram, len(kw))
+        grams = {kw[i:i + size] for i in range(len(kw) - size + 1)}
+        postings = min((self.index.get(g, ()) for g in grams), key=len)
+        result: List[_Entry] = []
+        for pos in postings:
+            entry = self.entries[pos]
+            if kw in entry.name or kw in entry.description:
+                result.append(entry)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def match_text(self, text: str, limit: int, min_hits: int, per_group: int) -> List[Tuple[_Entry, int]]:
+        """按自由文本预选条目：统计文本的 n-gram 在各条目 name/category/description 中的命中数，
+        按 (命中数降序, trust_score 降序) 排序；同一 category（无分类时按名称）最多保留 per_group 条。"""
+        text = text.lower()
+        grams = {text[i:i + self.ngram] for i in range(len(text) - self.ngram + 1)}
+        hits: Dict[int, int] = {}
+        for gram in grams:
+            # 只用由文字/数字组成的 n-gram，标点与空白不具区分度
+            if not all(ch.isalnum() for ch in gram):
+                continue
+            for pos in self.index.get(gram, ()):
+                hits[pos] = hits.get(pos, 0) + 1
+        ranked = sorted((p for p, n in hits.items() if n >= min_hits), key=lambda p: (-hits[p], p))
+        result: List[Tuple[_Entry, int]] = []
+        groups: Dict[str, int] = {}
+        for pos in ranked:
+            entry = self.entries[pos]
+            group = str(entry.row.get("category") or entry.name)
+            if groups.get(group, 0) >= per_group:
+                continue
+            groups[group] = groups.get(group, 0) + 1
+            result.append((entry, hits[pos]))
+            if len(result) >= limit:
+                break
+        return result
+
+
+class MCPCatalog:
+    """内存 MCP 目录
+
+    参数:
+        loader: 读取 MCP 记录的函数 loader(since)，since 为 None 时整表读取；
+            默认 mcp_repository.list_mcp_agents。
+        counter: 返回记录总数的函数，默认 mcp_repository.count_mcp_agents。
+        refresh_interval: 后台增量同步间隔（秒），<=0 表示不启动后台线程。
+        ngram: 倒排索引的 n-gram 长度（中文关键词通常为 2 字以上，默认 2）。
+    """
+
+    def __init__(
+        self,
+        loader: Optional[Loader] = None,
+        counter: Optional[Counter] = None,
+        refresh_interval: float = 30.0,
+        ngram: int = 2,
+    ) -> None:
+        if loader is None or counter is None:
+            from agentlz.repositories import mcp_repository
+
+            loader = loader or mcp_repository.list_mcp_agents
+            counter = counter or mcp_repository.count_mcp_agents
+        self.loader = loader
+        self.counter = counter
+        self.refresh_interval = float(refresh_interval)
+        self.ngram = max(1, int(ngram))
+        self._rows: Dict[Any, Dict[str, Any]] = {}
+        self._snapshot: Optional[_Snapshot] = None
+        self._watermark: Optional[datetime] = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "lookups": 0,
+            "full_loads": 0,
+            "incremental_refreshes": 0,
+            "refresh_errors": 0,
+            "last_refresh_ms": 0.0,
+        }
+        self._last_refresh_at: Optional[float] = None
+        self._listeners: List[Callable[["MCPCatalog"], None]] = []
+        self._loaded = threading.Event()
+        self.version = 0
+
+    def _count(self, name: str, delta: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += delta
+
+    # ---- 同步 ----
+    def _apply(self, rows: List[Dict[str, Any]], full: bool) -> None:
+        """合并记录并替换快照（调用方需持有 _refresh_lock）。"""
+        merged = {} if full else dict(self._rows)
+        watermark = None if full else self._watermark
+        for row in rows:
+            merged[row.get("id", row.get("name"))] = row
+            ts = row.get("updated_at")
+            if ts is not None and (watermark is None or ts > watermark):
+                watermark = ts
+        self._rows = merged
+        self._watermark = watermark
+        self._snapshot = _Snapshot(merged, self.ngram)
+        self.version += 1
+        self._loaded.set()
+
+    def add_listener(self, listener: Callable[["MCPCatalog"], None]) -> None:
+        """注册目录变化回调（快照替换后在刷新线程中调用，用于增量重建派生索引）。"""
+        self._listeners.append(listener)
+
+    def refresh(self, full: bool = False) -> bool:
+        """同步目录：首次或 full=True 时整表加载，否则按 updated_at 水位增量同步。
+
+        返回:
+            bool：同步成功返回 True；数据库异常时保留旧快照并返回 False。
+        """
+        logger = setup_logging()
+        start = time.perf_counter()
+        version = self.version
+        with self._refresh_lock:
+            try:
+                if full or self._snapshot is None or self._watermark is None:
+                    self._apply(self.loader(None), full=True)
+                    self._count("full_loads")
+                else:
+                    # 水位取 >=（TIMESTAMP 精度为秒），与内存一致的记录跳过，避免无谓重建索引
+                    changed = [r for r in self.loader(self._watermark)
+                               if self._rows.get(r.get("id", r.get("name"))) != r]
+                    if changed:
+                        self._apply(changed, full=False)
+                    self._count("incremental_refreshes")
+                    # 增量水位无法感知删除：总数不一致时整表重载
+                    if self.counter() != len(self._rows):
+                        self._apply(self.loader(None), full=True)
+                        self._count("full_loads")
+            except Exception as e:
+                self._count("refresh_errors")
+                logger.warning("MCP 目录同步失败，继续使用旧快照：%r", e)
+                return False
+            with self._stats_lock:
+                self._stats["last_refresh_ms"] = round((time.perf_counter() - start) * 1000.0, 3)
+            self._last_refresh_at = time.time()
+        if self.version != version:
+            for listener in list(self._listeners):
+                try:
+                    listener(self)
+                except Exception as e:
+                    logger.warning("MCP 目录变化回调失败：%r", e)
+        return True
+
+    def _run(self) -> None:
+        if not self.ready:
+            self.refresh(full=True)
+        if self.refresh_interval <= 0:
+            return
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+    def start(self) -> None:
+        """启动后台同步线程（幂等）：未就绪时先整表加载，随后按 refresh_interval 增量同步。"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if self.refresh_interval <= 0 and self.ready:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="mcp-catalog-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止后台同步线程。"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    # ---- 查询 ----
+    @property
+    def ready(self) -> bool:
+        """是否已成功加载过快照。"""
+        return self._snapshot is not None
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """等待首次加载完成（后台构建派生索引时使用），返回是否已就绪。"""
+        return self._loaded.wait(timeout)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """返回当前快照的全部记录（按 trust_score 降序，只读，勿修改）。"""
+        snapshot = self._snapshot
+        return [e.row for e in snapshot.entries] if snapshot is not None else []
+
+    def search(self, keyword: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """按关键词匹配 name/description，按 trust_score 降序返回原始记录（只读，勿修改）。"""
+        return [e.row for e in self._search(keyword, limit)]
+
+    def search_configs(self, keyword: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """同 search，返回预构建的工具配置（transport/command/args，只读，勿修改）。"""
+        return [e.config for e in self._search(keyword, limit)]
+
+    def _search(self, keyword: str, limit: int) -> List[_Entry]:
+        snapshot = self._snapshot
+        self._count("lookups")
+        kw = (keyword or "").strip()
+        if snapshot is None or not kw or limit <= 0:
+            return []
+        return snapshot.search(kw, limit)
+
+    def prefilter(self, text: str, limit: int = 8, min_hits: int = 2, per_group: int = 2) -> List[Dict[str, Any]]:
+        """按用户输入预选候选工具（内联规划使用），返回附带 hits（命中 n-gram 数）的记录副本。
+
+        参数:
+            text: 用户输入原文。
+            limit: 最多返回条数。
+            min_hits: 入选所需的最少命中 n-gram 数。
+            per_group: 同一 category 最多保留的条数（同类工具只保留可信度最高的几条，留出名额给其他子任务）。
+        """
+        snapshot = self._snapshot
+        if snapshot is None or not (text or "").strip():
+            return []
+        result = []
+        for entry, hits in snapshot.match_text(text, limit, min_hits, per_group):
+            row = dict(entry.row)
+            row.pop("updated_at", None)
+            row["hits"] = hits
+            result.append(row)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """返回目录规模、同步次数与水位等统计快照。"""
+        snapshot = self._snapshot
+        with self._stats_lock:
+            data: Dict[str, Any] = dict(self._stats)
+        data["entries"] = len(snapshot.entries) if snapshot is not None else 0
+        data["index_terms"] = len(snapshot.index) if snapshot is not None else 0
+        data["watermark"] = self._watermark.isoformat() if isinstance(self._watermark, datetime) else self._watermark
+        data["last_refresh_at"] = self._last_refresh_at
+        return data
+
+
+def get_mcp_catalog(settings: Settings, create: bool = True) -> Optional[MCPCatalog]:
+    """返回进程共享的内存 MCP 目录（首次调用时创建并启动后台线程整表加载与增量同步，不阻塞调用方）；
+    MCP_CATALOG_ENABLED 关闭时返回 None。加载完成前目录为未就绪状态（ready 为 False），调用方应回退到数据库查询；
+    首次加载失败时由后台线程按 refresh_interval 继续重试。应用启动时调用一次以提前开始加载。
+
+    参数:
+        create: 为 False 时不创建目录（尚未创建则返回 None）。
+    """
+    global _CATALOG
+    if not settings.mcp_catalog_enabled:
+        return None
+    if _CATALOG is None and create:
+        with _CATALOG_LOCK:
+            if _CATALOG is None:
+                catalog = MCPCatalog(
+                    refresh_interval=settings.mcp_catalog_refresh_interval,
+                    ngram=settings.mcp_catalog_ngram,
+                )
+                catalog.start()
+                _CATALOG = catalog
+    return _CATALOG
+
+
+def get_mcp_catalog_stats() -> Dict[str, Any]:
+    """返回内存目录统计；未创建时返回空字典。"""
+    return _CATALOG.stats() if _CATALOG is not None else {}
@@ -0,0 +1,581 @@
+from __future__ import annotations
+
+"""
+MCP 会话池
+
+进程内共享的长连接 MCP 会话，键为 (name, transport, command, args)：
+- 会话由池内的后台事件循环线程持有，不随单次工作流退出；调用方所在事件循环（FastAPI、asyncio.run）
+  通过 run_coroutine_threadsafe 提交请求，取消会传递到池内的调用；
+- 每个会话可同时承载 max_inflight_per_session 个请求（MCP 按请求 id 多路复用），全部占满时新建会话，
+  单个服务器的会话数不超过 max_sessions_per_server，超出后排队等待；
+- 后台巡检：空闲超过 idle_ttl 的会话关闭（子进程随之退出），空闲会话每 health_interval 秒 ping 一次，
+  失败即关闭；调用时遇到连接类异常也会关闭该会话，下次租用重新拉起；
+- 工具调用超时（调用方传入的 timeout 或上下文截止时间）或被取消时，该会话不再接受新请求，
+  其上的请求全部结束后在后台关闭（结束可能卡住的服务器子进程）；
+- 配置了工具定义缓存（MCPToolSchemaCache）时，get_tools 命中缓存即直接构建工具，不联系服务器，
+  会话在首次调用工具时才建立；建立后核对服务器上报的版本，不一致则使缓存失效；
+- 开启链路追踪时，服务器拉起、list_tools 与工具调用记录为调用方当前 span 的子 span，
+  工具调用请求的 _meta.traceparent 携带 trace 上下文；
+- 预热（prewarm）：Planner 仍在规划时即可按候选配置在后台拉起服务器并预取工具定义，不阻塞调用方；
+  执行器租用时直接采用预热会话（预热尚未完成则等待它，不重复拉起），宽限期 prewarm_grace 内
+  未被采用的预热会话关闭。
+"""
+
+import asyncio
+import atexit
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import anyio
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.sessions import create_session
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+
+from agentlz.config.settings import Settings
+from agentlz.core.deadline import effective_timeout
+from agentlz.core.logger import setup_logging
+from agentlz.core.tracing import bind_current_span, span
+from agentlz.services.mcp_tool_cache import MCPToolSchemaCache, ServerKey
+
+
+SessionFactory = Callable[[Dict[str, Any]], Any]
+
+_POOL: Optional["MCPSessionPool"] = None
+_POOL_LOCK = threading.Lock()
+
+# 视为会话已不可用（子进程退出、管道断开）的异常
+_BROKEN_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream, OSError)
+
+
+def _field(config: Any, name: str, default: Any = None) -> Any:
+    return config.get(name, default) if isinstance(config, dict) else getattr(config, name, default)
+
+
+def server_key(config: Any) -> ServerKey:
+    """由 MCPConfigItem 或配置字典计算会话池键。"""
+    return (
+        str(_field(config, "name", "")),
+        str(_field(config, "transport", "stdio")),
+        str(_field(config, "command", "")),
+        tuple(str(a) for a in (_field(config, "args") or [])),
+    )
+
+
+def _connection(key: ServerKey) -> Dict[str, Any]:
+    _, transport, command, args = key
+    return {"transport": transport, "command": command, "args": list(args)}
+
+
+def _is_broken(error: BaseException) -> bool:
+    if isinstance(error, McpError):
+        return error.error.code == CONNECTION_CLOSED
+    return isinstance(error, _BROKEN_ERRORS)
+
+
+@dataclass(eq=False)
+class _PooledSession:
+    """池内会话：由 owner 任务在池事件循环中持有 create_session 上下文，stop 置位后退出并结束子进程。"""
+    key: ServerKey
+    session: Any = None
+    server_info: Optional[Dict[str, Any]] = None
+    inflight: int = 0
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    last_checked: float = field(default_factory=time.monotonic)
+    closing: bool = False
+    # 有请求超时/被取消：不再分配新请求，进行中的请求结束后关闭
+    retired: bool = False
+    # 预热会话在该时刻（time.monotonic）前未被采用即关闭；0 表示非预热会话或已被采用
+    speculative_until: float = 0.0
+    stop: Optional[asyncio.Event] = None
+    task: Optional[asyncio.Task] = None
+
+
+class _PooledToolSession:
+    """供 convert_mcp_tool_to_langchain_tool 使用的会话代理：每次 call_tool 从池中租用会话。"""
+
+    def __init__(self, pool: "MCPSessionPool", key: ServerKey) -> None:
+        self.pool = pool
+        self.key = key
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None, **_: Any) -> Any:
+        # 在调用方上下文中读取截止时间与 trace 上下文，池事件循环线程中看不到调用方的 contextvars
+        with span("mcp.call_tool", {"mcp.server": self.key[0], "mcp.tool": name}, kind="client") as sp:
+            meta = {"traceparent": sp.traceparent} if sp.recording else None
+            return await self.pool.call_tool(self.key, name, arguments, timeout=effective_timeout(), meta=meta)
+
+
+class MCPSessionPool:
+    """MCP 长连接会话池
+
+    参数:
+        max_sessions_per_server: 同一服务器（池键）最多同时保持的会话数。
+        max_inflight_per_session: 单个会话同时承载的请求数上限。
+        idle_ttl: 会话空闲超过该秒数后关闭。
+        health_interval: 空闲会话的 ping 间隔（秒）。
+        connect_timeout: 拉起服务器并完成 initialize 的超时（秒）。
+        session_factory: 创建会话的异步上下文管理器工厂 session_factory(connection)，
+            默认 langchain_mcp_adapters 的 create_session（测试可注入）。
+        tool_cache: 可选的工具定义缓存；命中时 get_tools 不联系服务器。
+        prewarm_grace: 预热会话等待被采用的宽限期（秒），超时未被采用即关闭。
+    """
+
+    def __init__(
+        self,
+        max_sessions_per_server: int = 2,
+        max_inflight_per_session: int = 4,
+        idle_ttl: float = 300.0,
+        health_interval: float = 30.0,
+        connect_timeout: float = 30.0,
+        session_factory: Optional[SessionFactory] = None,
+        tool_cache: Optional[MCPToolSchemaCache] = None,
+        prewarm_grace: float = 30.0,
+    ) -> None:
+        self.max_sessions_per_server = max(1, int(max_sessions_per_server))
+        self.max_inflight_per_session = max(1, int(max_inflight_per_session))
+        self.idle_ttl = float(idle_ttl)
+        self.health_interval = float(health_interval)
+        self.connect_timeout = float(connect_timeout)
+        self.session_factory = session_factory or create_session
+        self.tool_cache = tool_cache
+        self.prewarm_grace = max(0.0, float(prewarm_grace))
+        self._sessions: Dict[ServerKey, List[_PooledSession]] = {}
+        self._creating: Dict[ServerKey, int] = {}
+        # 正在预热的池键，及预热时预取、尚未被 get_tools 取走的工具定义
+        self._warming: set = set()
+        self._warm_tools: Dict[ServerKey, List[Any]] = {}
+        self._prewarm_tasks: set = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._cond: Optional[asyncio.Condition] = None
+        self._janitor_future = None
+        self._background: set = set()
+        self._start_lock = threading.Lock()
+        self._stats = {
+            "leases": 0,
+            "sessions_created": 0,
+            "create_errors": 0,
+            "evicted_idle": 0,
+            "evicted_unhealthy": 0,
+            "evicted_timeout": 0,
+            "waits": 0,
+            "prewarm_sessions": 0,
+            "prewarm_adopted": 0,
+            "prewarm_expired": 0,
+            "prewarm_skipped": 0,
+            "prewarm_errors": 0,
+        }
+
+    # ---- 事件循环 ----
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._start_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    started = threading.Event()
+
+                    def run() -> None:
+                        asyncio.set_event_loop(loop)
+                        loop.call_soon(started.set)
+                        loop.run_forever()
+
+                    self._thread = threading.Thread(target=run, name="mcp-session-pool", daemon=True)
+                    self._thread.start()
+                    started.wait()
+                    self._loop = loop
+                    self._janitor_future = asyncio.run_coroutine_threadsafe(self._janitor(), loop)
+        return self._loop
+
+    async def _submit(self, coro) -> Any:
+        """在池事件循环中执行协程（沿用调用方的当前 span）；调用方取消时同步取消池内任务。"""
+        loop = self._ensure_loop()
+        coro = bind_current_span(coro)
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    def _condition(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    # ---- 会话生命周期（仅在池事件循环中执行） ----
+    async def _own(self, pooled: _PooledSession, ready: asyncio.Future) -> None:
+        logger = setup_logging()
+        try:
+            async with self.session_factory(_connection(pooled.key)) as session:
+                result = await session.initialize()
+                info = getattr(result, "serverInfo", None)
+                if info is not None:
+                    pooled.server_info = {"name": info.name, "version": info.version}
+                pooled.session = session
+                ready.set_result(pooled)
+                await pooled.stop.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+            elif not pooled.closing:
+                logger.warning("MCP 会话异常退出：%s %r", pooled.key[0], e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            await self._discard(pooled)
+
+    async def _spawn(self, key: ServerKey, speculative: bool = False) -> _PooledSession:
+        pooled = _PooledSession(key=key, stop=asyncio.Event())
+        ready = asyncio.get_running_loop().create_future()
+        attributes = {"mcp.server": key[0], "mcp.command": key[2], "mcp.speculative": speculative}
+        with span("mcp.spawn", attributes, kind="client"):
+            pooled.task = asyncio.create_task(self._own(pooled, ready), name=f"mcp-session:{key[0]}")
+            try:
+                return await asyncio.wait_for(asyncio.shield(ready), self.connect_timeout)
+            except BaseException:
+                pooled.closing = True
+                pooled.task.cancel()
+                raise
+
+    async def _discard(self, pooled: _PooledSession) -> None:
+        """从池中移除会话并唤醒等待者。"""
+        cond = self._condition()
+        async with cond:
+            sessions = self._sessions.get(pooled.key, [])
+            if pooled in sessions:
+                sessions.remove(pooled)
+                if not sessions:
+                    self._sessions.pop(pooled.key, None)
+                    self._warm_tools.pop(pooled.key, None)
+            cond.notify_all()
+
+    async def _close(self, pooled: _PooledSession, reason: Optional[str] = None) -> None:
+        if pooled.closing:
+            return
+        pooled.closing = True
+        if reason:
+            self._stats[reason] += 1
+        await self._discard(pooled)
+        pooled.stop.set()
+        if pooled.task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(pooled.task), 5.0)
+            except BaseException:
+                pooled.task.cancel()
+
+    async def _acquire(self, key: ServerKey) -> _PooledSession:
+        cond = self._condition()
+        async with cond:
+            waited = False
+            while True:
+                candidates = [
+                    s for s in self._sessions.get(key, [])
+                    if not s.closing and not s.retired and s.inflight < self.max_inflight_per_session
+                ]
+                if candidates:
+                    pooled = min(candidates, key=lambda s: s.inflight)
+                    pooled.inflight += 1
+                    self._stats["leases"] += 1
+                    self._adopt(pooled)
+                    return pooled
+                active = [s for s in self._sessions.get(key, []) if not s.retired]
+                # 预热中的服务器：等待预热会话就绪，不再并行拉起一个
+                if key not in self._warming and len(active) + self._creating.get(key, 0) < self.max_sessions_per_server:
+                    self._creating[key] = self._creating.get(key, 0) + 1
+                    break
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                await cond.wait()
+        try:
+            pooled = await self._spawn(key)
+        except BaseException:
+            self._stats["create_errors"] += 1
+            async with cond:
+                self._creating[key] -= 1
+                cond.notify_all()
+            raise
+        async with cond:
+            self._creating[key] -= 1
+            self._sessions.setdefault(key, []).append(pooled)
+            pooled.inflight += 1
+            self._stats["sessions_created"] += 1
+            self._stats["leases"] += 1
+            cond.notify_all()
+        if self.tool_cache is not None:
+            self.tool_cache.verify(key, pooled.server_info)
+        return pooled
+
+    def _adopt(self, pooled: _PooledSession) -> None:
+        """预热会话首次被租用：转为普通会话，不再受宽限期约束。"""
+        if pooled.speculative_until:
+            pooled.speculative_until = 0.0
+            self._stats["prewarm_adopted"] += 1
+
+    async def _adopt_key(self, key: ServerKey) -> None:
+        cond = self._condition()
+        async with cond:
+            for pooled in self._sessions.get(key, []):
+                self._adopt(pooled)
+
+    async def _prewarm(self, key: ServerKey, grace: float) -> None:
+        """拉起一个预热会话并预取工具定义；服务器已有会话、正在拉起或正在预热时跳过。"""
+        cond = self._condition()
+        async with cond:
+            if self._sessions.get(key) or self._creating.get(key) or key in self._warming:
+                self._stats["prewarm_skipped"] += 1
+                return
+            self._warming.add(key)
+            self._creating[key] = self._creating.get(key, 0) + 1
+        pooled: Optional[_PooledSession] = None
+        try:
+            pooled = await self._spawn(key, speculative=True)
+        except Exception as e:
+            self._stats["prewarm_errors"] += 1
+            setup_logging().warning("MCP 服务器预热失败：%s %r", key[0], e)
+        finally:
+            async with cond:
+                self._warming.discard(key)
+                self._creating[key] -= 1
+                if pooled is not None:
+                    pooled.speculative_until = time.monotonic() + grace
+                    pooled.inflight += 1  # 预取工具定义期间占用
+                    self._sessions.setdefault(key, []).append(pooled)
+                    self._stats["sessions_created"] += 1
+                    self._stats["prewarm_sessions"] += 1
+                cond.notify_all()
+        if pooled is None:
+            return
+        if self.tool_cache is not None:
+            self.tool_cache.verify(key, pooled.server_info)
+        error: Optional[BaseException] = None
+        try:
+            if self.tool_cache is None or self.tool_cache.get(key) is None:
+                with span("mcp.list_tools", {"mcp.server": key[0], "mcp.speculative": True}, kind="client"):
+                    self._warm_tools[key] = await self._list_tool_defs(key, pooled)
+        except BaseException as e:
+            error = e
+            if not isinstance(e, Exception):
+                raise
+            setup_logging().warning("MCP 服务器预热时获取工具定义失败：%s %r", key[0], e)
+        finally:
+            await self._release(pooled, error)
+
+    def _start_prewarm(self, key: ServerKey, coro) -> None:
+        task = asyncio.create_task(coro, name=f"mcp-prewarm:{key[0]}")
+        self._prewarm_tasks.add(task)
+        task.add_done_callback(self._prewarm_tasks.discard)
+
+    async def _release(self, pooled: _PooledSession, error: Optional[BaseException] = None) -> None:
+        cond = self._condition()
+        async with cond:
+            pooled.inflight -= 1
+            pooled.last_used = time.monotonic()
+            cond.notify_all()
+        if error is not None and _is_broken(error):
+            setup_logging().warning("MCP 会话连接失效，关闭后重建：%s %r", pooled.key[0], error)
+            await self._close(pooled, "evicted_unhealthy")
+            return
+        if isinstance(error, (asyncio.CancelledError, asyncio.TimeoutError)) and not pooled.retired:
+            setup_logging().warning("MCP 工具调用超时或被取消，会话停止分配新请求：%s", pooled.key[0])
+            pooled.retired = True
+        if pooled.retired and pooled.inflight == 0:
+            # 后台关闭：调用方无需等待子进程退出
+            task = asyncio.create_task(self._close(pooled, "evicted_timeout"))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+    async def _with_session(self, key: ServerKey, fn) -> Any:
+        pooled = await self._acquire(key)
+        error: Optional[BaseException] = None
+        try:
+            return await fn(pooled)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            await self._release(pooled, error)
+
+    async def _janitor(self) -> None:
+        """后台巡检：关闭空闲超时的会话，ping 空闲会话并关闭无响应的会话。"""
+        interval = max(0.05, min(self.idle_ttl, self.health_interval, self.prewarm_grace) / 2.0)
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for sessions in list(self._sessions.values()):
+                for pooled in list(sessions):
+                    if pooled.inflight or pooled.closing:
+                        continue
+                    if pooled.speculative_until and now >= pooled.speculative_until:
+                        await self._close(pooled, "prewarm_expired")
+                    elif now - pooled.last_used >= self.idle_ttl:
+                        await self._close(pooled, "evicted_idle")
+                    elif now - pooled.last_checked >= self.health_interval:
+                        pooled.last_checked = now
+                        try:
+                            await asyncio.wait_for(pooled.session.send_ping(), self.connect_timeout)
+                        except Exception as e:
+                            setup_logging().warning("MCP 会话 ping 失败，关闭：%s %r", pooled.key[0], e)
+                            await self._close(pooled, "evicted_unhealthy")
+
+    async def _list_tool_defs(self, key: ServerKey, pooled: _PooledSession) -> List[Any]:
+        tools, cursor = [], None
+        while True:
+            page = await pooled.session.list_tools(cursor=cursor) if cursor else await pooled.session.list_tools()
+            tools.extend(page.tools)
+            cursor = page.nextCursor
+            if not cursor:
+                break
+        if self.tool_cache is not None:
+            await asyncio.to_thread(self.tool_cache.put, key, tools, pooled.server_info)
+        return tools
+
+    # ---- 对外接口 ----
+    def prewarm(self, configs: Iterable[Any], grace: Optional[float] = None) -> int:
+        """
+        在后台预热服务器：拉起会话、完成 initialize 并预取工具定义，立即返回（线程安全，可在任意线程调用）。
+
+        参数:
+            configs: MCPConfigItem 或配置字典。
+            grace: 预热会话等待被采用的宽限期（秒），默认 prewarm_grace。
+        返回:
+            提交预热的服务器数（已有会话或正在拉起的服务器在池内跳过，仍计入）。
+        """
+        keys = list(dict.fromkeys(server_key(c) for c in configs))
+        if not keys:
+            return 0
+        loop = self._ensure_loop()
+        grace = self.prewarm_grace if grace is None else max(0.0, float(grace))
+        for key in keys:
+            # 沿用调用方当前 span：预热的拉起与 list_tools 出现在规划阶段的链路下
+            coro = bind_current_span(self._prewarm(key, grace))
+            loop.call_soon_threadsafe(self._start_prewarm, key, coro)
+        return len(keys)
+
+    async def list_tools(self, key: ServerKey) -> List[Any]:
+        """列出服务器的全部 MCP 工具定义（处理分页）；配置了缓存时写入缓存。"""
+
+        with span("mcp.list_tools", {"mcp.server": key[0]}, kind="client") as sp:
+            tools = await self._submit(self._with_session(key, lambda p: self._list_tool_defs(key, p)))
+            sp.set_attribute("mcp.tools", len(tools))
+            return tools
+
+    async def call_tool(
+        self,
+        key: ServerKey,
+        name: str,
+        arguments: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        """
+        租用会话调用工具，返回 MCP CallToolResult。
+
+        参数:
+            timeout: 可选的超时（秒，含排队等待会话的时间）；调用中途超时的会话停止分配新请求并在空闲后关闭。
+            meta: 可选的请求 _meta（如 {"traceparent": ...}），随 tools/call 请求发送给服务器。
+        异常:
+            asyncio.TimeoutError：调用超时（timeout <= 0 时不发起调用）。
+        """
+        if timeout is not None and timeout <= 0:
+            raise asyncio.TimeoutError(f"MCP 工具调用未执行：已超过截止时间 {name}")
+        if meta:
+            call = self._with_session(key, lambda p: p.session.call_tool(name, arguments, meta=meta))
+        else:
+            call = self._with_session(key, lambda p: p.session.call_tool(name, arguments))
+        if timeout is not None:
+            call = asyncio.wait_for(call, timeout)
+        return await self._submit(call)
+
+    async def _tool_defs(self, key: ServerKey) -> List[Any]:
+        cached = self.tool_cache.get(key) if self.tool_cache is not None else None
+        if cached is not None:
+            return cached
+        warm = self._warm_tools.pop(key, None)
+        if warm is not None:
+            # 直接使用预热时预取的工具定义，预热会话视为已采用
+            await self._submit(self._adopt_key(key))
+            return warm
+        return await self.list_tools(key)
+
+    async def get_tools(self, configs: Iterable[Any]) -> List[BaseTool]:
+        """按计划的 mcp_config 构建 LangChain 工具（各服务器并行加载，命中缓存的服务器不联系），
+        工具调用经由池内会话执行。"""
+        keys = list(dict.fromkeys(server_key(c) for c in configs))
+        listed = await asyncio.gather(*(self._tool_defs(key) for key in keys))
+        return [
+            convert_mcp_tool_to_langchain_tool(_PooledToolSession(self, key), tool, server_name=key[0])
+            for key, tools in zip(keys, listed)
+            for tool in tools
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """会话池统计：服务器数、会话数、进行中请求数与租用/创建/淘汰计数。"""
+        sessions = [s for group in list(self._sessions.values()) for s in list(group)]
+        data: Dict[str, Any] = dict(self._stats)
+        data.update({
+            "servers": len(self._sessions),
+            "sessions": len(sessions),
+            "inflight": sum(s.inflight for s in sessions),
+            # 按需拉起的会话各有一次租用需等待拉起，其余（含采用预热会话）均为热租用
+            "warm_leases": data["leases"] - (data["sessions_created"] - data["prewarm_sessions"]),
+        })
+        if self.tool_cache is not None:
+            data["tool_cache"] = self.tool_cache.stats()
+        return data
+
+    def close(self, timeout: float = 10.0) -> None:
+        """关闭全部会话并停止池事件循环（进程退出时自动调用）。"""
+        loop = self._loop
+        if loop is None or not loop.is_running():
+            return
+
+        async def shutdown() -> None:
+            if self._janitor_future is not None:
+                self._janitor_future.cancel()
+            for task in list(self._prewarm_tasks):
+                task.cancel()
+            await asyncio.gather(*list(self._prewarm_tasks), return_exceptions=True)
+            pooled = [s for group in list(self._sessions.values()) for s in group]
+            await asyncio.gather(*(self._close(s) for s in pooled), return_exceptions=True)
+            await asyncio.gather(*list(self._background), return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._loop = None
+        self._cond = None
+
+
+def get_mcp_session_pool(settings: Settings) -> Optional[MCPSessionPool]:
+    """返回进程共享的 MCP 会话池；MCP_SESSION_POOL_ENABLED 关闭时返回 None。"""
+    global _POOL
+    if not settings.mcp_session_pool_enabled:
+        return None
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = MCPSessionPool(
+                    max_sessions_per_server=settings.mcp_pool_max_sessions_per_server,
+                    max_inflight_per_session=settings.mcp_pool_max_inflight_per_session,
+                    idle_ttl=settings.mcp_pool_idle_ttl,
+                    health_interval=settings.mcp_pool_health_interval,
+                    connect_timeout=settings.mcp_pool_connect_timeout,
+                    prewarm_grace=settings.mcp_prewarm_grace_seconds,
+                    tool_cache=(
+                        MCPToolSchemaCache(settings.mcp_tool_cache_path or None)
+                        if settings.mcp_tool_cache_enabled else None
+                    ),
+                )
+                atexit.register(_POOL.close)
+    return _POOL
+
+
+def get_mcp_session_pool_stats() -> Dict[str, Any]:
+    """返回会话池统计；未创建时返回空字典。"""
+    return _POOL.stats() if _POOL is not None else {}
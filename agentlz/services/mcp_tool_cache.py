@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+"""
+MCP 工具定义缓存
+
+按服务器配置缓存 list_tools 返回的工具定义（名称、描述、inputSchema），进程内保存并持久化为 JSON：
+- 指纹 = (name, transport, command, args) + 命令可执行文件与参数中脚本文件的 mtime/大小，
+  配置或服务器程序变化时指纹不同，条目自动失效；
+- 同时记录服务器 initialize 时上报的 serverInfo（名称/版本），会话真正建立后版本不一致则删除条目；
+- 命中时执行器无需联系服务器即可构建工具列表，服务器在首次调用工具时才拉起。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from mcp.types import Tool
+
+from agentlz.core.logger import setup_logging
+
+
+# 会话池键：(name, transport, command, args)
+ServerKey = Tuple[str, str, str, Tuple[str, ...]]
+
+
+def _file_stamp(path: Optional[str]) -> Optional[List[Any]]:
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [os.path.abspath(path), st.st_mtime_ns, st.st_size]
+
+
+def fingerprint(key: ServerKey) -> str:
+    """计算服务器配置指纹：配置本身 + 命令与脚本参数对应文件的 mtime/大小。"""
+    _, _, command, args = key
+    stamps = [_file_stamp(shutil.which(command) or command)]
+    stamps.extend(_file_stamp(a) for a in args if os.path.isfile(a))
+    raw = json.dumps([list(key[:3]), list(args), stamps], ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class MCPToolSchemaCache:
+    """MCP 工具定义缓存（内存 + JSON 文件）
+
+    参数:
+        path: 持久化文件路径；None 表示仅在内存中缓存。
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "load_errors": 0}
+        self._load()
+
+    @staticmethod
+    def _id(key: ServerKey) -> str:
+        return json.dumps([key[0], key[1], key[2], list(key[3])], ensure_ascii=False)
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._entries = {k: v for k, v in (data.get("entries") or {}).items() if isinstance(v, dict)}
+        except Exception as e:
+            self._stats["load_errors"] += 1
+            setup_logging().warning("读取 MCP 工具缓存失败，忽略：%s %r", self.path, e)
+
+    def _persist(self) -> None:
+        """原子写入持久化文件（调用方需持有 _lock）。"""
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"entries": self._entries}, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            setup_logging().warning("写入 MCP 工具缓存失败：%s %r", self.path, e)
+
+    def get(self, key: ServerKey) -> Optional[List[Tool]]:
+        """返回缓存的工具定义；未缓存或指纹不匹配（配置/程序已变化）时返回 None。"""
+        entry = self._entries.get(self._id(key))
+        if entry is None or entry.get("fingerprint") != fingerprint(key):
+            self._stats["misses"] += 1
+            return None
+        try:
+            tools = [Tool.model_validate(t) for t in entry.get("tools") or []]
+        except Exception:
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        return tools
+
+    def put(self, key: ServerKey, tools: List[Any], server_info: Optional[Dict[str, Any]] = None) -> None:
+        """写入工具定义与服务器上报的 serverInfo，并持久化。"""
+        entry = {
+            "fingerprint": fingerprint(key),
+            "server_info": server_info or {},
+            "tools": [t.model_dump(mode="json", by_alias=True, exclude_none=True) for t in tools],
+            "cached_at": time.time(),
+        }
+        with self._lock:
+            self._entries[self._id(key)] = entry
+            self._persist()
+
+    def verify(self, key: ServerKey, server_info: Optional[Dict[str, Any]]) -> bool:
+        """会话建立后核对服务器上报的 serverInfo；与缓存不一致时删除条目并返回 False。"""
+        entry = self._entries.get(self._id(key))
+        if entry is None or not server_info or entry.get("server_info") == server_info:
+            return True
+        setup_logging().info("MCP 服务器版本变化，工具缓存失效：%s %s -> %s",
+                             key[0], entry.get("server_info"), server_info)
+        self.invalidate(key)
+        return False
+
+    def invalidate(self, key: ServerKey) -> None:
+        with self._lock:
+            if self._entries.pop(self._id(key), None) is not None:
+                self._stats["invalidations"] += 1
+                self._persist()
+
+    def stats(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = dict(self._stats)
+        data["entries"] = len(self._entries)
+        return data
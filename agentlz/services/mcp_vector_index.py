@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+"""
+MCP 工具语义检索
+
+对内存 MCP 目录（mcp_catalog）中每条记录的 name/category/description 建立 FAISS 向量索引，
+按自然语言需求返回 top-k 工具，排序分数为相似度与 trust_score 的加权：
+    score = (1 - trust_weight) * cosine + trust_weight * trust_score / max_trust_score
+- 索引随目录变化增量重建：按记录内容哈希比较，仅对新增/变更记录重新编码，删除已移除的记录；
+- 配置持久化目录时保存索引，重启后加载并只补齐差异；索引文件名与内容哈希都包含嵌入模型名，
+  更换 HF_EMBEDDING_MODEL 后不会复用旧模型的向量，加载到维度不符的索引时丢弃重建；
+- 同步串行执行，记录编码在索引锁之外完成，FAISS 的删除/写入与检索都在索引锁内进行；
+- 进程共享索引在后台线程构建（等待目录加载、加载嵌入模型并首次编码整个目录），构建完成前
+  get_mcp_vector_index 返回 None；构建失败时按退避间隔在之后的调用中重试。
+"""
+
+import hashlib
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from agentlz.config.settings import Settings
+from agentlz.core.logger import setup_logging
+from agentlz.services.faiss_service import FAISSVectorService
+from agentlz.services.mcp_catalog import MCPCatalog
+
+
+_INDEX: Optional["MCPVectorIndex"] = None
+_INDEX_LOCK = threading.Lock()
+_BUILDER: Optional[threading.Thread] = None
+# 构建失败后的重试退避（秒）：首次 30 秒，逐次翻倍，最长 600 秒
+_BUILD_RETRY_BASE = 30.0
+_BUILD_RETRY_MAX = 600.0
+_BUILD_FAILURES = 0
+_BUILD_RETRY_AT = 0.0
+# 后台构建等待目录首次加载的最长时间（秒）
+_CATALOG_WAIT = 120.0
+
+
+def _document(row: Dict[str, Any]) -> str:
+    """用于编码的记录文本。"""
+    parts = [str(row.get("name") or ""), str(row.get("category") or ""), str(row.get("description") or "")]
+    return "：".join(p for p in parts if p)
+
+
+def _digest(text: str, model_name: str = "") -> str:
+    return hashlib.sha1(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _index_name(base: str, model_name: str) -> str:
+    """按嵌入模型区分的索引文件名（模型名可能含路径分隔符，取其哈希）。"""
+    if not model_name:
+        return base
+    return f"{base}-{hashlib.sha1(model_name.encode('utf-8')).hexdigest()[:12]}"
+
+
+class MCPVectorIndex:
+    """MCP 工具向量索引
+
+    参数:
+        catalog: 内存 MCP 目录（记录来源，变化时回调 sync）。
+        embeddings: LangChain Embeddings（需归一化向量，get_hf_embeddings 默认归一化）。
+        persist_dir: 索引持久化目录；None 表示仅在内存中维护。
+        index_name: 索引文件名。
+        trust_weight: trust_score 在排序分数中的权重（0~1）。
+        fetch_factor: 向量检索的候选数为 k * fetch_factor，再按加权分数重排。
+        model_name: 嵌入模型名；计入索引文件名与内容哈希，模型变化时重新编码。
+    """
+
+    def __init__(
+        self,
+        catalog: MCPCatalog,
+        embeddings: Any,
+        persist_dir: Optional[str] = None,
+        index_name: str = "mcp_agents",
+        trust_weight: float = 0.3,
+        fetch_factor: int = 4,
+        model_name: str = "",
+    ) -> None:
+        self.catalog = catalog
+        self.embeddings = embeddings
+        self.persist_dir = persist_dir
+        self.model_name = model_name
+        self.service = FAISSVectorService(persist_dir or "", _index_name(index_name, model_name))
+        self.trust_weight = min(1.0, max(0.0, float(trust_weight)))
+        self.fetch_factor = max(1, int(fetch_factor))
+        # _lock 保护 FAISS 对象与检索用的记录快照；_sync_lock 串行化 sync（编码期间不持有 _lock）
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._vectorstore = None
+        # 文档 ID -> 内容哈希（与索引中的向量一一对应）
+        self._digests: Dict[str, str] = {}
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._max_trust = 0.0
+        self._stats = {"syncs": 0, "embedded": 0, "deleted": 0, "searches": 0}
+        if persist_dir:
+            self._vectorstore = self.service.load_or_create(embeddings)
+            if self._vectorstore is not None and self._vectorstore.index.d != len(embeddings.embed_query("维度")):
+                # 维度与当前模型不符（旧模型写入的索引）：丢弃，由首次同步全部重新编码
+                setup_logging().warning("MCP 向量索引维度与嵌入模型不符，重建索引")
+                self._vectorstore = None
+            if self._vectorstore is not None:
+                for doc_id, doc in getattr(self._vectorstore.docstore, "_dict", {}).items():
+                    self._digests[doc_id] = (doc.metadata or {}).get("digest", "")
+
+    def sync(self, catalog: Optional[MCPCatalog] = None) -> Dict[str, int]:
+        """按目录当前快照增量更新索引。
+
+        返回:
+            {"embedded": 新编码条数, "deleted": 删除条数}
+        """
+        rows = (catalog or self.catalog).rows()
+        wanted: Dict[str, Dict[str, Any]] = {str(r.get("id", r.get("name"))): r for r in rows}
+        with self._sync_lock:
+            texts: Dict[str, str] = {doc_id: _document(row) for doc_id, row in wanted.items()}
+            digests = {doc_id: _digest(text, self.model_name) for doc_id, text in texts.items()}
+            changed = [doc_id for doc_id, digest in digests.items() if self._digests.get(doc_id) != digest]
+            removed = [doc_id for doc_id in self._digests if doc_id not in wanted]
+            stale = removed + [doc_id for doc_id in changed if doc_id in self._digests]
+            vectors = self.embeddings.embed_documents([texts[doc_id] for doc_id in changed]) if changed else []
+            with self._lock:
+                if stale and self._vectorstore is not None:
+                    self.service.delete(self._vectorstore, stale)
+                    for doc_id in stale:
+                        self._digests.pop(doc_id, None)
+                if changed:
+                    self._vectorstore = self.service.add_embeddings(
+                        self._vectorstore,
+                        texts=[texts[doc_id] for doc_id in changed],
+                        vectors=vectors,
+                        metadatas=[{"id": doc_id, "digest": digests[doc_id]} for doc_id in changed],
+                        ids=changed,
+                        embeddings=self.embeddings,
+                    )
+                    for doc_id in changed:
+                        self._digests[doc_id] = digests[doc_id]
+                self._rows = wanted
+                self._max_trust = max((float(r.get("trust_score") or 0.0) for r in rows), default=0.0)
+                self._stats["syncs"] += 1
+                self._stats["embedded"] += len(changed)
+                self._stats["deleted"] += len(removed)
+            # 持久化只读取索引；其他写入者都需要 _sync_lock，因此可在 _lock 之外保存
+            if (changed or stale) and self.persist_dir and self._vectorstore is not None:
+                self.service.save(self._vectorstore)
+        if changed or removed:
+            setup_logging().info("MCP 向量索引增量更新：编码 %d 条，删除 %d 条", len(changed), len(removed))
+        return {"embedded": len(changed), "deleted": len(removed)}
+
+    def search(self, need: str, k: int = 5) -> List[Dict[str, Any]]:
+        """按自然语言需求检索工具，返回按加权分数降序的记录副本（附 similarity/score 字段）。"""
+        need = (need or "").strip()
+        with self._lock:
+            self._stats["searches"] += 1
+            empty = self._vectorstore is None
+        if not need or k <= 0 or empty:
+            return []
+        # 查询编码在锁外进行；FAISS 检索与 sync 的删除/写入互斥
+        vector = self.embeddings.embed_query(need)
+        with self._lock:
+            rows, max_trust = self._rows, self._max_trust
+            hits = self.service.similarity_search_with_score_by_vector(
+                self._vectorstore, vector, k=k * self.fetch_factor
+            )
+        results: List[Dict[str, Any]] = []
+        for doc, distance in hits:
+            row = rows.get(str((doc.metadata or {}).get("id")))
+            if row is None:
+                continue
+            # 归一化向量的平方 L2 距离 d 与余弦相似度满足 cos = 1 - d / 2
+            similarity = 1.0 - float(distance) / 2.0
+            trust = float(row.get("trust_score") or 0.0) / max_trust if max_trust > 0 else 0.0
+            item = dict(row)
+            item.pop("updated_at", None)
+            item["similarity"] = round(similarity, 4)
+            item["score"] = round((1.0 - self.trust_weight) * similarity + self.trust_weight * trust, 4)
+            results.append(item)
+        results.sort(key=lambda r: r["score"], reverse=True)
+        return results[:k]
+
+    def stats(self) -> Dict[str, Any]:
+        """返回索引条目数与增量编码统计。"""
+        with self._lock:
+            data: Dict[str, Any] = dict(self._stats)
+            data["entries"] = len(self._digests)
+        return data
+
+
+def _build_index(settings: Settings, catalog: MCPCatalog) -> None:
+    """后台构建进程共享索引：等待目录加载，加载嵌入模型与持久化索引并完成首次同步后注册目录回调。
+    失败时清除构建线程标记并设置重试时间。"""
+    global _INDEX, _BUILDER, _BUILD_FAILURES, _BUILD_RETRY_AT
+    try:
+        if not catalog.wait_ready(_CATALOG_WAIT):
+            raise RuntimeError("MCP 目录尚未加载完成")
+        from agentlz.core.embedding_model_factory import get_hf_embeddings
+
+        model_name = settings.hf_embedding_model or "BAAI/bge-small-zh-v1.5"
+        index = MCPVectorIndex(
+            catalog,
+            embeddings=get_hf_embeddings(model_name=model_name),
+            persist_dir=settings.mcp_vector_index_dir or None,
+            trust_weight=settings.mcp_vector_trust_weight,
+            model_name=model_name,
+        )
+        index.sync()
+        # 首次同步成功后才注册回调；再同步一次，补上注册前目录发生的变化
+        catalog.add_listener(index.sync)
+        index.sync()
+    except Exception as e:
+        with _INDEX_LOCK:
+            _BUILD_FAILURES += 1
+            delay = min(_BUILD_RETRY_MAX, _BUILD_RETRY_BASE * 2 ** (_BUILD_FAILURES - 1))
+            _BUILD_RETRY_AT = time.monotonic() + delay
+            _BUILDER = None
+        setup_logging().warning("MCP 向量索引构建失败，%.0f 秒后重试：%r", delay, e)
+        return
+    with _INDEX_LOCK:
+        _INDEX = index
+        _BUILD_FAILURES = 0
+
+
+def get_mcp_vector_index(settings: Settings) -> Optional[MCPVectorIndex]:
+    """返回进程共享的 MCP 向量索引（依附内存 MCP 目录，目录变化时自动增量更新）；
+    MCP_VECTOR_SEARCH_ENABLED 关闭、目录不可用或索引尚在后台构建时返回 None。
+
+    首次调用启动后台构建线程（加载嵌入模型并编码整个目录），不阻塞调用方；应用启动时调用一次以提前构建。
+    构建失败后按退避间隔（30 秒起逐次翻倍，最长 600 秒）在之后的调用中重新构建。
+    """
+    global _BUILDER
+    if not settings.mcp_vector_search_enabled:
+        return None
+    if _INDEX is None and _BUILDER is None and time.monotonic() >= _BUILD_RETRY_AT:
+        with _INDEX_LOCK:
+            if _INDEX is None and _BUILDER is None and time.monotonic() >= _BUILD_RETRY_AT:
+                from agentlz.services.mcp_catalog import get_mcp_catalog
+
+                catalog = get_mcp_catalog(settings)
+                if catalog is None:
+                    return None
+                _BUILDER = threading.Thread(
+                    target=_build_index, args=(settings, catalog), name="mcp-vector-index-build", daemon=True
+                )
+                _BUILDER.start()
+    return _INDEX
+
+
+def get_mcp_vector_index_stats() -> Dict[str, Any]:
+    """返回向量索引统计；未创建时返回空字典。"""
+    return _INDEX.stats() if _INDEX is not None else {}
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+"""
+MCP 服务器预热（规划与服务器启动重叠）
+
+Planner 代理按关键词查询 MCP 配置后还要再经过若干轮模型往返才输出计划，执行器随后才开始拉起服务器。
+MCPWarmupCallback 作为 LangChain 回调挂在 Planner 的代理调用上，观察查询工具的返回结果：
+- 每次查询结果取排序最靠前的候选（单关键词查询取首条，批量查询取每个关键词分组的首条），
+  交给会话池 prewarm 在后台拉起、initialize 并预取工具定义，不阻塞 Planner；
+- 每次规划最多预热 max_servers 个服务器，同一服务器只提交一次；
+- 执行器经由同一会话池加载工具与调用工具时直接采用预热会话；未被计划选中的预热会话在宽限期后由会话池关闭。
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from agentlz.config.settings import Settings
+from agentlz.services.mcp_session_pool import MCPSessionPool, get_mcp_session_pool, server_key
+
+
+def _is_config(item: Any) -> bool:
+    return isinstance(item, dict) and bool(item.get("name")) and bool(item.get("command"))
+
+
+def extract_mcp_configs(output: Any, per_lookup: int = 1) -> List[Dict[str, Any]]:
+    """
+    从查询工具的输出中提取最可能被选中的 MCP 配置。
+
+    参数:
+        output: 工具输出（ToolMessage、JSON 字符串或已解析的列表/字典）。
+            支持配置列表（get_mcp_config_by_keyword / search_mcp_tools）与
+            {"groups": {关键词: [名称]}, "configs": [...]}（get_mcp_configs_by_keywords）。
+        per_lookup: 每个关键词取排序靠前的候选数。
+    返回:
+        配置字典列表；无法解析或不含配置时为空列表。
+    """
+    data = getattr(output, "content", output)
+    if isinstance(data, (str, bytes)):
+        try:
+            data = json.loads(data)
+        except ValueError:
+            return []
+    if isinstance(data, list):
+        return [c for c in data if _is_config(c)][:per_lookup]
+    if not isinstance(data, dict):
+        return []
+    configs = {c["name"]: c for c in data.get("configs") or [] if _is_config(c)}
+    picked: List[Dict[str, Any]] = []
+    for names in (data.get("groups") or {}).values():
+        for name in list(names or [])[:per_lookup]:
+            config = configs.get(name)
+            if config is not None and config not in picked:
+                picked.append(config)
+    return picked
+
+
+class MCPWarmupCallback(BaseCallbackHandler):
+    """观察 Planner 查询工具的结果，把候选 MCP 服务器交给会话池预热（单次规划使用一个实例）
+
+    参数:
+        pool: MCP 会话池。
+        max_servers: 本次规划最多预热的服务器数。
+        per_lookup: 每个关键词预热排序靠前的候选数。
+    """
+
+    run_inline = True
+
+    def __init__(self, pool: MCPSessionPool, max_servers: int = 4, per_lookup: int = 1) -> None:
+        self.pool = pool
+        self.max_servers = max(0, int(max_servers))
+        self.per_lookup = max(1, int(per_lookup))
+        self.requested: List[str] = []
+        self._keys: set = set()
+
+    def observe(self, configs: List[Dict[str, Any]]) -> int:
+        """提交预热（跳过本次已提交的服务器与超出上限的部分），返回新提交的服务器数。"""
+        fresh: List[Dict[str, Any]] = []
+        for config in configs:
+            key = server_key(config)
+            if key in self._keys or len(self._keys) >= self.max_servers:
+                continue
+            self._keys.add(key)
+            self.requested.append(key[0])
+            fresh.append(config)
+        return self.pool.prewarm(fresh) if fresh else 0
+
+    def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        try:
+            self.observe(extract_mcp_configs(output, self.per_lookup))
+        except Exception:
+            # 预热只是优化，任何失败都不影响规划
+            pass
+
+
+def create_mcp_warmup(settings: Settings) -> Optional[MCPWarmupCallback]:
+    """按配置创建本次规划的预热回调；预热关闭或会话池关闭时返回 None。"""
+    if not settings.mcp_prewarm_enabled or settings.mcp_prewarm_max_servers <= 0:
+        return None
+    pool = get_mcp_session_pool(settings)
+    if pool is None:
+        return None
+    return MCPWarmupCallback(pool, max_servers=settings.mcp_prewarm_max_servers)
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+"""
+语义计划缓存
+
+许多用户请求只是同一任务的不同说法。本模块对规范化后的用户输入做向量化，
+在一个小型内存向量索引（numpy 余弦相似度）中查找历史 WorkflowPlan：
+- 相似度超过阈值，且计划引用的 MCP 条目仍存在、配置（transport/command/args）未变时直接返回缓存计划；
+- MCP 目录指纹变化（任意增删改）时清空全部条目；
+- 统计命中率与节省的规划耗时（命中条目原始规划耗时 - 查找耗时）。
+
+相近说法的请求参数可能不同（"计算 3 的平方" 与 "计算 5 的平方"，向量几乎相同）：instructions、steps 的
+task/tool/args 都是按原请求填写的字面值（执行器把 instructions 作为系统消息注入，依赖图/直接执行模式按 steps 执行），
+因此只缓存与输入无关的部分（execution_chain 与 mcp_config），命中后由执行器按新请求完成任务。
+"""
+
+import copy
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from agentlz.config.settings import Settings
+from agentlz.core.logger import setup_logging
+from agentlz.schemas.workflow import WorkflowPlan
+
+
+CatalogLookup = Callable[[List[str]], List[Dict[str, Any]]]
+CatalogFingerprint = Callable[[], str]
+
+_TRIM_PUNCT = " \t\r\n。．.!！?？,，;；:：、~～\"'“”‘’"
+
+_CACHE: Optional["SemanticPlanCache"] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def _space(match: "re.Match[str]") -> str:
+    text, start, end = match.string, match.start(), match.end()
+    left = text[start - 1] if start > 0 else ""
+    right = text[end] if end < len(text) else ""
+    return " " if left.isascii() and left.isalnum() and right.isascii() and right.isalnum() else ""
+
+
+def normalize_input(text: str) -> str:
+    """规范化用户输入：NFKC（全角转半角）、小写、去除首尾标点；
+    空白仅在两侧均为英文字母/数字时保留为单个空格（中文与数字之间的空格无语义）。"""
+    text = unicodedata.normalize("NFKC", text or "").lower().strip(_TRIM_PUNCT)
+    return re.sub(r"\s+", _space, text)
+
+
+def _config_signature(item: Any) -> tuple:
+    """MCP 配置的可比较签名（transport/command/args）。"""
+    get = item.get if isinstance(item, dict) else (lambda k, d=None: getattr(item, k, d))
+    return (get("transport", "stdio"), get("command", ""), tuple(get("args", []) or []))
+
+
+@dataclass
+class _PlanEntry:
+    """缓存条目。"""
+    normalized: str
+    plan: WorkflowPlan
+    plan_latency_s: float
+    created_at: float
+    hits: int = 0
+
+
+class SemanticPlanCache:
+    """语义计划缓存
+
+    参数:
+        embeddings: LangChain Embeddings（用于 embed_query）。
+        threshold: 命中所需的最低余弦相似度。
+        max_entries: 最大条目数，超出时淘汰最早写入的条目。
+        ttl_seconds: 条目有效期（秒），<=0 表示不过期。
+        catalog_lookup: 按名称查询 MCP 记录的函数，默认 mcp_repository.get_mcp_by_names。
+        catalog_fingerprint: 返回 MCP 目录指纹的函数，默认 mcp_repository.get_mcp_catalog_fingerprint。
+        catalog_check_interval: 两次目录指纹检查的最小间隔（秒）。
+    """
+
+    def __init__(
+        self,
+        embeddings: Any,
+        threshold: float = 0.92,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600.0,
+        catalog_lookup: Optional[CatalogLookup] = None,
+        catalog_fingerprint: Optional[CatalogFingerprint] = None,
+        catalog_check_interval: float = 10.0,
+    ) -> None:
+        if catalog_lookup is None or catalog_fingerprint is None:
+            from agentlz.repositories import mcp_repository
+
+            catalog_lookup = catalog_lookup or mcp_repository.get_mcp_by_names
+            catalog_fingerprint = catalog_fingerprint or mcp_repository.get_mcp_catalog_fingerprint
+        self.embeddings = embeddings
+        self.threshold = float(threshold)
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.catalog_lookup = catalog_lookup
+        self.catalog_fingerprint = catalog_fingerprint
+        self.catalog_check_interval = float(catalog_check_interval)
+        self._lock = threading.Lock()
+        self._entries: List[_PlanEntry] = []
+        self._vectors: Optional[np.ndarray] = None
+        self._fingerprint: Optional[str] = None
+        self._fingerprint_checked_at = 0.0
+        self._stats = {
+            "lookups": 0,
+            "hits": 0,
+            "misses": 0,
+            "rejected": 0,
+            "stores": 0,
+            "invalidations": 0,
+            "saved_latency_s": 0.0,
+        }
+
+    # ---- 内部工具 ----
+    def _embed(self, normalized: str) -> np.ndarray:
+        vec = np.asarray(self.embeddings.embed_query(normalized), dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    def _current_fingerprint(self, force: bool = False) -> Optional[str]:
+        """按间隔读取目录指纹；读取失败时返回 None（视为无法确认，缓存不可用）。"""
+        now = time.monotonic()
+        if not force and self._fingerprint is not None and now - self._fingerprint_checked_at < self.catalog_check_interval:
+            return self._fingerprint
+        try:
+            fingerprint = self.catalog_fingerprint()
+        except Exception as e:
+            setup_logging().warning("读取 MCP 目录指纹失败，跳过计划缓存：%r", e)
+            return None
+        self._fingerprint_checked_at = now
+        return fingerprint
+
+    def _sync_catalog(self, force: bool = False) -> bool:
+        """目录指纹变化时清空缓存；返回目录状态是否可确认。"""
+        fingerprint = self._current_fingerprint(force)
+        if fingerprint is None:
+            return False
+        with self._lock:
+            if self._fingerprint is not None and fingerprint != self._fingerprint and self._entries:
+                self._entries = []
+                self._vectors = None
+                self._stats["invalidations"] += 1
+            self._fingerprint = fingerprint
+        return True
+
+    def _drop(self, index: int) -> None:
+        """移除第 index 个条目（调用方需持有 _lock）。"""
+        del self._entries[index]
+        if self._vectors is not None:
+            self._vectors = np.delete(self._vectors, index, axis=0) if self._entries else None
+
+    def _plan_still_valid(self, plan: WorkflowPlan) -> bool:
+        """校验计划引用的 MCP 条目仍存在且配置未变。"""
+        names = [item.name for item in plan.mcp_config]
+        if not names:
+            return True
+        try:
+            rows = self.catalog_lookup(names)
+        except Exception as e:
+            setup_logging().warning("校验缓存计划的 MCP 条目失败：%r", e)
+            return False
+        current = {r.get("name"): _config_signature(r) for r in rows}
+        return all(current.get(item.name) == _config_signature(item) for item in plan.mcp_config)
+
+    # ---- 对外接口 ----
+    def lookup(self, user_input: str) -> Optional[WorkflowPlan]:
+        """查找语义相近的历史计划；命中时返回其深拷贝，否则返回 None。"""
+        start = time.perf_counter()
+        with self._lock:
+            self._stats["lookups"] += 1
+            empty = not self._entries
+        if empty or not self._sync_catalog():
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+
+        normalized = normalize_input(user_input)
+        query = self._embed(normalized)
+        with self._lock:
+            if not self._entries or self._vectors is None:
+                self._stats["misses"] += 1
+                return None
+            scores = self._vectors @ query
+            index = int(np.argmax(scores))
+            entry = self._entries[index]
+            expired = self.ttl_seconds > 0 and time.time() - entry.created_at > self.ttl_seconds
+            if expired:
+                self._drop(index)
+            if expired or float(scores[index]) < self.threshold:
+                self._stats["misses"] += 1
+                return None
+
+        if not self._plan_still_valid(entry.plan):
+            with self._lock:
+                for i, existing in enumerate(self._entries):
+                    if existing is entry:
+                        self._drop(i)
+                        break
+                self._stats["rejected"] += 1
+                self._stats["misses"] += 1
+            return None
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            entry.hits += 1
+            self._stats["hits"] += 1
+            self._stats["saved_latency_s"] += max(0.0, entry.plan_latency_s - elapsed)
+        return copy.deepcopy(entry.plan)
+
+    def store(self, user_input: str, plan: WorkflowPlan, plan_latency_s: float) -> bool:
+        """写入一条成功生成的计划；空计划或目录状态无法确认时不写入。
+        只保存 execution_chain 与 mcp_config：instructions 与 steps 含原请求的字面值，命中时不能复用。"""
+        if not plan.execution_chain and not plan.mcp_config:
+            return False
+        if not self._sync_catalog():
+            return False
+        normalized = normalize_input(user_input)
+        vec = self._embed(normalized)
+        cached = WorkflowPlan(
+            execution_chain=list(plan.execution_chain),
+            mcp_config=copy.deepcopy(plan.mcp_config),
+        )
+        entry = _PlanEntry(
+            normalized=normalized,
+            plan=cached,
+            plan_latency_s=float(plan_latency_s),
+            created_at=time.time(),
+        )
+        with self._lock:
+            # 相同规范化输入只保留最新计划
+            for i, existing in enumerate(self._entries):
+                if existing.normalized == normalized:
+                    self._drop(i)
+                    break
+            self._entries.append(entry)
+            row = vec.reshape(1, -1)
+            self._vectors = row if self._vectors is None else np.vstack([self._vectors, row])
+            while len(self._entries) > self.max_entries:
+                self._drop(0)
+            self._stats["stores"] += 1
+        return True
+
+    def invalidate(self) -> None:
+        """清空全部条目。"""
+        with self._lock:
+            self._entries = []
+            self._vectors = None
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中率与节省的规划耗时等统计快照。"""
+        with self._lock:
+            data: Dict[str, Any] = dict(self._stats)
+            data["entries"] = len(self._entries)
+        lookups = data["lookups"]
+        data["hit_rate"] = round(data["hits"] / lookups, 4) if lookups else 0.0
+        data["saved_latency_s"] = round(data["saved_latency_s"], 3)
+        data["threshold"] = self.threshold
+        return data
+
+
+def get_plan_cache(settings: Settings) -> Optional[SemanticPlanCache]:
+    """返回进程共享的语义计划缓存；PLAN_CACHE_ENABLED 关闭时返回 None。"""
+    global _CACHE
+    if not settings.plan_cache_enabled:
+        return None
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                from agentlz.core.embedding_model_factory import get_hf_embeddings
+
+                _CACHE = SemanticPlanCache(
+                    embeddings=get_hf_embeddings(model_name=settings.hf_embedding_model),
+                    threshold=settings.plan_cache_threshold,
+                    max_entries=settings.plan_cache_max_entries,
+                    ttl_seconds=settings.plan_cache_ttl_seconds,
+                    catalog_check_interval=settings.plan_cache_catalog_check_interval,
+                )
+    return _CACHE
+
+
+def get_plan_cache_stats() -> Dict[str, Any]:
+    """返回计划缓存统计；未创建时返回空字典。"""
+    return _CACHE.stats() if _CACHE is not None else {}
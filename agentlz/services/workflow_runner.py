@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+"""
+工作流运行器（全局并发上限 + 按租户加权公平排队）
+
+FastAPI 进程内所有工作流执行（规划 + 执行）先向运行器申请运行名额：
+- 全局同时运行的工作流数不超过 max_concurrency，其余按租户（TENANT_ID_HEADER）分别排队；
+- 加权公平调度（start-time fair queuing）：每个租户维护虚拟时间，每启动一个工作流前进 1/权重，
+  名额空出时启动虚拟时间最小的租户的队首；空闲后重新排队的租户从当前虚拟时钟开始，不能囤积额度。
+  因此一个租户提交大量工作流时，其它租户的新请求仍按权重比例获得名额；
+- 单租户排队数超过 max_queue_per_tenant 或总排队数超过 max_queue_total 时拒绝（HTTP 层返回 429）；
+- 租户 id 来自请求头，租户表不能无限增长：没有排队与运行中工作流、且虚拟时间不超前于虚拟时钟的租户立即移除
+  （再次出现时从当前虚拟时钟开始，与保留时的行为相同）；租户数达到 max_tenants 时移除所有空闲租户，
+  仍然达到上限则拒绝新租户；
+- 统计：各租户排队深度、运行数、接纳/拒绝次数与排队等待时间分位数（仅保留中的租户）。
+
+与 LLM 调度器一致，名额等待以 (事件循环, Future) 登记，释放时 call_soon_threadsafe 唤醒，
+可被多个事件循环与线程共享。
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+from agentlz.config.settings import Settings
+from agentlz.core.stats import percentile
+
+
+DEFAULT_TENANT = "default"
+
+_RUNNER: Optional["WorkflowRunner"] = None
+_RUNNER_LOCK = threading.Lock()
+
+# 每个租户保留的最近等待时间样本数（用于分位数）
+_WAIT_SAMPLES = 512
+
+
+class WorkflowQueueFull(Exception):
+    """租户队列或总队列已满，工作流被拒绝。"""
+
+    def __init__(self, tenant_id: str, message: str) -> None:
+        super().__init__(message)
+        self.tenant_id = tenant_id
+
+
+def parse_tenant_weights(spec: Optional[str]) -> Dict[str, float]:
+    """解析 "tenant_a:3,tenant_b:1" 形式的租户权重；格式错误或非正数的条目忽略。"""
+    weights: Dict[str, float] = {}
+    for item in (spec or "").split(","):
+        name, sep, value = item.strip().rpartition(":")
+        if not sep or not name.strip():
+            continue
+        try:
+            weight = float(value)
+        except ValueError:
+            continue
+        if weight > 0:
+            weights[name.strip()] = weight
+    return weights
+
+
+def _wake(fut: asyncio.Future) -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+@dataclass(eq=False)
+class RunTicket:
+    """一次工作流运行的名额申请：queued -> running -> done（排队中取消直接 done）。"""
+    tenant_id: str
+    runner: "WorkflowRunner"
+    state: str = "queued"
+    enqueued_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+    loop: Optional[asyncio.AbstractEventLoop] = None
+    future: Optional[asyncio.Future] = None
+
+    @property
+    def wait_ms(self) -> float:
+        """排队等待时间（毫秒）；尚未开始时为已等待的时间。"""
+        end = self.started_at if self.started_at is not None else time.monotonic()
+        return round((end - self.enqueued_at) * 1000.0, 1)
+
+    async def wait(self) -> None:
+        """等待轮到本工作流运行；等待期间被取消时退出队列。"""
+        if self.future is None:
+            return
+        try:
+            await self.future
+        except BaseException:
+            self.release()
+            raise
+
+    def release(self) -> None:
+        """归还名额（运行结束或放弃排队）；可重复调用。"""
+        self.runner._release(self)
+
+
+@dataclass
+class _TenantQueue:
+    weight: float
+    queue: Deque[RunTicket] = field(default_factory=deque)
+    vtime: float = 0.0
+    running: int = 0
+    admitted: int = 0
+    rejected: int = 0
+    completed: int = 0
+    waits: Deque[float] = field(default_factory=lambda: deque(maxlen=_WAIT_SAMPLES))
+
+
+class WorkflowRunner:
+    """全局并发受限、按租户加权公平排队的工作流运行器
+
+    参数:
+        max_concurrency: 同时运行的工作流数上限。
+        max_queue_per_tenant: 单个租户的排队数上限（不含运行中）。
+        max_queue_total: 全部租户的排队总数上限。
+        weights: 租户权重 {租户: 权重}，权重越大分得的名额比例越高。
+        default_weight: 未配置租户的权重。
+        max_tenants: 同时跟踪的租户数上限。
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        max_queue_per_tenant: int = 50,
+        max_queue_total: int = 500,
+        weights: Optional[Dict[str, float]] = None,
+        default_weight: float = 1.0,
+        max_tenants: int = 10000,
+    ) -> None:
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue_per_tenant = max(0, int(max_queue_per_tenant))
+        self.max_queue_total = max(0, int(max_queue_total))
+        self.weights = dict(weights or {})
+        self.default_weight = float(default_weight) if default_weight > 0 else 1.0
+        self.max_tenants = max(1, int(max_tenants))
+        self._tenants: Dict[str, _TenantQueue] = {}
+        self._running = 0
+        self._queued = 0
+        self._rejected = 0
+        self._vclock = 0.0
+        self._lock = threading.Lock()
+
+    # ---- 调度（调用方需持有 _lock） ----
+    def _tenant(self, tenant_id: str) -> _TenantQueue:
+        tenant = self._tenants.get(tenant_id)
+        if tenant is None:
+            if len(self._tenants) >= self.max_tenants:
+                # 租户表已满：放弃空闲租户尚未用完的虚拟时间超前量，移除全部空闲租户
+                self._evict_idle(force=True)
+                if len(self._tenants) >= self.max_tenants:
+                    self._rejected += 1
+                    raise WorkflowQueueFull(tenant_id, f"活跃租户数已达上限 {self.max_tenants}")
+            tenant = _TenantQueue(weight=self.weights.get(tenant_id, self.default_weight), vtime=self._vclock)
+            self._tenants[tenant_id] = tenant
+        return tenant
+
+    def _evictable(self, tenant: _TenantQueue) -> bool:
+        # 空闲且虚拟时间不超前：重新创建时 vtime 取虚拟时钟，与保留该租户的调度结果一致
+        return not tenant.queue and not tenant.running and tenant.vtime <= self._vclock
+
+    def _evict_idle(self, force: bool = False) -> None:
+        for tenant_id in [k for k, t in self._tenants.items()
+                          if self._evictable(t) or (force and not t.queue and not t.running)]:
+            del self._tenants[tenant_id]
+
+    def _start(self, ticket: RunTicket, tenant: _TenantQueue) -> None:
+        # 虚拟时钟推进到被启动工作流的开始时间，租户虚拟时间前进 1/权重
+        advanced = tenant.vtime > self._vclock
+        self._vclock = max(self._vclock, tenant.vtime)
+        tenant.vtime += 1.0 / tenant.weight
+        if advanced:
+            # 虚拟时钟前进后，此前超前的空闲租户可能已可移除
+            self._evict_idle()
+        tenant.running += 1
+        self._running += 1
+        ticket.state = "running"
+        ticket.started_at = time.monotonic()
+        tenant.waits.append(ticket.started_at - ticket.enqueued_at)
+
+    def _dispatch(self) -> List[RunTicket]:
+        """名额空出时按虚拟时间依次启动排队的工作流，返回需要唤醒的票据。"""
+        started: List[RunTicket] = []
+        while self._running < self.max_concurrency and self._queued:
+            tenant_id, tenant = min(
+                ((k, t) for k, t in self._tenants.items() if t.queue),
+                key=lambda kv: kv[1].vtime,
+            )
+            ticket = tenant.queue.popleft()
+            self._queued -= 1
+            self._start(ticket, tenant)
+            started.append(ticket)
+        return started
+
+    @staticmethod
+    def _notify(tickets: List[RunTicket]) -> None:
+        for ticket in tickets:
+            if ticket.loop is None or ticket.future is None:
+                continue
+            try:
+                ticket.loop.call_soon_threadsafe(_wake, ticket.future)
+            except RuntimeError:
+                pass  # 事件循环已关闭
+
+    # ---- 对外接口 ----
+    def submit(self, tenant_id: Optional[str] = None) -> RunTicket:
+        """
+        申请运行名额：有空闲名额且无人排队时立即获得，否则进入租户队列。
+
+        参数:
+            tenant_id: 租户 id；为空时归入 DEFAULT_TENANT。
+        返回:
+            RunTicket；排队中的票据需 await ticket.wait() 等待轮到自己，结束后调用 ticket.release()。
+        异常:
+            WorkflowQueueFull：租户队列或总队列已满。
+        """
+        tenant_id = tenant_id or DEFAULT_TENANT
+        ticket = RunTicket(tenant_id=tenant_id, runner=self)
+        with self._lock:
+            tenant = self._tenant(tenant_id)
+            if not tenant.queue and not tenant.running:
+                # 空闲租户重新开始排队：不能使用空闲期间积累的额度
+                tenant.vtime = max(tenant.vtime, self._vclock)
+            if self._running < self.max_concurrency and not self._queued:
+                tenant.admitted += 1
+                self._start(ticket, tenant)
+                return ticket
+            if len(tenant.queue) >= self.max_queue_per_tenant:
+                tenant.rejected += 1
+                self._rejected += 1
+                self._drop_if_evictable(tenant_id, tenant)
+                raise WorkflowQueueFull(tenant_id, f"租户 {tenant_id} 的排队工作流已达上限 {self.max_queue_per_tenant}")
+            if self._queued >= self.max_queue_total:
+                tenant.rejected += 1
+                self._rejected += 1
+                self._drop_if_evictable(tenant_id, tenant)
+                raise WorkflowQueueFull(tenant_id, f"排队工作流总数已达上限 {self.max_queue_total}")
+            try:
+                ticket.loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self._drop_if_evictable(tenant_id, tenant)
+                raise RuntimeError("WorkflowRunner.submit 需要在事件循环中调用") from None
+            ticket.future = ticket.loop.create_future()
+            tenant.admitted += 1
+            tenant.queue.append(ticket)
+            self._queued += 1
+        return ticket
+
+    def _drop_if_evictable(self, tenant_id: str, tenant: _TenantQueue) -> None:
+        if self._evictable(tenant) and self._tenants.get(tenant_id) is tenant:
+            del self._tenants[tenant_id]
+
+    def _release(self, ticket: RunTicket) -> None:
+        with self._lock:
+            if ticket.state == "done":
+                return
+            tenant = self._tenants[ticket.tenant_id]
+            if ticket.state == "queued":
+                try:
+                    tenant.queue.remove(ticket)
+                    self._queued -= 1
+                except ValueError:
+                    pass
+            elif ticket.state == "running":
+                tenant.running -= 1
+                tenant.completed += 1
+                self._running -= 1
+            ticket.state = "done"
+            started = self._dispatch()
+            self._drop_if_evictable(ticket.tenant_id, tenant)
+        self._notify(started)
+
+    @asynccontextmanager
+    async def slot(self, tenant_id: Optional[str] = None) -> AsyncIterator[RunTicket]:
+        """申请名额并在退出时归还：async with runner.slot(tenant): ...（队列满时抛出 WorkflowQueueFull）。"""
+        ticket = self.submit(tenant_id)
+        try:
+            await ticket.wait()
+            yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """运行器统计：全局运行/排队数、累计拒绝次数与各租户（仅保留中的租户）排队深度、接纳/拒绝次数、
+        等待时间分位数（毫秒）。"""
+        with self._lock:
+            now = time.monotonic()
+            tenants: Dict[str, Any] = {}
+            for tenant_id, t in self._tenants.items():
+                waits = list(t.waits)
+                tenants[tenant_id] = {
+                    "weight": t.weight,
+                    "queued": len(t.queue),
+                    "running": t.running,
+                    "admitted": t.admitted,
+                    "rejected": t.rejected,
+                    "completed": t.completed,
+                    "oldest_wait_ms": round((now - t.queue[0].enqueued_at) * 1000.0, 1) if t.queue else 0.0,
+                    "wait_p50_ms": round(percentile(waits, 0.50) * 1000.0, 1),
+                    "wait_p95_ms": round(percentile(waits, 0.95) * 1000.0, 1),
+                }
+            return {
+                "max_concurrency": self.max_concurrency,
+                "running": self._running,
+                "queued": self._queued,
+                "rejected": self._rejected,
+                "tenants": tenants,
+            }
+
+
+def get_workflow_runner(settings: Settings) -> WorkflowRunner:
+    """返回进程共享的工作流运行器（首次调用时按配置创建）。"""
+    global _RUNNER
+    if _RUNNER is None:
+        with _RUNNER_LOCK:
+            if _RUNNER is None:
+                _RUNNER = WorkflowRunner(
+                    max_concurrency=settings.workflow_max_concurrency,
+                    max_queue_per_tenant=settings.workflow_queue_per_tenant,
+                    max_queue_total=settings.workflow_queue_total,
+                    weights=parse_tenant_weights(settings.workflow_tenant_weights),
+                    max_tenants=settings.workflow_max_tenants,
+                )
+    return _RUNNER
+
+
+def get_workflow_runner_stats() -> Dict[str, Any]:
+    """返回工作流运行器统计；尚未创建时返回空字典。"""
+    return _RUNNER.stats() if _RUNNER is not None else {}
@@ -47,8 +47,8 @@ def send_email(content: str, to_email: str) -> str:
 
         smtp_server.sendmail(settings.email_address, to_email, msg.as_string())
         smtp_server.quit()
-        logger.info(f"邮件已发送到 {to_email}")
+        logger.info("邮件已发送到 %s", to_email)
         return "ok"
     except Exception as e:
-        logger.error(f"发送邮件失败: {e}")
+        logger.error("发送邮件失败: %s", e)
         return f"error: {e}"
\ No newline at end of file
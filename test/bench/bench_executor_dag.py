@@ -0,0 +1,107 @@
+"""
+Executor 顺序代理（agent） vs 依赖图并发（dag）对比
+
+计划为扇出 + 汇总：width 个互不依赖的步骤（各用一个 mock MCP 服务器），再由一个步骤汇总全部输出。
+agent 模式下单个代理逐个调用工具（width + 2 次 LLM 往返、width + 1 次工具调用串行）；
+dag 模式下每个步骤由独立代理完成（每步 2 次 LLM 往返 + 1 次工具调用），扇出步骤并发执行，
+总耗时趋近关键路径（并发上限不小于 width 时为 2 轮步骤）。两种模式共用预热的会话池，不计 MCP 进程拉起。
+
+用法（项目根目录）：
+    python -m test.bench.bench_executor_dag --width 4 --parallel 4 --runs 5 --llm-latency-ms 200 --tool-latency-ms 100
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from test.bench.bench_mcp_pool import build_plan
+from test.bench.run_bench import USER_INPUT
+from test.bench.fake_llm import FakeChatModel, executor_responder
+from agentlz.core.stats import percentile
+import agentlz.agents.executor.executor_agnet as executor_module
+from agentlz.agents.executor.executor_agnet import MCPChainExecutor
+from agentlz.schemas.workflow import WorkflowPlan, WorkflowStep
+from agentlz.services.mcp_session_pool import MCPSessionPool
+
+
+def build_dag_plan(width: int, tool_latency_ms: float) -> WorkflowPlan:
+    """扇出 + 汇总计划：s0..s{width-1} 互不依赖，merge 引用全部输出。"""
+    plan = build_plan(width + 1, tool_latency_ms)
+    names = plan.execution_chain
+    fan_out = [WorkflowStep(id=f"s{i}", server=names[i], task=f"处理第 {i} 项") for i in range(width)]
+    merge = WorkflowStep(id="merge", server=names[width], task="汇总：" + "、".join(f"{{s{i}}}" for i in range(width)),
+                         inputs=[s.id for s in fan_out])
+    plan.steps = fan_out + [merge]
+    return plan
+
+
+async def run_mode(mode: str, plan: WorkflowPlan, runs: int, llm_latency_ms: float, parallel: int) -> Dict[str, Any]:
+    """以 agent/dag 模式执行 runs 次，返回延迟分位数与每次工作流的 LLM 调用次数。"""
+    llm = FakeChatModel(responder=executor_responder(), latency_ms=llm_latency_ms, stage="exec_llm", counters={})
+    env = {"EXECUTOR_MODE": mode, "EXECUTOR_MAX_PARALLEL_STEPS": str(parallel)}
+    previous = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    try:
+        await MCPChainExecutor(plan, llm=llm).execute_chain(USER_INPUT)  # 预热（会话池拉起服务器）
+        llm.counters.clear()
+        latencies: List[float] = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            output = await MCPChainExecutor(plan, llm=llm).execute_chain(USER_INPUT)
+            latencies.append(time.perf_counter() - start)
+            assert not str(output).startswith("执行器错误"), output
+    finally:
+        for k, v in previous.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+    return {
+        "mode": mode,
+        "llm_calls": llm.counters.get("calls", 0) / runs,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000.0, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000.0, 1),
+    }
+
+
+async def main_async(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    plan = build_dag_plan(args.width, args.tool_latency_ms)
+    pool = MCPSessionPool(max_inflight_per_session=args.width + 1)
+    original = executor_module.get_mcp_session_pool
+    executor_module.get_mcp_session_pool = lambda settings: pool
+    try:
+        return [await run_mode(mode, plan, args.runs, args.llm_latency_ms, args.parallel) for mode in ("agent", "dag")]
+    finally:
+        executor_module.get_mcp_session_pool = original
+        await asyncio.to_thread(pool.close)
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description="Executor agent/dag 模式延迟对比")
+    parser.add_argument("--width", type=int, default=4, help="扇出步骤数")
+    parser.add_argument("--parallel", type=int, default=4, help="EXECUTOR_MAX_PARALLEL_STEPS")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--tool-latency-ms", type=float, default=100.0)
+    parser.add_argument("--json", dest="json_path", default=None)
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(main_async(args))
+    waves = -(-args.width // max(1, args.parallel)) + 1
+    critical_ms = waves * (2 * args.llm_latency_ms + args.tool_latency_ms)
+    print(f"{'mode':<8}{'llm calls':>12}{'p50(ms)':>10}{'p95(ms)':>10}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['llm_calls']:>12}{r['p50_ms']:>10}{r['p95_ms']:>10}")
+    print(f"dag 关键路径（{waves} 轮步骤的模拟 LLM + 工具耗时）：{critical_ms:.0f}ms")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results, "critical_path_ms": critical_ms},
+                      f, ensure_ascii=False, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Executor 代理执行（agent/dag） vs 直接执行（direct）对比：数学 → 语言示例链路
+
+链路为“3 的平方 → 再平方 → 加 3 → 用一句话描述结果”：前三步调用 test/planner/test_tool/math_tool.py 的
+evaluate 工具，最后一步由模型完成（语言描述，reasoning 步骤）。
+- agent：单个代理依次调用 3 次 evaluate 再回答（4 次 LLM 往返）；
+- dag：每个步骤由独立代理完成（工具步骤各 2 次 LLM 往返，共 7 次）；
+- direct：工具步骤按参数模板直接调用 MCP 工具，仅 reasoning 步骤调用一次模型。
+三种模式共用预热的会话池，不计 MCP 进程拉起。
+
+用法（项目根目录）：
+    python -m test.bench.bench_executor_direct --runs 5 --llm-latency-ms 500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+import test.bench.run_bench  # noqa: F401  (设置离线环境变量)
+from test.bench.fake_llm import FakeChatModel, Responder, _tool_call, _turn_tool_messages
+from agentlz.core.stats import percentile
+import agentlz.agents.executor.executor_agnet as executor_module
+from agentlz.agents.executor.executor_agnet import MCPChainExecutor
+from agentlz.schemas.workflow import MCPConfigItem, WorkflowPlan, WorkflowStep
+from agentlz.services.mcp_session_pool import MCPSessionPool
+
+MATH_TOOL = Path(__file__).resolve().parents[1] / "planner" / "test_tool" / "math_tool.py"
+USER_INPUT = "先计算 3 的平方，再平方，再加 3，然后用一句有趣的话描述这个数"
+EXPRESSIONS = ["3**2", "{prev}**2", "{prev}+3"]
+ANSWER = "84 是一个在平方之后又多走了三步的数"
+
+
+def build_chain_plan() -> WorkflowPlan:
+    """数学 → 语言示例计划：3 个 evaluate 工具步骤 + 1 个 reasoning 步骤。"""
+    config = MCPConfigItem(name="math_tool", transport="stdio", command=sys.executable, args=[str(MATH_TOOL)])
+    steps = [
+        WorkflowStep(id="s1", server="math_tool", task="计算 3 的平方", tool="evaluate", args={"expression": "3**2"}),
+        WorkflowStep(id="s2", server="math_tool", task="计算 {s1} 的平方", inputs=["s1"],
+                     tool="evaluate", args={"expression": "{s1}**2"}),
+        WorkflowStep(id="s3", server="math_tool", task="计算 {s2} 加 3", inputs=["s2"],
+                     tool="evaluate", args={"expression": "{s2}+3"}, output="number"),
+        WorkflowStep(id="s4", server="", task="用一句有趣的话描述数字 {number}", inputs=["s3"], reasoning=True),
+    ]
+    return WorkflowPlan(
+        execution_chain=["math_tool"],
+        mcp_config=[config],
+        instructions="依次用 evaluate 计算 3**2、结果的平方、再加 3，最后用一句话描述结果。",
+        steps=steps,
+    )
+
+
+def chain_responder() -> Responder:
+    """伪 LLM 脚本：整条链路时依次调用 evaluate；单步骤时按消息中的建议参数调用一次；无工具时直接回答。"""
+
+    def respond(messages: List[BaseMessage], tools: List[str]) -> AIMessage:
+        done = _turn_tool_messages(messages)
+        human = next((str(m.content) for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        if "evaluate" in tools:
+            if "参数：" in human:
+                if not done:
+                    return _tool_call("evaluate", json.loads(human.split("参数：", 1)[1]), 0)
+                return AIMessage(content=str(done[-1].content))
+            if len(done) < len(EXPRESSIONS):
+                prev = str(done[-1].content) if done else ""
+                return _tool_call("evaluate", {"expression": EXPRESSIONS[len(done)].format(prev=prev)}, len(done))
+        return AIMessage(content=ANSWER)
+
+    return respond
+
+
+async def run_mode(mode: str, plan: WorkflowPlan, runs: int, llm_latency_ms: float) -> Dict[str, Any]:
+    """以 agent/dag/direct 模式执行 runs 次，返回延迟分位数、每次工作流的 LLM 调用次数与工具步骤输出。"""
+    llm = FakeChatModel(responder=chain_responder(), latency_ms=llm_latency_ms, stage="exec_llm", counters={})
+    previous = os.environ.get("EXECUTOR_MODE")
+    os.environ["EXECUTOR_MODE"] = mode
+    try:
+        await MCPChainExecutor(plan, llm=llm).execute_chain(USER_INPUT)  # 预热（会话池拉起服务器）
+        llm.counters.clear()
+        latencies: List[float] = []
+        for _ in range(runs):
+            executor = MCPChainExecutor(plan, llm=llm)
+            start = time.perf_counter()
+            output = await executor.execute_chain(USER_INPUT)
+            latencies.append(time.perf_counter() - start)
+            assert output == ANSWER, output
+    finally:
+        if previous is None:
+            os.environ.pop("EXECUTOR_MODE", None)
+        else:
+            os.environ["EXECUTOR_MODE"] = previous
+    return {
+        "mode": mode,
+        "llm_calls": llm.counters.get("calls", 0) / runs,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000.0, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000.0, 1),
+        "steps": [r.output for r in executor.step_results.values()][:3],
+    }
+
+
+async def main_async(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    plan = build_chain_plan()
+    pool = MCPSessionPool()
+    original = executor_module.get_mcp_session_pool
+    executor_module.get_mcp_session_pool = lambda settings: pool
+    try:
+        return [await run_mode(mode, plan, args.runs, args.llm_latency_ms) for mode in ("agent", "dag", "direct")]
+    finally:
+        executor_module.get_mcp_session_pool = original
+        await asyncio.to_thread(pool.close)
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description="Executor agent/dag/direct 模式延迟对比（数学 → 语言链路）")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--llm-latency-ms", type=float, default=500.0)
+    parser.add_argument("--json", dest="json_path", default=None)
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(main_async(args))
+    print(f"{'mode':<8}{'llm calls':>12}{'p50(ms)':>10}{'p95(ms)':>10}  steps")
+    for r in results:
+        print(f"{r['mode']:<8}{r['llm_calls']:>12}{r['p50_ms']:>10}{r['p95_ms']:>10}  {r['steps']}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Executor MCP 会话池对比：每次工作流拉起 MCP 服务器（cold） vs 复用会话池（warm）
+
+cold 模式（MCP_SESSION_POOL_ENABLED=false）下每次执行都新建 MultiServerMCPClient：加载工具时拉起一次
+全部服务器，每次工具调用再拉起一次；warm 模式复用进程内会话池，仅首个工作流拉起服务器
+（first 列为该次耗时）。并发模式下同一服务器的请求在池内会话上多路复用。
+warm+cache 模式额外启用工具定义缓存（新进程场景：缓存文件已存在、会话尚未建立），
+工具列表直接由缓存构建，服务器在首次调用工具时才拉起。另行报告新进程构建工具列表的耗时（load 表）。
+
+用法（项目根目录）：
+    python -m test.bench.bench_mcp_pool --runs 8 --servers 2 --concurrency 1,4 --llm-latency-ms 50
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from test.bench.run_bench import MOCK_SERVER, USER_INPUT
+from test.bench.fake_llm import FakeChatModel, executor_responder
+from agentlz.core.stats import percentile
+import agentlz.agents.executor.executor_agnet as executor_module
+from agentlz.agents.executor.executor_agnet import MCPChainExecutor
+from agentlz.schemas.workflow import MCPConfigItem, WorkflowPlan
+from agentlz.services.mcp_session_pool import MCPSessionPool
+from agentlz.services.mcp_tool_cache import MCPToolSchemaCache
+
+
+def build_plan(servers: int, tool_latency_ms: float) -> WorkflowPlan:
+    """构造包含 servers 个本地 mock MCP 服务器的计划。"""
+    names = [f"bench_tool{i}" for i in range(servers)]
+    configs = [
+        MCPConfigItem(name=n, transport="stdio", command=sys.executable,
+                      args=[str(MOCK_SERVER), "--name", n, "--delay-ms", str(tool_latency_ms)])
+        for n in names
+    ]
+    return WorkflowPlan(execution_chain=names, mcp_config=configs)
+
+
+def _new_pool(cache_path: Optional[str]) -> MCPSessionPool:
+    return MCPSessionPool(tool_cache=MCPToolSchemaCache(cache_path) if cache_path else None)
+
+
+async def measure_tool_load(plan: WorkflowPlan, cache_path: str) -> List[Dict[str, Any]]:
+    """新进程（会话池为空）构建工具列表的耗时：无缓存需拉起服务器并 list_tools，有缓存直接构建。"""
+    rows = []
+    for label, path in (("no cache", None), ("cache", cache_path)):
+        pool = _new_pool(path)
+        try:
+            start = time.perf_counter()
+            tools = await pool.get_tools(plan.mcp_config)
+            elapsed = time.perf_counter() - start
+            rows.append({"tool_list": label, "tools": len(tools), "load_ms": round(elapsed * 1000.0, 2),
+                         "sessions_created": pool.stats()["sessions_created"]})
+        finally:
+            await asyncio.to_thread(pool.close)
+    return rows
+
+
+async def run_mode(mode: str, plan: WorkflowPlan, runs: int, concurrency: int, llm_latency_ms: float,
+                   cache_path: Optional[str] = None) -> Dict[str, Any]:
+    """以 cold/warm/warm+cache 模式执行 runs 次工作流（并发 concurrency），返回首个工作流耗时与延迟分位数。"""
+    pool = _new_pool(cache_path if mode == "warm+cache" else None) if mode != "cold" else None
+    original = executor_module.get_mcp_session_pool
+    executor_module.get_mcp_session_pool = lambda settings: pool
+    llm = FakeChatModel(responder=executor_responder(), latency_ms=llm_latency_ms, stage="exec_llm", counters={})
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one() -> float:
+        async with sem:
+            start = time.perf_counter()
+            output = await MCPChainExecutor(plan, llm=llm).execute_chain(USER_INPUT)
+            assert not str(output).startswith("执行器错误"), output
+            return time.perf_counter() - start
+
+    try:
+        first = await one()
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one() for _ in range(runs)))
+        wall = time.perf_counter() - start
+        stats = pool.stats() if pool is not None else {}
+    finally:
+        executor_module.get_mcp_session_pool = original
+        if pool is not None:
+            await asyncio.to_thread(pool.close)
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "first_ms": round(first * 1000.0, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000.0, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000.0, 1),
+        "throughput_rps": round(runs / wall, 2) if wall else 0.0,
+        "sessions_created": stats.get("sessions_created", "-"),
+    }
+
+
+async def main_async(args: argparse.Namespace) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    plan = build_plan(args.servers, args.tool_latency_ms)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = f"{tmp}/mcp_tool_cache.json"
+        pool = _new_pool(cache_path)
+        await pool.get_tools(plan.mcp_config)  # 生成缓存文件（模拟上一个进程留下的缓存）
+        await asyncio.to_thread(pool.close)
+        results = []
+        for concurrency in args.concurrency:
+            for mode in ("cold", "warm", "warm+cache"):
+                results.append(await run_mode(mode, plan, args.runs, concurrency, args.llm_latency_ms, cache_path))
+        loads = await measure_tool_load(plan, cache_path)
+    return results, loads
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description="Executor MCP 会话池 cold/warm 延迟对比")
+    parser.add_argument("--runs", type=int, default=8)
+    parser.add_argument("--servers", type=int, default=2)
+    parser.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",") if x], default=[1, 4])
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--tool-latency-ms", type=float, default=5.0)
+    parser.add_argument("--json", dest="json_path", default=None)
+    args = parser.parse_args(argv)
+
+    results, loads = asyncio.run(main_async(args))
+    print(f"{'mode':<12}{'conc':>6}{'first(ms)':>12}{'p50(ms)':>10}{'p95(ms)':>10}{'runs/s':>9}{'sessions':>10}")
+    for r in results:
+        print(f"{r['mode']:<12}{r['concurrency']:>6}{r['first_ms']:>12}{r['p50_ms']:>10}{r['p95_ms']:>10}"
+              f"{r['throughput_rps']:>9}{r['sessions_created']:>10}")
+    print(f"\n{'tool_list':<12}{'tools':>6}{'load(ms)':>12}{'sessions':>10}")
+    for r in loads:
+        print(f"{r['tool_list']:<12}{r['tools']:>6}{r['load_ms']:>12}{r['sessions_created']:>10}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results, "tool_load": loads}, f, ensure_ascii=False, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
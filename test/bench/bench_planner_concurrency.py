@@ -0,0 +1,116 @@
+"""
+Planner 并发吞吐对比：同步 plan_workflow_chain（线程池） vs 异步 aplan_workflow_chain_batch
+
+同步版本每个规划占用一个线程（agent.invoke + 阻塞的数据库查询），并发受线程数限制
+（FastAPI/Starlette 同步端点默认线程池为 40）；异步版本在单个事件循环上并发，
+数据库查询通过工具的 coroutine 路径执行。
+
+用法（项目根目录）：
+    python -m test.bench.bench_planner_concurrency --plans 50 --threads 40 --llm-latency-ms 200 --db-latency-ms 20
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from test.bench.run_bench import USER_INPUT, make_lookup_tool  # noqa: F401  (设置离线环境变量)
+from test.bench.fake_llm import FakeChatModel, planner_responder
+from agentlz.core.stats import percentile
+from agentlz.agents.planner.planner_agent import (
+    aplan_workflow_chain,
+    aplan_workflow_chain_batch,
+    plan_workflow_chain,
+)
+
+
+def _summary(mode: str, wall: float, latencies: List[float], plans: List[Any]) -> Dict[str, Any]:
+    ok = sum(1 for p in plans if p.execution_chain)
+    return {
+        "mode": mode,
+        "plans": len(plans),
+        "ok": ok,
+        "wall_s": round(wall, 3),
+        "throughput_pps": round(len(plans) / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000.0, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000.0, 1),
+    }
+
+
+def run_sync(llm, tool, plans: int, threads: int) -> Dict[str, Any]:
+    """同步版本：线程池中并发执行 plan_workflow_chain。"""
+
+    def one(_: int):
+        start = time.perf_counter()
+        plan = plan_workflow_chain(USER_INPUT, llm=llm, tools=[tool])
+        return plan, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(one, range(plans)))
+    wall = time.perf_counter() - start
+    return _summary(f"sync(threads={threads})", wall, [r[1] for r in results], [r[0] for r in results])
+
+
+async def run_async(llm, tool, plans: int, concurrency: int) -> Dict[str, Any]:
+    """异步版本：事件循环上有界并发执行 aplan_workflow_chain，记录单条延迟。"""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            start = time.perf_counter()
+            plan = await aplan_workflow_chain(USER_INPUT, llm=llm, tools=[tool])
+            return plan, time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(plans)))
+    wall = time.perf_counter() - start
+    return _summary(f"async(concurrency={concurrency})", wall, [r[1] for r in results], [r[0] for r in results])
+
+
+async def run_batch(llm, tool, plans: int, concurrency: int) -> Dict[str, Any]:
+    """批量接口：aplan_workflow_chain_batch（单条延迟不可见，以整体耗时计）。"""
+    start = time.perf_counter()
+    results = await aplan_workflow_chain_batch([USER_INPUT] * plans, concurrency=concurrency, llm=llm, tools=[tool])
+    wall = time.perf_counter() - start
+    return _summary(f"batch(concurrency={concurrency})", wall, [wall] * plans, results)
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description="Planner 同步/异步并发吞吐对比")
+    parser.add_argument("--plans", type=int, default=50, help="并发规划数")
+    parser.add_argument("--threads", type=int, default=40, help="同步版本线程池大小")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="伪 LLM 每次调用延迟")
+    parser.add_argument("--db-latency-ms", type=float, default=20.0, help="关键词查询的模拟数据库往返")
+    parser.add_argument("--servers", type=int, default=2, help="每个计划查询的关键词数")
+    parser.add_argument("--json", dest="json_path", default=None, help="将结果写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    llm = FakeChatModel(
+        responder=planner_responder([f"tool{i}" for i in range(args.servers)]),
+        latency_ms=args.llm_latency_ms,
+        stage="plan_llm",
+    )
+    tool = make_lookup_tool(0, db_latency_ms=args.db_latency_ms)
+    # 预热：导入与首次代理构建不计入结果
+    plan_workflow_chain(USER_INPUT, llm=llm, tools=[tool])
+
+    results = [
+        run_sync(llm, tool, args.plans, args.threads),
+        run_sync(llm, tool, args.plans, args.plans),
+        asyncio.run(run_async(llm, tool, args.plans, args.plans)),
+        asyncio.run(run_batch(llm, tool, args.plans, args.plans)),
+    ]
+    print(f"{'mode':<26}{'ok':>6}{'wall(s)':>10}{'plans/s':>10}{'p50(ms)':>10}{'p95(ms)':>10}")
+    for r in results:
+        print(f"{r['mode']:<26}{r['ok']:>6}{r['wall_s']:>10}{r['throughput_pps']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Planner 查询模式对比：逐关键词查询（single） vs 批量查询（batch）
+
+single 模式下模型每个子任务调用一次 get_mcp_config_by_keyword，N 个子任务需要 N + 1 次 LLM 往返；
+batch 模式（PLANNER_LOOKUP_MODE=batch）使用批量提示词，一次调用 get_mcp_configs_by_keywords，
+固定 2 次 LLM 往返。伪 LLM 按各自提示词的约定脚本化调用工具。
+
+用法（项目根目录）：
+    python -m test.bench.bench_planner_lookup --keywords 1,2,3 --runs 5 --llm-latency-ms 500 --db-latency-ms 20
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from test.bench.run_bench import USER_INPUT, make_batch_lookup_tool, make_lookup_tool
+from test.bench.fake_llm import FakeChatModel, planner_batch_responder, planner_responder
+from agentlz.core.stats import percentile
+from agentlz.agents.planner.planner_agent import plan_workflow_chain
+
+
+def run_mode(mode: str, keywords: int, runs: int, llm_latency_ms: float, db_latency_ms: float) -> Dict[str, Any]:
+    """以指定查询模式规划 runs 次，返回延迟分位数与 LLM 调用次数。"""
+    names = [f"tool{i}" for i in range(keywords)]
+    single = make_lookup_tool(0, db_latency_ms=db_latency_ms)
+    if mode == "batch":
+        responder = planner_batch_responder(names)
+        tools = [make_batch_lookup_tool(0, db_latency_ms=db_latency_ms), single]
+    else:
+        responder = planner_responder(names)
+        tools = [single]
+    llm = FakeChatModel(responder=responder, latency_ms=llm_latency_ms, stage="plan_llm", counters={})
+    previous = os.environ.get("PLANNER_LOOKUP_MODE")
+    os.environ["PLANNER_LOOKUP_MODE"] = mode
+    try:
+        plan_workflow_chain(USER_INPUT, llm=llm, tools=tools)  # 预热
+        llm.counters.clear()
+        latencies: List[float] = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            plan = plan_workflow_chain(USER_INPUT, llm=llm, tools=tools)
+            latencies.append(time.perf_counter() - start)
+            assert len(plan.execution_chain) == keywords, plan
+    finally:
+        if previous is None:
+            os.environ.pop("PLANNER_LOOKUP_MODE", None)
+        else:
+            os.environ["PLANNER_LOOKUP_MODE"] = previous
+    return {
+        "mode": mode,
+        "keywords": keywords,
+        "llm_calls_per_plan": llm.counters.get("calls", 0) / runs,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000.0, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000.0, 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description="Planner 逐关键词/批量查询延迟对比")
+    parser.add_argument("--keywords", type=lambda s: [int(x) for x in s.split(",") if x], default=[1, 2, 3])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--llm-latency-ms", type=float, default=500.0)
+    parser.add_argument("--db-latency-ms", type=float, default=20.0)
+    parser.add_argument("--json", dest="json_path", default=None)
+    args = parser.parse_args(argv)
+
+    results = [
+        run_mode(mode, n, args.runs, args.llm_latency_ms, args.db_latency_ms)
+        for n in args.keywords
+        for mode in ("single", "batch")
+    ]
+    print(f"{'mode':<8}{'keywords':>10}{'llm calls':>12}{'p50(ms)':>10}{'p95(ms)':>10}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['keywords']:>10}{r['llm_calls_per_plan']:>12}{r['p50_ms']:>10}{r['p95_ms']:>10}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
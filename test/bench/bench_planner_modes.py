@@ -0,0 +1,130 @@
+"""
+Planner 规划模式对比：agent（逐关键词 / 批量查询） vs inline（本地预选 + 单次结构化输出）
+
+inline 模式在内存 MCP 目录上预选候选工具并内联到提示词，不调用查询工具；
+预选没有候选时回退到 agent 模式（fallback 一行测量回退的额外代价）。
+
+用法（项目根目录）：
+    python -m test.bench.bench_planner_modes --runs 5 --llm-latency-ms 500 --catalog-size 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from test.bench.run_bench import MOCK_SERVER, USER_INPUT, make_batch_lookup_tool, make_lookup_tool
+from test.bench.fake_llm import (
+    FakeChatModel,
+    planner_batch_responder,
+    planner_inline_responder,
+    planner_responder,
+)
+from agentlz.core.stats import percentile
+from agentlz.agents.planner.planner_agent import plan_workflow_chain
+from agentlz.services.mcp_catalog import MCPCatalog
+
+KEYWORDS = ["tool0", "tool1"]
+UNMATCHED_INPUT = "帮我订一张明天去上海的火车票"
+_FILLER = ["发送邮件通知", "读取本地文件", "查询城市天气", "地图路线规划", "图像识别标注", "网页搜索摘要", "数据库备份", "日程提醒"]
+
+
+def build_catalog(size: int) -> MCPCatalog:
+    """构造基准目录：与 USER_INPUT 相关的两条（计算、翻译）+ 若干无关工具。"""
+    rows = []
+
+    def add(id, name, description, category, trust):
+        rows.append({"id": id, "name": name, "transport": "stdio", "command": sys.executable,
+                     "args": [str(MOCK_SERVER), "--name", name], "category": category,
+                     "trust_score": trust, "description": description})
+
+    add(0, "bench_tool0", "数学计算：平方、加减乘除等数值运算", "math", 100)
+    add(1, "bench_tool1", "语言处理：翻译与文本描述", "language", 95)
+    for i in range(2, size):
+        add(i, f"filler_{i}", _FILLER[i % len(_FILLER)], f"misc{i % len(_FILLER)}", i % 90)
+    catalog = MCPCatalog(loader=lambda since: [dict(r) for r in rows], counter=lambda: len(rows), refresh_interval=0)
+    catalog.refresh()
+    return catalog
+
+
+def _inline_or_lookup(keywords):
+    """内联脚本；若回退到代理模式（已绑定查询工具），改用逐关键词脚本。"""
+    inline, lookup = planner_inline_responder(), planner_responder(keywords)
+
+    def respond(messages, tools):
+        if "get_mcp_config_by_keyword" in tools:
+            return lookup(messages, tools)
+        return inline(messages, tools)
+
+    return respond
+
+
+def run_mode(label: str, runs: int, llm_latency_ms: float, db_latency_ms: float, catalog: MCPCatalog,
+             user_input: str = USER_INPUT) -> Dict[str, Any]:
+    """以指定模式规划 runs 次，返回 LLM 调用次数与延迟分位数。"""
+    single = make_lookup_tool(0, db_latency_ms=db_latency_ms)
+    env = {"PLANNER_LOOKUP_MODE": "single", "PLANNER_MODE": "agent"}
+    if label == "agent-single":
+        responder, tools = planner_responder(KEYWORDS), [single]
+    elif label == "agent-batch":
+        responder, tools = planner_batch_responder(KEYWORDS), [make_batch_lookup_tool(0, db_latency_ms), single]
+        env["PLANNER_LOOKUP_MODE"] = "batch"
+    else:
+        responder, tools = _inline_or_lookup(KEYWORDS), [single]
+        env["PLANNER_MODE"] = "inline"
+    llm = FakeChatModel(responder=responder, latency_ms=llm_latency_ms, stage="plan_llm", counters={})
+    previous = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    try:
+        plan_workflow_chain(user_input, llm=llm, tools=tools, catalog=catalog)  # 预热
+        llm.counters.clear()
+        latencies: List[float] = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            plan = plan_workflow_chain(user_input, llm=llm, tools=tools, catalog=catalog)
+            latencies.append(time.perf_counter() - start)
+            assert len(plan.execution_chain) == len(KEYWORDS), plan
+    finally:
+        for k, v in previous.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+    return {
+        "mode": label,
+        "llm_calls_per_plan": llm.counters.get("calls", 0) / runs,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000.0, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000.0, 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description="Planner agent/inline 模式延迟对比")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--llm-latency-ms", type=float, default=500.0)
+    parser.add_argument("--db-latency-ms", type=float, default=20.0)
+    parser.add_argument("--catalog-size", type=int, default=200)
+    parser.add_argument("--json", dest="json_path", default=None)
+    args = parser.parse_args(argv)
+
+    catalog = build_catalog(args.catalog_size)
+    common = (args.runs, args.llm_latency_ms, args.db_latency_ms, catalog)
+    results = [
+        run_mode("agent-single", *common),
+        run_mode("agent-batch", *common),
+        run_mode("inline", *common),
+        dict(run_mode("inline", *common, user_input=UNMATCHED_INPUT), mode="inline-fallback"),
+    ]
+    print(f"{'mode':<18}{'llm calls':>12}{'p50(ms)':>10}{'p95(ms)':>10}")
+    for r in results:
+        print(f"{r['mode']:<18}{r['llm_calls_per_plan']:>12}{r['p50_ms']:>10}{r['p95_ms']:>10}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+MCP 服务器预热对比：规划结束后再拉起服务器（serial） vs 规划期间预热候选服务器（prewarm）
+
+每次运行使用新的会话池（服务器冷启动，不启用工具定义缓存）：Planner 代理按关键词查询本地 mock MCP 服务器
+（每次查询后一次 LLM 往返），随后 agent 模式执行器加载工具并依次调用各服务器。
+- serial：执行器开始时才拉起服务器并 list_tools；
+- prewarm：Planner 挂载 MCPWarmupCallback，查询结果返回即在后台拉起候选服务器并预取工具定义，
+  执行器采用已就绪的会话。
+overlap_ms 为两种模式 e2e p50 之差（服务器启动被规划阶段掩盖的时间）。
+
+用法（项目根目录）：
+    python -m test.bench.bench_speculative_warmup --runs 5 --servers 2 --llm-latency-ms 500
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from test.bench.run_bench import USER_INPUT, make_lookup_tool
+from test.bench.fake_llm import FakeChatModel, executor_responder, planner_responder
+from agentlz.core.stats import percentile
+import agentlz.agents.executor.executor_agnet as executor_module
+from agentlz.agents.executor.executor_agnet import MCPChainExecutor
+from agentlz.agents.planner.planner_agent import plan_workflow_chain
+from agentlz.services.mcp_session_pool import MCPSessionPool
+from agentlz.services.mcp_warmup import MCPWarmupCallback
+
+
+async def run_once(prewarm: bool, servers: int, llm_latency_ms: float, tool_latency_ms: float) -> Dict[str, float]:
+    """执行一次规划 + 执行，返回各阶段耗时（秒）与预热统计。"""
+    keywords = [f"tool{i}" for i in range(servers)]
+    planner_llm = FakeChatModel(responder=planner_responder(keywords), latency_ms=llm_latency_ms)
+    executor_llm = FakeChatModel(responder=executor_responder(), latency_ms=llm_latency_ms)
+    pool = MCPSessionPool()
+    callbacks = [MCPWarmupCallback(pool, max_servers=servers)] if prewarm else None
+    original = executor_module.get_mcp_session_pool
+    executor_module.get_mcp_session_pool = lambda settings: pool
+    try:
+        start = time.perf_counter()
+        plan = await asyncio.to_thread(
+            plan_workflow_chain, USER_INPUT, llm=planner_llm, tools=[make_lookup_tool(tool_latency_ms)],
+            callbacks=callbacks,
+        )
+        t_plan = time.perf_counter()
+        await MCPChainExecutor(plan, llm=executor_llm).execute_chain(USER_INPUT)
+        end = time.perf_counter()
+        stats = pool.stats()
+        assert len(plan.execution_chain) == servers, plan
+    finally:
+        executor_module.get_mcp_session_pool = original
+        await asyncio.to_thread(pool.close)
+    return {
+        "plan": t_plan - start,
+        "exec": end - t_plan,
+        "e2e": end - start,
+        "sessions": stats["sessions_created"],
+        "adopted": stats["prewarm_adopted"],
+    }
+
+
+async def main_async(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    results = []
+    for label, prewarm in (("serial", False), ("prewarm", True)):
+        runs = [await run_once(prewarm, args.servers, args.llm_latency_ms, args.tool_latency_ms)
+                for _ in range(args.runs)]
+        row: Dict[str, Any] = {"mode": label}
+        for stage in ("plan", "exec", "e2e"):
+            values = [r[stage] for r in runs]
+            row[f"{stage}_p50_ms"] = round(percentile(values, 0.50) * 1000.0, 1)
+        row["e2e_p95_ms"] = round(percentile([r["e2e"] for r in runs], 0.95) * 1000.0, 1)
+        row["sessions"] = sum(r["sessions"] for r in runs) / len(runs)
+        row["adopted"] = sum(r["adopted"] for r in runs) / len(runs)
+        results.append(row)
+    results[1]["overlap_ms"] = round(results[0]["e2e_p50_ms"] - results[1]["e2e_p50_ms"], 1)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description="MCP 服务器预热（与规划重叠）对比")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--servers", type=int, default=2)
+    parser.add_argument("--llm-latency-ms", type=float, default=500.0)
+    parser.add_argument("--tool-latency-ms", type=float, default=5.0)
+    parser.add_argument("--json", dest="json_path", default=None)
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(main_async(args))
+    print(f"{'mode':<9}{'plan p50':>10}{'exec p50':>10}{'e2e p50':>10}{'e2e p95':>10}{'sessions':>10}{'adopted':>9}")
+    for r in results:
+        print(f"{r['mode']:<9}{r['plan_p50_ms']:>10}{r['exec_p50_ms']:>10}{r['e2e_p50_ms']:>10}"
+              f"{r['e2e_p95_ms']:>10}{r['sessions']:>10}{r['adopted']:>9}")
+    print(f"overlap saved (e2e p50): {results[1]['overlap_ms']} ms")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
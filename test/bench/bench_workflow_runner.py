@@ -0,0 +1,77 @@
+"""
+工作流准入对比：单一 FIFO 信号量 vs WorkflowRunner（按租户加权公平排队）
+
+模拟“大租户一次提交大量工作流、小租户随后提交少量工作流”：每个工作流以 asyncio.sleep 模拟固定耗时，
+全局并发上限相同。FIFO 下小租户排在大租户全部积压之后；公平排队下小租户与大租户交替获得名额，
+等待时间与大租户积压量无关。
+
+用法（项目根目录）：
+    python -m test.bench.bench_workflow_runner --flood 200 --small 5 --concurrency 8 --job-ms 50
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from agentlz.core.stats import percentile
+from agentlz.services.workflow_runner import WorkflowRunner
+
+
+async def _measure(admit, flood: int, small: int, job_ms: float) -> Dict[str, List[float]]:
+    """大租户先提交 flood 个工作流，随后小租户提交 small 个；返回各租户的排队等待时间（秒）。"""
+    waits: Dict[str, List[float]] = {"big": [], "small": []}
+
+    async def job(tenant: str) -> None:
+        submitted = time.perf_counter()
+        async with admit(tenant):
+            waits[tenant].append(time.perf_counter() - submitted)
+            await asyncio.sleep(job_ms / 1000.0)
+
+    tasks = [asyncio.create_task(job("big")) for _ in range(flood)]
+    await asyncio.sleep(0)
+    tasks += [asyncio.create_task(job("small")) for _ in range(small)]
+    await asyncio.gather(*tasks)
+    return waits
+
+
+async def main_async(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    sem = asyncio.Semaphore(args.concurrency)
+    runner = WorkflowRunner(max_concurrency=args.concurrency, max_queue_per_tenant=args.flood,
+                            max_queue_total=args.flood + args.small)
+    rows = []
+    for mode, admit in (("fifo", lambda tenant: sem), ("fair", runner.slot)):
+        start = time.perf_counter()
+        waits = await _measure(admit, args.flood, args.small, args.job_ms)
+        rows.append({
+            "mode": mode,
+            "wall_s": round(time.perf_counter() - start, 2),
+            "small_wait_p50_ms": round(percentile(waits["small"], 0.50) * 1000.0, 1),
+            "small_wait_max_ms": round(max(waits["small"]) * 1000.0, 1),
+            "big_wait_p50_ms": round(percentile(waits["big"], 0.50) * 1000.0, 1),
+        })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description="工作流准入：FIFO vs 按租户公平排队")
+    parser.add_argument("--flood", type=int, default=200, help="大租户提交的工作流数")
+    parser.add_argument("--small", type=int, default=5, help="小租户提交的工作流数")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--job-ms", type=float, default=50.0, help="单个工作流的模拟耗时")
+    parser.add_argument("--json", dest="json_path", default=None)
+    args = parser.parse_args(argv)
+
+    rows = asyncio.run(main_async(args))
+    print(f"{'mode':<6}{'wall(s)':>9}{'small p50(ms)':>15}{'small max(ms)':>15}{'big p50(ms)':>13}")
+    for r in rows:
+        print(f"{r['mode']:<6}{r['wall_s']:>9}{r['small_wait_p50_ms']:>15}{r['small_wait_max_ms']:>15}{r['big_wait_p50_ms']:>13}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": rows}, f, ensure_ascii=False, indent=2)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
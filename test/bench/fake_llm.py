@@ -0,0 +1,217 @@
+"""
+确定性伪聊天模型（离线基准测试 / 测试使用）
+
+FakeChatModel 由 responder 根据对话历史与已绑定工具名决定下一条 AIMessage，
+支持可配置的首 token 延迟与流式逐块延迟，可驱动 create_agent（含 ToolStrategy 结构化输出）
+与 with_structured_output。内置脚本：
+- planner_responder：依次调用关键词查询工具，再以 WorkflowPlan 工具调用输出计划
+- planner_batch_responder：一次调用批量查询工具，再输出计划
+- planner_inline_responder：从内联的候选工具中选择，直接输出计划
+- executor_responder：依次调用每个 MCP 工具一次，最后输出文本回答
+- check_responder：以 CheckOutput 工具调用输出评估结果
+"""
+
+import asyncio
+import contextvars
+import json
+import time
+from typing import Any, Callable, Dict, Iterator, AsyncIterator, List, Optional, Sequence
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+Responder = Callable[[List[BaseMessage], List[str]], AIMessage]
+
+# 当前基准运行的计时字典（由 run_bench 设置，伪模型把模拟的 LLM 耗时记入其中）
+CURRENT_TIMINGS: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "bench_current_timings", default=None
+)
+
+
+def record(stage: str, seconds: float) -> None:
+    """把耗时累加到当前运行的计时字典（未处于基准运行时忽略）。"""
+    timings = CURRENT_TIMINGS.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+class FakeChatModel(BaseChatModel):
+    """按脚本响应的伪聊天模型
+
+    参数:
+        responder: (messages, bound_tool_names) -> AIMessage
+        latency_ms: 每次调用的首 token 延迟
+        token_latency_ms: 流式输出时每个文本块的延迟
+        stage: 计入计时字典的阶段名（如 "plan_llm"）
+    """
+
+    responder: Responder
+    latency_ms: float = 0.0
+    token_latency_ms: float = 0.0
+    stage: str = "llm"
+    bound_tools: List[str] = []
+    # model_copy 为浅拷贝，bind_tools 派生出的实例与原实例共享同一计数字典
+    counters: Dict[str, int] = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "agentlz-fake"
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Any = None, **kwargs: Any):
+        names = [convert_to_openai_tool(t)["function"]["name"] for t in tools]
+        return self.model_copy(update={"bound_tools": names})
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        self.counters["calls"] = self.counters.get("calls", 0) + 1
+        return self.responder(list(messages), list(self.bound_tools))
+
+    # ---- 非流式 ----
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency_ms / 1000.0)
+        record(self.stage, self.latency_ms / 1000.0)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency_ms / 1000.0)
+        record(self.stage, self.latency_ms / 1000.0)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    # ---- 流式 ----
+    def _chunks(self, msg: AIMessage) -> List[AIMessageChunk]:
+        if msg.tool_calls:
+            return [AIMessageChunk(content="", tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"], ensure_ascii=False), "id": c["id"], "index": i}
+                for i, c in enumerate(msg.tool_calls)
+            ])]
+        words = str(msg.content).split(" ")
+        return [AIMessageChunk(content=w + (" " if i < len(words) - 1 else "")) for i, w in enumerate(words)]
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency_ms / 1000.0)
+        chunks = self._chunks(self._respond(messages))
+        for chunk in chunks:
+            time.sleep(self.token_latency_ms / 1000.0)
+            yield ChatGenerationChunk(message=chunk)
+        record(self.stage, (self.latency_ms + self.token_latency_ms * len(chunks)) / 1000.0)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency_ms / 1000.0)
+        chunks = self._chunks(self._respond(messages))
+        for chunk in chunks:
+            await asyncio.sleep(self.token_latency_ms / 1000.0)
+            yield ChatGenerationChunk(message=chunk)
+        record(self.stage, (self.latency_ms + self.token_latency_ms * len(chunks)) / 1000.0)
+
+
+def _turn_tool_messages(messages: List[BaseMessage]) -> List[ToolMessage]:
+    """返回最后一条用户消息之后的工具结果。"""
+    result: List[ToolMessage] = []
+    for m in reversed(messages):
+        if isinstance(m, HumanMessage):
+            break
+        if isinstance(m, ToolMessage):
+            result.append(m)
+    return list(reversed(result))
+
+
+def _tool_call(name: str, args: Dict[str, Any], index: int) -> AIMessage:
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{name}_{index}"}])
+
+
+def planner_responder(keywords: Sequence[str], lookup_tool: str = "get_mcp_config_by_keyword") -> Responder:
+    """Planner 脚本：每轮查询一个关键词，全部查询完成后输出 WorkflowPlan。"""
+
+    def respond(messages: List[BaseMessage], tools: List[str]) -> AIMessage:
+        done = _turn_tool_messages(messages)
+        if lookup_tool in tools and len(done) < len(keywords):
+            return _tool_call(lookup_tool, {"keyword": keywords[len(done)]}, len(done))
+        configs: List[Dict[str, Any]] = []
+        for m in done:
+            try:
+                items = json.loads(m.content) if isinstance(m.content, str) else []
+            except ValueError:
+                items = []
+            if items:
+                configs.append(items[0])
+        plan = {
+            "execution_chain": [c["name"] for c in configs],
+            "mcp_config": configs,
+            "instructions": "依次调用：" + " -> ".join(c["name"] for c in configs),
+        }
+        return _tool_call("WorkflowPlan", plan, len(done))
+
+    return respond
+
+
+def planner_batch_responder(keywords: Sequence[str], batch_tool: str = "get_mcp_configs_by_keywords") -> Responder:
+    """Planner 脚本（批量查询变体）：一次调用批量工具查询全部关键词，再输出 WorkflowPlan。"""
+
+    def respond(messages: List[BaseMessage], tools: List[str]) -> AIMessage:
+        done = _turn_tool_messages(messages)
+        if batch_tool in tools and not done:
+            return _tool_call(batch_tool, {"keywords": list(keywords)}, 0)
+        configs: List[Dict[str, Any]] = []
+        for m in done:
+            try:
+                result = json.loads(m.content) if isinstance(m.content, str) else {}
+            except ValueError:
+                result = {}
+            by_name = {c["name"]: c for c in result.get("configs", [])}
+            for kw in keywords:
+                names = result.get("groups", {}).get(kw) or []
+                if names and names[0] in by_name:
+                    configs.append(by_name[names[0]])
+        plan = {
+            "execution_chain": [c["name"] for c in configs],
+            "mcp_config": configs,
+            "instructions": "依次调用：" + " -> ".join(c["name"] for c in configs),
+        }
+        return _tool_call("WorkflowPlan", plan, len(done))
+
+    return respond
+
+
+def planner_inline_responder() -> Responder:
+    """Planner 脚本（内联变体）：从用户消息中的候选 JSON 里每个 category 选第一条，直接输出 WorkflowPlan。"""
+
+    def respond(messages: List[BaseMessage], tools: List[str]) -> AIMessage:
+        text = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        try:
+            candidates = json.loads(text.split("```json", 1)[1].split("```", 1)[0])
+        except (IndexError, ValueError):
+            candidates = []
+        picked: Dict[str, Dict[str, Any]] = {}
+        for c in candidates:
+            picked.setdefault(c.get("category") or c["name"], c)
+        configs = [{k: c[k] for k in ("name", "transport", "command", "args")} for c in picked.values()]
+        plan = {
+            "execution_chain": [c["name"] for c in configs],
+            "mcp_config": configs,
+            "instructions": "依次调用：" + " -> ".join(c["name"] for c in configs),
+        }
+        return _tool_call("WorkflowPlan", plan, 0)
+
+    return respond
+
+
+def executor_responder(answer_words: int = 20) -> Responder:
+    """Executor 脚本：依次调用每个已绑定工具一次，最后输出 answer_words 个词的回答。"""
+
+    def respond(messages: List[BaseMessage], tools: List[str]) -> AIMessage:
+        done = _turn_tool_messages(messages)
+        if len(done) < len(tools):
+            return _tool_call(tools[len(done)], {"text": f"step{len(done)}"}, len(done))
+        return AIMessage(content=" ".join(f"w{i}" for i in range(answer_words)))
+
+    return respond
+
+
+def check_responder(judge: bool = True, score: int = 90) -> Responder:
+    """Check 脚本：直接输出 CheckOutput 结构化结果。"""
+
+    def respond(messages: List[BaseMessage], tools: List[str]) -> AIMessage:
+        return _tool_call("CheckOutput", {"judge": judge, "score": score, "reasoning": "bench"}, 0)
+
+    return respond
@@ -0,0 +1,35 @@
+"""
+基准测试用的本地 stdio MCP 服务器（与 test/planner/test_tool/math_tool.py 相同形态）
+
+用法：python mock_mcp_server.py --name bench_math --delay-ms 5
+暴露一个名为 <name>_run 的工具：等待 delay_ms 后回显输入。
+"""
+
+import argparse
+import asyncio
+import sys
+
+from mcp.server.fastmcp import FastMCP
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--name", default="bench_tool")
+    parser.add_argument("--delay-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    mcp = FastMCP(args.name, log_level="WARNING")
+
+    async def run(text: str) -> str:
+        """回显输入文本（模拟工具执行耗时）。"""
+        await asyncio.sleep(args.delay_ms / 1000.0)
+        return f"{args.name}:{text}"
+
+    mcp.tool(name=f"{args.name}_run")(run)
+    if sys.platform == "win32":
+        sys.stdout.reconfigure(encoding="utf-8")
+    mcp.run(transport="stdio")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+离线端到端基准测试：Planner -> Executor -> Check
+
+使用伪 LLM（test/bench/fake_llm.py）与本地 stdio MCP 服务器（test/bench/mock_mcp_server.py），
+无需网络与数据库，测量框架自身开销（代理构建、MCP 进程拉起与工具加载、提示词构建等）。
+
+用法（项目根目录）：
+    python -m test.bench.run_bench --concurrency 1,4,8 --runs 8 --llm-latency-ms 50
+    python -m test.bench.run_bench --json bench_output.json
+
+输出每个并发级别的吞吐量，以及各阶段耗时的 p50/p95/均值（毫秒）：
+- plan_total / plan_build / plan_llm：规划总耗时 / 代理构建 / 模拟 LLM 耗时
+- exec_total / exec_mcp_load / exec_build / exec_tool / exec_llm：执行总耗时 / MCP 工具加载（会话池关闭或
+  未预热时含进程拉起）/ 代理构建 / 工具调用（会话池关闭时含每次调用的会话建立）/ 模拟 LLM 耗时
+- check_build / check_total / check_llm：Check Agent 构建 / 总耗时 / 模拟 LLM 耗时
+- e2e：端到端耗时；overhead：e2e 扣除模拟 LLM 与模拟工具耗时后的框架开销
+"""
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+os.environ.setdefault("MODEL_NAME", "bench-fake")
+os.environ.setdefault("CHATOPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+
+from langchain_core.tools import StructuredTool  # noqa: E402
+from langchain_mcp_adapters.client import MultiServerMCPClient  # noqa: E402
+from agentlz.core.stats import percentile  # noqa: E402
+from agentlz.services.mcp_session_pool import MCPSessionPool  # noqa: E402
+
+import agentlz.agents.executor.executor_agnet as executor_module  # noqa: E402
+import agentlz.agents.planner.planner_agent as planner_module  # noqa: E402
+from agentlz.agents.check.check_agent_1 import get_check_agent  # noqa: E402
+from agentlz.agents.executor.executor_agnet import MCPChainExecutor  # noqa: E402
+from agentlz.agents.planner.planner_agent import plan_workflow_chain  # noqa: E402
+from test.bench.fake_llm import (  # noqa: E402
+    CURRENT_TIMINGS,
+    FakeChatModel,
+    check_responder,
+    executor_responder,
+    planner_responder,
+    record,
+)
+
+MOCK_SERVER = Path(__file__).resolve().with_name("mock_mcp_server.py")
+USER_INPUT = "请先计算再翻译：3 的平方"
+STAGES = [
+    "plan_total", "plan_build", "plan_llm",
+    "exec_total", "exec_mcp_load", "exec_build", "exec_tool", "exec_llm",
+    "check_build", "check_total", "check_llm",
+    "e2e", "overhead",
+]
+
+
+def make_lookup_tool(tool_delay_ms: float, db_latency_ms: float = 0.0):
+    """构造替代 MySQL 查询的关键词工具：每个关键词对应一个本地 mock MCP 服务器。
+
+    db_latency_ms 模拟数据库往返：同步调用 time.sleep（阻塞线程，同 pymysql），
+    异步调用 asyncio.sleep（同生产工具的 coroutine 路径，不阻塞事件循环）。
+    """
+
+    def _config(keyword: str) -> str:
+        name = f"bench_{keyword}"
+        return json.dumps([{
+            "name": name,
+            "transport": "stdio",
+            "command": sys.executable,
+            "args": [str(MOCK_SERVER), "--name", name, "--delay-ms", str(tool_delay_ms)],
+        }], ensure_ascii=False)
+
+    def lookup(keyword: str) -> str:
+        """按关键词查询 MCP 配置（基准测试版本，返回本地 mock 服务器）。"""
+        time.sleep(db_latency_ms / 1000.0)
+        return _config(keyword)
+
+    async def alookup(keyword: str) -> str:
+        await asyncio.sleep(db_latency_ms / 1000.0)
+        return _config(keyword)
+
+    return StructuredTool.from_function(func=lookup, coroutine=alookup, name="get_mcp_config_by_keyword")
+
+
+def make_batch_lookup_tool(tool_delay_ms: float, db_latency_ms: float = 0.0):
+    """构造替代批量查询的工具：一次模拟数据库往返解析全部关键词（返回结构同 get_mcp_configs_by_keywords）。"""
+    single = make_lookup_tool(tool_delay_ms)
+
+    def _result(keywords: List[str]) -> str:
+        configs = [json.loads(single.func(kw))[0] for kw in keywords]
+        return json.dumps({"groups": {kw: [c["name"]] for kw, c in zip(keywords, configs)}, "configs": configs},
+                          ensure_ascii=False)
+
+    def lookup(keywords: List[str], limit_per_keyword: int = 3) -> str:
+        """多关键词批量查询 MCP 配置（基准测试版本）。"""
+        time.sleep(db_latency_ms / 1000.0)
+        return _result(keywords)
+
+    async def alookup(keywords: List[str], limit_per_keyword: int = 3) -> str:
+        await asyncio.sleep(db_latency_ms / 1000.0)
+        return _result(keywords)
+
+    return StructuredTool.from_function(func=lookup, coroutine=alookup, name="get_mcp_configs_by_keywords")
+
+
+def _timed(fn, stage: str):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            record(stage, time.perf_counter() - start)
+    return wrapper
+
+
+def _timed_async(fn, stage: str):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            record(stage, time.perf_counter() - start)
+    return wrapper
+
+
+@contextlib.contextmanager
+def instrument() -> Iterator[None]:
+    """在代理构建、MCP 工具加载与工具调用处插入计时。"""
+
+    def timed_get_tools(original):
+        async def get_tools(self, *args, **kwargs):
+            start = time.perf_counter()
+            tools = await original(self, *args, **kwargs)
+            record("exec_mcp_load", time.perf_counter() - start)
+            for t in tools:
+                if getattr(t, "coroutine", None) is not None:
+                    t.coroutine = _timed_async(t.coroutine, "exec_tool")
+            return tools
+        return get_tools
+
+    patches = [
+        (planner_module, "create_agent", _timed(planner_module.create_agent, "plan_build")),
+        (executor_module, "create_agent", _timed(executor_module.create_agent, "exec_build")),
+        (MultiServerMCPClient, "get_tools", timed_get_tools(MultiServerMCPClient.get_tools)),
+        (MCPSessionPool, "get_tools", timed_get_tools(MCPSessionPool.get_tools)),
+    ]
+    saved = [(obj, name, getattr(obj, name)) for obj, name, _ in patches]
+    try:
+        for obj, name, value in patches:
+            setattr(obj, name, value)
+        yield
+    finally:
+        for obj, name, value in saved:
+            setattr(obj, name, value)
+
+
+class BenchConfig:
+    """一次基准运行的参数。"""
+
+    def __init__(self, llm_latency_ms: float, token_latency_ms: float, tool_latency_ms: float, servers: int) -> None:
+        self.llm_latency_ms = llm_latency_ms
+        self.token_latency_ms = token_latency_ms
+        self.tool_latency_ms = tool_latency_ms
+        self.keywords = [f"tool{i}" for i in range(servers)]
+        common = {"latency_ms": llm_latency_ms, "token_latency_ms": token_latency_ms}
+        self.planner_llm = FakeChatModel(responder=planner_responder(self.keywords), stage="plan_llm", **common)
+        self.executor_llm = FakeChatModel(responder=executor_responder(), stage="exec_llm", **common)
+        self.check_llm = FakeChatModel(responder=check_responder(), stage="check_llm", **common)
+        self.lookup_tool = make_lookup_tool(tool_latency_ms)
+
+
+async def run_once(cfg: BenchConfig) -> Dict[str, Any]:
+    """执行一次完整工作流并返回各阶段耗时（秒）与结果。"""
+    timings: Dict[str, float] = {}
+    token = CURRENT_TIMINGS.set(timings)
+    try:
+        start = time.perf_counter()
+        plan = await asyncio.to_thread(
+            plan_workflow_chain, USER_INPUT, llm=cfg.planner_llm, tools=[cfg.lookup_tool]
+        )
+        t_plan = time.perf_counter()
+        timings["plan_total"] = t_plan - start
+
+        output = await MCPChainExecutor(plan, llm=cfg.executor_llm).execute_chain(USER_INPUT)
+        t_exec = time.perf_counter()
+        timings["exec_total"] = t_exec - t_plan
+
+        check_agent = get_check_agent(llm=cfg.check_llm)
+        timings["check_build"] = time.perf_counter() - t_exec
+        verdict = await check_agent.ainvoke({"objectMsg": USER_INPUT, "factMsg": str(output)})
+        end = time.perf_counter()
+        timings["check_total"] = end - t_exec
+        timings["e2e"] = end - start
+
+        simulated = sum(timings.get(k, 0.0) for k in ("plan_llm", "exec_llm", "check_llm"))
+        simulated += len(plan.mcp_config) * cfg.tool_latency_ms / 1000.0
+        timings["overhead"] = max(0.0, timings["e2e"] - simulated)
+        return {"timings": timings, "plan": plan, "output": output, "verdict": verdict}
+    finally:
+        CURRENT_TIMINGS.reset(token)
+
+
+async def run_level(cfg: BenchConfig, concurrency: int, runs: int) -> Dict[str, Any]:
+    """以给定并发执行 runs 次工作流，汇总吞吐量与分阶段延迟。"""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def guarded() -> Dict[str, Any]:
+        async with sem:
+            return await run_once(cfg)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(guarded() for _ in range(runs)))
+    wall = time.perf_counter() - start
+    stages: Dict[str, Dict[str, float]] = {}
+    for stage in STAGES:
+        values = [r["timings"].get(stage, 0.0) * 1000.0 for r in results]
+        stages[stage] = {
+            "p50_ms": round(percentile(values, 0.50), 2),
+            "p95_ms": round(percentile(values, 0.95), 2),
+            "mean_ms": round(sum(values) / len(values), 2),
+        }
+    return {
+        "concurrency": concurrency,
+        "runs": runs,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(runs / wall, 3) if wall else 0.0,
+        "stages": stages,
+    }
+
+
+def print_report(level: Dict[str, Any]) -> None:
+    print(
+        f"\nconcurrency={level['concurrency']} runs={level['runs']} "
+        f"wall={level['wall_s']}s throughput={level['throughput_rps']} runs/s"
+    )
+    print(f"{'stage':<16}{'p50(ms)':>12}{'p95(ms)':>12}{'mean(ms)':>12}")
+    for stage, s in level["stages"].items():
+        print(f"{stage:<16}{s['p50_ms']:>12}{s['p95_ms']:>12}{s['mean_ms']:>12}")
+
+
+async def main_async(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    cfg = BenchConfig(args.llm_latency_ms, args.token_latency_ms, args.tool_latency_ms, args.servers)
+    levels = []
+    with instrument():
+        # 预热：导入、首次进程拉起等一次性开销不计入结果
+        await run_once(cfg)
+        for concurrency in args.concurrency:
+            level = await run_level(cfg, concurrency, args.runs)
+            print_report(level)
+            levels.append(level)
+    return levels
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="agentlz 离线端到端基准测试")
+    parser.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",") if x], default=[1, 4, 8])
+    parser.add_argument("--runs", type=int, default=8, help="每个并发级别的工作流运行次数")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0, help="伪 LLM 每次调用的首 token 延迟")
+    parser.add_argument("--token-latency-ms", type=float, default=0.0, help="伪 LLM 流式逐块延迟")
+    parser.add_argument("--tool-latency-ms", type=float, default=5.0, help="mock MCP 工具的执行耗时")
+    parser.add_argument("--servers", type=int, default=2, help="计划中的 MCP 服务器数量")
+    parser.add_argument("--json", dest="json_path", default=None, help="将结果写入 JSON 文件")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    levels = asyncio.run(main_async(args))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "levels": levels}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
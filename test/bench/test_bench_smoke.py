@@ -0,0 +1,25 @@
+import asyncio
+
+from agentlz.services import mcp_session_pool
+from test.bench.run_bench import STAGES, BenchConfig, instrument, run_level
+
+
+def test_offline_workflow_runs_end_to_end_with_stage_breakdown(monkeypatch, tmp_path):
+    # 共享会话池的工具定义缓存写到临时目录，不落到默认的 .storage 路径
+    monkeypatch.setenv("MCP_TOOL_CACHE_PATH", str(tmp_path / "mcp_tool_cache.json"))
+    monkeypatch.setattr(mcp_session_pool, "_POOL", None)
+    cfg = BenchConfig(llm_latency_ms=0, token_latency_ms=0, tool_latency_ms=0, servers=1)
+    try:
+        with instrument():
+            level = asyncio.run(run_level(cfg, concurrency=1, runs=1))
+    finally:
+        if mcp_session_pool._POOL is not None:
+            mcp_session_pool._POOL.close()
+    assert level["runs"] == 1 and level["throughput_rps"] > 0
+    assert set(level["stages"]) == set(STAGES)
+    # 伪模型脚本驱动了完整链路：关键词查询 -> 计划 -> MCP 工具调用 -> Check 结构化输出
+    assert level["stages"]["exec_mcp_load"]["mean_ms"] > 0
+    assert level["stages"]["exec_tool"]["mean_ms"] > 0
+    assert cfg.planner_llm.counters["calls"] == 2
+    assert cfg.executor_llm.counters["calls"] == 2
+    assert cfg.check_llm.counters["calls"] == 1
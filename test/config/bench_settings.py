@@ -0,0 +1,31 @@
+import os
+import time
+
+from agentlz.config.settings import Settings, get_settings
+
+
+def _bench(fn, rounds: int) -> float:
+    """返回单次调用平均耗时（微秒）。"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    # 确保必填字段存在（未配置 .env 时也可运行）
+    os.environ.setdefault("MODEL_NAME", "bench-model")
+    os.environ.setdefault("CHATOPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+    rounds = 2000
+    get_settings()  # 预热缓存
+
+    before = _bench(Settings, rounds)
+    after = _bench(get_settings, rounds)
+    print("=== 配置读取开销（每次 HTTP 请求 / 工具调用 / Agent 构建均会调用） ===")
+    print(f"Settings() 每次重新解析 .env: {before:.1f} µs/次")
+    print(f"get_settings() 缓存快照:      {after:.1f} µs/次")
+    print(f"加速比: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
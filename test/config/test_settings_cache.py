@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from agentlz.config.settings import SettingsProvider
+
+
+@pytest.fixture
+def provider(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MODEL_NAME", "model-a")
+    monkeypatch.setenv("CHATOPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+    monkeypatch.delenv("LOG_LEVEL", raising=False)
+    (tmp_path / ".env").write_text("LOG_LEVEL=DEBUG\n", encoding="utf-8")
+    return SettingsProvider(".env")
+
+
+def test_snapshot_is_cached_and_immutable(provider):
+    a = provider.get()
+    b = provider.get()
+    assert a is b
+    assert a.log_level == "DEBUG"
+    with pytest.raises(Exception):
+        a.log_level = "INFO"
+
+
+def test_environment_change_triggers_reload(provider, monkeypatch):
+    a = provider.get()
+    monkeypatch.setenv("MODEL_NAME", "model-b")
+    b = provider.get()
+    assert b is not a
+    assert b.model_name == "model-b"
+    assert provider.get() is b
+
+
+def test_env_file_change_triggers_reload(provider, tmp_path):
+    a = provider.get()
+    env_file = tmp_path / ".env"
+    env_file.write_text("LOG_LEVEL=WARNING\n", encoding="utf-8")
+    st = env_file.stat()
+    # 保证 mtime 变化可被观察（部分文件系统时间精度较粗）
+    os.utime(env_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    b = provider.get()
+    assert b is not a
+    assert b.log_level == "WARNING"
+
+
+def test_explicit_reload_returns_fresh_snapshot(provider):
+    a = provider.get()
+    b = provider.reload()
+    assert b is not a
+    assert provider.get() is b
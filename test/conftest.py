@@ -0,0 +1,39 @@
+"""
+测试公共夹具
+
+- offline_env：设置 Settings 必需的 LLM 配置（占位值，不会发起真实请求）；
+- pooled_executor：让执行器使用测试自建的 MCP 会话池，测试结束时关闭。
+"""
+
+import pytest
+
+
+@pytest.fixture
+def offline_env(monkeypatch):
+    """设置离线占位的 MODEL_NAME/CHATOPENAI_BASE_URL；返回 monkeypatch 供测试继续设置其它变量。"""
+    monkeypatch.setenv("MODEL_NAME", "fake")
+    monkeypatch.setenv("CHATOPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+    return monkeypatch
+
+
+@pytest.fixture
+def pooled_executor(offline_env):
+    """
+    返回 use(session_factory=None) -> MCPSessionPool：创建会话池并替换执行器的 get_mcp_session_pool。
+
+    session_factory 通常为 FakeMCPServer().factory；为 None 时按配置拉起真实的 stdio 服务器。
+    """
+    import agentlz.agents.executor.executor_agnet as executor_module
+    from agentlz.services.mcp_session_pool import MCPSessionPool
+
+    pools = []
+
+    def use(session_factory=None):
+        pool = MCPSessionPool(session_factory=session_factory)
+        pools.append(pool)
+        offline_env.setattr(executor_module, "get_mcp_session_pool", lambda settings: pool)
+        return pool
+
+    yield use
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,91 @@
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agentlz.core import llm_cache as llm_cache_mod
+from agentlz.core.llm_cache import SQLiteLLMCache, llm_cache_bypass
+
+
+def _model(cache, responses=("first", "second", "third")):
+    # FakeListChatModel 每次调用依次返回下一条响应，命中缓存时则重复首条
+    return FakeListChatModel(responses=list(responses), cache=cache)
+
+
+def test_repeated_prompt_hits_cache(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "c.sqlite3"))
+    model = _model(cache)
+    assert model.invoke("hello").content == "first"
+    assert model.invoke("hello").content == "first"
+    assert model.invoke("other").content == "second"
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["entries"] == 2
+
+    # 进程重启后（新实例、同一文件）仍然命中
+    cache.close()
+    reopened = SQLiteLLMCache(str(tmp_path / "c.sqlite3"))
+    assert _model(reopened).invoke("hello").content == "first"
+    assert reopened.stats()["hits"] == 1
+
+
+def test_volatile_message_fields_do_not_change_key(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "c.sqlite3"))
+    model = _model(cache)
+    history_a = [HumanMessage("q"), AIMessage("a", id="run-1", response_metadata={"t": 1}), HumanMessage("q2")]
+    history_b = [HumanMessage("q"), AIMessage("a", id="run-2", response_metadata={"t": 2}), HumanMessage("q2")]
+    assert model.invoke(history_a).content == "first"
+    assert model.invoke(history_b).content == "first"
+    # 不同的 tools / schema 绑定会进入模型配置字符串，从而产生不同的键
+    assert cache.make_key("p", '{"tools": [1]}') != cache.make_key("p", '{"tools": [2]}')
+
+
+def test_ttl_and_lru_eviction(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache_mod.time, "time", lambda: now[0])
+    cache = SQLiteLLMCache(str(tmp_path / "c.sqlite3"), ttl_seconds=60, max_entries=2)
+    model = _model(cache, ["r1", "r2", "r3", "r4", "r5"])
+
+    model.invoke("a")
+    now[0] += 1
+    model.invoke("b")
+    now[0] += 1
+    model.invoke("a")  # 命中，刷新 a 的访问时间
+    now[0] += 1
+    model.invoke("c")  # 超出容量，淘汰最久未访问的 b
+    assert cache.stats()["evictions"] == 1
+    assert model.invoke("a").content == "r1"
+    assert model.invoke("b").content == "r4"
+
+    now[0] += 120
+    assert model.invoke("a").content == "r5"
+    assert cache.stats()["expired"] >= 1
+
+
+def test_bypass_skips_read_and_refreshes_entry(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "c.sqlite3"))
+    model = _model(cache)
+    assert model.invoke("x").content == "first"
+    with llm_cache_bypass():
+        assert model.invoke("x").content == "second"
+    assert model.invoke("x").content == "second"
+    assert cache.stats()["bypassed"] == 1
+
+
+def test_get_model_enables_cache_per_agent(tmp_path, monkeypatch):
+    from agentlz.config.settings import Settings
+    from agentlz.core.model_factory import clear_model_cache, get_model
+
+    monkeypatch.setenv("MODEL_NAME", "gpt-test")
+    monkeypatch.setenv("CHATOPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+    monkeypatch.setenv("CHATOPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "true")
+    monkeypatch.setenv("LLM_CACHE_AGENTS", "planner")
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "agents.sqlite3"))
+    settings = Settings(_env_file=None)
+    try:
+        planner = get_model(settings, agent_name="planner")
+        executor = get_model(settings, agent_name="executor")
+        assert isinstance(planner.cache, SQLiteLLMCache)
+        assert executor.cache is None
+        assert planner is not executor
+    finally:
+        clear_model_cache()
+        llm_cache_mod.close_llm_caches()
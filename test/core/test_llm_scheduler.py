@@ -0,0 +1,211 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from agentlz.core.llm_scheduler import LLMScheduler, TokenBucket, is_rate_limit_error
+
+
+class _FakeOpenAI:
+    """本地 OpenAI 兼容服务：前 fail_first 次请求返回 429，其余返回固定补全。"""
+
+    def __init__(self, fail_first=0, delay=0.0, retry_after="0"):
+        self.fail_first = fail_first
+        self.delay = delay
+        self.retry_after = retry_after
+        self.calls = 0
+        self.inflight = 0
+        self.max_inflight = 0
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                with fake.lock:
+                    fake.calls += 1
+                    n = fake.calls
+                    fake.inflight += 1
+                    fake.max_inflight = max(fake.max_inflight, fake.inflight)
+                try:
+                    time.sleep(fake.delay)
+                    if n <= fake.fail_first:
+                        body = json.dumps({"error": {"message": "rate limited", "type": "rate_limit"}}).encode()
+                        self.send_response(429)
+                        self.send_header("Retry-After", fake.retry_after)
+                    else:
+                        body = json.dumps({
+                            "id": "cmpl-1", "object": "chat.completion", "created": 0, "model": "fake",
+                            "choices": [{"index": 0, "finish_reason": "stop",
+                                         "message": {"role": "assistant", "content": "pong"}}],
+                            "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+                        }).encode()
+                        self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with fake.lock:
+                        fake.inflight -= 1
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def model_env(monkeypatch):
+    from agentlz.config.settings import Settings
+    from agentlz.core.model_factory import clear_model_cache
+
+    def build(url, **extra):
+        monkeypatch.setenv("MODEL_NAME", "fake")
+        monkeypatch.setenv("CHATOPENAI_BASE_URL", url)
+        monkeypatch.setenv("CHATOPENAI_API_KEY", "sk-test")
+        monkeypatch.setenv("LLM_RETRY_BASE_DELAY", "0.01")
+        for k, v in extra.items():
+            monkeypatch.setenv(k, str(v))
+        return Settings(_env_file=None)
+
+    clear_model_cache()
+    yield build
+    clear_model_cache()
+
+
+def _scheduler_stats(url):
+    from agentlz.core.model_factory import get_model_pool_stats
+    return get_model_pool_stats()[url]["scheduler"]
+
+
+def test_retries_429_honoring_retry_after_and_backs_off(model_env):
+    from agentlz.core.model_factory import get_model
+
+    fake = _FakeOpenAI(fail_first=2)
+    try:
+        settings = model_env(fake.url)
+        assert get_model(settings).invoke("ping").content == "pong"
+        stats = _scheduler_stats(fake.url)
+        assert fake.calls == 3
+        assert stats["retries"] == 2 and stats["rate_limited"] == 2
+        # 429 触发乘性减：8 -> 4（同一波过载只减一次）
+        assert stats["concurrency_limit"] == 4
+    finally:
+        fake.close()
+
+
+def test_exhausted_retries_surface_rate_limit_error(model_env):
+    from agentlz.core.model_factory import get_model
+
+    fake = _FakeOpenAI(fail_first=100)
+    try:
+        settings = model_env(fake.url, LLM_MAX_RETRIES=1)
+        with pytest.raises(Exception) as info:
+            get_model(settings).invoke("ping")
+        assert is_rate_limit_error(info.value)
+        assert fake.calls == 2
+    finally:
+        fake.close()
+
+
+def test_concurrency_limit_is_shared_across_async_callers(model_env):
+    from agentlz.core.model_factory import get_model
+
+    fake = _FakeOpenAI(delay=0.05)
+    try:
+        settings = model_env(fake.url, LLM_CONCURRENCY_INITIAL=2, LLM_CONCURRENCY_MAX=2)
+
+        async def run():
+            # 不同 Agent 名称得到的模型实例共享同一端点调度器
+            models = [get_model(settings, agent_name=name) for name in ("planner", "executor", "check", "mail")]
+            return await asyncio.gather(*(models[i % 4].ainvoke(f"q{i}") for i in range(8)))
+
+        results = asyncio.run(run())
+        assert [r.content for r in results] == ["pong"] * 8
+        assert fake.max_inflight <= 2
+    finally:
+        fake.close()
+
+
+def test_token_bucket_and_retry_after_parsing():
+    bucket = TokenBucket(rate_per_minute=60)
+    assert bucket.reserve(60) == 0.0
+    # 桶已耗尽：再取 1 个需等待约 1 秒
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+
+    scheduler = LLMScheduler(base_delay=1.0, max_delay=8.0)
+    resp = httpx.Response(429, headers={"Retry-After": "3"})
+    assert scheduler.backoff_delay(0, resp) == 3.0
+    assert scheduler.backoff_delay(0, httpx.Response(429, headers={"retry-after-ms": "250"})) == 0.25
+    # 无 Retry-After：full jitter，范围 [0, min(max_delay, base * 2^attempt)]
+    delays = [scheduler.backoff_delay(5) for _ in range(50)]
+    assert all(0 <= d <= 8.0 for d in delays)
+
+
+def test_retries_stop_at_the_request_deadline(model_env):
+    from agentlz.core.deadline import deadline_scope
+    from agentlz.core.model_factory import get_model
+
+    # Retry-After 5s 超过剩余截止时间：不再等待重试，直接返回限流错误
+    fake = _FakeOpenAI(fail_first=100, retry_after="5")
+    try:
+        settings = model_env(fake.url)
+        start = time.perf_counter()
+        with deadline_scope(1.0), pytest.raises(Exception) as info:
+            get_model(settings).invoke("ping")
+        assert time.perf_counter() - start < 1.0
+        assert is_rate_limit_error(info.value)
+        assert fake.calls == 1
+        assert _scheduler_stats(fake.url)["deadline_stops"] == 1
+    finally:
+        fake.close()
+
+
+def test_streaming_response_holds_the_slot_until_the_body_is_read():
+    from agentlz.core.llm_scheduler import AIMDLimiter, AsyncScheduledTransport, ScheduledTransport
+
+    scheduler = LLMScheduler(limiter=AIMDLimiter(initial=1, maximum=1))
+    chunks = [b"data: a\n\n", b"data: b\n\n", b"data: [DONE]\n\n"]
+
+    async def agen():
+        for chunk in chunks:
+            yield chunk
+
+    seen = []
+
+    async def run():
+        transport = AsyncScheduledTransport(
+            httpx.MockTransport(lambda request: httpx.Response(200, content=agen())), scheduler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            async with client.stream("POST", "http://llm/v1/chat/completions", json={"stream": True}) as resp:
+                async for _ in resp.aiter_raw():
+                    seen.append(scheduler.limiter.inflight)
+            seen.append(scheduler.limiter.inflight)
+
+    asyncio.run(run())
+    # 读取响应体期间仍占用名额，读完后归还
+    assert seen == [1, 1, 1, 0]
+
+    transport = ScheduledTransport(httpx.MockTransport(lambda request: httpx.Response(200, content=iter(chunks))),
+                                   scheduler)
+    with httpx.Client(transport=transport) as client:
+        with client.stream("POST", "http://llm/v1/chat/completions", json={"stream": True}) as resp:
+            body = resp.iter_raw()
+            next(body)
+            assert scheduler.limiter.inflight == 1
+            assert list(body) == chunks[1:]
+        assert scheduler.limiter.inflight == 0
+        # 非流式请求的名额在返回响应头时归还
+        client.post("http://llm/v1/chat/completions", json={"stream": False})
+        assert scheduler.limiter.inflight == 0
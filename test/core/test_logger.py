@@ -0,0 +1,65 @@
+import json
+import logging
+import sys
+
+import pytest
+
+from agentlz.core import logger as log_module
+from agentlz.core.logger import JsonFormatter, setup_logging, shutdown_logging
+
+
+@pytest.fixture
+def fresh_logging(offline_env, monkeypatch):
+    shutdown_logging()
+    yield monkeypatch
+    shutdown_logging()
+    for name in ("agentlz.test_verbose", "agentlz.test_quiet"):
+        logging.getLogger(name).setLevel(logging.NOTSET)
+
+
+def _queue_handlers():
+    return [h for h in logging.getLogger().handlers if isinstance(h, log_module._QueueHandler)]
+
+
+def test_repeated_setup_keeps_a_single_listener(fresh_logging):
+    first = setup_logging("INFO")
+    listener = log_module._LISTENER
+    for level in ("INFO", "DEBUG", "INFO"):
+        assert setup_logging(level) is first
+    assert log_module._LISTENER is listener and len(_queue_handlers()) == 1
+    assert logging.getLogger().level == logging.INFO
+
+
+def test_json_format_and_module_levels_apply(fresh_logging, capsys):
+    fresh_logging.setenv("LOG_FORMAT", "json")
+    fresh_logging.setenv("LOG_MODULE_LEVELS", "agentlz.test_verbose=DEBUG, agentlz.test_quiet=ERROR, bad")
+    setup_logging("INFO")
+    verbose, quiet = logging.getLogger("agentlz.test_verbose"), logging.getLogger("agentlz.test_quiet")
+    assert verbose.level == logging.DEBUG and quiet.level == logging.ERROR
+
+    verbose.debug("调试 %s", "可见", extra={"request_id": "r-1"})
+    quiet.warning("不应输出")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        quiet.exception("失败：%d", 42)
+    shutdown_logging()
+
+    lines = [json.loads(line) for line in capsys.readouterr().err.splitlines() if line.strip()]
+    assert [r["message"] for r in lines] == ["调试 可见", "失败：42"]
+    assert lines[0]["level"] == "DEBUG" and lines[0]["request_id"] == "r-1"
+    assert lines[1]["logger"] == "agentlz.test_quiet"
+    assert "ValueError: boom" in lines[1]["exc_info"] and "Traceback" in lines[1]["exc_info"]
+
+
+def test_json_formatter_emits_one_line_with_exc_info():
+    try:
+        raise KeyError("missing")
+    except KeyError:
+        record = logging.getLogger("agentlz").makeRecord(
+            "agentlz", logging.ERROR, __file__, 1, "多行\n消息", None, sys.exc_info()
+        )
+    line = JsonFormatter().format(record)
+    assert "\n" not in line
+    payload = json.loads(line)
+    assert payload["message"] == "多行\n消息" and "KeyError: 'missing'" in payload["exc_info"]
@@ -0,0 +1,75 @@
+import asyncio
+import gc
+
+import pytest
+
+from test.core.test_llm_scheduler import _FakeOpenAI
+
+
+@pytest.fixture
+def settings_for(monkeypatch):
+    from agentlz.config.settings import Settings
+    from agentlz.core.model_factory import clear_model_cache
+
+    def build(url, api_key="sk-test", temperature=0.0):
+        monkeypatch.setenv("MODEL_NAME", "fake")
+        monkeypatch.setenv("CHATOPENAI_BASE_URL", url)
+        monkeypatch.setenv("CHATOPENAI_API_KEY", api_key)
+        monkeypatch.setenv("MODEL_TEMPERATURE", str(temperature))
+        return Settings(_env_file=None)
+
+    clear_model_cache()
+    yield build
+    clear_model_cache()
+
+
+def test_same_settings_share_instance_and_endpoint_shares_clients(settings_for):
+    from agentlz.core.model_factory import get_model, get_model_pool_stats
+
+    url = "http://127.0.0.1:9/v1"
+    base = get_model(settings_for(url))
+    assert get_model(settings_for(url)) is base
+    # 端点、密钥或温度不同都不命中
+    other_endpoint = get_model(settings_for("http://127.0.0.1:10/v1"))
+    other_key = get_model(settings_for(url, api_key="sk-other"))
+    warmer = get_model(settings_for(url, temperature=0.7))
+    assert len({id(m) for m in (base, other_endpoint, other_key, warmer)}) == 4
+    stats = get_model_pool_stats()[url]
+    assert stats["model_hits"] == 1 and stats["model_misses"] == 3 and stats["cached_models"] == 3
+
+    # 同一端点的模型共享连接池；不同端点各自独立
+    assert warmer.http_client is base.http_client and warmer.http_async_client is base.http_async_client
+    assert other_endpoint.http_client is not base.http_client
+    assert other_endpoint.http_async_client is not base.http_async_client
+
+
+def test_async_pools_are_created_per_loop_and_dropped_with_it(settings_for):
+    from agentlz.core.model_factory import get_model, get_model_pool_stats
+
+    fake = _FakeOpenAI()
+    try:
+        # 在同步代码中创建的模型：创建时不绑定任何事件循环的连接池
+        model = get_model(settings_for(fake.url))
+        assert get_model_pool_stats()[fake.url]["async_pools"] == 0
+
+        async def ask():
+            return (await model.ainvoke("ping")).content
+
+        assert asyncio.run(ask()) == "pong"
+        assert asyncio.run(ask()) == "pong"
+        assert fake.calls == 2
+        # 每次 asyncio.run 的事件循环关闭并被回收后，其连接池随之移除
+        gc.collect()
+        assert get_model_pool_stats()[fake.url]["async_pools"] == 0
+
+        loop = asyncio.new_event_loop()
+        try:
+            assert loop.run_until_complete(ask()) == "pong"
+            assert get_model_pool_stats()[fake.url]["async_pools"] == 1
+        finally:
+            loop.close()
+        del loop
+        gc.collect()
+        assert get_model_pool_stats()[fake.url]["async_pools"] == 0
+    finally:
+        fake.close()
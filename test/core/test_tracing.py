@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from agentlz.agents.executor.executor_agnet import MCPChainExecutor
+from agentlz.core import tracing
+from agentlz.core.tracing import JsonlSpanExporter, load_spans, set_span_exporter, span, summarize_spans
+from agentlz.schemas.workflow import MCPConfigItem, WorkflowPlan
+from test.bench.fake_llm import FakeChatModel, executor_responder
+from test.helpers import FakeMCPServer
+
+
+@pytest.fixture
+def exporter(tmp_path):
+    exporter = JsonlSpanExporter(str(tmp_path / "traces" / "spans.jsonl"))
+    previous = set_span_exporter(exporter)
+    try:
+        yield exporter
+    finally:
+        set_span_exporter(previous)
+
+
+def test_nested_spans_are_exported_in_otel_shape_and_summarized(exporter, capsys):
+    async def main():
+        with span("workflow.run", parent="00-" + "a" * 32 + "-" + "b" * 16 + "-01") as root:
+            with span("planner.plan", {"planner.mode": "agent"}):
+                await asyncio.sleep(0.05)
+            with pytest.raises(ValueError):
+                with span("mcp.call_tool", {"mcp.tool": "square"}, kind="client"):
+                    raise ValueError("boom")
+        return root
+
+    root = asyncio.run(main())
+    assert tracing.current_span() is None
+    assert exporter.flush()
+    spans = {s["name"]: s for s in load_spans(exporter.path)}
+    # 延续 traceparent 中的 trace，子 span 挂在 workflow.run 下
+    assert root.trace_id == "a" * 32 and spans["workflow.run"]["parent_id"] == "b" * 16
+    assert spans["planner.plan"]["parent_id"] == spans["mcp.call_tool"]["parent_id"] == root.span_id
+    assert spans["planner.plan"]["attributes"] == {"planner.mode": "agent"}
+    assert spans["mcp.call_tool"]["status"] == "STATUS_CODE_ERROR"
+
+    summary = tracing.main(["--path", exporter.path, "--top", "2"])
+    assert [s["name"] for s in summary["slowest"]] == ["workflow.run", "planner.plan"]
+    assert summary["by_name"][0]["name"] == "planner.plan" and summary["by_name"][0]["self_ms"] >= 40
+    assert "planner.plan" in capsys.readouterr().out
+
+
+def test_executor_run_traces_llm_and_mcp_calls_and_propagates_traceparent(exporter, offline_env, pooled_executor):
+    offline_env.setenv("EXECUTOR_MODE", "agent")
+    server = FakeMCPServer()
+    pool = pooled_executor(server.factory)
+    plan = WorkflowPlan(
+        execution_chain=["math"],
+        mcp_config=[MCPConfigItem(name="math", transport="stdio", command="python", args=["math.py"])],
+    )
+    llm = FakeChatModel(responder=executor_responder(answer_words=2), counters={})
+    try:
+        asyncio.run(MCPChainExecutor(plan, llm=llm).execute_chain("计算"))
+    finally:
+        pool.close()
+    assert exporter.flush()
+    spans = load_spans(exporter.path)
+    names = [s["name"] for s in spans]
+    root = next(s for s in spans if s["name"] == "executor.run")
+    assert names.count("llm.chat") == 2 and {"mcp.get_tools", "mcp.list_tools", "mcp.spawn", "tool.call"} <= set(names)
+    # 会话池线程中的 span 与调用方属于同一 trace
+    assert {s["trace_id"] for s in spans} == {root["trace_id"]}
+    call = next(s for s in spans if s["name"] == "mcp.call_tool")
+    assert call["parent_id"] == next(s["span_id"] for s in spans if s["name"] == "tool.call")
+    assert server.metas == [{"traceparent": f"00-{root['trace_id']}-{call['span_id']}-01"}]
+    summary = summarize_spans(spans)
+    assert summary["traces"] == 1 and summary["slowest"][0]["name"] == "executor.run"
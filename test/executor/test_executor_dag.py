@@ -0,0 +1,97 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from agentlz.agents.executor.dag import render_task, run_dag, validate_steps
+from agentlz.agents.executor.executor_agnet import MCPChainExecutor
+from agentlz.schemas.workflow import MCPConfigItem, WorkflowPlan, WorkflowStep
+from test.bench.fake_llm import FakeChatModel, executor_responder
+from test.helpers import FakeMCPServer
+
+
+def _fan_in():
+    return [
+        WorkflowStep(id="a", server="math", task="计算 3 的平方"),
+        WorkflowStep(id="b", server="math", task="计算 4 的平方"),
+        WorkflowStep(id="c", server="math", task="计算 5 的平方"),
+        WorkflowStep(id="sum", server="math", task="{a} + {b} + {c}", inputs=["a", "b", "c"]),
+    ]
+
+
+def test_ready_steps_run_concurrently_and_failures_skip_dependents():
+    async def run_step(step, outputs):
+        await asyncio.sleep(0.1)
+        if step.id == "b" and fail:
+            raise RuntimeError("boom")
+        return render_task(step.task, outputs) if step.inputs else step.id.upper()
+
+    fail = False
+    start = time.perf_counter()
+    results = asyncio.run(run_dag(_fan_in(), run_step, concurrency=4))
+    assert time.perf_counter() - start < 0.3  # 关键路径 2 步 × 0.1s
+    assert results["sum"].output == "A + B + C"
+
+    start = time.perf_counter()
+    asyncio.run(run_dag(_fan_in(), run_step, concurrency=1))
+    assert time.perf_counter() - start >= 0.4
+
+    fail = True
+    results = asyncio.run(run_dag(_fan_in(), run_step, concurrency=4))
+    assert [r.status for r in results.values()] == ["ok", "error", "ok", "skipped"]
+
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError):
+        validate_steps([WorkflowStep(id="a", server="", task="", inputs=["b"]),
+                        WorkflowStep(id="b", server="", task="", inputs=["a"])])
+    with pytest.raises(ValueError):
+        validate_steps([WorkflowStep(id="a", server="", task="", inputs=["missing"])])
+
+
+def test_executor_dag_mode_streams_step_events(offline_env, pooled_executor):
+    offline_env.setenv("EXECUTOR_MODE", "dag")
+    pooled_executor(FakeMCPServer().factory)
+    plan = WorkflowPlan(
+        execution_chain=["math"],
+        mcp_config=[MCPConfigItem(name="math", transport="stdio", command="python", args=["math.py"])],
+        steps=_fan_in(),
+    )
+    llm = FakeChatModel(responder=executor_responder(answer_words=2), counters={})
+    executor = MCPChainExecutor(plan, llm=llm)
+
+    async def collect():
+        return [ev async for ev in executor.astream_chain("计算平方和")]
+
+    events = asyncio.run(collect())
+    assert [e["event"] for e in events].count("step_end") == 4
+    assert events[-1] == {"event": "result", "data": {"output": "w0 w1"}}
+    assert all(r.status == "ok" for r in executor.step_results.values())
+    # 每个步骤：一次工具调用 + 一次回答
+    assert llm.counters["calls"] == 8
+
+
+def test_direct_mode_calls_tools_without_llm_and_pipes_outputs(offline_env, pooled_executor):
+    offline_env.setenv("EXECUTOR_MODE", "direct")
+    pooled_executor()
+    math_tool = str(Path(__file__).resolve().parents[1] / "planner" / "test_tool" / "math_tool.py")
+    plan = WorkflowPlan(
+        execution_chain=["math"],
+        mcp_config=[MCPConfigItem(name="math", transport="stdio", command=sys.executable, args=[math_tool])],
+        steps=[
+            WorkflowStep(id="s1", server="math", task="", tool="evaluate", args={"expression": "3**2"}),
+            # 未声明 inputs：依赖由参数模板中的引用推断
+            WorkflowStep(id="s2", server="math", task="", tool="evaluate", args={"expression": "{s1}**2"}, output="sq"),
+            WorkflowStep(id="s3", server="math", task="", tool="evaluate", args={"expression": "{sq}+3"}),
+            WorkflowStep(id="s4", server="", task="把 {s3} 写成一句话", reasoning=True),
+        ],
+    )
+    llm = FakeChatModel(responder=executor_responder(answer_words=2), counters={})
+    executor = MCPChainExecutor(plan, llm=llm)
+    output = asyncio.run(executor.execute_chain("3 平方两次再加 3，用一句话描述"))
+    assert [r.output for r in executor.step_results.values()] == ["9", "81", "84", "w0 w1"]
+    assert output == "w0 w1"
+    # 只有 reasoning 步骤调用模型
+    assert llm.counters["calls"] == 1
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from agentlz.agents.executor.executor_agnet import MCPChainExecutor
+from agentlz.core.deadline import DeadlineExceeded, deadline_scope, remaining, run_with_timeout
+from agentlz.schemas.workflow import MCPConfigItem, WorkflowPlan, WorkflowStep
+from test.bench.fake_llm import FakeChatModel, executor_responder
+from test.helpers import FakeMCPServer
+
+
+def test_nested_scopes_keep_the_earliest_deadline():
+    async def main():
+        with deadline_scope(0.2):
+            with deadline_scope(10):
+                assert remaining() <= 0.2
+                await run_with_timeout(asyncio.sleep(5))
+
+    start = time.perf_counter()
+    try:
+        asyncio.run(main())
+    except DeadlineExceeded:
+        pass
+    else:
+        raise AssertionError("expected DeadlineExceeded")
+    assert time.perf_counter() - start < 1.0
+
+
+def test_hung_tool_times_out_its_step_and_retires_the_session(offline_env, pooled_executor):
+    offline_env.setenv("EXECUTOR_MODE", "direct")
+    slow, fast = FakeMCPServer(), FakeMCPServer()
+    slow.gate = asyncio.Event()  # 永不放行：模拟卡住的服务器
+    pool = pooled_executor(lambda c: (slow if "slow.py" in c["args"] else fast).factory(c))
+    plan = WorkflowPlan(
+        execution_chain=["slow", "fast"],
+        mcp_config=[MCPConfigItem(name="slow", transport="stdio", command="python", args=["slow.py"]),
+                    MCPConfigItem(name="fast", transport="stdio", command="python", args=["fast.py"])],
+        steps=[
+            WorkflowStep(id="a", server="slow", task="", tool="square", timeout=0.3),
+            WorkflowStep(id="b", server="fast", task="", tool="square"),
+            WorkflowStep(id="c", server="slow", task="", tool="square", inputs=["a"]),
+        ],
+    )
+    executor = MCPChainExecutor(plan)
+    start = time.perf_counter()
+    output = asyncio.run(executor.execute_chain("卡住的服务器"))
+    elapsed = time.perf_counter() - start
+    deadline = time.monotonic() + 5
+    while slow.closed == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    stats, closed = pool.stats(), (slow.closed, fast.closed)
+    assert elapsed < 2.0
+    assert executor.status == "timeout" and output.startswith("执行器超时")
+    assert [r.status for r in executor.step_results.values()] == ["timeout", "ok", "skipped"]
+    assert executor.partial_results == {"b": ""}
+    # 超时调用所在会话被关闭（子进程结束），未超时的服务器会话保留
+    assert closed == (1, 0)
+    assert stats["evicted_timeout"] == 1
+
+
+def test_request_deadline_cancels_slow_llm_in_agent_mode(offline_env, pooled_executor):
+    offline_env.setenv("EXECUTOR_MODE", "agent")
+    pooled_executor(FakeMCPServer().factory)
+    plan = WorkflowPlan(
+        execution_chain=["math"],
+        mcp_config=[MCPConfigItem(name="math", transport="stdio", command="python", args=["math.py"])],
+    )
+    llm = FakeChatModel(responder=executor_responder(answer_words=2), latency_ms=300, counters={})
+    executor = MCPChainExecutor(plan, llm=llm)
+
+    async def collect():
+        return [ev async for ev in executor.astream_chain("计算", timeout=0.5)]
+
+    start = time.perf_counter()
+    events = asyncio.run(collect())
+    elapsed = time.perf_counter() - start
+    assert elapsed < 1.5
+    # 第一次 LLM 往返（300ms）后完成了一次工具调用，第二次往返被截止时间取消
+    assert [e["event"] for e in events] == ["tool_start", "tool_end", "timeout"]
+    assert events[-1]["data"]["partial"] == {"square#1": ""}
+    assert executor.status == "timeout"
@@ -0,0 +1,69 @@
+import asyncio
+import contextlib
+import time
+
+from agentlz.agents.planner.planner_agent import plan_workflow_chain
+from agentlz.services.mcp_session_pool import MCPSessionPool, server_key
+from agentlz.services.mcp_warmup import MCPWarmupCallback, extract_mcp_configs
+from test.bench.fake_llm import FakeChatModel, planner_responder
+from test.bench.run_bench import make_lookup_tool
+from test.helpers import FakeMCPServer
+
+USED = {"name": "used", "transport": "stdio", "command": "python", "args": ["used.py"]}
+UNUSED = {"name": "unused", "transport": "stdio", "command": "python", "args": ["unused.py"]}
+
+
+def _slow_start(server, delay):
+    """服务器拉起耗时 delay 秒（模拟子进程启动与 initialize）。"""
+
+    @contextlib.asynccontextmanager
+    async def factory(connection):
+        await asyncio.sleep(delay)
+        async with server.factory(connection) as session:
+            yield session
+
+    return factory
+
+
+def _wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+
+def test_executor_adopts_warming_session_and_unused_one_expires():
+    used, unused = FakeMCPServer(), FakeMCPServer()
+    factories = {"used.py": _slow_start(used, 0.2), "unused.py": _slow_start(unused, 0.2)}
+    pool = MCPSessionPool(prewarm_grace=0.3, session_factory=lambda c: factories[c["args"][0]](c))
+    try:
+        assert pool.prewarm([USED, UNUSED, dict(USED)]) == 2
+        # 预热尚未完成时加载工具：等待预热会话而不是再拉起一个
+        tools = asyncio.run(pool.get_tools([USED]))
+        asyncio.run(pool.call_tool(server_key(USED), "square", {}))
+        assert [t.name for t in tools] == ["square"] and used.started == 1
+        assert pool.prewarm([USED]) == 1
+        _wait_for(lambda: pool.stats()["prewarm_expired"] == 1)
+        stats = pool.stats()
+    finally:
+        pool.close()
+    assert stats["prewarm_sessions"] == 2 and stats["prewarm_adopted"] == 1 and stats["prewarm_skipped"] == 1
+    # 未被采用的预热会话在宽限期后关闭，被采用的会话保留
+    assert unused.closed == 1 and stats["sessions"] == 1 and used.started == 1
+
+
+def test_planner_lookups_prewarm_top_candidates_while_planning(offline_env):
+    server = FakeMCPServer()
+    pool = MCPSessionPool(session_factory=server.factory)
+    warmup = MCPWarmupCallback(pool, max_servers=4)
+    llm = FakeChatModel(responder=planner_responder(["tool0", "tool1"]), latency_ms=200)
+    try:
+        plan = plan_workflow_chain("任务", llm=llm, tools=[make_lookup_tool(0)], callbacks=[warmup])
+        # 最后一轮模型往返期间两个候选服务器已拉起
+        started = server.started
+        _wait_for(lambda: pool.stats()["prewarm_sessions"] == 2)
+    finally:
+        pool.close()
+    assert plan.execution_chain == ["bench_tool0", "bench_tool1"]
+    assert warmup.requested == plan.execution_chain and started == 2
+    batch = {"groups": {"a": ["x", "y"]}, "configs": [dict(USED, name="y"), dict(USED, name="x")]}
+    assert [c["name"] for c in extract_mcp_configs(batch)] == ["x"]
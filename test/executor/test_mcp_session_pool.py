@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import anyio
+
+from agentlz.services.mcp_session_pool import MCPSessionPool, server_key
+from test.helpers import FakeMCPServer
+
+CONFIG = {"name": "math_agent", "transport": "stdio", "command": "python", "args": ["math_agent.py"]}
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_sessions_are_reused_across_event_loops_and_capped_per_server():
+    server = FakeMCPServer()
+    pool = MCPSessionPool(max_sessions_per_server=2, max_inflight_per_session=2, session_factory=server.factory)
+    key = server_key(CONFIG)
+    try:
+        tools = _run(pool.get_tools([CONFIG, dict(CONFIG)]))
+        assert [t.name for t in tools] == ["square"]
+        _run(pool.get_tools([CONFIG]))
+        _run(pool.call_tool(key, "square", {}))
+        assert server.started == 1 and pool.stats()["warm_leases"] == 2
+
+        async def burst():
+            # 6 个请求同时阻塞：2 个会话 × 每会话 2 个并发，其余排队
+            server.gate = asyncio.Event()
+            calls = [asyncio.create_task(pool.call_tool(key, "square", {})) for _ in range(6)]
+            await asyncio.sleep(0.2)
+            inflight = pool.stats()["inflight"]
+            pool._loop.call_soon_threadsafe(server.gate.set)
+            await asyncio.gather(*calls)
+            return inflight
+
+        inflight = _run(burst())
+        assert inflight == 4 and server.started == 2
+        assert pool.stats()["waits"] >= 1 and pool.stats()["sessions"] == 2
+    finally:
+        pool.close()
+    assert server.closed == server.started
+
+
+def test_idle_unhealthy_and_broken_sessions_are_evicted():
+    server = FakeMCPServer()
+    pool = MCPSessionPool(idle_ttl=0.3, health_interval=0.1, session_factory=server.factory)
+    key = server_key(CONFIG)
+    try:
+        _run(pool.call_tool(key, "square", {}))
+        deadline = time.monotonic() + 3
+        while pool.stats()["sessions"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert pool.stats()["evicted_idle"] == 1 and server.closed == 1
+
+        server.ping_ok = False
+        _run(pool.call_tool(key, "square", {}))
+        deadline = time.monotonic() + 3
+        while pool.stats()["sessions"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert pool.stats()["evicted_unhealthy"] == 1
+
+        server.dead = True
+        try:
+            _run(pool.call_tool(key, "square", {}))
+        except anyio.ClosedResourceError:
+            pass
+        assert pool.stats()["sessions"] == 0 and pool.stats()["evicted_unhealthy"] == 2
+        server.dead = False
+        _run(pool.call_tool(key, "square", {}))
+        assert server.started == 4
+    finally:
+        pool.close()
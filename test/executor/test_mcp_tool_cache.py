@@ -0,0 +1,69 @@
+import asyncio
+import os
+
+from agentlz.services.mcp_session_pool import MCPSessionPool, server_key
+from agentlz.services.mcp_tool_cache import MCPToolSchemaCache
+from test.helpers import FakeMCPServer
+
+
+def _config(script):
+    return {"name": "math_agent", "transport": "stdio", "command": "python", "args": [str(script)]}
+
+
+def _pool(server, path):
+    return MCPSessionPool(session_factory=server.factory, tool_cache=MCPToolSchemaCache(str(path)))
+
+
+def test_cold_process_builds_tools_from_disk_and_connects_lazily(tmp_path):
+    script = tmp_path / "math_agent.py"
+    script.write_text("print('v1')")
+    path = tmp_path / "mcp_tool_cache.json"
+    server = FakeMCPServer()
+    config = _config(script)
+
+    pool = _pool(server, path)
+    try:
+        assert [t.name for t in asyncio.run(pool.get_tools([config]))] == ["square"]
+        assert server.started == 1 and path.exists()
+    finally:
+        pool.close()
+
+    # 新进程：从持久化文件构建工具，不拉起服务器；首次调用工具时才建立会话
+    pool = _pool(server, path)
+    try:
+        tools = asyncio.run(pool.get_tools([config]))
+        assert [t.name for t in tools] == ["square"] and server.started == 1
+        assert pool.stats()["tool_cache"]["hits"] == 1
+        asyncio.run(tools[0].ainvoke({}))
+        assert server.started == 2
+    finally:
+        pool.close()
+
+
+def test_entries_invalidate_on_config_binary_or_version_change(tmp_path):
+    script = tmp_path / "math_agent.py"
+    script.write_text("print('v1')")
+    cache = MCPToolSchemaCache(str(tmp_path / "mcp_tool_cache.json"))
+    server = FakeMCPServer()
+    pool = MCPSessionPool(session_factory=server.factory, tool_cache=cache)
+    config = _config(script)
+    try:
+        asyncio.run(pool.get_tools([config]))
+        assert cache.get(server_key(config)) is not None
+        assert cache.get(server_key(dict(config, args=[str(script), "--verbose"]))) is None
+
+        script.write_text("print('v2, longer')")
+        os.utime(script, ns=(1, 1))
+        assert cache.get(server_key(config)) is None
+        asyncio.run(pool.get_tools([config]))
+        assert server.started == 1 and cache.get(server_key(config)) is not None
+
+        # 服务器升级：新会话上报的版本与缓存不一致，条目失效
+        server.version = "2.0"
+        pool.close()
+        tools = asyncio.run(pool.get_tools([config]))
+        asyncio.run(tools[0].ainvoke({}))
+        assert server.started == 2 and cache.get(server_key(config)) is None
+        assert cache.stats()["invalidations"] == 1
+    finally:
+        pool.close()
@@ -0,0 +1,58 @@
+"""
+测试共用的模拟对象
+
+- FakeMCPServer：进程内模拟的 MCP 服务器，作为 MCPSessionPool 的 session_factory 使用，
+  记录拉起/关闭次数与每次工具调用，不启动子进程。
+"""
+
+import contextlib
+from types import SimpleNamespace
+
+import anyio
+from mcp.types import Tool
+
+
+class FakeMCPServer:
+    """模拟 MCP 服务器：记录拉起/关闭次数，call_tool 可阻塞以制造并发占用。"""
+
+    def __init__(self):
+        self.started = 0
+        self.closed = 0
+        self.gate = None
+        self.ping_ok = True
+        self.dead = False
+        self.version = "1.0"
+        # 各次 call_tool 收到的请求 _meta 与 (工具名, 参数)
+        self.metas = []
+        self.calls = []
+
+    @contextlib.asynccontextmanager
+    async def factory(self, connection):
+        self.started += 1
+        server = self
+
+        class Session:
+            async def initialize(self):
+                return SimpleNamespace(serverInfo=SimpleNamespace(name="fake", version=server.version))
+
+            async def list_tools(self, cursor=None):
+                tool = Tool(name="square", description="平方", inputSchema={"type": "object", "properties": {}})
+                return SimpleNamespace(tools=[tool], nextCursor=None)
+
+            async def call_tool(self, name, arguments=None, meta=None):
+                server.metas.append(meta)
+                server.calls.append((name, arguments))
+                if server.dead:
+                    raise anyio.ClosedResourceError()
+                if server.gate is not None:
+                    await server.gate.wait()
+                return SimpleNamespace(content=[], isError=False, structuredContent=None)
+
+            async def send_ping(self):
+                if not server.ping_ok:
+                    raise RuntimeError("no pong")
+
+        try:
+            yield Session()
+        finally:
+            self.closed += 1
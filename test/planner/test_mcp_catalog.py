@@ -0,0 +1,156 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+from agentlz.services.mcp_catalog import MCPCatalog
+
+
+class _Table:
+    """模拟 mcp_agents 表：loader(since) 按 updated_at 水位返回记录。"""
+
+    def __init__(self):
+        self.now = datetime(2025, 1, 1)
+        self.rows = {}
+        self.loads = []
+
+    def upsert(self, id, name, description, trust_score, args=None):
+        self.now += timedelta(seconds=1)
+        self.rows[id] = {"id": id, "name": name, "transport": "stdio", "command": "python",
+                         "args": args or [f"{name}.py"], "category": None, "trust_score": trust_score,
+                         "description": description, "updated_at": self.now}
+
+    def load(self, since):
+        self.loads.append(since)
+        return [dict(r) for r in self.rows.values() if since is None or r["updated_at"] >= since]
+
+    def count(self):
+        return len(self.rows)
+
+    def like(self, kw, limit):
+        kw = kw.lower()
+        hits = [r for r in self.rows.values() if kw in r["name"].lower() or kw in r["description"].lower()]
+        hits.sort(key=lambda r: (-r["trust_score"], str(r["id"])))
+        return [r["name"] for r in hits[:limit]]
+
+
+def _catalog(table):
+    catalog = MCPCatalog(loader=table.load, counter=table.count, refresh_interval=0)
+    assert catalog.refresh()
+    return catalog
+
+
+def test_search_matches_like_semantics_and_trust_order():
+    table = _Table()
+    table.upsert(1, "math_agent_top", "数学计算 agent（最高可信度）", 100)
+    table.upsert(2, "math_agent_low", "数学计算 agent", 40)
+    table.upsert(3, "language_agent_top", "语言处理 Agent", 100)
+    catalog = _catalog(table)
+
+    assert [r["name"] for r in catalog.search("数学")] == ["math_agent_top", "math_agent_low"]
+    assert [r["name"] for r in catalog.search("AGENT", limit=2)] == table.like("agent", 2)
+    assert catalog.search("翻译") == [] and catalog.search("  ") == []
+    assert catalog.search_configs("语言")[0] == {
+        "name": "language_agent_top", "transport": "stdio", "command": "python", "args": ["language_agent_top.py"],
+    }
+
+    words = ["数学", "语言", "计算", "处理", "翻译", "图像", "搜索", "agent", "math", "top", "可信"]
+    rng = random.Random(7)
+    for i in range(4, 300):
+        desc = "".join(rng.choice(words) for _ in range(4))
+        table.upsert(i, f"tool_{i}_{rng.choice(words)}", desc, rng.randint(0, 100))
+    catalog.refresh(full=True)
+    for kw in words + ["学计", "m", "数", "_1", "不存在"]:
+        assert [r["name"] for r in catalog.search(kw, limit=3)] == table.like(kw, 3), kw
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        catalog.search("计算", limit=3)
+    assert (time.perf_counter() - start) / 1000 < 0.001
+
+
+def test_incremental_refresh_by_watermark_and_reload_on_delete():
+    table = _Table()
+    table.upsert(1, "math_agent_top", "数学计算", 100)
+    table.upsert(2, "language_agent_top", "语言处理", 90)
+    catalog = _catalog(table)
+    first_watermark = table.now
+
+    table.upsert(2, "language_agent_top", "语言处理与翻译", 90)
+    table.upsert(3, "search_agent", "网页搜索", 80)
+    assert catalog.refresh()
+    assert table.loads[-1] == first_watermark
+    assert [r["name"] for r in catalog.search("翻译")] == ["language_agent_top"]
+    assert [r["name"] for r in catalog.search("搜索")] == ["search_agent"]
+    assert catalog.stats()["full_loads"] == 1
+
+    del table.rows[1]
+    assert catalog.refresh()
+    assert catalog.search("数学") == []
+    assert catalog.stats()["full_loads"] == 2 and catalog.stats()["entries"] == 2
+
+
+def test_refresh_failure_keeps_previous_snapshot():
+    table = _Table()
+    table.upsert(1, "math_agent_top", "数学计算", 100)
+    catalog = _catalog(table)
+
+    def broken(since):
+        raise RuntimeError("db down")
+
+    catalog.loader = broken
+    assert not catalog.refresh()
+    assert catalog.ready and [r["name"] for r in catalog.search("数学")] == ["math_agent_top"]
+    assert catalog.stats()["refresh_errors"] == 1
+
+
+def test_batch_keyword_tool_groups_and_deduplicates(offline_env, monkeypatch):
+    import json
+
+    from agentlz.agents.planner.tools import mcp_config_tool
+
+    table = _Table()
+    table.upsert(1, "math_agent_top", "数学计算 agent", 100)
+    table.upsert(2, "math_agent_low", "数学计算 agent", 40)
+    table.upsert(3, "language_agent_top", "语言处理 agent", 90)
+    catalog = _catalog(table)
+    monkeypatch.setattr(mcp_config_tool, "get_mcp_catalog", lambda settings, create=True: catalog)
+
+    result = json.loads(mcp_config_tool.get_mcp_configs_by_keywords.invoke(
+        {"keywords": ["数学", "语言", "agent", "数学", "翻译"], "limit_per_keyword": 2}
+    ))
+    assert result["groups"] == {
+        "数学": ["math_agent_top", "math_agent_low"],
+        "语言": ["language_agent_top"],
+        "agent": ["math_agent_top", "language_agent_top"],
+        "翻译": [],
+    }
+    assert [c["name"] for c in result["configs"]] == ["math_agent_top", "math_agent_low", "language_agent_top"]
+
+
+def test_start_loads_in_background_and_counts_lookups_under_lock():
+    import threading
+
+    table = _Table()
+    table.upsert(1, "math_agent_top", "数学计算", 100)
+    gate = threading.Event()
+
+    def slow_load(since):
+        gate.wait(5)
+        return table.load(since)
+
+    catalog = MCPCatalog(loader=slow_load, counter=table.count, refresh_interval=0)
+    start = time.perf_counter()
+    catalog.start()
+    # 启动不等待整表加载；加载完成前未就绪，调用方回退到数据库查询
+    assert time.perf_counter() - start < 0.5
+    assert not catalog.ready and catalog.search("数学") == []
+    gate.set()
+    catalog._thread.join(5)
+    assert catalog.ready and [r["name"] for r in catalog.search("数学")] == ["math_agent_top"]
+
+    threads = [threading.Thread(target=lambda: [catalog.search("数学") for _ in range(2000)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert catalog.stats()["lookups"] == 2 + 4 * 2000 and catalog.stats()["full_loads"] == 1
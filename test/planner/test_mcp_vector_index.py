@@ -0,0 +1,189 @@
+import math
+import zlib
+
+import pytest
+
+pytest.importorskip("faiss")
+
+from agentlz.services.mcp_catalog import MCPCatalog  # noqa: E402
+from agentlz.services.mcp_vector_index import MCPVectorIndex  # noqa: E402
+
+
+class _CharEmbeddings:
+    """字符二元组哈希向量（归一化）：措辞相近的文本余弦相似度高，且结果确定。"""
+
+    def _vec(self, text):
+        vec = [0.0] * 256
+        for a, b in zip(text, text[1:]):
+            vec[zlib.crc32((a + b).encode("utf-8")) % 256] += 1.0
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+    def embed_query(self, text):
+        return self._vec(text)
+
+    def embed_documents(self, texts):
+        self.calls = getattr(self, "calls", 0) + len(texts)
+        return [self._vec(t) for t in texts]
+
+    def __call__(self, text):
+        return self._vec(text)
+
+
+def _row(id, name, description, trust_score):
+    return {"id": id, "name": name, "transport": "stdio", "command": "python", "args": [f"{name}.py"],
+            "category": None, "trust_score": trust_score, "description": description}
+
+
+def test_semantic_search_blends_trust_and_syncs_incrementally():
+    rows = {
+        1: _row(1, "math_agent_top", "数学计算：平方、加减乘除等数值运算", 100),
+        2: _row(2, "math_agent_low", "数学计算：平方、加减乘除等数值运算", 10),
+        3: _row(3, "language_agent_top", "把数字或文本翻译成有趣的语言描述", 90),
+    }
+    catalog = MCPCatalog(loader=lambda since: [dict(r) for r in rows.values()], counter=lambda: len(rows),
+                         refresh_interval=0)
+    catalog.refresh()
+    embeddings = _CharEmbeddings()
+    index = MCPVectorIndex(catalog, embeddings, trust_weight=0.3)
+    catalog.add_listener(index.sync)
+    assert index.sync() == {"embedded": 3, "deleted": 0}
+
+    # 两条数学工具描述相同、相似度相近，trust_score 决定先后
+    hits = index.search("数学计算：平方运算", k=2)
+    assert [h["name"] for h in hits] == ["math_agent_top", "math_agent_low"]
+    assert abs(hits[0]["similarity"] - hits[1]["similarity"]) < 0.05 and hits[0]["score"] > hits[1]["score"]
+    assert index.search("把数字翻译成有趣的语言描述", k=1)[0]["name"] == "language_agent_top"
+
+    # 目录变化：仅重新编码变更记录，删除已移除记录
+    rows[3] = _row(3, "language_agent_top", "发送邮件通知", 90)
+    del rows[2]
+    calls = embeddings.calls
+    catalog.refresh(full=True)
+    assert embeddings.calls - calls == 1
+    assert index.stats()["entries"] == 2
+    assert [h["name"] for h in index.search("发送邮件通知", k=1)] == ["language_agent_top"]
+    assert [h["name"] for h in index.search("数学计算", k=3)] == ["math_agent_top", "language_agent_top"]
+
+
+def test_search_runs_while_sync_embeds_and_shared_index_builds_in_background(offline_env, monkeypatch):
+    import threading
+    import time
+
+    from agentlz.config.settings import get_settings
+    from agentlz.core import embedding_model_factory
+    from agentlz.services import mcp_catalog, mcp_vector_index
+
+    rows = {1: _row(1, "math_agent_top", "数学计算：平方、加减乘除等数值运算", 100)}
+    catalog = MCPCatalog(loader=lambda since: [dict(r) for r in rows.values()], counter=lambda: len(rows),
+                         refresh_interval=0)
+    catalog.refresh()
+    gate = threading.Event()
+
+    class _GatedEmbeddings(_CharEmbeddings):
+        def embed_documents(self, texts):
+            if getattr(self, "calls", 0):
+                gate.wait(5)
+            return super().embed_documents(texts)
+
+    index = MCPVectorIndex(catalog, _GatedEmbeddings())
+    index.sync()
+    rows[2] = _row(2, "mail_agent", "发送邮件通知", 80)
+    catalog.refresh(full=True)
+    syncing = threading.Thread(target=index.sync)
+    syncing.start()
+    try:
+        # 新记录编码期间检索不被阻塞，返回旧快照
+        start = time.perf_counter()
+        assert [h["name"] for h in index.search("发送邮件通知", k=2)] == ["math_agent_top"]
+        assert time.perf_counter() - start < 1.0
+    finally:
+        gate.set()
+        syncing.join(5)
+    assert index.search("发送邮件通知", k=1)[0]["name"] == "mail_agent"
+
+    # 进程共享索引：首次调用启动后台构建并立即返回 None
+    built = threading.Event()
+    monkeypatch.setenv("MCP_VECTOR_SEARCH_ENABLED", "true")
+    monkeypatch.setenv("MCP_VECTOR_INDEX_DIR", "")
+    monkeypatch.setattr(mcp_catalog, "_CATALOG", catalog)
+    monkeypatch.setattr(mcp_vector_index, "_INDEX", None)
+    monkeypatch.setattr(mcp_vector_index, "_BUILDER", None)
+
+    def slow_embeddings(**kwargs):
+        built.wait(5)
+        return _CharEmbeddings()
+
+    monkeypatch.setattr(embedding_model_factory, "get_hf_embeddings", slow_embeddings)
+    settings = get_settings()
+    assert mcp_vector_index.get_mcp_vector_index(settings) is None
+    built.set()
+    mcp_vector_index._BUILDER.join(5)
+    shared = mcp_vector_index.get_mcp_vector_index(settings)
+    assert shared is not None and shared.stats()["entries"] == 2
+    catalog._listeners.remove(shared.sync)
+
+
+def test_failed_build_is_retried_and_registers_no_listener(offline_env, monkeypatch):
+    from agentlz.config.settings import get_settings
+    from agentlz.core import embedding_model_factory
+    from agentlz.services import mcp_catalog, mcp_vector_index
+
+    rows = {1: _row(1, "math_agent_top", "数学计算", 100)}
+    catalog = MCPCatalog(loader=lambda since: [dict(r) for r in rows.values()], counter=lambda: len(rows),
+                         refresh_interval=0)
+    catalog.refresh()
+    monkeypatch.setenv("MCP_VECTOR_SEARCH_ENABLED", "true")
+    monkeypatch.setenv("MCP_VECTOR_INDEX_DIR", "")
+    monkeypatch.setattr(mcp_catalog, "_CATALOG", catalog)
+    for name, value in (("_INDEX", None), ("_BUILDER", None), ("_BUILD_FAILURES", 0), ("_BUILD_RETRY_AT", 0.0)):
+        monkeypatch.setattr(mcp_vector_index, name, value)
+    attempts = []
+
+    def flaky_embeddings(**kwargs):
+        attempts.append(kwargs)
+        if len(attempts) == 1:
+            raise OSError("model download failed")
+        return _CharEmbeddings()
+
+    monkeypatch.setattr(embedding_model_factory, "get_hf_embeddings", flaky_embeddings)
+    settings = get_settings()
+    assert mcp_vector_index.get_mcp_vector_index(settings) is None
+    mcp_vector_index._BUILDER.join(5)
+    # 失败后不留下构建线程标记与目录回调，退避期内不重试
+    assert mcp_vector_index._BUILDER is None and catalog._listeners == []
+    assert mcp_vector_index.get_mcp_vector_index(settings) is None and len(attempts) == 1
+
+    monkeypatch.setattr(mcp_vector_index, "_BUILD_RETRY_AT", 0.0)
+    assert mcp_vector_index.get_mcp_vector_index(settings) is None
+    mcp_vector_index._BUILDER.join(5)
+    shared = mcp_vector_index.get_mcp_vector_index(settings)
+    assert shared is not None and shared.stats()["entries"] == 1 and catalog._listeners == [shared.sync]
+    catalog._listeners.remove(shared.sync)
+
+
+def test_persisted_index_is_not_reused_across_embedding_models(tmp_path):
+    class _ShortEmbeddings(_CharEmbeddings):
+        def _vec(self, text):
+            return super()._vec(text)[:128]
+
+    rows = {1: _row(1, "math_agent_top", "数学计算：平方运算", 100)}
+    catalog = MCPCatalog(loader=lambda since: [dict(r) for r in rows.values()], counter=lambda: len(rows),
+                         refresh_interval=0)
+    catalog.refresh()
+    first = MCPVectorIndex(catalog, _CharEmbeddings(), persist_dir=str(tmp_path), model_name="model-a")
+    assert first.sync() == {"embedded": 1, "deleted": 0}
+    again = MCPVectorIndex(catalog, _CharEmbeddings(), persist_dir=str(tmp_path), model_name="model-a")
+    assert again.sync() == {"embedded": 0, "deleted": 0}
+
+    # 换模型（维度也不同）：不读取 model-a 的索引，全部重新编码
+    other = MCPVectorIndex(catalog, _ShortEmbeddings(), persist_dir=str(tmp_path), model_name="model-b")
+    assert other.sync() == {"embedded": 1, "deleted": 0}
+    assert other.search("数学计算", k=1)[0]["name"] == "math_agent_top"
+
+    # 同名索引文件却是其它维度（例如旧版本按固定文件名写入）：丢弃重建而不是让 FAISS 报错
+    (tmp_path / "mcp_agents-x.faiss").write_bytes((tmp_path / f"{first.service.index_name}.faiss").read_bytes())
+    (tmp_path / "mcp_agents-x.pkl").write_bytes((tmp_path / f"{first.service.index_name}.pkl").read_bytes())
+    stale = MCPVectorIndex(catalog, _ShortEmbeddings(), persist_dir=str(tmp_path), index_name="mcp_agents-x")
+    assert stale.stats()["entries"] == 0 and stale.sync() == {"embedded": 1, "deleted": 0}
+    assert stale.search("数学计算", k=1)[0]["name"] == "math_agent_top"
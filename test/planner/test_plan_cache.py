@@ -0,0 +1,121 @@
+import asyncio
+import dataclasses
+import json
+import zlib
+
+from agentlz.agents.executor.executor_agnet import MCPChainExecutor
+from agentlz.schemas.workflow import MCPConfigItem, WorkflowPlan, WorkflowStep
+from agentlz.services.plan_cache import SemanticPlanCache, normalize_input
+from test.bench.fake_llm import FakeChatModel, executor_responder
+from test.helpers import FakeMCPServer
+
+
+class _CharEmbeddings:
+    """字符二元组哈希向量：措辞相近的句子余弦相似度高，且结果确定。"""
+
+    def embed_query(self, text):
+        vec = [0.0] * 256
+        for a, b in zip(text, text[1:]):
+            vec[zlib.crc32((a + b).encode("utf-8")) % 256] += 1.0
+        return vec
+
+
+class _Catalog:
+    def __init__(self):
+        self.rows = {"math_agent_top": {"name": "math_agent_top", "transport": "stdio",
+                                        "command": "python", "args": ["math_agent.py"]}}
+        self.version = 1
+
+    def lookup(self, names):
+        return [dict(self.rows[n]) for n in names if n in self.rows]
+
+    def fingerprint(self):
+        return f"v{self.version}"
+
+
+def _plan():
+    return WorkflowPlan(
+        execution_chain=["math_agent_top"],
+        mcp_config=[MCPConfigItem(name="math_agent_top", transport="stdio", command="python", args=["math_agent.py"])],
+        instructions="调用 math_agent_top",
+    )
+
+
+def _cache(catalog, threshold=0.9):
+    return SemanticPlanCache(
+        _CharEmbeddings(), threshold=threshold,
+        catalog_lookup=catalog.lookup, catalog_fingerprint=catalog.fingerprint, catalog_check_interval=0,
+    )
+
+
+def test_paraphrase_hits_and_reports_saved_latency():
+    cache = _cache(_Catalog())
+    assert cache.lookup("请计算 3 的平方，再加上 3") is None
+    assert cache.store("请计算 3 的平方，再加上 3", _plan(), plan_latency_s=2.5)
+
+    hit = cache.lookup("  请计算３的平方,再加上３！ ")
+    assert hit is not None and hit.execution_chain == ["math_agent_top"]
+    # 返回深拷贝，调用方修改不影响缓存
+    hit.execution_chain.append("x")
+    assert cache.lookup("请计算 3 的平方，再加上 3").execution_chain == ["math_agent_top"]
+
+    assert cache.lookup("给张三发一封邮件") is None
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["lookups"] == 4
+    assert stats["hit_rate"] == 0.5
+    assert 4.0 < stats["saved_latency_s"] <= 5.0
+    assert normalize_input(" ＡＢＣ！") == "abc"
+
+
+def test_changed_mcp_config_rejects_entry():
+    catalog = _Catalog()
+    cache = _cache(catalog)
+    cache.store("请计算 3 的平方", _plan(), 1.0)
+    catalog.rows["math_agent_top"]["args"] = ["other.py"]
+    assert cache.lookup("请计算 3 的平方") is None
+    stats = cache.stats()
+    assert stats["rejected"] == 1 and stats["entries"] == 0
+
+
+def test_catalog_change_invalidates_all_entries():
+    catalog = _Catalog()
+    cache = _cache(catalog)
+    cache.store("请计算 3 的平方", _plan(), 1.0)
+    cache.store("请计算 4 的平方", _plan(), 1.0)
+    catalog.version = 2
+    assert cache.lookup("请计算 3 的平方") is None
+    stats = cache.stats()
+    assert stats["invalidations"] == 1 and stats["entries"] == 0
+
+
+def test_hit_for_other_number_carries_no_literal_from_the_cached_request():
+    # 阈值放低，保证 "计算 5 的平方" 命中 "计算 3 的平方" 的条目
+    cache = _cache(_Catalog(), threshold=0.5)
+    plan = _plan()
+    plan.instructions = "计算 3 的平方"
+    plan.steps = [WorkflowStep(id="s1", server="math_agent_top", task="计算 3 的平方"),
+                  WorkflowStep(id="s2", server="", task="用一句话说明 {s1} 是 3 的平方", inputs=["s1"])]
+    cache.store("计算 3 的平方", plan, 1.0)
+
+    hit = cache.lookup("计算 5 的平方")
+    assert hit is not None and hit.execution_chain == ["math_agent_top"]
+    assert "3" not in json.dumps(dataclasses.asdict(hit), ensure_ascii=False)
+
+
+def test_paraphrase_with_other_number_does_not_replay_cached_tool_args(offline_env, pooled_executor):
+    offline_env.setenv("EXECUTOR_MODE", "direct")
+    cache = _cache(_Catalog())
+    plan = _plan()
+    plan.steps = [WorkflowStep(id="s1", server="math_agent_top", task="计算 3 的平方", tool="square", args={"x": 3})]
+    cache.store("请帮我计算一下 3 的平方，然后把结果用一句话告诉我", plan, 1.0)
+
+    hit = cache.lookup("请帮我计算一下 5 的平方，然后把结果用一句话告诉我")
+    assert hit is not None and hit.steps == [] and hit.instructions == ""
+
+    server = FakeMCPServer()
+    pooled_executor(server.factory)
+    llm = FakeChatModel(responder=executor_responder(answer_words=2), latency_ms=0, counters={})
+    asyncio.run(MCPChainExecutor(hit, llm=llm).execute_chain("请帮我计算一下 5 的平方"))
+    # 没有原样重放缓存的 {"x": 3}：工具参数由模型按新请求给出
+    assert server.calls and ("square", {"x": 3}) not in server.calls
+    assert llm.counters["calls"] >= 1
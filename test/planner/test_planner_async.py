@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+
+from agentlz.agents.planner.planner_agent import aplan_workflow_chain, aplan_workflow_chain_batch
+from test.bench.fake_llm import FakeChatModel, planner_responder
+from test.bench.run_bench import make_lookup_tool
+
+
+pytestmark = pytest.mark.usefixtures("offline_env")
+
+
+def test_batch_plans_concurrently_and_preserves_order():
+    llm = FakeChatModel(responder=planner_responder(["tool0"]), latency_ms=100)
+    tool = make_lookup_tool(0, db_latency_ms=50)
+    inputs = [f"任务 {i}" for i in range(8)]
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        plans = await aplan_workflow_chain_batch(inputs, concurrency=8, llm=llm, tools=[tool])
+        return plans, loop.time() - start
+
+    plans, elapsed = asyncio.run(run())
+    assert len(plans) == len(inputs)
+    assert all(p.execution_chain == ["bench_tool0"] for p in plans)
+    # 串行需 8 * (2 * 100ms + 50ms) = 2s；并发执行应远小于此
+    assert elapsed < 1.5
+
+
+def test_timeout_cancels_planning_and_returns_failed_plan():
+    llm = FakeChatModel(responder=planner_responder(["tool0"]), latency_ms=2000)
+    plan = asyncio.run(aplan_workflow_chain("任务", llm=llm, tools=[make_lookup_tool(0)], timeout=0.2))
+    assert plan.execution_chain == [] and "超时" in plan.instructions
@@ -0,0 +1,41 @@
+import pytest
+
+from agentlz.agents.planner.planner_agent import plan_workflow_chain
+from test.bench.bench_planner_modes import UNMATCHED_INPUT, build_catalog
+from test.bench.fake_llm import FakeChatModel, _tool_call, planner_inline_responder, planner_responder
+from test.bench.run_bench import USER_INPUT, make_lookup_tool
+
+
+@pytest.fixture(autouse=True)
+def _env(offline_env):
+    offline_env.setenv("PLANNER_MODE", "inline")
+
+
+def test_inline_mode_plans_in_a_single_call_from_catalog_candidates():
+    llm = FakeChatModel(responder=planner_inline_responder(), counters={})
+    plan = plan_workflow_chain(USER_INPUT, llm=llm, tools=[make_lookup_tool(0)], catalog=build_catalog(50))
+    assert plan.execution_chain == ["bench_tool0", "bench_tool1"]
+    assert llm.counters["calls"] == 1
+
+
+def test_inline_plan_keeps_catalog_configs_and_drops_unknown_tools():
+    def responder(messages, tools):
+        return _tool_call("WorkflowPlan", {
+            "execution_chain": ["bench_tool0", "made_up_tool"],
+            "mcp_config": [{"name": "bench_tool0", "transport": "stdio", "command": "node", "args": ["x.js"]},
+                           {"name": "made_up_tool", "transport": "stdio", "command": "python", "args": []}],
+            "instructions": "调用 bench_tool0",
+        }, 0)
+
+    catalog = build_catalog(10)
+    plan = plan_workflow_chain(USER_INPUT, llm=FakeChatModel(responder=responder), catalog=catalog)
+    assert plan.execution_chain == ["bench_tool0"]
+    expected = catalog.search_configs("bench_tool0")[0]
+    assert (plan.mcp_config[0].command, plan.mcp_config[0].args) == (expected["command"], expected["args"])
+
+
+def test_inline_mode_falls_back_to_agent_when_prefilter_is_inconclusive():
+    llm = FakeChatModel(responder=planner_responder(["tool0"]), counters={})
+    plan = plan_workflow_chain(UNMATCHED_INPUT, llm=llm, tools=[make_lookup_tool(0)], catalog=build_catalog(50))
+    # 代理模式：一次关键词查询 + 一次输出计划
+    assert plan.execution_chain == ["bench_tool0"] and llm.counters["calls"] == 2
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import agentlz.app.routers.workflow as workflow_router
+from agentlz.schemas.workflow import WorkflowPlan
+from agentlz.services.workflow_runner import WorkflowQueueFull, WorkflowRunner, parse_tenant_weights
+
+
+def _start_order(runner, submissions):
+    """按 submissions 顺序提交 (租户, 个数)，逐个完成后返回各工作流的启动顺序（租户名）。"""
+
+    async def main():
+        order = []
+
+        async def job(tenant):
+            async with runner.slot(tenant):
+                order.append(tenant)
+                await asyncio.sleep(0.01)
+
+        tasks = []
+        for tenant, count in submissions:
+            for _ in range(count):
+                tasks.append(asyncio.create_task(job(tenant)))
+                await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return order
+
+    return asyncio.run(main())
+
+
+def test_backlogged_tenant_does_not_starve_others():
+    runner = WorkflowRunner(max_concurrency=1)
+    order = _start_order(runner, [("a", 20), ("b", 3)])
+    # b 的 3 个工作流与 a 交替启动，而不是排在 a 的 20 个之后
+    assert order.index("b") <= 2
+    assert [i for i, t in enumerate(order) if t == "b"][-1] < 8
+    stats = runner.stats()
+    assert stats["running"] == 0 and stats["queued"] == 0
+    assert stats["tenants"]["a"]["completed"] == 20 and stats["tenants"]["a"]["wait_p95_ms"] > 0
+
+
+def test_weights_split_slots_proportionally():
+    runner = WorkflowRunner(max_concurrency=1, weights=parse_tenant_weights("gold:3, free:1, bad:x"))
+    order = _start_order(runner, [("free", 12), ("gold", 12)])
+    # 两个租户都在排队的区间内，gold 约获得 3/4 的名额
+    window = order[1:13]
+    assert window.count("gold") == 9
+    assert runner.weights == {"gold": 3.0, "free": 1.0}
+
+
+def test_full_queue_rejects_and_cancelled_waiters_leave_the_queue():
+    runner = WorkflowRunner(max_concurrency=1, max_queue_per_tenant=1, max_queue_total=2)
+
+    async def main():
+        held = runner.submit("a")  # 立即获得名额
+        queued = runner.submit("a")
+        with pytest.raises(WorkflowQueueFull):
+            runner.submit("a")
+        other = runner.submit("b")
+        with pytest.raises(WorkflowQueueFull):
+            runner.submit("c")  # 总排队数已满
+        waiter = asyncio.create_task(queued.wait())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert runner.stats()["queued"] == 1
+        held.release()
+        await asyncio.wait_for(other.wait(), 1.0)
+        other.release()
+
+    asyncio.run(main())
+    stats = runner.stats()
+    assert stats["rejected"] == 2 and stats["tenants"]["a"]["rejected"] == 1
+    assert stats["running"] == 0 and stats["queued"] == 0
+
+
+def test_idle_tenants_are_evicted_and_tenant_count_is_capped():
+    runner = WorkflowRunner(max_concurrency=1, max_tenants=3)
+
+    async def main():
+        held = runner.submit("a")
+        queued = [runner.submit(f"t{i}") for i in range(2)]
+        # 租户表已满（a、t0、t1 都有工作流），新租户被拒绝
+        with pytest.raises(WorkflowQueueFull):
+            runner.submit("spam")
+        held.release()
+        for ticket in queued:
+            await asyncio.wait_for(ticket.wait(), 1.0)
+            ticket.release()
+        # 大量一次性租户 id：完成后不再占用租户表
+        for i in range(50):
+            async with runner.slot(f"once-{i}"):
+                pass
+
+    asyncio.run(main())
+    stats = runner.stats()
+    assert stats["rejected"] == 1 and stats["running"] == 0 and stats["queued"] == 0
+    assert len(stats["tenants"]) <= 3
+
+    # 被移除后重新出现的租户与保留时一样从当前虚拟时钟开始，公平性不变
+    order = _start_order(runner, [("a", 20), ("b", 3)])
+    assert order.index("b") <= 2 and [i for i, t in enumerate(order) if t == "b"][-1] < 8
+    assert len(runner.stats()["tenants"]) <= 3
+
+
+def test_http_workflow_returns_429_when_tenant_queue_is_full(offline_env, monkeypatch):
+    monkeypatch.setenv("MCP_CATALOG_ENABLED", "false")
+    runner = WorkflowRunner(max_concurrency=1, max_queue_per_tenant=0)
+    monkeypatch.setattr(workflow_router, "get_workflow_runner", lambda settings: runner)
+    failed = WorkflowPlan(execution_chain=[], mcp_config=[], instructions="计划生成失败：无可用工具。")
+    monkeypatch.setattr(workflow_router, "plan_workflow_chain", lambda text, **kwargs: failed)
+
+    from agentlz.app.http_langserve import app
+
+    held = runner.submit("busy")
+    with TestClient(app) as client:
+        rejected = client.post("/v1/workflow/run", json={"input": "x"}, headers={"X-Tenant-ID": "t1"})
+        held.release()
+        accepted = client.post("/v1/workflow/run", json={"input": "x"}, headers={"X-Tenant-ID": "t1"})
+        stats = client.get("/v1/workflow-runner/stats")
+    assert rejected.status_code == 429
+    assert accepted.status_code == 200 and accepted.json()["status"] == "error"
+    # 被拒绝时 t1 没有排队与运行中的工作流，不保留租户条目；拒绝计入全局计数
+    assert runner.stats()["rejected"] == 1
+    assert stats.status_code == 200
@@ -0,0 +1,105 @@
+import json
+import sys
+from pathlib import Path
+from typing import Any, List
+
+from fastapi.testclient import TestClient
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+import agentlz.agents.executor.executor_agnet as executor_module
+import agentlz.app.routers.workflow as workflow_router
+from agentlz.services import mcp_session_pool
+from agentlz.schemas.workflow import MCPConfigItem, WorkflowPlan
+
+MATH_TOOL = Path(__file__).resolve().parents[1] / "planner" / "test_tool" / "math_tool.py"
+
+
+class _ScriptedChatModel(BaseChatModel):
+    """按脚本依次返回消息的伪模型；流式时逐词输出文本，工具调用整块输出。"""
+
+    script: List[AIMessage]
+    cursor: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: Any, **kwargs: Any):
+        return self
+
+    def _next(self) -> AIMessage:
+        msg = self.script[min(self.cursor, len(self.script) - 1)]
+        self.cursor += 1
+        return msg
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._next())])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        msg = self._next()
+        if msg.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                for i, c in enumerate(msg.tool_calls)
+            ]))
+            return
+        for word in msg.content.split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+
+def _parse_sse(text: str):
+    events = []
+    for block in text.replace("\r\n", "\n").split("\n\n"):
+        name, data = None, None
+        for line in block.split("\n"):
+            if line.startswith("event:"):
+                name = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:"):].strip())
+        if name:
+            events.append((name, data))
+    return events
+
+
+def test_workflow_stream_emits_plan_tool_and_token_events(offline_env, monkeypatch, tmp_path):
+    monkeypatch.setenv("MCP_CATALOG_ENABLED", "false")
+    # 共享会话池的工具定义缓存写到临时目录，不落到默认的 .storage 路径
+    monkeypatch.setenv("MCP_TOOL_CACHE_PATH", str(tmp_path / "mcp_tool_cache.json"))
+    monkeypatch.setattr(mcp_session_pool, "_POOL", None)
+    plan = WorkflowPlan(
+        execution_chain=["math"],
+        mcp_config=[MCPConfigItem(name="math", transport="stdio", command=sys.executable, args=[str(MATH_TOOL)])],
+        instructions="调用 evaluate 计算。",
+    )
+    model = _ScriptedChatModel(script=[
+        AIMessage("", tool_calls=[{"name": "evaluate", "args": {"expression": "3*3"}, "id": "call-1"}]),
+        AIMessage("结果 是 9"),
+    ])
+    monkeypatch.setattr(workflow_router, "plan_workflow_chain", lambda text, **kwargs: plan)
+    monkeypatch.setattr(executor_module, "get_model", lambda *a, **k: model)
+
+    from agentlz.app.http_langserve import app
+
+    try:
+        with TestClient(app) as client:
+            resp = client.post("/v1/workflow/stream", json={"input": "3 的平方"})
+    finally:
+        if mcp_session_pool._POOL is not None:
+            mcp_session_pool._POOL.close()
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(resp.text)
+    names = [n for n, _ in events]
+
+    # 规划结果最先推送，随后是工具调用、token 增量，最后 result / done
+    assert names[0] == "plan"
+    assert events[0][1]["plan"]["execution_chain"] == ["math"]
+    assert names.index("tool_start") < names.index("tool_end") < names.index("token")
+    tool_end = events[names.index("tool_end")][1]
+    assert tool_end["name"] == "evaluate" and "9" in tool_end["output"]
+    tokens = "".join(d["text"] for n, d in events if n == "token")
+    assert tokens.strip() == "结果 是 9"
+    assert names[-2:] == ["result", "done"]
+    assert events[-2][1]["output"].strip() == "结果 是 9"
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agentlz.core.async_embeddings import AsyncEmbeddings
+
+
+class _SlowEmbeddings:
+    """同步且耗时的编码实现，用于验证事件循环不被阻塞。"""
+
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.started = threading.Event()
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.started.set()
+        time.sleep(self.delay)
+        return [[float(len(t))] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_encode_does_not_block_event_loop():
+    emb = AsyncEmbeddings(_SlowEmbeddings(0.3), max_workers=1, max_queue=4)
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        t = asyncio.create_task(ticker())
+        vec = await emb.aembed_query("abc")
+        t.cancel()
+        return vec, ticks
+
+    vec, ticks = asyncio.run(run())
+    assert vec == [3.0]
+    # 编码 0.3 秒期间事件循环仍持续调度其他协程
+    assert ticks >= 10
+    emb.shutdown()
+
+
+def test_cancelled_queued_request_is_withdrawn_and_metrics_reported():
+    slow = _SlowEmbeddings(0.3)
+    emb = AsyncEmbeddings(slow, max_workers=1, max_queue=4)
+
+    async def run():
+        first = asyncio.create_task(emb.aembed_query("a"))
+        await asyncio.to_thread(slow.started.wait, 1.0)
+        second = asyncio.create_task(emb.aembed_query("bb"))
+        await asyncio.sleep(0.02)
+        during = emb.metrics()
+        second.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await second
+        await first
+        return during
+
+    during = asyncio.run(run())
+    assert during["running"] == 1
+    assert during["queued"] == 1
+    after = emb.metrics()
+    assert after["queued"] == 0 and after["running"] == 0
+    assert after["cancelled"] == 1 and after["completed"] == 1
+    # 被取消的排队任务从未执行
+    assert slow.calls == 1
+    emb.shutdown()
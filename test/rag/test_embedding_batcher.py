@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+
+from agentlz.services.embedding_batcher import MicroBatcher
+
+
+class _RecordingEmbeddings:
+    """记录每次 embed_documents 的批大小；向量为文本长度，便于校验结果切分。"""
+
+    def __init__(self):
+        self.batch_sizes = []
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            self.batch_sizes.append(len(texts))
+        return [[float(len(t))] for t in texts]
+
+
+def test_concurrent_requests_are_coalesced_and_split_back():
+    emb = _RecordingEmbeddings()
+
+    async def run():
+        batcher = MicroBatcher(emb, max_batch_size=16, max_wait_ms=50)
+        texts = [["a" * (i + 1)] for i in range(16)]
+        results = await asyncio.gather(*(batcher.embed(t) for t in texts))
+        stats = batcher.stats()
+        await batcher.stop()
+        return results, stats
+
+    results, stats = asyncio.run(run())
+
+    # 每个请求拿回自己文本对应的向量
+    assert results == [[[float(i + 1)]] for i in range(16)]
+    # 16 个并发单条请求应被合并为少量批次
+    assert len(emb.batch_sizes) <= 2
+    assert stats["requests"] == 16
+    assert stats["batch_fill_ratio"] > 0.5
+    assert stats["latency_p99_ms"] >= stats["latency_p50_ms"]
+
+
+def test_lone_request_departs_after_max_wait():
+    emb = _RecordingEmbeddings()
+
+    async def run():
+        batcher = MicroBatcher(emb, max_batch_size=64, max_wait_ms=5)
+        out = await asyncio.wait_for(batcher.embed(["hello"]), timeout=1.0)
+        await batcher.stop()
+        return out
+
+    assert asyncio.run(run()) == [[5.0]]
+    assert emb.batch_sizes == [1]
+
+
+def test_stop_cancels_requests_already_taken_by_the_worker():
+    started = threading.Event()
+
+    class _SlowEmbeddings:
+        def embed_documents(self, texts):
+            started.set()
+            time.sleep(0.3)
+            return [[0.0] for _ in texts]
+
+    async def run():
+        batcher = MicroBatcher(_SlowEmbeddings(), max_batch_size=1, max_wait_ms=0)
+        running = asyncio.create_task(batcher.embed(["in-flight"]))
+        while not started.is_set():
+            await asyncio.sleep(0.005)
+        queued = asyncio.create_task(batcher.embed(["queued"]))
+        await asyncio.sleep(0)
+        # 推理中的批次与排队中的请求都以取消结束，调用方不会一直挂起
+        await batcher.stop()
+        return await asyncio.wait_for(asyncio.gather(running, queued, return_exceptions=True), 1.0)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, asyncio.CancelledError) for r in results)
@@ -0,0 +1,128 @@
+import threading
+import time
+
+from agentlz.core import embedding_model_factory as factory
+
+
+class _CountingEmbeddings:
+    """替代 HuggingFaceEmbeddings 的轻量实现：记录构造与编码次数。"""
+
+    created = 0
+
+    def __init__(self, model_name, model_kwargs, encode_kwargs):
+        type(self).created += 1
+        # 模拟较慢的权重加载，放大并发首次访问的竞争窗口
+        time.sleep(0.05)
+        self.model_name = model_name
+        self.model_kwargs = model_kwargs
+        self.encode_kwargs = encode_kwargs
+        self.queries = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [0.0]
+
+
+def _setup(monkeypatch):
+    monkeypatch.setenv("MODEL_NAME", "test-model")
+    monkeypatch.setenv("CHATOPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+    _CountingEmbeddings.created = 0
+    monkeypatch.setattr(factory, "HuggingFaceEmbeddings", _CountingEmbeddings)
+    factory.clear_hf_embeddings_cache()
+
+
+def test_same_key_returns_cached_instance_with_single_warmup(monkeypatch):
+    _setup(monkeypatch)
+
+    a = factory.get_hf_embeddings(model_name="m1", device="cpu")
+    b = factory.get_hf_embeddings(model_name="m1", device="cpu")
+    c = factory.get_hf_embeddings(model_name="m1", device="cpu", normalize_embeddings=False)
+
+    assert a is b
+    assert a is not c
+    assert _CountingEmbeddings.created == 2
+    assert len(a.queries) == 1  # 仅首次加载时预热一次
+    factory.clear_hf_embeddings_cache()
+
+
+def test_concurrent_first_access_loads_once(monkeypatch):
+    _setup(monkeypatch)
+
+    results = []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        results.append(factory.get_hf_embeddings(model_name="m2", device="cpu"))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert _CountingEmbeddings.created == 1
+    assert all(r is results[0] for r in results)
+    factory.clear_hf_embeddings_cache()
+
+
+def test_shared_server_only_serves_its_own_model_and_normalization(monkeypatch):
+    _setup(monkeypatch)
+    monkeypatch.setenv("EMBEDDING_SERVER_URL", "http://127.0.0.1:9")
+    monkeypatch.setenv("HF_EMBEDDING_MODEL", "served-model")
+
+    remote = factory.get_hf_embeddings(model_name="served-model")
+    assert isinstance(remote, factory.RemoteEmbeddings) and remote.model == "served-model"
+    assert factory.get_hf_embeddings(model_name=None) is remote
+    # 其它模型或不归一化：进程内加载，不能复用服务端的向量
+    other = factory.get_hf_embeddings(model_name="other-model", warmup=False)
+    raw = factory.get_hf_embeddings(model_name="served-model", normalize_embeddings=False, warmup=False)
+    assert isinstance(other, _CountingEmbeddings) and other.model_name == "other-model"
+    assert isinstance(raw, _CountingEmbeddings) and raw.encode_kwargs == {"normalize_embeddings": False}
+    factory.clear_hf_embeddings_cache()
+
+
+def test_embedding_server_rejects_mismatched_model(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import agentlz.app.embedding_server as server
+
+    monkeypatch.setattr(server, "_MODEL", "served-model")
+    client = TestClient(server.app)  # 不进入 lifespan：不加载模型
+    assert client.post("/v1/embeddings", json={"texts": ["a"], "model": "other-model"}).status_code == 400
+    assert client.post("/v1/embeddings", json={"texts": ["a"], "normalize": False}).status_code == 400
+
+
+def test_remote_embeddings_uses_one_async_client_per_event_loop():
+    import asyncio
+    import gc
+    import json
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from agentlz.core.embedding_client import RemoteEmbeddings
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            texts = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["texts"]
+            body = json.dumps({"embeddings": [[float(len(t))] for t in texts]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        remote = RemoteEmbeddings(f"http://127.0.0.1:{httpd.server_address[1]}")
+        # 进程共享的实例在多次 asyncio.run 中使用：每个事件循环各自的连接池，不会跨循环复用
+        assert asyncio.run(remote.aembed_query("abc")) == [3.0]
+        assert asyncio.run(remote.aembed_documents(["a", "bb"])) == [[1.0], [2.0]]
+        gc.collect()
+        assert len(remote._async_clients) == 0
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
@@ -0,0 +1,89 @@
+
+import time
+
+import pytest
+
+# 覆盖中英混合、长短不一的样本，贴近检索场景
+SAMPLE_TEXTS = [
+    "数学计算 agent（最高可信度）",
+    "将数字结果转化为有趣双关的描述",
+    "请根据原始数字进行两次平方和一次与原始数字的相加",
+    "通过邮件代理发送邮件，成功返回 ok",
+    "FAISS 向量数据库服务封装，提供统一的 CRUD 接口",
+    "Send an email using credentials from .env.",
+    "自然坐标系是一种沿着物体运动轨迹建立的坐标系，其基矢量随物体运动而变化。" * 4,
+    "hello world",
+]
+
+
+# Settings 要求 LLM 相关配置；嵌入对比用不到，使用离线占位值
+pytestmark = pytest.mark.usefixtures("offline_env")
+
+
+def _load_backends(quantize: bool):
+    """加载 PyTorch 与 ONNX 两个后端；依赖或模型不可用时跳过。"""
+    try:
+        import numpy  # noqa: F401
+        import onnxruntime  # noqa: F401
+        from agentlz.config.settings import get_settings
+        from agentlz.core.embedding_model_factory import get_hf_embeddings, get_onnx_embeddings
+    except Exception as e:
+        pytest.skip(f"环境不完整，跳过测试: {e}")
+
+    try:
+        settings = get_settings()
+        torch_emb = get_hf_embeddings(model_name=settings.hf_embedding_model, device="cpu")
+        onnx_emb = get_onnx_embeddings(model_name=settings.hf_embedding_model, quantize=quantize)
+    except Exception as e:
+        pytest.skip(f"嵌入模型不可用或导出失败，跳过：{e}")
+    return torch_emb, onnx_emb
+
+
+def compare_onnx_with_torch(quantize: bool = True, rounds: int = 5, texts=None):
+    """对比 ONNX 与 PyTorch 后端：返回余弦相似度（逐条）与吞吐（条/秒）。"""
+    import numpy as np
+
+    texts = texts or SAMPLE_TEXTS
+    torch_emb, onnx_emb = _load_backends(quantize)
+
+    ref = np.asarray(torch_emb.embed_documents(texts), dtype=np.float32)
+    got = np.asarray(onnx_emb.embed_documents(texts), dtype=np.float32)
+    cos = (ref * got).sum(axis=1) / (
+        np.linalg.norm(ref, axis=1) * np.linalg.norm(got, axis=1)
+    )
+
+    def _throughput(emb) -> float:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            emb.embed_documents(texts)
+        return rounds * len(texts) / (time.perf_counter() - start)
+
+    return {
+        "cosine": cos.tolist(),
+        "min_cosine": float(cos.min()),
+        "torch_texts_per_s": _throughput(torch_emb),
+        "onnx_texts_per_s": _throughput(onnx_emb),
+    }
+
+
+def test_onnx_fp32_parity_with_torch():
+    """fp32 导出应与 PyTorch 输出几乎一致。"""
+    result = compare_onnx_with_torch(quantize=False, rounds=1)
+    assert result["min_cosine"] > 0.999, result
+
+
+def test_onnx_int8_parity_with_torch():
+    """动态 int8 量化允许少量精度损失，但检索语义应保持一致。"""
+    result = compare_onnx_with_torch(quantize=True, rounds=1)
+    assert result["min_cosine"] > 0.98, result
+
+
+if __name__ == "__main__":
+    for q in (False, True):
+        r = compare_onnx_with_torch(quantize=q)
+        print(f"=== ONNX {'int8' if q else 'fp32'} vs PyTorch ===")
+        print(f"最小余弦相似度: {r['min_cosine']:.5f}")
+        print(f"PyTorch 吞吐: {r['torch_texts_per_s']:.1f} 条/秒")
+        print(f"ONNX 吞吐: {r['onnx_texts_per_s']:.1f} 条/秒")
+        print(f"加速比: {r['onnx_texts_per_s'] / r['torch_texts_per_s']:.2f}x")
+        print()